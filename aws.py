@@ -1,15 +1,50 @@
-import gzip
+import atexit
 import logging
 import os
 import pathlib
-import urllib
-import zipfile
+import time
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-import boto3
-import botocore
-from decouple import config
-from utils import retrieve_objects_with_pattern, get_file_object, update_file_by_tuples
-from botocore.exceptions import ClientError
+from buffer_pool import DEFAULT_MEMORY_BUDGET, BufferPool
+from columnar import get_engine_kwargs
+from inventory import BucketInventory
+from journal import (
+    CLEANED,
+    DOWNLOADED,
+    REWRITTEN,
+    UPLOADED,
+    UPLOADING,
+    UpdateJournal,
+)
+from key_index import KeyIndex
+from lazy import lazy_import
+from listing import iter_objects_in_parallel
+from metrics import RequestMetrics
+from multipart import DEFAULT_PART_SIZE, DEFAULT_UPLOAD_WORKERS, upload_stream
+from streaming import read_object_sample, scan_object, update_object_streaming
+from throttling import (
+    DEFAULT_MAX_CONCURRENCY,
+    AdaptiveConcurrencyLimiter,
+    ThrottlingHandler,
+)
+from utils import (
+    CountingReader,
+    change_compress_type,
+    choose_compresslevel,
+    get_file_object,
+    get_uncompressed_name,
+    open_compressed_stream,
+    update_bytes_stream_by_tuples,
+)
+
+# boto3, botocore and decouple are imported when a session is created, so commands parse arguments without them
+boto3 = lazy_import("boto3")
+botocore_exceptions = lazy_import("botocore.exceptions")
+decouple = lazy_import("decouple")
+
+# decompressed bytes of the first object measured to choose the compression level
+COMPRESSION_SAMPLE_SIZE: int = 8 * 1024**2
 
 
 class AWSSession:
@@ -17,14 +52,111 @@ class AWSSession:
     Class to interact wit Amazon Web Service (AWS) API through boto3 library
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        inventory: BucketInventory = None,
+        listing_workers: int = None,
+        journal: UpdateJournal = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        memory_budget: int = None,
+        compression_threads: int = None,
+    ):
         self.session = boto3.Session(
-            aws_access_key_id=config("AWS_ACCESS_KEY_ID"),
-            aws_secret_access_key=config("AWS_SECRET_ACCESS_KEY"),
+            aws_access_key_id=decouple.config("AWS_ACCESS_KEY_ID"),
+            aws_secret_access_key=decouple.config("AWS_SECRET_ACCESS_KEY"),
         )
         self.logger = logging.getLogger(__name__)
+        # every client and resource of the session shares the limit of requests in flight, it shrinks when S3
+        # throttles and grows back while requests succeed
+        self.throttling: ThrottlingHandler = ThrottlingHandler(
+            AdaptiveConcurrencyLimiter(max_limit=max_concurrency)
+        )
+        self.throttling.register(self.session.events)
+        self.request_metrics: RequestMetrics = RequestMetrics()
+        self.request_metrics.register(self.session.events)
+        # with S3_METRICS_FILE set (.env or environment) the totals are written when the command ends, update
+        # workers exit without running atexit handlers and send their totals with each job result instead
+        metrics_file: str = decouple.config("S3_METRICS_FILE", default="")
+        if metrics_file:
+            atexit.register(self.export_metrics, metrics_file)
+        # bytes of transfer buffers in flight, S3_MEMORY_BUDGET_MB (.env or environment) sets it for every command
+        if memory_budget is None:
+            memory_budget = (
+                decouple.config(
+                    "S3_MEMORY_BUDGET_MB",
+                    default=DEFAULT_MEMORY_BUDGET // 1024**2,
+                    cast=int,
+                )
+                * 1024**2
+            )
+        self.buffer_pool: BufferPool = BufferPool(memory_budget)
+        # threads of each gz or zst compression, None uses every CPU
+        self.compression_threads: int = compression_threads
+        # optional local inventory, queried instead of listing the bucket each time
+        self.inventory: BucketInventory = inventory
+        self._refreshed_buckets: set = set()
+        # when set, bucket listings are split in key ranges listed concurrently
+        self.listing_workers: int = listing_workers
+        # optional journal of the update job, the steps of each object are recorded to resume it
+        self.journal: UpdateJournal = journal
+
+    def refresh_inventory(self, bucket_name: str, full: bool = False) -> None:
+        """
+        Refresh the local inventory of a bucket, at most once per session unless full is requested
+        Args:
+            bucket_name: bucket name
+            full: force a full reconcile with the bucket listing
+        """
+        if bucket_name in self._refreshed_buckets and not full:
+            return
+        self.inventory.refresh(
+            self.session.client("s3"),
+            bucket_name,
+            full=full,
+            list_objects=self.iter_objects if self.listing_workers else None,
+        )
+        self._refreshed_buckets.add(bucket_name)
+
+    def iter_objects(self, bucket_name: str):
+        """
+        Iterate over the listing entries (dicts with Key, Size, ETag and LastModified) of a bucket sorted by key
+        Args:
+            bucket_name: bucket name
+        """
+        client = self.session.client("s3")
+        if self.listing_workers:
+            yield from iter_objects_in_parallel(
+                client, bucket_name, max_workers=self.listing_workers
+            )
+            return
+        paginator = client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=bucket_name):
+            yield from page.get("Contents", [])
 
     def retrieve_obj_list(self, bucket_name):
+        if self.inventory is not None:
+            self.refresh_inventory(bucket_name)
+            return [
+                dict(
+                    name=obj["key"],
+                    size=float(obj["size"]) / (1024**2),
+                    last_modified=obj["last_modified"],
+                    url=self._build_url(obj["key"], bucket_name),
+                )
+                for obj in self.inventory.list_objects(bucket_name)
+            ]
+
+        if self.listing_workers:
+            return [
+                dict(
+                    name=obj["Key"],
+                    size=float(obj["Size"]) / (1024**2),
+                    last_modified=obj["LastModified"],
+                    url=self._build_url(obj["Key"], bucket_name),
+                )
+                for obj in self.iter_objects(bucket_name)
+            ]
+
         s3 = self.session.resource("s3")
         bucket = s3.Bucket(bucket_name)
 
@@ -48,7 +180,7 @@ class AWSSession:
         try:
             s3.meta.client.head_bucket(Bucket=bucket_name)
             return True
-        except botocore.exceptions.ClientError as e:
+        except botocore_exceptions.ClientError as e:
             # If a client error is thrown, then check that it was a 404 error.
             # If it was a 404 error, then the bucket does not exist.
             error_code = int(e.response["Error"]["Code"])
@@ -58,10 +190,14 @@ class AWSSession:
                 return False
 
     def check_file_exists(self, bucket_name, key):
+        if self.inventory is not None:
+            self.refresh_inventory(bucket_name)
+            return self.inventory.contains(bucket_name, key)
+
         s3 = self.session.resource("s3")
         try:
             s3.Object(bucket_name, key).load()
-        except botocore.exceptions.ClientError as e:
+        except botocore_exceptions.ClientError as e:
             if e.response["Error"]["Code"] == "404":
                 # The object does not exist.
                 return False
@@ -72,36 +208,127 @@ class AWSSession:
             # The object exists.
             return True
 
+    def get_object_size(self, bucket_name: str, key: str) -> int:
+        """
+        Size in bytes of an object
+        Args:
+            bucket_name: bucket name
+            key: object key
+        """
+        s3 = self.session.resource("s3")
+        return s3.Object(bucket_name, key).content_length
+
     def _build_url(self, key, bucket_name):
         return "".join(
             ["https://s3.amazonaws.com/", bucket_name, "/", urllib.parse.quote(key)]
         )
 
-    def send_file_to_bucket(self, file_path, file_key, bucket_name):
+    def send_file_to_bucket(
+        self, file_path, file_key, bucket_name, extra_args: dict = None
+    ):
+        """
+        Upload a file
+        Args:
+            file_path: local file path
+            file_key: object key
+            bucket_name: bucket name
+            extra_args: ACL, ContentType, ContentEncoding and CacheControl of the object (see get_upload_extra_args),
+                they are sent with the upload request
+        """
         s3 = self.session.resource("s3")
         bucket = s3.Bucket(bucket_name)
-        bucket.upload_file(file_path, file_key)
+        with self.buffer_pool.transfer() as config:
+            bucket.upload_file(
+                file_path, file_key, ExtraArgs=extra_args or None, Config=config
+            )
+        if self.inventory is not None:
+            self.inventory.put_object(bucket_name, file_key, os.path.getsize(file_path))
 
         return self._build_url(file_key, bucket_name)
 
-    def send_object_to_bucket(self, obj, obj_key, bucket_name):
+    def send_object_to_bucket(self, obj, obj_key, bucket_name, extra_args: dict = None):
+        """
+        Upload a file object, it is public unless extra_args gives another ACL
+        Args:
+            obj: binary file object
+            obj_key: object key
+            bucket_name: bucket name
+            extra_args: ACL, ContentType, ContentEncoding and CacheControl of the object (see get_upload_extra_args),
+                they are sent with the upload request, so the object is never published with other settings
+        """
         s3 = self.session.resource("s3")
         bucket = s3.Bucket(bucket_name)
-        bucket.upload_fileobj(obj, obj_key)
-        s3.Object(bucket_name, obj_key).Acl().put(ACL="public-read")
+        # the inventory takes the size from the source, a HEAD request after each upload would double its requests
+        size: int = None
+        if self.inventory is not None:
+            if obj.seekable():
+                position: int = obj.tell()
+                size = obj.seek(0, os.SEEK_END) - position
+                obj.seek(position)
+            else:
+                obj = CountingReader(obj)
+        with self.buffer_pool.transfer() as config:
+            bucket.upload_fileobj(
+                obj,
+                obj_key,
+                ExtraArgs={"ACL": "public-read", **(extra_args or {})},
+                Config=config,
+            )
+        if self.inventory is not None:
+            self.inventory.put_object(
+                bucket_name, obj_key, obj.bytes_read if size is None else size
+            )
+
+        return self._build_url(obj_key, bucket_name)
+
+    def send_stream_to_bucket(
+        self,
+        input_stream,
+        obj_key: str,
+        bucket_name: str,
+        part_size: int = DEFAULT_PART_SIZE,
+        workers: int = DEFAULT_UPLOAD_WORKERS,
+        extra_args: dict = None,
+    ) -> str:
+        """
+        Upload a stream of unknown length, like stdin, with a multipart upload
+        Args:
+            input_stream: binary stream
+            obj_key: object key
+            bucket_name: bucket name
+            part_size: bytes of each part, the memory used is part_size x workers
+            workers: parts uploaded at the same time
+            extra_args: ACL, ContentType, ContentEncoding and CacheControl of the object (see get_upload_extra_args)
+        """
+        size, _ = upload_stream(
+            self.session.client("s3"),
+            input_stream,
+            bucket_name,
+            obj_key,
+            part_size,
+            workers,
+            extra_args,
+            buffer_pool=self.buffer_pool,
+        )
+        if self.inventory is not None:
+            self.inventory.put_object(bucket_name, obj_key, size)
 
         return self._build_url(obj_key, bucket_name)
 
     def delete_object_in_bucket(self, obj_key, bucket_name):
         s3 = self.session.resource("s3")
         obj = s3.Object(bucket_name, obj_key)
+        response = obj.delete()
+        if self.inventory is not None:
+            self.inventory.delete_object(bucket_name, obj_key)
 
-        return obj.delete()
+        return response
 
     def download_object_from_bucket(self, obj_key, bucket_name, file_path):
         s3 = self.session.resource("s3")
         bucket = s3.Bucket(bucket_name)
-        bucket.download_file(obj_key, file_path)
+        with self.buffer_pool.transfer() as config:
+            bucket.download_file(obj_key, file_path, Config=config)
 
     def copy_file_from_bucket_to_bucket(
         self, source_bucket_name, target_bucket_name, file_name
@@ -117,6 +344,15 @@ class AWSSession:
         target_bucket = s3.Bucket(target_bucket_name)
         copy_source = {"Bucket": source_bucket_name, "Key": file_name}
         target_bucket.copy(copy_source, file_name)
+        if self.inventory is not None:
+            source_object = self.inventory.get_object(source_bucket_name, file_name)
+            if source_object is not None:
+                self.inventory.put_object(
+                    target_bucket_name,
+                    file_name,
+                    source_object["size"],
+                    source_object["etag"],
+                )
 
     def move_files_from_bucket_to_bucket(
         self,
@@ -124,7 +360,7 @@ class AWSSession:
         target_bucket_name: str,
         datafiles: list,
         extension_list: list,
-    ) -> None:
+    ) -> dict:
         """
         Move files from source bucket to target bucket
         Args:
@@ -132,12 +368,17 @@ class AWSSession:
             target_bucket_name: target bucket
             datafiles: list of files to move (optional)
             extension_list: list of extension filter (op)
+
+        Returns:
+            dict: number of moved objects and their bytes (only known when datafiles is not given)
         """
         s3 = self.session.resource("s3")
         source_bucket = s3.Bucket(source_bucket_name)
+        stats: dict = dict(objects=0, bytes=0)
 
         if not datafiles:
-            datafiles = [obj.key for obj in source_bucket.objects.all()]
+            sizes = {obj.key: obj.size for obj in source_bucket.objects.all()}
+            datafiles = list(sizes)
             if extension_list:
                 datafiles = filter_by_extension(datafiles, extension_list)
             for file in datafiles:
@@ -148,6 +389,8 @@ class AWSSession:
                 self.logger.info(
                     f"{file} moved from {source_bucket_name} to {target_bucket_name}"
                 )
+                stats["objects"] += 1
+                stats["bytes"] += sizes[file]
         else:
             if extension_list:
                 datafiles = filter_by_extension(datafiles, extension_list)
@@ -160,26 +403,37 @@ class AWSSession:
                     self.logger.info(
                         f"{file_name} moved from {source_bucket_name} to {target_bucket_name}"
                     )
+                    stats["objects"] += 1
                 else:
                     self.logger.info(
                         f"{file_name} does not exist in {source_bucket_name}"
                     )
+        return stats
 
-    def delete_bucket(self, bucket_name: str) -> None:
+    def delete_bucket(self, bucket_name: str) -> dict:
         """
         Delete bucket with all files
         Args:
             bucket_name: name of bucket to delete
+
+        Returns:
+            dict: number of deleted objects and their bytes
         """
         s3 = self.session.resource("s3")
         client = self.session.client("s3")
         bucket = s3.Bucket(bucket_name)
+        stats: dict = dict(objects=0, bytes=0)
         for file in bucket.objects.all():
             self.delete_object_in_bucket(file.key, bucket_name)
             self.logger.info(f"{file.key} deleted")
+            stats["objects"] += 1
+            stats["bytes"] += file.size
 
         client.delete_bucket(Bucket=bucket_name)
+        if self.inventory is not None:
+            self.inventory.delete_bucket(bucket_name)
         self.logger.info(f"{bucket_name} deleted")
+        return stats
 
     def update_files_from_bucket(
         self,
@@ -188,126 +442,717 @@ class AWSSession:
         extension: str,
         tuples_list: list,
         destination_path: str,
-    ) -> None:
+        streaming: bool = False,
+        workers: int = 1,
+        scan: bool = False,
+        codec: str = None,
+        compresslevel: int = None,
+        target_throughput: float = None,
+    ) -> dict:
+        """
+        Update the objects of a bucket for each date with tuples values
+        Args:
+            date_list: dates to update
+            bucket_name: bucket name
+            extension: object extension pattern, e.g. .bip*
+            tuples_list: tuples in format [(column_to_check, value_to_replace, new_value)...]
+            destination_path: path where local versions are saved (None means current path)
+            streaming: update objects without temporary files, a backup is only saved if destination_path is given
+            workers: number of processes updating objects at the same time
+            scan: only count the cells each tuple would replace, objects are not modified
+            codec: gz, zip or zst format of the updated objects, the key extension is changed (None keeps the format)
+            compresslevel: compression level of the updated objects (None means the default level of the format)
+            target_throughput: MB/s, choose the highest compression level that reaches it on a sample of the first
+                object instead of compresslevel
+
+        Returns:
+            dict: number of updated and unchanged objects, bytes processed and cells replaced by each tuple
+        """
+        if self.journal is not None and not scan:
+            completed_dates: set = self.journal.get_completed_dates(bucket_name)
+            date_list = [
+                date
+                for date in date_list
+                if date.strftime("%Y-%m-%d") not in completed_dates
+            ]
+            if not date_list:
+                self.logger.info("Every date of the job was already updated")
+                return dict(
+                    objects=0, unchanged=0, bytes=0, replacements=[0] * len(tuples_list)
+                )
         object_list: list = self.retrieve_obj_list(bucket_name)
+        sizes: dict = {obj.get("name"): obj.get("size") for obj in object_list}
+        # Index the listing once, every date is resolved with a binary search
+        key_index: KeyIndex = KeyIndex.from_object_list(object_list)
+        jobs: list = []
+        date_keys: dict = {}
         for datafile in date_list:
             data_filename_date: str = datafile.strftime("%Y-%m-%d")
-            data_filename_pattern: str = f"{data_filename_date}{extension}"
 
             # Check if object exist bucket
-            data_filename_list: list = retrieve_objects_with_pattern(
-                data_filename_pattern, object_list
+            data_filename_list: list = key_index.match_date(datafile, extension)
+            if not len(data_filename_list):
+                self.logger.info(
+                    f"Not object found for date '{data_filename_date}' with extension '{extension}'"
+                )
+            else:
+                date_keys[data_filename_date] = data_filename_list
+            # In case of more than one object
+            for data_filename in data_filename_list:
+                jobs.append(
+                    dict(
+                        data_filename=data_filename,
+                        bucket_name=bucket_name,
+                        tuples_list=tuples_list,
+                        destination_path=destination_path,
+                        size=int(round((sizes.get(data_filename) or 0) * 1024**2)),
+                        streaming=streaming,
+                        scan=scan,
+                        codec=codec,
+                        compresslevel=compresslevel,
+                    )
+                )
+
+        pending_jobs: list = [
+            job
+            for job in jobs
+            if self.journal is None
+            or not self.journal.is_cleaned(bucket_name, job["data_filename"])
+        ]
+        if target_throughput is not None and pending_jobs and not scan:
+            chosen_level: int = self.choose_compresslevel(
+                pending_jobs[0]["data_filename"],
+                bucket_name,
+                codec,
+                target_throughput,
+                pending_jobs[0]["size"],
+            )
+            for job in jobs:
+                job["compresslevel"] = chosen_level
+
+        start_time: float = time.perf_counter()
+        if workers > 1 and len(jobs) > 1:
+            results: list = []
+            # each worker process has its own pool, with a share of the budget, and compresses with its share of
+            # the CPUs
+            journal_args: tuple = (
+                (self.journal.database_path, self.journal.job_id)
+                if self.journal is not None
+                else (None, None)
+            ) + (
+                max(1, self.buffer_pool.budget // workers),
+                max(1, (os.cpu_count() or 1) // workers),
             )
-            if len(data_filename_list):
-                # In case of more than one object
-                for filename in data_filename_list:
-                    data_filename: str = filename
-                    filename = data_filename
-                    if destination_path is not None:
-                        filename: str = os.path.join(destination_path, data_filename)
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_update_worker,
+                initargs=journal_args,
+            ) as executor:
+                futures: dict = {
+                    executor.submit(_run_update_job, job): job for job in jobs
+                }
+                for future in as_completed(futures):
                     try:
-                        # Download the file
-                        self.logger.info(f"Downloading object {data_filename} ...")
-                        self.download_object_from_bucket(
-                            data_filename, bucket_name, filename
-                        )
-                        # Extract and make copy
-                        uncompress_filename, compress_type = get_file_object(filename)
-                        # Rename the copy
-                        self.logger.info(
-                            f"Object '{os.path.basename(filename)}' renamed to '{os.path.basename(filename)}.old-version'..."
-                        )
-                        os.rename(filename, filename + ".old-version")
-                        if compress_type:
-                            os.rename(
-                                uncompress_filename,
-                                uncompress_filename + ".old-version",
-                            )
-                        # Update the copy
-                        self.logger.info(
-                            f"Updating object {os.path.basename(data_filename)} ..."
+                        result: dict = future.result()
+                    except Exception as e:
+                        # the worker process died, the other objects continue
+                        key: str = futures[future]["data_filename"]
+                        error: str = str(e) or type(e).__name__
+                        self.logger.error(f"{key}: {error}")
+                        result = dict(
+                            key=key,
+                            status="failed",
+                            bytes=0,
+                            updated_key=key,
+                            updated_size=0,
+                            replacements=[0] * len(tuples_list),
+                            error=error,
+                            seconds=0,
+                            throttle_events=0,
                         )
-                        update_file_by_tuples(
-                            uncompress_filename + ".old-version",
-                            uncompress_filename,
-                            tuples_list,
-                        )
-                        # Check if it was a compressed file
-                        uncompress_filename_basename: str = os.path.basename(
-                            uncompress_filename
+                    results.append(result)
+                    self.request_metrics.merge(result.pop("request_metrics", []))
+                    # workers do not share the inventory, it is updated with their results
+                    if self.inventory is not None and result["status"] == "updated":
+                        self.inventory.put_object(
+                            bucket_name, result["updated_key"], result["updated_size"]
                         )
+                        if result["updated_key"] != result["key"]:
+                            self.inventory.delete_object(bucket_name, result["key"])
+        else:
+            results = [self.run_update_job(job) for job in jobs]
 
-                        # Case is not compressed file
-                        compress_filename: str = uncompress_filename
-                        compress_filename_basename: str = uncompress_filename_basename
-
-                        if compress_type == "zip":
-                            # Update compressed filenames
-                            compress_filename = f"{uncompress_filename}.zip"
-                            compress_filename_basename = os.path.basename(
-                                compress_filename
-                            )
-                            self.logger.info(
-                                f"Compressing object {uncompress_filename_basename} to {compress_filename_basename} ..."
-                            )
-                            # Compress file
-                            with zipfile.ZipFile(
-                                filename, "w", zipfile.ZIP_DEFLATED
-                            ) as zipf:
-                                zipf.write(
-                                    uncompress_filename,
-                                    uncompress_filename_basename,
-                                )
-                            # Remove extracted copy
-                            os.remove(uncompress_filename + ".old-version")
-                        elif compress_type == "gz":
-                            # Update compressed filenames
-                            compress_filename = f"{uncompress_filename}.gz"
-                            compress_filename_basename = os.path.basename(
-                                compress_filename
-                            )
-
-                            self.logger.info(
-                                f"Compressing object {uncompress_filename_basename} to {compress_filename_basename} ..."
-                            )
-                            # Compress file
-                            with open(uncompress_filename, "rb") as f_in, gzip.open(
-                                compress_filename, "wb"
-                            ) as f_out:
-                                buffer_size = 65536
-                                while True:
-                                    buffer = f_in.read(buffer_size)
-                                    if not buffer:
-                                        break
-                                    f_out.write(buffer)
-                            # Remove extracted copy
-                            self.logger.info(
-                                f"Removing object {uncompress_filename_basename}.old-version ..."
-                            )
-                            os.remove(uncompress_filename + ".old-version")
-
-                        self.logger.info(
-                            f"Uploading object {compress_filename_basename} ..."
-                        )
-                        self.send_file_to_bucket(
-                            compress_filename,
-                            compress_filename_basename,
-                            bucket_name,
-                        )
-                        self.logger.info(
-                            f"Removing object {compress_filename_basename} ..."
-                        )
-                        os.remove(compress_filename)
-                        self.logger.info(
-                            f"Object {uncompress_filename_basename} uploaded succesfully ..."
-                        )
+        stats: dict = dict(
+            objects=sum(1 for result in results if result["status"] == "updated"),
+            unchanged=sum(1 for result in results if result["status"] == "unchanged"),
+            bytes=sum(result["bytes"] for result in results),
+            replacements=[0] * len(tuples_list),
+        )
+        for result in results:
+            for tuple_index, cell_number in enumerate(result["replacements"]):
+                stats["replacements"][tuple_index] += cell_number
+        if self.journal is not None and not scan:
+            for date, keys in date_keys.items():
+                if all(self.journal.is_cleaned(bucket_name, key) for key in keys):
+                    self.journal.complete_date(bucket_name, date)
+        self.log_update_summary(results, time.perf_counter() - start_time)
+        self.log_replacements("Total", tuples_list, stats["replacements"])
+        return stats
+
+    def run_update_job(self, job: dict) -> dict:
+        """
+        Run update_object_job with the arguments of job and add the requests S3 throttled meanwhile to its result,
+        the limiter counts the throttles of the whole session, so no other job may run in it at the same time
+        """
+        start_throttle_events: int = self.throttling.limiter.throttle_events
+        result: dict = self.update_object_job(**job)
+        result["throttle_events"] = (
+            self.throttling.limiter.throttle_events - start_throttle_events
+        )
+        return result
 
-                    except ClientError as e:
-                        self.logger.error(e)
+    def update_object_job(
+        self,
+        data_filename: str,
+        bucket_name: str,
+        tuples_list: list,
+        destination_path: str,
+        size: int,
+        streaming: bool,
+        scan: bool = False,
+        codec: str = None,
+        compresslevel: int = None,
+    ) -> dict:
+        """
+        Update (or only scan) an object, errors (S3, corrupt objects, local disk) are logged and reported in the
+        result, so the other objects continue
+        Returns:
+            dict: object key, status (updated, unchanged, scanned, skipped or failed), bytes, key and size of the
+            updated object, cells replaced by each tuple, seconds and error message
+        """
+        start_time: float = time.perf_counter()
+        result: dict = dict(
+            key=data_filename,
+            status="updated",
+            bytes=size,
+            updated_key=data_filename,
+            updated_size=0,
+            replacements=[0] * len(tuples_list),
+            error=None,
+        )
+        try:
+            if (
+                not scan
+                and self.journal is not None
+                and self.journal.is_cleaned(bucket_name, data_filename)
+            ):
+                self.logger.info(
+                    f"Object {data_filename} was already updated by this job, it is skipped"
+                )
+                result.update(
+                    status="skipped",
+                    bytes=0,
+                    updated_key=self.journal.get_object(bucket_name, data_filename)[
+                        "updated_key"
+                    ]
+                    or data_filename,
+                )
+                result["seconds"] = time.perf_counter() - start_time
+                return result
+            if scan:
+                result.update(
+                    status="scanned",
+                    replacements=self.scan_object(
+                        data_filename, bucket_name, tuples_list, size
+                    ),
+                )
             else:
+                # an interrupted streaming update may have published the updated object already
+                update: dict = self.finish_published_update(data_filename, bucket_name)
+                if update is None and streaming:
+                    update = self.update_object_streaming(
+                        data_filename,
+                        bucket_name,
+                        tuples_list,
+                        destination_path,
+                        size,
+                        codec,
+                        compresslevel,
+                    )
+                elif update is None:
+                    update = self.update_object(
+                        data_filename,
+                        bucket_name,
+                        tuples_list,
+                        destination_path,
+                        codec,
+                        compresslevel,
+                    )
+                result.update(
+                    status="updated" if update["size"] is not None else "unchanged",
+                    updated_key=update["key"],
+                    updated_size=update["size"] or 0,
+                    replacements=update["replacements"],
+                )
+            self.log_replacements(data_filename, tuples_list, result["replacements"])
+        except Exception as e:
+            error: str = str(e) or type(e).__name__
+            self.logger.error(f"{data_filename}: {error}")
+            result.update(status="failed", bytes=0, error=error)
+        result["seconds"] = time.perf_counter() - start_time
+        return result
+
+    def log_update_summary(self, results: list, seconds: float) -> None:
+        updated: list = [result for result in results if result["status"] == "updated"]
+        failed: list = [result for result in results if result["status"] == "failed"]
+        updated_bytes: float = sum(result["bytes"] for result in updated) / 1024**2
+        other_statuses: str = "".join(
+            f", {number} {status}"
+            for status in ["unchanged", "scanned", "skipped"]
+            for number in [sum(1 for result in results if result["status"] == status)]
+            if number
+        )
+        self.logger.info(
+            f"Update summary: {len(updated)} objects updated ({updated_bytes:.1f} MB){other_statuses}, "
+            f"{len(failed)} failed in {seconds:.1f}s"
+        )
+        throttle_events: int = sum(
+            result.get("throttle_events", 0) for result in results
+        )
+        if throttle_events:
+            self.logger.info(
+                f"S3 throttled {throttle_events} requests, they were retried with a lower concurrency"
+            )
+        for result in failed:
+            self.logger.info(f"Failed object {result['key']}: {result['error']}")
+
+    def log_replacements(
+        self, name: str, tuples_list: list, replacements: list
+    ) -> None:
+        self.logger.info(
+            f"Cells replaced ({name}): "
+            + ", ".join(
+                f"[{','.join(str(value) for value in tuple_values)}] {cell_number}"
+                for tuple_values, cell_number in zip(tuples_list, replacements)
+            )
+        )
+
+    def update_object(
+        self,
+        data_filename: str,
+        bucket_name: str,
+        tuples_list: list,
+        destination_path: str,
+        codec: str = None,
+        compresslevel: int = None,
+    ) -> dict:
+        """
+        Update an object with tuples values through local files, the original version is kept as .old-version.
+        The object is not uploaded if no tuple matched any cell.
+        Args:
+            data_filename: object key
+            bucket_name: bucket name
+            tuples_list: tuples in format [(column_to_check, value_to_replace, new_value)...]
+            destination_path: path where local versions are saved (None means current path)
+            codec: gz, zip or zst format of the updated object, if it changes the format the object is uploaded with
+                the new extension and the original object is deleted (None keeps the format)
+            compresslevel: compression level (None means the default level of the format)
+
+        Returns:
+            dict: key and size of the updated object (None if it was not changed) and cells replaced by each tuple
+        """
+        filename: str = data_filename
+        if destination_path is not None:
+            filename = os.path.join(destination_path, data_filename)
+        backup_filename: str = filename + ".old-version"
+        journal_object: dict = self.get_journal_object(bucket_name, data_filename)
+        state: str = journal_object["state"]
+        if state == UPLOADING:
+            # a streaming update that was not published, the object in the bucket is still the original one
+            state = None
+        if state in [DOWNLOADED, REWRITTEN] and not os.path.isfile(backup_filename):
+            # local files were lost before the upload, the object in the bucket is still the original one
+            state = None
+        if state in [REWRITTEN, UPLOADED]:
+            filename = os.path.join(
+                os.path.dirname(filename), journal_object["updated_key"]
+            )
+            replacements: list = journal_object["replacements"]
+            if state == REWRITTEN and not os.path.isfile(filename):
+                state = DOWNLOADED
+        if state is None:
+            # Download the file
+            self.logger.info(f"Downloading object {data_filename} ...")
+            self.download_object_from_bucket(data_filename, bucket_name, filename)
+            # Keep the original version
+            self.logger.info(
+                f"Object '{os.path.basename(filename)}' renamed to '{os.path.basename(filename)}.old-version'..."
+            )
+            os.rename(filename, backup_filename)
+            self.record_journal_state(bucket_name, data_filename, DOWNLOADED)
+        else:
+            self.logger.info(f"Resuming object {data_filename} after state {state} ...")
+
+        if state in [None, DOWNLOADED]:
+            # Update the object, decompressing and compressing it again while it is rewritten
+            self.logger.info(f"Updating object {os.path.basename(data_filename)} ...")
+            with get_file_object(backup_filename) as (input_stream, compress_type):
+                filename = change_compress_type(
+                    filename, compress_type, codec or compress_type
+                )
+                with open(filename, "wb") as output_file, open_compressed_stream(
+                    output_file,
+                    codec or compress_type,
+                    get_uncompressed_name(data_filename, compress_type),
+                    compresslevel,
+                    self.compression_threads,
+                ) as output_stream:
+                    replacements = update_bytes_stream_by_tuples(
+                        input_stream,
+                        output_stream,
+                        tuples_list,
+                        **get_engine_kwargs(os.path.getsize(backup_filename)),
+                    )
+            if not any(replacements):
                 self.logger.info(
-                    f"Not object found for date '{data_filename_date}' with extension '{extension}'"
+                    f"No cells replaced in object {data_filename}, it is not uploaded"
+                )
+                os.remove(filename)
+                self.record_journal_state(
+                    bucket_name, data_filename, CLEANED, replacements=replacements
                 )
+                return dict(key=data_filename, size=None, replacements=replacements)
+            self.record_journal_state(
+                bucket_name,
+                data_filename,
+                REWRITTEN,
+                updated_key=os.path.basename(filename),
+                updated_size=os.path.getsize(filename),
+                replacements=replacements,
+            )
+
+        filename_basename: str = os.path.basename(filename)
+        if state != UPLOADED:
+            self.logger.info(f"Uploading object {filename_basename} ...")
+            updated_size: int = os.path.getsize(filename)
+            self.send_file_to_bucket(filename, filename_basename, bucket_name)
+            self.record_journal_state(bucket_name, data_filename, UPLOADED)
+        else:
+            updated_size = journal_object["updated_size"]
+        if os.path.isfile(filename):
+            self.logger.info(f"Removing object {filename_basename} ...")
+            os.remove(filename)
+        self.logger.info(f"Object {filename_basename} uploaded succesfully ...")
+        if filename_basename != os.path.basename(data_filename):
+            self.logger.info(
+                f"Object {data_filename} saved as {filename_basename}, deleting {data_filename} ..."
+            )
+            self.delete_object_in_bucket(data_filename, bucket_name)
+        self.record_journal_state(bucket_name, data_filename, CLEANED)
+        return dict(key=filename_basename, size=updated_size, replacements=replacements)
+
+    def update_object_streaming(
+        self,
+        data_filename: str,
+        bucket_name: str,
+        tuples_list: list,
+        destination_path: str = None,
+        size: int = None,
+        codec: str = None,
+        compresslevel: int = None,
+    ) -> dict:
+        """
+        Update an object with tuples values streaming it from and to the bucket, without temporary files
+        Args:
+            data_filename: object key
+            bucket_name: bucket name
+            tuples_list: tuples in format [(column_to_check, value_to_replace, new_value)...]
+            destination_path: if it is given, the original version is saved there as .old-version
+            size: object size in bytes, to avoid a HEAD request
+            codec: gz, zip or zst format of the updated object, if it changes the format the object is uploaded with
+                the new extension and the original object is deleted (None keeps the format)
+            compresslevel: compression level (None means the default level of the format)
+
+        Returns:
+            dict: key and size of the updated object (None if it was not changed) and cells replaced by each tuple
+        """
+        backup_file_path: str = None
+        if destination_path is not None:
+            backup_file_path = os.path.join(
+                destination_path, data_filename + ".old-version"
+            )
+        update: dict = update_object_streaming(
+            self.session.client("s3"),
+            bucket_name,
+            data_filename,
+            tuples_list,
+            backup_file_path=backup_file_path,
+            size=size or None,
+            codec=codec,
+            buffer_pool=self.buffer_pool,
+            compresslevel=compresslevel,
+            compression_threads=self.compression_threads,
+            before_publish=lambda updated_key, updated_size, replacements, updated_etag: self.record_journal_state(
+                bucket_name,
+                data_filename,
+                UPLOADING,
+                updated_key=updated_key,
+                updated_size=updated_size,
+                replacements=replacements,
+                updated_etag=updated_etag,
+            ),
+        )
+        if update["size"] is not None:
+            if self.inventory is not None:
+                self.inventory.put_object(bucket_name, update["key"], update["size"])
+                if update["key"] != data_filename:
+                    self.inventory.delete_object(bucket_name, data_filename)
+            self.logger.info(f"Object {update['key']} uploaded succesfully ...")
+        # a streaming update has no local steps, an interrupted one starts again from the original object unless it
+        # was interrupted after publishing the updated object, see finish_published_update
+        self.record_journal_state(
+            bucket_name,
+            data_filename,
+            CLEANED,
+            updated_key=update["key"],
+            updated_size=update["size"],
+            replacements=update["replacements"],
+        )
+        return update
+
+    def finish_published_update(self, data_filename: str, bucket_name: str):
+        """
+        Finish a streaming update interrupted after its updated object was published: the journal state is uploading
+        and the updated object has the ETag and size recorded with that state. The original object is deleted if the
+        key changed, so the tuples are not applied twice.
+        Returns:
+            dict: key, size and replacements of the updated object, None if the update must run (again)
+        """
+        journal_object: dict = self.get_journal_object(bucket_name, data_filename)
+        if journal_object["state"] != UPLOADING:
+            return None
+        updated_key: str = journal_object["updated_key"]
+        try:
+            response: dict = self.session.client("s3").head_object(
+                Bucket=bucket_name, Key=updated_key
+            )
+        except botocore_exceptions.ClientError as e:
+            if e.response["Error"]["Code"] in ["404", "NoSuchKey", "NotFound"]:
+                return None
+            raise
+        # LastModified of a multipart object is the start of its upload, only the ETag tells which upload it is
+        if (
+            response["ETag"] != journal_object["updated_etag"]
+            or response["ContentLength"] != journal_object["updated_size"]
+        ):
+            return None
+        self.logger.info(
+            f"Object {updated_key} was uploaded before the update was interrupted, it is not updated again"
+        )
+        if updated_key != data_filename:
+            self.delete_object_in_bucket(data_filename, bucket_name)
+        if self.inventory is not None:
+            self.inventory.put_object(
+                bucket_name, updated_key, journal_object["updated_size"]
+            )
+        self.record_journal_state(bucket_name, data_filename, CLEANED)
+        return dict(
+            key=updated_key,
+            size=journal_object["updated_size"],
+            replacements=journal_object["replacements"],
+        )
+
+    def get_throttling_metrics(self) -> dict:
+        """
+        Metrics of the adaptive concurrency of the session
+        Returns:
+            dict: current concurrency limit, requests in flight, throttle events, successes and retries
+        """
+        return self.throttling.get_metrics()
+
+    def export_metrics(self, path: str) -> None:
+        """
+        Write the request totals by operation and bucket and the throttling metrics of the session
+        Args:
+            path: output file, in the Prometheus text format if it ends with .prom or .txt, JSON otherwise
+        """
+        gauges: dict = {
+            f"throttling_{name}": value
+            for name, value in self.get_throttling_metrics().items()
+        }
+        gauges.update(self.buffer_pool.get_metrics())
+        self.request_metrics.export(path, gauges)
+        self.logger.info(f"Request metrics written to {path}")
+
+    def get_journal_object(self, bucket_name: str, data_filename: str) -> dict:
+        """
+        Get the journal entry of an object, with state None if there is no journal or the object was not started
+        """
+        journal_object: dict = None
+        if self.journal is not None:
+            journal_object = self.journal.get_object(bucket_name, data_filename)
+        return journal_object or dict(
+            state=None,
+            updated_key=None,
+            updated_size=None,
+            updated_etag=None,
+            replacements=None,
+        )
+
+    def record_journal_state(
+        self, bucket_name: str, data_filename: str, state: str, **values
+    ) -> None:
+        """
+        Record the state reached by an object in the journal, if there is one
+        """
+        if self.journal is not None:
+            self.journal.set_state(bucket_name, data_filename, state, **values)
+
+    def choose_compresslevel(
+        self,
+        data_filename: str,
+        bucket_name: str,
+        codec: str,
+        target_throughput: float,
+        size: int = None,
+    ) -> int:
+        """
+        Choose the highest compression level that compresses a sample of an object at target_throughput
+        Args:
+            data_filename: object key, the sample is the start of its decompressed content
+            bucket_name: bucket name
+            codec: gz, zip or zst format to measure (None means the format of the object)
+            target_throughput: minimum throughput in MB/s
+            size: object size in bytes, to avoid a HEAD request
+
+        Returns:
+            int: compression level, None if the object is not compressed and codec is not given
+        """
+        sample, compress_type = read_object_sample(
+            self.session.client("s3"),
+            bucket_name,
+            data_filename,
+            COMPRESSION_SAMPLE_SIZE,
+            size=size or None,
+        )
+        codec = codec or compress_type
+        if not codec:
+            self.logger.info(
+                f"Object {data_filename} is not compressed, the compression level is not chosen"
+            )
+            return None
+        measure: dict = choose_compresslevel(sample, codec, target_throughput)
+        self.logger.info(
+            f"Compression level {measure['compresslevel']} chosen for {codec}: "
+            f"{measure['throughput']:.1f} MB/s, ratio {measure['ratio']:.3f} (target {target_throughput} MB/s)"
+        )
+        return measure["compresslevel"]
+
+    def scan_object(
+        self,
+        data_filename: str,
+        bucket_name: str,
+        tuples_list: list,
+        size: int = None,
+    ) -> list:
+        """
+        Count the cells each tuple would replace in an object, without modifying it
+        Args:
+            data_filename: object key
+            bucket_name: bucket name
+            tuples_list: tuples in format [(column_to_check, value_to_replace, new_value)...]
+            size: object size in bytes, to avoid a HEAD request
+
+        Returns:
+            list: number of cells each tuple would replace
+        """
+        return scan_object(
+            self.session.client("s3"),
+            bucket_name,
+            data_filename,
+            tuples_list,
+            size=size or None,
+        )
+
+
+class ObjectLoggerAdapter(logging.LoggerAdapter):
+    """
+    Prefix log messages with the object key, so the logs of concurrent jobs can be told apart
+    """
+
+    def process(self, msg, kwargs):
+        return f"[{self.extra['key']}] {msg}", kwargs
+
+
+# session of each update worker process, boto3 sessions can not be shared between processes
+_worker_session: AWSSession = None
+
+
+def _init_update_worker(
+    journal_path: str = None,
+    job_id: str = None,
+    memory_budget: int = None,
+    compression_threads: int = None,
+) -> None:
+    global _worker_session
+    # each worker opens the journal, so the steps of its objects are recorded as soon as they finish
+    journal: UpdateJournal = (
+        UpdateJournal(journal_path, job_id) if journal_path is not None else None
+    )
+    _worker_session = AWSSession(
+        journal=journal,
+        memory_budget=memory_budget,
+        compression_threads=compression_threads,
+    )
+
+
+def _run_update_job(job: dict) -> dict:
+    _worker_session.logger = ObjectLoggerAdapter(
+        logging.getLogger(__name__), dict(key=job["data_filename"])
+    )
+    # a worker process runs one job at a time
+    result: dict = _worker_session.run_update_job(job)
+    result["request_metrics"] = _worker_session.request_metrics.pop_totals()
+    return result
+
+
+# canned ACLs of S3 objects
+CANNED_ACLS: list = [
+    "private",
+    "public-read",
+    "public-read-write",
+    "authenticated-read",
+    "aws-exec-read",
+    "bucket-owner-read",
+    "bucket-owner-full-control",
+]
+
+
+def get_upload_extra_args(
+    acl: str = None,
+    content_type: str = None,
+    content_encoding: str = None,
+    cache_control: str = None,
+) -> dict:
+    """
+    Upload arguments (ExtraArgs of boto3 transfers) that set the ACL and headers of an object in the same request
+    that uploads it, so there is no separate PutObjectAcl and the object is never visible with other settings
+    Args:
+        acl: canned ACL, e.g. public-read
+        content_type: Content-Type header, e.g. text/csv
+        content_encoding: Content-Encoding header, e.g. gzip
+        cache_control: Cache-Control header, e.g. max-age=3600
+
+    Returns:
+        dict: arguments that were given
+    """
+    extra_args: dict = dict(
+        ACL=acl,
+        ContentType=content_type,
+        ContentEncoding=content_encoding,
+        CacheControl=cache_control,
+    )
+    return {name: value for name, value in extra_args.items() if value is not None}
 
 
 def filter_by_extension(file_list: list, extension_list: list) -> list:
@@ -0,0 +1,54 @@
+import argparse
+import os
+import sys
+import tempfile
+
+# add path so we can use repository modules through command line
+new_path = os.path.join(os.path.dirname(__file__), "..")
+sys.path.append(new_path)
+
+from synthetic_bip import write_synthetic_bip
+from utils import COMPRESS_LEVELS, COMPRESS_TYPES, get_file_object, measure_compression, zstandard
+
+
+def read_sample(files: list, sample_size: int) -> bytes:
+    """Read up to sample_size decompressed bytes from each file, any supported compression is accepted."""
+    sample: bytes = b""
+    for file_path in files:
+        with get_file_object(file_path) as (stream, compress_type):
+            sample += stream.read(sample_size)
+    return sample
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description="report compression ratio against MB/s for each format and level on a sample of .bip files"
+    )
+    parser.add_argument("files", nargs="*", help=".bip files (compressed or not), a synthetic one is used if none is given")
+    parser.add_argument("--sample-size", type=int, default=16 * 1024**2, help="decompressed bytes read from each file")
+    parser.add_argument("--rows", type=int, default=300_000, help="synthetic .bip rows when no file is given")
+    parser.add_argument("--codecs", nargs="+", default=COMPRESS_TYPES, choices=COMPRESS_TYPES, help="formats to measure")
+    args = parser.parse_args(argv[1:])
+
+    if args.files:
+        sample: bytes = read_sample(args.files, args.sample_size)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            input_file: str = os.path.join(directory, "2021-06-30.bip")
+            write_synthetic_bip(input_file, args.rows)
+            sample = read_sample([input_file], args.sample_size)
+    print(f"sample of {len(sample) / 1024 ** 2:.1f} MB")
+
+    print(f"{'format':>6} {'level':>5} {'ratio':>7} {'MB/s':>8}")
+    for compress_type in args.codecs:
+        if compress_type == "zst" and zstandard is None:
+            print("zst skipped, zstandard is not installed")
+            continue
+        for compresslevel in COMPRESS_LEVELS[compress_type]:
+            measure: dict = measure_compression(sample, compress_type, compresslevel)
+            print(f"{compress_type:>6} {compresslevel:>5} {measure['ratio']:>7.4f} {measure['throughput']:>8.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,78 @@
+import argparse
+import gzip
+import io
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# add path so we can use repository modules through command line
+new_path = os.path.join(os.path.dirname(__file__), "..")
+sys.path.append(new_path)
+
+from synthetic_bip import write_synthetic_bip
+from parallel_gzip import DEFAULT_BLOCK_SIZE, ParallelGzipWriter
+
+CHUNK_SIZE: int = 1024**2
+
+
+def compress_with_gzip_file(data: bytes, compresslevel: int, **kwargs) -> bytes:
+    """Previous implementation, one gzip.GzipFile member compressed in the calling thread."""
+    output_stream: io.BytesIO = io.BytesIO()
+    with gzip.GzipFile(filename="2021-06-30.bip", fileobj=output_stream, mode="wb", compresslevel=compresslevel) as gzip_file:
+        for start in range(0, len(data), CHUNK_SIZE):
+            gzip_file.write(data[start : start + CHUNK_SIZE])
+    return output_stream.getvalue()
+
+
+def compress_in_parallel(data: bytes, compresslevel: int, **kwargs) -> bytes:
+    """Independent blocks compressed in parallel as a multi-member gzip stream."""
+    output_stream: io.BytesIO = io.BytesIO()
+    with ParallelGzipWriter(output_stream, "2021-06-30.bip", compresslevel, **kwargs) as gzip_file:
+        for start in range(0, len(data), CHUNK_SIZE):
+            gzip_file.write(data[start : start + CHUNK_SIZE])
+    return output_stream.getvalue()
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="compare gzip.GzipFile with the block parallel gzip writer")
+    parser.add_argument("--rows", type=int, default=2_000_000, help="synthetic .bip rows")
+    parser.add_argument("--level", type=int, default=9, help="compression level")
+    parser.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE, help="parallel block size in bytes")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count()], help="thread numbers")
+    parser.add_argument("--processes", type=int, default=0, help="also run with a process pool of this size")
+    args = parser.parse_args(argv[1:])
+
+    with tempfile.TemporaryDirectory() as directory:
+        input_file: str = os.path.join(directory, "2021-06-30.bip")
+        write_synthetic_bip(input_file, args.rows)
+        with open(input_file, "rb") as file_obj:
+            data: bytes = file_obj.read()
+    megabytes: float = len(data) / 1024**2
+    print(f"{args.rows} rows ({megabytes:.1f} MB), level {args.level}, blocks of {args.block_size / 1024 ** 2:g} MB")
+
+    runs: list = [("gzip.GzipFile", compress_with_gzip_file, {})]
+    for workers in sorted(set(args.workers)):
+        runs.append((f"parallel, {workers} threads", compress_in_parallel, dict(block_size=args.block_size, workers=workers)))
+    executor: ProcessPoolExecutor = None
+    if args.processes:
+        executor = ProcessPoolExecutor(max_workers=args.processes)
+        runs.append((f"parallel, {args.processes} processes", compress_in_parallel, dict(block_size=args.block_size, workers=args.processes, executor=executor)))
+
+    failed: bool = False
+    for name, function, kwargs in runs:
+        start: float = time.perf_counter()
+        compressed: bytes = function(data, args.level, **kwargs)
+        seconds: float = time.perf_counter() - start
+        print(f"{name}: {seconds:.3f}s ({megabytes / seconds:.1f} MB/s, ratio {len(compressed) / len(data):.4f})")
+        if gzip.decompress(compressed) != data:
+            print(f"{name} output differs!")
+            failed = True
+    if executor is not None:
+        executor.shutdown()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
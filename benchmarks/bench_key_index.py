@@ -0,0 +1,71 @@
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+# add path so we can use repository modules through command line
+new_path = os.path.join(os.path.dirname(__file__), "..")
+sys.path.append(new_path)
+
+from key_index import KeyIndex
+from utils import retrieve_objects_with_pattern
+
+EXTENSIONS: list = [".bip", ".bip.gz", ".bip.zip", ".trip.gz", ".viajes.gz", ".etapas.gz"]
+
+
+def build_synthetic_keys(key_number: int) -> list:
+    """Build date named keys, one per extension and day, starting at year 1700 to have room for millions."""
+    keys: list = []
+    day: datetime = datetime(1700, 1, 1)
+    while len(keys) < key_number:
+        date_part: str = day.strftime("%Y-%m-%d")
+        keys.extend(f"{date_part}{extension}" for extension in EXTENSIONS)
+        day += timedelta(days=1)
+    return keys[:key_number]
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description="compare linear pattern matching against KeyIndex queries"
+    )
+    parser.add_argument("--keys", type=int, default=1_000_000, help="synthetic key number")
+    parser.add_argument("--queries", type=int, default=365, help="date queries to run")
+    args = parser.parse_args(argv[1:])
+
+    keys: list = build_synthetic_keys(args.keys)
+    aws_object_list: list = [dict(name=key) for key in keys]
+    dates: list = [datetime(2010, 1, 1) + timedelta(days=i) for i in range(args.queries)]
+    print(f"{len(keys)} keys, {len(dates)} date queries")
+
+    start: float = time.perf_counter()
+    linear_result: list = [
+        retrieve_objects_with_pattern(f"{date.strftime('%Y-%m-%d')}.bip*", aws_object_list)
+        for date in dates
+    ]
+    linear_time: float = time.perf_counter() - start
+    print(f"retrieve_objects_with_pattern: {linear_time:.3f}s ({linear_time / len(dates) * 1000:.3f} ms/query)")
+
+    start = time.perf_counter()
+    key_index: KeyIndex = KeyIndex.from_object_list(aws_object_list)
+    build_time: float = time.perf_counter() - start
+    print(f"KeyIndex build: {build_time:.3f}s")
+
+    start = time.perf_counter()
+    index_result: list = [key_index.match_date(date, ".bip*") for date in dates]
+    index_time: float = time.perf_counter() - start
+    print(f"KeyIndex.match_date: {index_time:.3f}s ({index_time / len(dates) * 1000:.3f} ms/query)")
+
+    start = time.perf_counter()
+    range_result: list = key_index.match_date_range(dates[0], dates[-1], ".bip*")
+    range_time: float = time.perf_counter() - start
+    print(f"KeyIndex.match_date_range: {range_time * 1000:.3f} ms ({len(range_result)} keys)")
+
+    if linear_result != index_result:
+        print("results differ!")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,288 @@
+import argparse
+import csv
+import io
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+import traceback
+from datetime import datetime, timedelta
+
+# add path so we can use repository modules through command line
+new_path = os.path.join(os.path.dirname(__file__), "..")
+sys.path.append(new_path)
+
+import delete_bucket_from_s3
+import delete_object_in_s3
+import download_from_s3
+import move_bucket_from_s3
+import update_objects_from_s3
+import upload_to_s3
+from lazy import lazy_import
+from synthetic_bip import get_synthetic_bip
+from utils import get_compress_type, open_decompressed_stream, zstandard
+
+# optional dependency, the in memory S3 stand-in of the harness
+moto = lazy_import("moto")
+
+SOURCE_BUCKET: str = "scale-source"
+TARGET_BUCKET: str = "scale-target"
+START_DATE: datetime = datetime(2021, 6, 28)
+TUPLE: list = ["7", "LABORAL", "FERIADO"]
+
+
+def get_object_key(date: datetime, index: int, compression: str) -> str:
+    """2021-06-28.bip.gz for the first object of a day, 2021-06-28.01.bip.gz for the next ones"""
+    name: str = f"{date:%Y-%m-%d}.bip" if index == 0 else f"{date:%Y-%m-%d}.{index:02d}.bip"
+    return name + (f".{compression}" if compression else "")
+
+
+def get_seeded_objects(days: int, objects: int, rows: int, compression: str) -> dict:
+    """Synthetic objects of N days x M objects, key: (date, seed)"""
+    return {
+        get_object_key(START_DATE + timedelta(days=day), index, compression): (
+            START_DATE + timedelta(days=day),
+            day * objects + index,
+        )
+        for day in range(days)
+        for index in range(objects)
+    }
+
+
+def read_rows(data: bytes) -> list:
+    """Rows of a .bip file in any format, line breaks written by csv.writer (CRLF) are ignored"""
+    file_obj: io.BytesIO = io.BytesIO(data)
+    with open_decompressed_stream(file_obj, get_compress_type(file_obj)) as stream:
+        text: str = stream.read().decode("utf-8")
+    return list(csv.reader(io.StringIO(text), delimiter="|"))
+
+
+def get_bucket_objects(client, bucket_name: str) -> dict:
+    paginator = client.get_paginator("list_objects_v2")
+    return {
+        obj["Key"]: client.get_object(Bucket=bucket_name, Key=obj["Key"])["Body"].read()
+        for page in paginator.paginate(Bucket=bucket_name)
+        for obj in page.get("Contents", [])
+    }
+
+
+def check(condition: bool, message: str) -> None:
+    if not condition:
+        raise AssertionError(message)
+
+
+class ScaleHarness:
+    """
+    Runs every command against an in memory S3 stand-in (moto) seeded with synthetic .bip days. Each scenario runs in
+    a forked process that starts from the seeded buckets, so scenarios do not see each other changes and the peak RSS
+    of the process is the one of the scenario.
+    """
+
+    def __init__(self, days: int, objects: int, rows: int, compression: str, directory: str):
+        self.seeded_objects: dict = get_seeded_objects(days, objects, rows, compression)
+        self.rows: int = rows
+        self.compression: str = compression
+        self.directory: str = directory
+        self._contents: dict = {}
+
+    def get_content(self, key: str) -> bytes:
+        if key not in self._contents:
+            date, seed = self.seeded_objects[key]
+            self._contents[key] = get_synthetic_bip(self.rows, seed, date, self.compression)
+        return self._contents[key]
+
+    def get_client(self):
+        import boto3
+
+        return boto3.client("s3")
+
+    def seed(self) -> None:
+        client = self.get_client()
+        for bucket_name in [SOURCE_BUCKET, TARGET_BUCKET]:
+            client.create_bucket(Bucket=bucket_name)
+        for key in self.seeded_objects:
+            client.put_object(Bucket=SOURCE_BUCKET, Key=key, Body=self.get_content(key))
+
+    def get_scenarios(self) -> list:
+        scenarios: list = [
+            ("upload", self.run_upload),
+            ("download", self.run_download),
+            ("delete", self.run_delete),
+            ("move-bucket", self.run_move_bucket),
+            ("delete-bucket", self.run_delete_bucket),
+            ("update", lambda: self.run_update([])),
+            ("update --streaming", lambda: self.run_update(["--streaming"])),
+        ]
+        if zstandard is not None:
+            scenarios.append(
+                ("update --streaming --codec zst", lambda: self.run_update(["--streaming", "--codec", "zst"]))
+            )
+        return scenarios
+
+    def run_upload(self) -> int:
+        upload_path: str = os.path.join(self.directory, "upload")
+        os.makedirs(upload_path)
+        for key in self.seeded_objects:
+            with open(os.path.join(upload_path, key), "wb") as file_obj:
+                file_obj.write(self.get_content(key))
+        upload_to_s3.main(["upload", os.path.join(upload_path, "*"), TARGET_BUCKET])
+        uploaded: dict = get_bucket_objects(self.get_client(), TARGET_BUCKET)
+        check(sorted(uploaded) == sorted(self.seeded_objects), "uploaded keys differ")
+        check(all(uploaded[key] == self.get_content(key) for key in uploaded), "uploaded content differs")
+        return len(uploaded)
+
+    def run_download(self) -> int:
+        download_path: str = os.path.join(self.directory, "download")
+        os.makedirs(download_path)
+        download_from_s3.main(["download", *self.seeded_objects, SOURCE_BUCKET, "--destination-path", download_path])
+        for key in self.seeded_objects:
+            with open(os.path.join(download_path, key), "rb") as file_obj:
+                check(file_obj.read() == self.get_content(key), f"downloaded {key} differs")
+        return len(self.seeded_objects)
+
+    def run_delete(self) -> int:
+        keys: list = list(self.seeded_objects)
+        for key in keys:
+            delete_object_in_s3.main(["delete", key, SOURCE_BUCKET])
+        check(not get_bucket_objects(self.get_client(), SOURCE_BUCKET), "objects were not deleted")
+        return len(keys)
+
+    def run_move_bucket(self) -> int:
+        move_bucket_from_s3.main(["move-bucket", SOURCE_BUCKET, TARGET_BUCKET])
+        client = self.get_client()
+        check(not get_bucket_objects(client, SOURCE_BUCKET), "source bucket is not empty")
+        moved: dict = get_bucket_objects(client, TARGET_BUCKET)
+        check(all(moved.get(key) == self.get_content(key) for key in self.seeded_objects), "moved objects differ")
+        return len(moved)
+
+    def run_delete_bucket(self) -> int:
+        delete_bucket_from_s3.main(["delete-bucket", SOURCE_BUCKET])
+        buckets: list = [bucket["Name"] for bucket in self.get_client().list_buckets()["Buckets"]]
+        check(SOURCE_BUCKET not in buckets, "bucket was not deleted")
+        return len(self.seeded_objects)
+
+    def run_update(self, options: list) -> int:
+        destination_path: str = os.path.join(self.directory, "update")
+        os.makedirs(destination_path)
+        dates: list = sorted(date for date, _ in self.seeded_objects.values())
+        update_objects_from_s3.main(
+            [
+                "update",
+                SOURCE_BUCKET,
+                "*.bip*",
+                f"{dates[0]:%Y-%m-%d}",
+                f"{dates[-1]:%Y-%m-%d}",
+                f"[{','.join(TUPLE)}]",
+                "--destination-path",
+                destination_path,
+            ]
+            + options
+        )
+        updated: dict = get_bucket_objects(self.get_client(), SOURCE_BUCKET)
+        check(len(updated) == len(self.seeded_objects), "updated objects are missing or duplicated")
+        column: int = int(TUPLE[0])
+        for key, data in updated.items():
+            original_key: str = next(
+                original for original in self.seeded_objects if original.split(".bip")[0] == key.split(".bip")[0]
+            )
+            expected: list = read_rows(self.get_content(original_key))
+            for row in expected:
+                if row[column] == TUPLE[1]:
+                    row[column] = TUPLE[2]
+            check(read_rows(data) == expected, f"updated {key} differs")
+        return len(updated)
+
+
+def run_scenario(harness: ScaleHarness, name: str, function) -> dict:
+    """Run a scenario in a forked process, it reports its objects, wall time and peak RSS or the error"""
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.get_context("fork").Process(target=_run_forked, args=(harness, function, sender))
+    process.start()
+    sender.close()
+    try:
+        result: dict = receiver.recv()
+    except EOFError:
+        result = dict(objects=0, seconds=0, peak_rss_mb=0, error=f"exit code {process.exitcode}")
+    process.join()
+    return dict(scenario=name, **result)
+
+
+def _run_forked(harness: ScaleHarness, function, sender) -> None:
+    harness.directory = tempfile.mkdtemp(dir=harness.directory)
+    start_time: float = time.perf_counter()
+    objects: int = 0
+    error: str = None
+    try:
+        objects = function()
+    except (Exception, SystemExit) as e:
+        error = "".join(traceback.format_exception_only(type(e), e)).strip()
+    sender.send(
+        dict(
+            objects=objects,
+            seconds=time.perf_counter() - start_time,
+            # kilobytes on Linux, the forked process starts counting again
+            peak_rss_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            error=error,
+        )
+    )
+    sender.close()
+
+
+def run_harness(days: int, objects: int, rows: int, compression: str, scenarios: list = None) -> list:
+    """Seed the S3 stand-in and run the scenarios (all by default).
+
+    Returns:
+        list: result of each scenario: scenario, objects, seconds, peak_rss_mb and error (None if its checks passed)
+    """
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    with tempfile.TemporaryDirectory() as directory, moto.mock_aws():
+        harness: ScaleHarness = ScaleHarness(days, objects, rows, compression, directory)
+        harness.seed()
+        return [
+            run_scenario(harness, name, function)
+            for name, function in harness.get_scenarios()
+            if scenarios is None or name in scenarios
+        ]
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description="run every command end to end on synthetic .bip days in an in memory S3 (moto), checking their "
+        "results and measuring wall time and peak RSS"
+    )
+    parser.add_argument("--days", type=int, default=7, help="days seeded in the bucket")
+    parser.add_argument("--objects", type=int, default=2, help="objects of each day")
+    parser.add_argument("--rows", type=int, default=100_000, help="rows of each object")
+    parser.add_argument("--compression", choices=["gz", "zip", "zst"], default="gz", help="format of the objects")
+    parser.add_argument("--scenario", dest="scenarios", action="append", default=None, help="only run this scenario")
+    parser.add_argument("--output", default=None, help="JSON file where the results are saved")
+    args = parser.parse_args(argv[1:])
+
+    if moto is None:
+        print("the harness needs moto (pip install moto)")
+        return 1
+    logging.basicConfig(level=logging.WARNING)
+    object_mb: float = len(get_synthetic_bip(args.rows, 0, START_DATE, args.compression)) / 1024 ** 2
+    data_mb: float = object_mb * args.days * args.objects
+    print(f"{args.days} days x {args.objects} objects x {args.rows} rows ({args.compression}, ~{data_mb:.1f} MB)")
+    results: list = run_harness(args.days, args.objects, args.rows, args.compression, args.scenarios)
+    for result in results:
+        status: str = "ok" if result["error"] is None else f"FAILED: {result['error']}"
+        print(
+            f"{result['scenario']}: {result['objects']} objects in {result['seconds']:.2f}s, "
+            f"peak RSS {result['peak_rss_mb']:.0f} MB, {status}"
+        )
+    if args.output is not None:
+        with open(args.output, "w") as file_obj:
+            json.dump(results, file_obj, indent=2)
+    return int(any(result["error"] is not None for result in results))
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,47 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# add path so we can use repository modules through command line
+new_path = os.path.join(os.path.dirname(__file__), "..")
+sys.path.append(new_path)
+
+from s3tool import SUBCOMMANDS
+
+REPOSITORY_PATH: str = os.path.abspath(new_path)
+
+
+def measure(command: list, runs: int) -> float:
+    """Median wall time in milliseconds of a command, its exit status is ignored (argument errors exit with 2)."""
+    times: list = []
+    for _ in range(runs):
+        start: float = time.perf_counter()
+        subprocess.run(command, cwd=REPOSITORY_PATH, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="measure the startup time of each s3tool subcommand")
+    parser.add_argument("--runs", type=int, default=10, help="runs of each command, the median is reported")
+    args = parser.parse_args(argv[1:])
+
+    python: str = sys.executable
+    print(f"python without imports: {measure([python, '-c', 'pass'], args.runs):.0f} ms")
+    print(f"import boto3 (previous cost of every command): {measure([python, '-c', 'import boto3'], args.runs):.0f} ms")
+    for subcommand, (module_name, _) in SUBCOMMANDS.items():
+        help_time: float = measure([python, "s3tool.py", subcommand, "--help"], args.runs)
+        error_time: float = measure([python, "s3tool.py", subcommand], args.runs)
+        script_time: float = measure([python, f"{module_name}.py", "--help"], args.runs)
+        print(
+            f"s3tool {subcommand}: --help {help_time:.0f} ms, argument error {error_time:.0f} ms, "
+            f"{module_name}.py --help {script_time:.0f} ms"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,104 @@
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+# add path so we can use repository modules through command line
+new_path = os.path.join(os.path.dirname(__file__), "..")
+sys.path.append(new_path)
+
+from columnar import VECTORIZED_CHUNK_SIZE, np
+from synthetic_bip import write_synthetic_bip
+from utils import update_bytes_stream_by_tuples, update_stream_by_tuples
+
+
+def build_rules(rule_number: int, seed: int = 0) -> list:
+    """Build rules over the op, servicio_usuario and periodo columns, like the service renames done in production."""
+    rng: random.Random = random.Random(seed)
+    rules: list = [["7", "LABORAL", "FERIADO"]]
+    while len(rules) < rule_number:
+        column: int = rng.choice([3, 5, 6])
+        if column == 5:
+            rules.append([str(column), f"{rng.randrange(600)}R", f"{rng.randrange(600)}R"])
+        else:
+            rules.append([str(column), str(rng.randrange(48)), str(rng.randrange(48))])
+    return rules
+
+
+def update_file_by_tuples_per_row(input_file: str, output_file: str, tuples: list, delimiter="|"):
+    """Previous implementation, every tuple is checked on every row."""
+    with open(input_file, "r", encoding="utf-8") as input, open(output_file, "w", encoding="utf-8") as output:
+        reader: csv.reader = csv.reader(input, delimiter=delimiter)
+        writer: csv.writer = csv.writer(output, delimiter=delimiter)
+        for row in reader:
+            for column_index, previous_value, new_value in tuples:
+                if int(column_index) < len(row) and row[int(column_index)] == str(previous_value):
+                    row[int(column_index)] = new_value
+            writer.writerow(row)
+
+
+def update_file_by_tuples_with_csv(input_file: str, output_file: str, tuples: list, delimiter="|"):
+    """Compiled tables over csv.reader/csv.writer text rows."""
+    with open(input_file, "r", encoding="utf-8") as input, open(output_file, "w", encoding="utf-8") as output:
+        update_stream_by_tuples(input, output, tuples, delimiter)
+
+
+def update_file_by_tuples_binary_rows(input_file: str, output_file: str, tuples: list, delimiter="|"):
+    """Compiled tables applied row by row to binary chunks."""
+    with open(input_file, "rb") as input, open(output_file, "wb") as output:
+        update_bytes_stream_by_tuples(input, output, tuples, delimiter)
+
+
+def update_file_by_tuples_vectorized(input_file: str, output_file: str, tuples: list, delimiter="|"):
+    """Compiled tables applied to 16 MB chunks with NumPy."""
+    with open(input_file, "rb") as input, open(output_file, "wb") as output:
+        update_bytes_stream_by_tuples(
+            input, output, tuples, delimiter, chunk_size=VECTORIZED_CHUNK_SIZE, vectorized=True
+        )
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description="compare the per row tuple loop, the csv module, the binary rewriter and the vectorized engine"
+    )
+    parser.add_argument("--rows", type=int, default=2_000_000, help="synthetic .bip rows")
+    parser.add_argument("--rules", type=int, default=300, help="replacement tuples")
+    parser.add_argument("--skip-per-row", action="store_true", help="do not run the slow per row tuple loop")
+    args = parser.parse_args(argv[1:])
+
+    with tempfile.TemporaryDirectory() as directory:
+        input_file: str = os.path.join(directory, "2021-06-30.bip")
+        write_synthetic_bip(input_file, args.rows)
+        rules: list = build_rules(args.rules)
+        print(f"{args.rows} rows ({os.path.getsize(input_file) / 1024 ** 2:.1f} MB), {len(rules)} rules")
+
+        engines: list = [
+            ("per row tuple loop", update_file_by_tuples_per_row),
+            ("compiled tables with csv", update_file_by_tuples_with_csv),
+            ("binary rows", update_file_by_tuples_binary_rows),
+        ]
+        if args.skip_per_row:
+            engines.pop(0)
+        if np is not None:
+            engines.append(("vectorized chunks", update_file_by_tuples_vectorized))
+        results: list = []
+        for name, function in engines:
+            output_file: str = os.path.join(directory, name.replace(" ", "_"))
+            start: float = time.perf_counter()
+            function(input_file, output_file, rules)
+            seconds: float = time.perf_counter() - start
+            print(f"{name}: {seconds:.3f}s ({args.rows / seconds:,.0f} rows/s)")
+            with open(output_file, "rb") as file_obj:
+                results.append(file_obj.read())
+
+    if any(result != results[0] for result in results):
+        print("results differ!")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
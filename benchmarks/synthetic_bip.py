@@ -0,0 +1,121 @@
+import argparse
+import csv
+import io
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+# add path so we can use repository modules through command line
+new_path = os.path.join(os.path.dirname(__file__), "..")
+sys.path.append(new_path)
+
+from utils import COMPRESS_TYPES, open_compressed_stream
+
+HEADER: list = ["id", "tiempo", "sitio", "op", "servicio_sonda", "servicio_usuario", "periodo", "tipo_dia"]
+DAY_TYPES: list = ["LABORAL", "SABADO", "DOMINGO"]
+DEFAULT_DATE: datetime = datetime(2021, 6, 30)
+# bus stops (ZN-1234) and buses (plate-direction) where the cards are validated
+SITE_LETTERS: str = "BCDFGHJKLPRSTVWXYZ"
+# route variants, e.g. T211 C0 00R is 211cR for the user
+SERVICE_VARIANTS: list = [("", ""), (" C0", "c"), (" E0", "e")]
+
+
+def get_day_type(date: datetime) -> str:
+    return DAY_TYPES[max(0, date.weekday() - 4)]
+
+
+def get_site(rng: random.Random) -> str:
+    if rng.random() < 0.5:
+        return f"ZN-{rng.randrange(10000):04d}"
+    return "".join(rng.choice(SITE_LETTERS) for _ in range(4)) + f"-{rng.randrange(10, 100)}"
+
+
+def iter_synthetic_rows(row_number: int, seed: int = 0, date: datetime = DEFAULT_DATE):
+    """Rows of a .bip day with the columns of the real files and random values, the same seed gives the same rows."""
+    rng: random.Random = random.Random(seed)
+    day_type: str = get_day_type(date)
+    for _ in range(row_number):
+        seconds: int = rng.randrange(5 * 3600, 24 * 3600)
+        route: int = rng.randrange(100, 800)
+        sonda_variant, user_variant = rng.choice(SERVICE_VARIANTS)
+        yield [
+            rng.randrange(10**9, 5 * 10**9),
+            (date + timedelta(seconds=seconds)).strftime("%Y-%m-%d %H:%M:%S"),
+            get_site(rng),
+            rng.choice([2, 2, 2, 5]),
+            f"T{route}{sonda_variant} 00R",
+            f"{route}{user_variant}R",
+            seconds // 1800,
+            day_type,
+        ]
+
+
+def get_synthetic_bip(
+    row_number: int,
+    seed: int = 0,
+    date: datetime = DEFAULT_DATE,
+    compress_type: str = "",
+    compresslevel: int = None,
+) -> bytes:
+    """Content of a synthetic .bip day, compressed like the objects of the buckets if compress_type is given.
+
+    Args:
+        row_number (int): rows without the header
+        seed (int, optional): random seed. Defaults to 0.
+        date (datetime, optional): day of the rows, it gives the tiempo and tipo_dia columns. Defaults to DEFAULT_DATE.
+        compress_type (str, optional): "gz", "zip", "zst" or "" for plain text. Defaults to "".
+        compresslevel (int, optional): compression level. Defaults to the default level of compress_type.
+
+    Returns:
+        bytes: file content
+    """
+    text: io.StringIO = io.StringIO()
+    writer: csv.writer = csv.writer(text, delimiter="|", lineterminator="\n")
+    writer.writerow(HEADER)
+    writer.writerows(iter_synthetic_rows(row_number, seed, date))
+    data: bytes = text.getvalue().encode("utf-8")
+    if not compress_type:
+        return data
+    output_stream: io.BytesIO = io.BytesIO()
+    with open_compressed_stream(output_stream, compress_type, f"{date:%Y-%m-%d}.bip", compresslevel) as stream:
+        stream.write(data)
+    return output_stream.getvalue()
+
+
+def write_synthetic_bip(
+    file_path: str,
+    row_number: int,
+    seed: int = 0,
+    date: datetime = DEFAULT_DATE,
+    compresslevel: int = None,
+) -> None:
+    """Write a synthetic .bip day, compressed according to the extension of file_path (.gz, .zip or .zst)."""
+    extension: str = os.path.splitext(file_path)[1][1:]
+    compress_type: str = extension if extension in COMPRESS_TYPES else ""
+    with open(file_path, "wb") as file_obj:
+        file_obj.write(get_synthetic_bip(row_number, seed, date, compress_type, compresslevel))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="write synthetic .bip days with the columns of the real files")
+    parser.add_argument("destination_path", help="directory where the files are written")
+    parser.add_argument("start_date", type=lambda value: datetime.strptime(value, "%Y-%m-%d"), help="YYYY-MM-DD")
+    parser.add_argument("--days", type=int, default=1, help="number of consecutive days")
+    parser.add_argument("--rows", type=int, default=100_000, help="rows of each day")
+    parser.add_argument("--compression", choices=COMPRESS_TYPES, default=None, help="compress the files")
+    parser.add_argument("--compress-level", type=int, default=None, help="compression level")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the first day")
+    args = parser.parse_args(argv[1:])
+
+    for day in range(args.days):
+        date: datetime = args.start_date + timedelta(days=day)
+        file_name: str = f"{date:%Y-%m-%d}.bip" + (f".{args.compression}" if args.compression else "")
+        file_path: str = os.path.join(args.destination_path, file_name)
+        write_synthetic_bip(file_path, args.rows, args.seed + day, date, args.compress_level)
+        print(f"{file_path}: {os.path.getsize(file_path) / 1024 ** 2:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,160 @@
+import threading
+from contextlib import contextmanager
+
+from multipart import DEFAULT_PART_SIZE
+
+DEFAULT_MEMORY_BUDGET: int = 512 * 1024**2
+# parts of a boto3 managed transfer (upload_file, download_file) held in memory at the same time
+TRANSFER_PARTS: int = 4
+# s3transfer writes downloads in chunks of this size through its IO queue
+TRANSFER_IO_CHUNKSIZE: int = 256 * 1024
+
+
+def get_transfer_memory(
+    part_size: int = DEFAULT_PART_SIZE, parts: int = TRANSFER_PARTS
+) -> int:
+    """Bytes a boto3 managed transfer made with get_transfer_config can hold in memory"""
+    return part_size * parts
+
+
+def get_transfer_parts(budget: int, part_size: int = DEFAULT_PART_SIZE) -> int:
+    """Parts of a managed transfer that fit in budget, at least one"""
+    return max(1, min(TRANSFER_PARTS, budget // part_size))
+
+
+def get_transfer_config(
+    part_size: int = DEFAULT_PART_SIZE, parts: int = TRANSFER_PARTS
+):
+    """This function makes the boto3 TransferConfig of managed transfers whose buffers fit in
+    get_transfer_memory(part_size, parts): parts threads, parts upload parts read ahead and a download IO queue of the
+    same size. boto3 defaults allow 10 upload parts and a 100 chunk IO queue for each transfer.
+
+    Returns:
+        boto3.s3.transfer.TransferConfig: Config argument of upload_file, download_file and the fileobj variants
+    """
+    # boto3 is imported when the first transfer starts
+    from boto3.s3.transfer import TransferConfig
+
+    memory: int = get_transfer_memory(part_size, parts)
+    config = TransferConfig(
+        multipart_chunksize=part_size,
+        max_concurrency=parts,
+        max_io_queue=memory // TRANSFER_IO_CHUNKSIZE,
+        io_chunksize=TRANSFER_IO_CHUNKSIZE,
+    )
+    # s3transfer options that boto3 does not take as arguments
+    config.max_in_memory_upload_chunks = parts
+    config.max_in_memory_download_chunks = memory // TRANSFER_IO_CHUNKSIZE
+    return config
+
+
+class BufferPool:
+    """
+    Memory budget of the buffers of every transfer of a session: stdin upload parts, streaming rewrite parts and the
+    chunks of boto3 managed transfers. A transfer acquires its buffers before using them and waits while the budget is
+    in use, so however many transfers are queued, the bytes in flight stay under the budget. Released buffers are kept
+    and handed out again to requests of the same size; they count against the budget and are dropped when other sizes
+    need room. A buffer bigger than the whole budget is not refused: it waits until nothing else is in use and runs
+    alone.
+    """
+
+    def __init__(self, budget: int = DEFAULT_MEMORY_BUDGET):
+        if budget <= 0:
+            raise ValueError("Memory budget must be positive")
+        self.budget: int = budget
+        self.in_use: int = 0
+        self.peak_in_use: int = 0
+        # transfers that had to wait for memory
+        self.waits: int = 0
+        self._free_buffers: dict = {}
+        self._free_bytes: int = 0
+        self._condition: threading.Condition = threading.Condition()
+
+    def _has_room(self, size: int) -> bool:
+        # a buffer bigger than the budget needs all of it
+        size = min(size, self.budget)
+        if self.in_use + self._free_bytes + size <= self.budget:
+            return True
+        # drop kept buffers of other sizes to make room
+        for buffer_size, buffers in list(self._free_buffers.items()):
+            while buffers and self.in_use + self._free_bytes + size > self.budget:
+                buffers.pop()
+                self._free_bytes -= buffer_size
+            if not buffers:
+                del self._free_buffers[buffer_size]
+        return self.in_use + self._free_bytes + size <= self.budget
+
+    def _take(self, size: int) -> None:
+        self.in_use += size
+        self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def acquire(self, size: int, blocking: bool = True) -> bytearray:
+        """Get a buffer of size bytes, waiting until the budget has room for it.
+
+        Returns:
+            bytearray: buffer to give back with release, None if blocking is False and the budget is in use
+        """
+        with self._condition:
+            waited: bool = False
+            while True:
+                if self._free_buffers.get(size):
+                    buffer: bytearray = self._free_buffers[size].pop()
+                    self._free_bytes -= size
+                    break
+                if self._has_room(size):
+                    buffer = bytearray(size)
+                    break
+                if not blocking:
+                    return None
+                if not waited:
+                    self.waits += 1
+                    waited = True
+                self._condition.wait()
+            self._take(size)
+            return buffer
+
+    def release(self, buffer: bytearray) -> None:
+        with self._condition:
+            self.in_use -= len(buffer)
+            self._free_buffers.setdefault(len(buffer), []).append(buffer)
+            self._free_bytes += len(buffer)
+            self._condition.notify_all()
+
+    @contextmanager
+    def reserve(self, size: int):
+        """Count size bytes against the budget while the block runs, for buffers allocated by boto3"""
+        with self._condition:
+            waited: bool = False
+            while not self._has_room(size):
+                if not waited:
+                    self.waits += 1
+                    waited = True
+                self._condition.wait()
+            self._take(size)
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.in_use -= size
+                self._condition.notify_all()
+
+    @contextmanager
+    def transfer(self, part_size: int = DEFAULT_PART_SIZE):
+        """Reserve the memory of a boto3 managed transfer with as many parts as the budget allows, one part when it
+        is smaller than a part.
+
+        Yields:
+            boto3.s3.transfer.TransferConfig: Config argument of the transfer
+        """
+        parts: int = get_transfer_parts(self.budget, part_size)
+        with self.reserve(get_transfer_memory(part_size, parts)):
+            yield get_transfer_config(part_size, parts)
+
+    def get_metrics(self) -> dict:
+        with self._condition:
+            return dict(
+                memory_budget_bytes=self.budget,
+                memory_in_use_bytes=self.in_use,
+                memory_peak_bytes=self.peak_in_use,
+                memory_waits=self.waits,
+            )
@@ -0,0 +1,213 @@
+import functools
+
+from lazy import lazy_import
+
+# optional dependency, the row by row engine is used without it. It is imported on first use
+np = lazy_import("numpy")
+
+VECTORIZED_SIZE_THRESHOLD: int = 64 * 1024**2
+VECTORIZED_CHUNK_SIZE: int = 16 * 1024**2
+NEW_LINE: int = ord("\n")
+PACKED_FIELD_WIDTH: int = 8
+QUOTED_EMPTY_FIELD: bytes = b'""'
+
+
+@functools.lru_cache(maxsize=None)
+def _get_packed_field_masks():
+    """Masks keeping the first n bytes of a packed field"""
+    return np.array(
+        [(1 << (8 * n)) - 1 for n in range(PACKED_FIELD_WIDTH + 1)], dtype="<u8"
+    )
+
+
+def use_vectorized_engine(size: int) -> bool:
+    """This function tells if a file of the given size should be updated with the vectorized engine.
+
+    Args:
+        size (int): file size in bytes
+
+    Returns:
+        bool: True if NumPy is installed and size is over VECTORIZED_SIZE_THRESHOLD
+    """
+    return np is not None and size >= VECTORIZED_SIZE_THRESHOLD
+
+
+def get_engine_kwargs(size: int) -> dict:
+    """This function makes the update_bytes_stream_by_tuples arguments of the engine suited to a file size.
+
+    Args:
+        size (int): file size in bytes
+
+    Returns:
+        dict: vectorized and chunk_size arguments, empty for the row by row engine
+    """
+    if use_vectorized_engine(size):
+        return dict(vectorized=True, chunk_size=VECTORIZED_CHUNK_SIZE)
+    return {}
+
+
+def supports_tables(column_tables: list) -> bool:
+    """This function tells if compiled tables can be applied by update_lines_vectorized.
+
+    Fields are compared as NumPy fixed width byte strings, which ignore trailing NUL bytes, and columns are located
+    from the start of the line, so negative columns and values with NUL bytes are not supported.
+
+    Args:
+        column_tables (list): (column_index, {value_to_replace: new_value}) pairs with bytes values
+
+    Returns:
+        bool: True if update_lines_vectorized gives the same result as the row by row engine
+    """
+    return all(
+        column_index >= 0 and all(b"\x00" not in value for value in table)
+        for column_index, table in column_tables
+    )
+
+
+def _get_fixed_width_fields(data_array, start, end, width: int):
+    """Fields as zero padded rows of width bytes, longer fields are cut"""
+    offsets = np.arange(width)
+    positions = np.minimum(start[:, None] + offsets, len(data_array) - 1)
+    return np.where(offsets < (end - start)[:, None], data_array[positions], 0).astype(
+        np.uint8
+    )
+
+
+def _get_packed_fields(packed_windows, start, end):
+    """Fields up to PACKED_FIELD_WIDTH bytes as zero padded little endian integers"""
+    length = np.minimum(end - start, PACKED_FIELD_WIDTH)
+    return packed_windows[start] & _get_packed_field_masks()[length]
+
+
+def _get_packed_windows(data: bytes):
+    """Overlapping little endian integers made of the PACKED_FIELD_WIDTH bytes starting at each position"""
+    padded: bytes = data + b"\x00" * PACKED_FIELD_WIDTH
+    return np.ndarray(
+        shape=(len(data),), dtype="<u8", buffer=padded, offset=0, strides=(1,)
+    )
+
+
+def _lookup(data_array, packed_windows, start, end, keys: list):
+    """Index of the key equal to each field, -1 if the field is not a key.
+
+    Fields up to PACKED_FIELD_WIDTH bytes are compared as integers, longer ones as fixed width byte strings.
+    """
+    width: int = max(len(key) for key in keys)
+    if width <= PACKED_FIELD_WIDTH:
+        key_array = np.array(
+            [int.from_bytes(key, "little") for key in keys],
+            dtype="<u8",
+        )
+        fields = _get_packed_fields(packed_windows, start, end)
+    else:
+        key_array = np.array(keys, dtype=f"S{width}")
+        fields = (
+            _get_fixed_width_fields(data_array, start, end, width)
+            .view(f"S{width}")
+            .ravel()
+        )
+    order = np.argsort(key_array)
+    sorted_keys = key_array[order]
+    positions = np.minimum(np.searchsorted(sorted_keys, fields), len(keys) - 1)
+    matched = (sorted_keys[positions] == fields) & (end - start <= width)
+    return np.where(matched, order[positions], -1)
+
+
+def update_lines_vectorized(
+    data: bytes, column_tables: list, delimiter: bytes, matches: dict = None
+) -> bytes:
+    """This function applies compiled replacement tables to complete lines with NumPy.
+
+    Delimiters and line breaks are located once for the whole chunk, then the fields of each touched column are
+    looked up in its table with a binary search over all lines at once and the output is assembled without a Python
+    loop over rows. The result is the same as the row by row engine: rows end with CRLF like csv.writer output.
+
+    Args:
+        data (bytes): lines separated by LF, without quotes, carriage returns or NUL bytes
+        column_tables (list): (column_index, {value_to_replace: new_value}) pairs with bytes values
+        delimiter (bytes): one byte delimiter
+        matches (dict, optional): number of cells found for each (column_index, original value), it is updated.
+
+    Returns:
+        bytes: updated lines
+    """
+    if not data:
+        return data
+    if not data.endswith(b"\n"):
+        data += b"\n"
+    if not column_tables:
+        return data.replace(b"\n", b"\r\n")
+    data_array = np.frombuffer(data, dtype=np.uint8)
+    packed_windows = _get_packed_windows(data)
+    # every field ends at a separator, the line breaks among them split the separators of each line
+    separators = np.flatnonzero((data_array == NEW_LINE) | (data_array == delimiter[0]))
+    line_breaks = np.flatnonzero(data_array[separators] == NEW_LINE)
+    first_separator = np.concatenate(([0], line_breaks[:-1] + 1))
+    line_start = np.concatenate(([0], separators[line_breaks[:-1]] + 1))
+    delimiter_number = line_breaks - first_separator
+    not_empty = separators[line_breaks] > line_start
+
+    values: list = [QUOTED_EMPTY_FIELD]
+    starts: list = []
+    ends: list = []
+    value_ids: list = []
+    for column_index, table in column_tables:
+        lines = np.flatnonzero((delimiter_number >= column_index) & not_empty)
+        if column_index == 0:
+            start = line_start[lines]
+        else:
+            start = separators[first_separator[lines] + column_index - 1] + 1
+        end = separators[first_separator[lines] + column_index]
+        keys: list = list(table)
+        key_index = _lookup(data_array, packed_windows, start, end, keys)
+        matched = key_index >= 0
+        if matches is not None:
+            for key, cell_number in zip(
+                keys, np.bincount(key_index[matched], minlength=len(keys))
+            ):
+                if cell_number:
+                    match: tuple = (column_index, key)
+                    matches[match] = matches.get(match, 0) + int(cell_number)
+        new_values: list = [table[key] for key in keys]
+        column_value_ids = key_index[matched] + len(values)
+        # csv.writer quotes a row with only one empty field
+        empty_row = np.array([len(value) == 0 for value in new_values], dtype=bool)[
+            key_index[matched]
+        ] & (delimiter_number[lines[matched]] == 0)
+        column_value_ids[empty_row] = 0
+        values.extend(new_values)
+        starts.append(start[matched])
+        ends.append(end[matched])
+        value_ids.append(column_value_ids)
+
+    start = np.concatenate(starts)
+    if len(start) == 0:
+        return data.replace(b"\n", b"\r\n")
+    end = np.concatenate(ends)
+    value_id = np.concatenate(value_ids)
+    order = np.argsort(start, kind="stable")
+    start, end, value_id = start[order], end[order], value_id[order]
+
+    value_pool = np.frombuffer(b"".join(values), dtype=np.uint8)
+    value_length = np.array([len(value) for value in values], dtype=np.int64)
+    value_offset = np.cumsum(value_length) - value_length
+    inserted_length = value_length[value_id]
+    inserted_before = np.cumsum(inserted_length) - inserted_length
+    inserted = value_pool[
+        np.repeat(value_offset[value_id] - inserted_before, inserted_length)
+        + np.arange(inserted_length.sum())
+    ]
+    removed_length = end - start
+    removed_before = np.cumsum(removed_length) - removed_length
+    removed = np.repeat(start - removed_before, removed_length) + np.arange(
+        removed_length.sum()
+    )
+    if np.array_equal(removed_length, inserted_length):
+        # values of the same length are written over the old ones
+        output = data_array.copy()
+        output[removed] = inserted
+    else:
+        kept = np.delete(data_array, removed)
+        insert_positions = np.repeat(start - removed_before, inserted_length)
+        output = np.insert(kept, insert_positions, inserted)
+    return output.tobytes().replace(b"\n", b"\r\n")
@@ -2,14 +2,15 @@ import argparse
 import logging
 import os
 import sys
-
-from botocore.exceptions import ClientError
+import time
 
 # add path so we can use function through command line
 new_path = os.path.join(os.path.dirname(__file__), '..', '..')
 sys.path.append(new_path)
 
-from aws import AWSSession
+from aws import AWSSession, botocore_exceptions
+from planner import ThroughputHistory, plan_delete_bucket
+from profiling import profile_main
 
 
 def main(argv):
@@ -21,11 +22,18 @@ def main(argv):
     parser = argparse.ArgumentParser(description='delete S3 bucket')
 
     parser.add_argument('bucket_name', help='bucket name')
+    parser.add_argument('--plan', action='store_true',
+                        help='show the objects, bytes, requests and estimated time of the deletion without deleting '
+                             'anything')
+    parser.add_argument('--throughput-history', default=None,
+                        help='JSON file where the throughput of each run is saved to estimate the time of plans')
 
     args = parser.parse_args(argv[1:])
 
     # Give names to arguments
     bucket_name = args.bucket_name
+    plan = args.plan
+    throughput_history_path = args.throughput_history
 
     aws_session = AWSSession()
     logger = logging.getLogger(__name__)
@@ -35,11 +43,22 @@ def main(argv):
         logger.info(f"Bucket {bucket_name} does not exist")
         exit(1)
 
+    if plan:
+        history = ThroughputHistory(throughput_history_path) if throughput_history_path is not None else None
+        object_list = aws_session.retrieve_obj_list(bucket_name)
+        for line in plan_delete_bucket(object_list).get_summary(history):
+            logger.info(line)
+        return
+
     try:
-        aws_session.delete_bucket(bucket_name)
-    except ClientError as e:
+        start_time = time.perf_counter()
+        stats = aws_session.delete_bucket(bucket_name)
+        if throughput_history_path is not None:
+            ThroughputHistory(throughput_history_path).record('delete', stats['objects'], stats['bytes'],
+                                                              time.perf_counter() - start_time)
+    except botocore_exceptions.ClientError as e:
         logger.error(e)
 
 
 if __name__ == "__main__":
-    sys.exit(main(sys.argv))
+    sys.exit(profile_main(main, sys.argv))
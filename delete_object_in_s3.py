@@ -3,13 +3,12 @@ import logging
 import os
 import sys
 
-from botocore.exceptions import ClientError
-
 # add path so we can use function through command line
 new_path = os.path.join(os.path.dirname(__file__), '..', '..')
 sys.path.append(new_path)
 
-from aws import AWSSession
+from aws import AWSSession, botocore_exceptions
+from profiling import profile_main
 
 
 def main(argv):
@@ -39,10 +38,10 @@ def main(argv):
     try:
         aws_session.delete_object_in_bucket(filename, bucket_name)
         logger.info(f"Object {filename} was deleted successfully!")
-    except ClientError as e:
+    except botocore_exceptions.ClientError as e:
         # ignore it and continue uploading files
         logger.error(e)
 
 
 if __name__ == "__main__":
-    sys.exit(main(sys.argv))
+    sys.exit(profile_main(main, sys.argv))
@@ -3,13 +3,12 @@ import logging
 import os
 import sys
 
-from botocore.exceptions import ClientError
-
 # add path so we can use function through command line
 new_path = os.path.join(os.path.dirname(__file__), '..', '..')
 sys.path.append(new_path)
 
-from aws import AWSSession
+from aws import AWSSession, botocore_exceptions
+from profiling import profile_main
 
 
 def main(argv):
@@ -51,9 +50,9 @@ def main(argv):
         logger.info(f"downloading object {datafile} ...")
         try:
             aws_session.download_object_from_bucket(datafile, bucket_name, filename)
-        except ClientError as e:
+        except botocore_exceptions.ClientError as e:
             logger.error(e)
 
 
 if __name__ == "__main__":
-    sys.exit(main(sys.argv))
+    sys.exit(profile_main(main, sys.argv))
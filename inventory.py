@@ -0,0 +1,258 @@
+import itertools
+import logging
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+from key_index import compile_pattern, get_literal_prefix, get_prefix_upper_bound
+
+DEFAULT_RECONCILE_INTERVAL: timedelta = timedelta(hours=24)
+INSERT_BATCH_SIZE: int = 1000
+
+
+class BucketInventory:
+    """
+    Local SQLite copy of bucket listings (key, size, ETag and last modified date per bucket).
+    Our keys are named by date, so new objects are usually listed after the greatest listed key: the inventory is
+    refreshed incrementally with StartAfter that key, which only listings advance (objects written by this process
+    are recorded without moving it), and reconciled with a full listing every reconcile_interval.
+
+    Between full listings the inventory can be stale: objects other writers add with a key lower than the last listed
+    one, and objects they overwrite or delete, are only seen by the next full listing.
+    """
+
+    def __init__(
+        self,
+        database_path: str,
+        reconcile_interval: timedelta = DEFAULT_RECONCILE_INTERVAL,
+    ):
+        self.connection = sqlite3.connect(database_path, check_same_thread=False)
+        self.reconcile_interval: timedelta = reconcile_interval
+        self.logger = logging.getLogger(__name__)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS object ("
+                "bucket TEXT NOT NULL, key TEXT NOT NULL, size INTEGER, etag TEXT, last_modified TEXT, "
+                "PRIMARY KEY (bucket, key))"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS bucket ("
+                "name TEXT PRIMARY KEY, last_full_refresh TEXT)"
+            )
+            # StartAfter of incremental refreshes, the greatest key listed in S3
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS listing ("
+                "bucket TEXT PRIMARY KEY, last_key TEXT)"
+            )
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def get_last_full_refresh(self, bucket_name: str):
+        row = self.connection.execute(
+            "SELECT last_full_refresh FROM bucket WHERE name = ?", (bucket_name,)
+        ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return datetime.fromisoformat(row[0])
+
+    def get_last_key(self, bucket_name: str):
+        """Greatest key of the bucket listings, keys recorded with put_object do not count"""
+        row = self.connection.execute(
+            "SELECT last_key FROM listing WHERE bucket = ?", (bucket_name,)
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def _set_last_key(self, bucket_name: str, last_key: str) -> None:
+        self.connection.execute(
+            "INSERT OR REPLACE INTO listing (bucket, last_key) VALUES (?, ?)",
+            (bucket_name, last_key),
+        )
+
+    def needs_full_refresh(self, bucket_name: str) -> bool:
+        last_full_refresh = self.get_last_full_refresh(bucket_name)
+        return (
+            last_full_refresh is None
+            or datetime.now(timezone.utc) - last_full_refresh > self.reconcile_interval
+        )
+
+    def refresh(
+        self, client, bucket_name: str, full: bool = False, list_objects=None
+    ) -> int:
+        """Update the inventory of a bucket with its S3 listing.
+
+        Args:
+            client: boto3 S3 client
+            bucket_name (str): bucket name
+            full (bool, optional): force a full reconcile. Defaults to False.
+            list_objects (callable, optional): function that yields the listing entries of a bucket for full
+                reconciles, e.g. a parallel lister. Defaults to a sequential listing.
+
+        Returns:
+            int: number of listed objects
+        """
+        paginator = client.get_paginator("list_objects_v2")
+        if full or self.needs_full_refresh(bucket_name):
+            self.logger.info(f"Full inventory refresh of bucket {bucket_name} ...")
+            started_at: datetime = datetime.now(timezone.utc)
+            with self.connection:
+                self.connection.execute(
+                    "DELETE FROM object WHERE bucket = ?", (bucket_name,)
+                )
+                objects = (
+                    list_objects(bucket_name)
+                    if list_objects is not None
+                    else _iter_page_objects(paginator.paginate(Bucket=bucket_name))
+                )
+                object_number, last_key = self._insert_objects(bucket_name, objects)
+                self._set_last_key(bucket_name, last_key)
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO bucket (name, last_full_refresh) VALUES (?, ?)",
+                    (bucket_name, started_at.isoformat()),
+                )
+            return object_number
+
+        pagination_kwargs: dict = dict(Bucket=bucket_name)
+        last_key = self.get_last_key(bucket_name)
+        if last_key is not None:
+            pagination_kwargs["StartAfter"] = last_key
+        self.logger.info(
+            f"Incremental inventory refresh of bucket {bucket_name} after '{last_key}' ..."
+        )
+        with self.connection:
+            object_number, new_last_key = self._insert_objects(
+                bucket_name, _iter_page_objects(paginator.paginate(**pagination_kwargs))
+            )
+            if new_last_key is not None:
+                self._set_last_key(bucket_name, new_last_key)
+        return object_number
+
+    def _insert_objects(self, bucket_name: str, objects) -> tuple:
+        """Insert listing entries, sorted by key. Returns the number of objects and the last key (None if empty)."""
+        object_number: int = 0
+        last_key: str = None
+        objects = iter(objects)
+        while True:
+            rows: list = [
+                (
+                    bucket_name,
+                    obj["Key"],
+                    obj["Size"],
+                    obj.get("ETag"),
+                    obj["LastModified"].isoformat(),
+                )
+                for obj in itertools.islice(objects, INSERT_BATCH_SIZE)
+            ]
+            if not rows:
+                break
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO object (bucket, key, size, etag, last_modified) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            object_number += len(rows)
+            last_key = rows[-1][1]
+        return object_number, last_key
+
+    def put_object(
+        self,
+        bucket_name: str,
+        key: str,
+        size: int,
+        etag: str = None,
+        last_modified: datetime = None,
+    ) -> None:
+        """Record an object written by this process, so the inventory does not need a new listing. The key does not
+        move the StartAfter of incremental refreshes, objects of other writers with lower keys are still listed.
+        """
+        if last_modified is None:
+            last_modified = datetime.now(timezone.utc)
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO object (bucket, key, size, etag, last_modified) VALUES (?, ?, ?, ?, ?)",
+                (bucket_name, key, size, etag, last_modified.isoformat()),
+            )
+
+    def delete_object(self, bucket_name: str, key: str) -> None:
+        with self.connection:
+            self.connection.execute(
+                "DELETE FROM object WHERE bucket = ? AND key = ?", (bucket_name, key)
+            )
+
+    def delete_bucket(self, bucket_name: str) -> None:
+        with self.connection:
+            self.connection.execute(
+                "DELETE FROM object WHERE bucket = ?", (bucket_name,)
+            )
+            self.connection.execute("DELETE FROM bucket WHERE name = ?", (bucket_name,))
+            self.connection.execute(
+                "DELETE FROM listing WHERE bucket = ?", (bucket_name,)
+            )
+
+    def get_object(self, bucket_name: str, key: str):
+        """Get an object of the inventory.
+
+        Returns:
+            dict: object with key, size, etag and last_modified or None if it is not in the inventory
+        """
+        row = self.connection.execute(
+            "SELECT key, size, etag, last_modified FROM object WHERE bucket = ? AND key = ?",
+            (bucket_name, key),
+        ).fetchone()
+        return None if row is None else _row_to_object(row)
+
+    def contains(self, bucket_name: str, key: str) -> bool:
+        return self.get_object(bucket_name, key) is not None
+
+    def list_objects(self, bucket_name: str, prefix: str = "") -> list:
+        """List the objects of a bucket sorted by key.
+
+        Args:
+            bucket_name (str): bucket name
+            prefix (str, optional): only keys starting with prefix. Defaults to "".
+
+        Returns:
+            list: objects with key, size, etag and last_modified
+        """
+        if prefix:
+            cursor = self.connection.execute(
+                "SELECT key, size, etag, last_modified FROM object "
+                "WHERE bucket = ? AND key >= ? AND key < ? ORDER BY key",
+                (bucket_name, prefix, get_prefix_upper_bound(prefix)),
+            )
+        else:
+            cursor = self.connection.execute(
+                "SELECT key, size, etag, last_modified FROM object WHERE bucket = ? ORDER BY key",
+                (bucket_name,),
+            )
+        return [_row_to_object(row) for row in cursor]
+
+    def match(self, bucket_name: str, pattern: str) -> list:
+        """Retrieve all keys of a bucket that match a glob pattern.
+
+        Args:
+            bucket_name (str): bucket name
+            pattern (str): filename pattern
+
+        Returns:
+            list: sorted matched keys
+        """
+        regex = compile_pattern(pattern)
+        return [
+            obj["key"]
+            for obj in self.list_objects(bucket_name, get_literal_prefix(pattern))
+            if regex.match(obj["key"])
+        ]
+
+
+def _iter_page_objects(pages):
+    for page in pages:
+        yield from page.get("Contents", [])
+
+
+def _row_to_object(row: tuple) -> dict:
+    key, size, etag, last_modified = row
+    return dict(
+        key=key,
+        size=size,
+        etag=etag,
+        last_modified=datetime.fromisoformat(last_modified),
+    )
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import sqlite3
+from datetime import datetime, timezone
+
+# states of an updated object, in order, an interrupted update continues after the last recorded one
+DOWNLOADED: str = "downloaded"
+REWRITTEN: str = "rewritten"
+# recorded by streaming updates before the updated object is published, with the ETag the object will have, the
+# upload may or may not have finished
+UPLOADING: str = "uploading"
+UPLOADED: str = "uploaded"
+CLEANED: str = "cleaned"
+OBJECT_STATES: list = [DOWNLOADED, REWRITTEN, UPLOADING, UPLOADED, CLEANED]
+
+
+def get_job_id(
+    bucket_name: str,
+    tuples_list: list,
+    codec: str = None,
+    extension: str = None,
+    compresslevel: int = None,
+) -> str:
+    """Identify an update job by the objects it selects and what it writes, a rerun with the same bucket, tuples,
+    extension, codec and compression level resumes it.
+
+    Args:
+        bucket_name (str): bucket name
+        tuples_list (list): tuples in format [(column_to_check, value_to_replace, new_value)...]
+        codec (str, optional): format of the updated objects. Defaults to None.
+        extension (str, optional): object extension pattern, e.g. .bip*. Defaults to None.
+        compresslevel (int, optional): compression level of the updated objects. Defaults to None.
+
+    Returns:
+        str: job identifier
+    """
+    job: str = json.dumps(
+        [
+            bucket_name,
+            [list(values) for values in tuples_list],
+            codec,
+            extension,
+            compresslevel,
+        ]
+    )
+    return hashlib.sha1(job.encode("utf-8")).hexdigest()[:16]
+
+
+class UpdateJournal:
+    """
+    Local SQLite journal of an update job. It records the state of each object (downloaded, rewritten, uploaded or
+    cleaned) as soon as a step finishes and the dates whose objects are all cleaned, so an interrupted job continues
+    where it stopped without applying the tuples twice to an object and a completed job is not repeated.
+    """
+
+    def __init__(self, database_path: str, job_id: str):
+        self.database_path: str = database_path
+        self.job_id: str = job_id
+        # update workers write to the same file, they wait for each other instead of failing
+        self.connection = sqlite3.connect(
+            database_path, timeout=60, check_same_thread=False
+        )
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS object ("
+                "job_id TEXT NOT NULL, bucket TEXT NOT NULL, key TEXT NOT NULL, state TEXT NOT NULL, "
+                "updated_key TEXT, updated_size INTEGER, updated_etag TEXT, replacements TEXT, updated_at TEXT, "
+                "PRIMARY KEY (job_id, bucket, key))"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS date ("
+                "job_id TEXT NOT NULL, bucket TEXT NOT NULL, date TEXT NOT NULL, completed_at TEXT, "
+                "PRIMARY KEY (job_id, bucket, date))"
+            )
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def get_object(self, bucket_name: str, key: str):
+        """Get the journal entry of an object.
+
+        Returns:
+            dict: state, updated_key, updated_size, updated_etag, replacements and updated_at (UTC datetime of the
+            state) of the object or None if it was not started
+        """
+        row = self.connection.execute(
+            "SELECT state, updated_key, updated_size, updated_etag, replacements, updated_at FROM object "
+            "WHERE job_id = ? AND bucket = ? AND key = ?",
+            (self.job_id, bucket_name, key),
+        ).fetchone()
+        if row is None:
+            return None
+        state, updated_key, updated_size, updated_etag, replacements, updated_at = row
+        return dict(
+            state=state,
+            updated_key=updated_key,
+            updated_size=updated_size,
+            updated_etag=updated_etag,
+            replacements=json.loads(replacements) if replacements else None,
+            updated_at=datetime.fromisoformat(updated_at),
+        )
+
+    def set_state(
+        self,
+        bucket_name: str,
+        key: str,
+        state: str,
+        updated_key: str = None,
+        updated_size: int = None,
+        replacements: list = None,
+        updated_etag: str = None,
+    ) -> None:
+        """Record that an object reached a state, values not given are kept from the previous state."""
+        if state not in OBJECT_STATES:
+            raise ValueError(f"Invalid object state '{state}'")
+        previous: dict = self.get_object(bucket_name, key) or {}
+        if updated_key is None:
+            updated_key = previous.get("updated_key")
+        if updated_size is None:
+            updated_size = previous.get("updated_size")
+        if replacements is None:
+            replacements = previous.get("replacements")
+        if updated_etag is None:
+            updated_etag = previous.get("updated_etag")
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO object "
+                "(job_id, bucket, key, state, updated_key, updated_size, updated_etag, replacements, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self.job_id,
+                    bucket_name,
+                    key,
+                    state,
+                    updated_key,
+                    updated_size,
+                    updated_etag,
+                    json.dumps(replacements) if replacements is not None else None,
+                    datetime.now(timezone.utc).isoformat(),
+                ),
+            )
+
+    def is_cleaned(self, bucket_name: str, key: str) -> bool:
+        journal_object: dict = self.get_object(bucket_name, key)
+        return journal_object is not None and journal_object["state"] == CLEANED
+
+    def complete_date(self, bucket_name: str, date: str) -> None:
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO date (job_id, bucket, date, completed_at) VALUES (?, ?, ?, ?)",
+                (
+                    self.job_id,
+                    bucket_name,
+                    date,
+                    datetime.now(timezone.utc).isoformat(),
+                ),
+            )
+
+    def get_completed_dates(self, bucket_name: str) -> set:
+        """Dates (YYYY-MM-DD) whose objects were all updated by this job"""
+        cursor = self.connection.execute(
+            "SELECT date FROM date WHERE job_id = ? AND bucket = ?",
+            (self.job_id, bucket_name),
+        )
+        return {row[0] for row in cursor}
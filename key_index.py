@@ -0,0 +1,155 @@
+import bisect
+import fnmatch
+import functools
+import re
+from datetime import datetime
+
+DATE_PART_LENGTH: int = len("YYYY-mm-dd")
+GLOB_SPECIAL_CHARACTERS: str = "*?["
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_pattern(pattern: str) -> re.Pattern:
+    """This function translates a glob pattern to a compiled regex only once per pattern.
+
+    Args:
+        pattern (str): glob pattern, e.g. 2021-06-30.bip*
+
+    Returns:
+        re.Pattern: compiled regex equivalent to fnmatch.fnmatchcase(name, pattern)
+    """
+    return re.compile(fnmatch.translate(pattern))
+
+
+def get_literal_prefix(pattern: str) -> str:
+    """This function returns the part of a glob pattern before its first wildcard.
+
+    Args:
+        pattern (str): glob pattern
+
+    Returns:
+        str: literal prefix, every name matched by the pattern starts with it
+    """
+    for index, character in enumerate(pattern):
+        if character in GLOB_SPECIAL_CHARACTERS:
+            return pattern[:index]
+    return pattern
+
+
+def get_prefix_upper_bound(prefix: str) -> str:
+    """This function returns the smallest string greater than every string starting with prefix.
+
+    Args:
+        prefix (str): non empty prefix
+
+    Returns:
+        str: exclusive upper bound for the prefix range
+    """
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class KeyIndex:
+    """
+    Sorted index of bucket keys. Our keys start with their date (YYYY-mm-dd.*), so the keys of one date or a
+    date range are a contiguous slice of the sorted array and can be found by binary search.
+    """
+
+    def __init__(self, keys):
+        self.keys: list = sorted(set(keys))
+
+    @classmethod
+    def from_object_list(cls, aws_object_list: list) -> "KeyIndex":
+        """Build an index from the output of AWSSession.retrieve_obj_list.
+
+        Args:
+            aws_object_list (list): AWS object list
+
+        Returns:
+            KeyIndex: index with every object name
+        """
+        return cls(obj["name"] for obj in aws_object_list if obj.get("name"))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key: str) -> bool:
+        position: int = bisect.bisect_left(self.keys, key)
+        return position < len(self.keys) and self.keys[position] == key
+
+    def _get_slice(self, lower_bound: str, upper_bound: str = None) -> list:
+        start: int = bisect.bisect_left(self.keys, lower_bound)
+        end: int = (
+            len(self.keys)
+            if upper_bound is None
+            else bisect.bisect_left(self.keys, upper_bound, lo=start)
+        )
+        return self.keys[start:end]
+
+    def match(self, pattern: str) -> list:
+        """Retrieve all keys that match a glob pattern.
+
+        Only the keys sharing the literal prefix of the pattern are checked against the compiled pattern.
+
+        Args:
+            pattern (str): filename pattern
+
+        Returns:
+            list: sorted matched keys
+        """
+        prefix: str = get_literal_prefix(pattern)
+        candidates: list = (
+            self._get_slice(prefix, get_prefix_upper_bound(prefix))
+            if prefix
+            else self.keys
+        )
+        regex: re.Pattern = compile_pattern(pattern)
+        return [key for key in candidates if regex.match(key)]
+
+    def match_date(self, date: datetime, extension: str) -> list:
+        """Retrieve all keys of a date with a given extension pattern.
+
+        Args:
+            date (datetime): date of the objects
+            extension (str): extension pattern, e.g. .bip*
+
+        Returns:
+            list: sorted matched keys
+        """
+        return self.match(f"{date.strftime('%Y-%m-%d')}{extension}")
+
+    def match_date_range(
+        self, start_date: datetime, end_date: datetime, extension: str = "*"
+    ) -> list:
+        """Retrieve all keys between two dates (both included) with a given extension pattern.
+
+        Args:
+            start_date (datetime): the initial date
+            end_date (datetime): the last date (included)
+            extension (str, optional): extension pattern. Defaults to "*".
+
+        Raises:
+            ValueError: Throw this error if the end date is before the start date
+
+        Returns:
+            list: sorted matched keys
+        """
+        if start_date > end_date:
+            raise ValueError("End date cannot be before start date.")
+        candidates: list = self._get_slice(
+            start_date.strftime("%Y-%m-%d"),
+            get_prefix_upper_bound(end_date.strftime("%Y-%m-%d")),
+        )
+        regex: re.Pattern = compile_pattern(extension)
+        return [
+            key
+            for key in candidates
+            if regex.match(key[DATE_PART_LENGTH:]) and _has_date_part(key)
+        ]
+
+
+def _has_date_part(key: str) -> bool:
+    try:
+        datetime.strptime(key[:DATE_PART_LENGTH], "%Y-%m-%d")
+    except ValueError:
+        return False
+    return True
@@ -0,0 +1,31 @@
+import importlib.util
+import sys
+
+
+def lazy_import(name: str):
+    """Import a module when one of its attributes is used for the first time.
+
+    boto3, botocore and NumPy take hundreds of milliseconds to import, commands import them lazily so parsing
+    arguments (or showing the help) does not pay for them.
+
+    Args:
+        name (str): module name, e.g. boto3 or botocore.exceptions
+
+    Returns:
+        module: module that is executed on its first attribute access, None if it is not installed
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        return None
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    parent_name, _, child_name = name.rpartition(".")
+    if parent_name:
+        # like the import statement, submodules are attributes of their package
+        setattr(sys.modules[parent_name], child_name, module)
+    return module
@@ -0,0 +1,148 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+DEFAULT_LISTING_WORKERS: int = 8
+
+logger = logging.getLogger(__name__)
+
+
+def get_month_boundaries(start_date: datetime, end_date: datetime) -> list:
+    """This function makes the year-month prefixes (YYYY-mm) between two given dates.
+
+    Args:
+        start_date (datetime): the initial date
+        end_date (datetime): the last date (included)
+
+    Returns:
+        list: sorted year-month prefixes
+    """
+    boundaries: list = []
+    year, month = start_date.year, start_date.month
+    while (year, month) <= (end_date.year, end_date.month):
+        boundaries.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return boundaries
+
+
+def discover_month_boundaries(
+    client, bucket_name: str, end_date: datetime = None
+) -> list:
+    """This function makes the year-month boundaries of a bucket with date named keys.
+
+    The first key of the bucket gives the first month, the last one is end_date (now by default).
+
+    Args:
+        client: boto3 S3 client
+        bucket_name (str): bucket name
+        end_date (datetime, optional): last month to include. Defaults to now.
+
+    Returns:
+        list: sorted year-month boundaries, empty if the first key is not named by date
+    """
+    response: dict = client.list_objects_v2(Bucket=bucket_name, MaxKeys=1)
+    contents: list = response.get("Contents", [])
+    if not contents:
+        return []
+    try:
+        start_date: datetime = datetime.strptime(contents[0]["Key"][:7], "%Y-%m")
+    except ValueError:
+        return []
+    return get_month_boundaries(start_date, end_date or datetime.now())
+
+
+def discover_delimiter_boundaries(
+    client, bucket_name: str, delimiter: str = "/"
+) -> list:
+    """This function uses the common prefixes of a bucket as boundaries.
+
+    Args:
+        client: boto3 S3 client
+        bucket_name (str): bucket name
+        delimiter (str, optional): prefix delimiter. Defaults to "/".
+
+    Returns:
+        list: sorted common prefixes
+    """
+    paginator = client.get_paginator("list_objects_v2")
+    boundaries: list = []
+    for page in paginator.paginate(Bucket=bucket_name, Delimiter=delimiter):
+        boundaries.extend(prefix["Prefix"] for prefix in page.get("CommonPrefixes", []))
+    return sorted(boundaries)
+
+
+def get_key_ranges(boundaries: list) -> list:
+    """This function splits the key space in disjoint ranges (start_after, last_key].
+
+    Args:
+        boundaries (list): sorted boundaries
+
+    Returns:
+        list: ranges covering every key, None means unbounded
+    """
+    bounds: list = [None] + sorted(set(boundaries)) + [None]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def list_key_range(
+    client, bucket_name: str, start_after: str = None, last_key: str = None
+) -> list:
+    """This function lists the objects of a bucket with start_after < key <= last_key.
+
+    Args:
+        client: boto3 S3 client
+        bucket_name (str): bucket name
+        start_after (str, optional): exclusive lower bound. Defaults to None.
+        last_key (str, optional): inclusive upper bound. Defaults to None.
+
+    Returns:
+        list: listing entries (dicts with Key, Size, ETag and LastModified)
+    """
+    pagination_kwargs: dict = dict(Bucket=bucket_name)
+    if start_after is not None:
+        pagination_kwargs["StartAfter"] = start_after
+    paginator = client.get_paginator("list_objects_v2")
+    objects: list = []
+    for page in paginator.paginate(**pagination_kwargs):
+        for obj in page.get("Contents", []):
+            if last_key is not None and obj["Key"] > last_key:
+                # keys are listed in order, the rest of the bucket belongs to next ranges
+                return objects
+            objects.append(obj)
+    return objects
+
+
+def iter_objects_in_parallel(
+    client,
+    bucket_name: str,
+    boundaries: list = None,
+    max_workers: int = DEFAULT_LISTING_WORKERS,
+):
+    """This function lists a bucket splitting its key space in ranges listed concurrently.
+
+    Paginated listing is sequential because each page needs the previous continuation token, but disjoint key
+    ranges do not depend on each other. Results are yielded sorted by key, like a sequential listing.
+
+    Args:
+        client: boto3 S3 client
+        bucket_name (str): bucket name
+        boundaries (list, optional): range boundaries. Defaults to year-month prefixes or delimiter prefixes.
+        max_workers (int, optional): concurrent listings. Defaults to DEFAULT_LISTING_WORKERS.
+
+    Yields:
+        dict: listing entries (dicts with Key, Size, ETag and LastModified)
+    """
+    if boundaries is None:
+        boundaries = discover_month_boundaries(client, bucket_name)
+        if not boundaries:
+            boundaries = discover_delimiter_boundaries(client, bucket_name)
+    key_ranges: list = get_key_ranges(boundaries)
+    logger.debug(f"Listing {bucket_name} in {len(key_ranges)} ranges ...")
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures: list = [
+            executor.submit(list_key_range, client, bucket_name, start_after, last_key)
+            for start_after, last_key in key_ranges
+        ]
+        # ranges are disjoint and sorted, so their concatenation is sorted too
+        for future in futures:
+            yield from future.result()
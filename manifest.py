@@ -0,0 +1,279 @@
+import csv
+import json
+import logging
+import os
+import time
+from argparse import ArgumentTypeError
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from utils import valid_three_tuple_list
+
+# operation: required fields
+OPERATIONS: dict = {
+    "upload": ["file", "bucket"],
+    "download": ["bucket", "key"],
+    "copy": ["bucket", "key", "target_bucket"],
+    "move": ["bucket", "key", "target_bucket"],
+    "delete": ["bucket", "key"],
+    "update": ["bucket", "key", "tuples"],
+}
+# columns of CSV manifests and result logs, JSONL entries may have any of them
+FIELDS: list = [
+    "id",
+    "op",
+    "bucket",
+    "key",
+    "file",
+    "target_bucket",
+    "tuples",
+    "streaming",
+    "destination_path",
+    "depends_on",
+]
+RESULT_FIELDS: list = ["line", "status", "error", "seconds"]
+OK: str = "ok"
+FAILED: str = "failed"
+SKIPPED: str = "skipped"
+DEFAULT_MANIFEST_WORKERS: int = 8
+
+logger = logging.getLogger(__name__)
+
+
+def parse_entry(entry: dict, line: int) -> dict:
+    """This function validates a manifest entry and fills in its defaults.
+
+    Args:
+        entry (dict): operation as read from the manifest, CSV values are strings and empty values are missing
+        line (int): line of the entry in the manifest, it is the id of entries without one
+
+    Raises:
+        ValueError: In case of an unknown operation, a missing field or malformed tuples
+
+    Returns:
+        dict: entry with id, line, key (the file name for uploads), tuples as a list and depends_on as a list of ids
+    """
+    entry = {name: value for name, value in entry.items() if value not in (None, "")}
+    operation: str = entry.get("op")
+    if operation not in OPERATIONS:
+        raise ValueError(f"Line {line}: unknown operation '{operation}'")
+    missing: list = [name for name in OPERATIONS[operation] if name not in entry]
+    if missing:
+        raise ValueError(f"Line {line}: {operation} needs {', '.join(missing)}")
+    entry["id"] = str(entry.get("id", line))
+    entry["line"] = line
+    if operation == "upload":
+        entry.setdefault("key", os.path.basename(entry["file"]))
+    if isinstance(entry.get("tuples"), str):
+        try:
+            entry["tuples"] = valid_three_tuple_list(entry["tuples"])
+        except ArgumentTypeError as e:
+            raise ValueError(f"Line {line}: {e}")
+    if isinstance(entry.get("streaming"), str):
+        entry["streaming"] = entry["streaming"].lower() in ["1", "true", "yes"]
+    depends_on = entry.get("depends_on", [])
+    entry["depends_on"] = [
+        str(dependency)
+        for dependency in (
+            depends_on.split() if isinstance(depends_on, str) else depends_on
+        )
+    ]
+    return entry
+
+
+def read_manifest(manifest_path: str) -> list:
+    """This function reads a JSONL manifest (one JSON object per line) or a CSV manifest with a header of FIELDS.
+
+    A result log can be read as a manifest: entries whose status is ok are kept, so their dependents can run, but
+    they are not run again.
+
+    Args:
+        manifest_path (str): .csv file or JSONL file
+
+    Returns:
+        list: parsed entries in manifest order
+    """
+    entries: list = []
+    with open(manifest_path, "r", newline="") as manifest_file:
+        if manifest_path.endswith(".csv"):
+            for line, row in enumerate(csv.DictReader(manifest_file), start=1):
+                entries.append(parse_entry(row, line))
+        else:
+            for line, text in enumerate(manifest_file, start=1):
+                if text.strip():
+                    entries.append(parse_entry(json.loads(text), line))
+    ids: set = {entry["id"] for entry in entries}
+    if len(ids) != len(entries):
+        raise ValueError("Manifest ids must be unique")
+    for entry in entries:
+        unknown: list = [
+            dependency for dependency in entry["depends_on"] if dependency not in ids
+        ]
+        if unknown:
+            raise ValueError(
+                f"Line {entry['line']}: unknown dependencies {', '.join(unknown)}"
+            )
+    return entries
+
+
+def get_touched_objects(entry: dict) -> list:
+    """(bucket, key) of the objects read or written by an operation"""
+    objects: list = [(entry["bucket"], entry["key"])]
+    if entry["op"] in ["copy", "move"]:
+        objects.append((entry["target_bucket"], entry["key"]))
+    return objects
+
+
+def get_dependencies(entries: list) -> dict:
+    """This function makes the ids each entry waits for: its depends_on ids and the previous entry of the manifest
+    that touches one of its objects, so operations over the same object run in manifest order.
+
+    Returns:
+        dict: entry id: set of ids
+    """
+    dependencies: dict = {}
+    last_entry_by_object: dict = {}
+    for entry in entries:
+        dependencies[entry["id"]] = set(entry["depends_on"])
+        for touched_object in get_touched_objects(entry):
+            if touched_object in last_entry_by_object:
+                dependencies[entry["id"]].add(last_entry_by_object[touched_object])
+            last_entry_by_object[touched_object] = entry["id"]
+    return dependencies
+
+
+def write_results(results_path: str, results: list) -> None:
+    """Write the result of each entry in manifest order, as CSV if results_path ends with .csv and JSONL otherwise"""
+    results = sorted(results, key=lambda result: result["line"])
+    with open(results_path, "w", newline="") as results_file:
+        if results_path.endswith(".csv"):
+            writer = csv.DictWriter(
+                results_file, FIELDS + RESULT_FIELDS, extrasaction="ignore"
+            )
+            writer.writeheader()
+            for result in results:
+                writer.writerow(
+                    dict(
+                        result,
+                        tuples=" ".join(
+                            f"[{','.join(values)}]"
+                            for values in result.get("tuples", [])
+                        ),
+                        depends_on=" ".join(result["depends_on"]),
+                    )
+                )
+        else:
+            for result in results:
+                results_file.write(json.dumps(result) + "\n")
+
+
+class ManifestRunner:
+    """
+    Runs the operations of a manifest with one AWSSession, so every request shares its connection pools and adaptive
+    concurrency limit. Up to workers operations run at the same time, each one after the operations it depends on;
+    when one of them fails its dependents are skipped.
+    """
+
+    def __init__(self, aws_session, workers: int = DEFAULT_MANIFEST_WORKERS):
+        self.aws_session = aws_session
+        self.workers: int = workers
+
+    def run_entry(self, entry: dict) -> None:
+        """Run an operation, errors are raised"""
+        operation: str = entry["op"]
+        bucket_name: str = entry["bucket"]
+        key: str = entry["key"]
+        if operation == "upload":
+            self.aws_session.send_file_to_bucket(entry["file"], key, bucket_name)
+        elif operation == "download":
+            file_path: str = entry.get("file") or key
+            self.aws_session.download_object_from_bucket(key, bucket_name, file_path)
+        elif operation in ["copy", "move"]:
+            self.aws_session.copy_file_from_bucket_to_bucket(
+                bucket_name, entry["target_bucket"], key
+            )
+            if operation == "move":
+                self.aws_session.delete_object_in_bucket(key, bucket_name)
+        elif operation == "delete":
+            self.aws_session.delete_object_in_bucket(key, bucket_name)
+        elif operation == "update":
+            result: dict = self.aws_session.update_object_job(
+                key,
+                bucket_name,
+                entry["tuples"],
+                entry.get("destination_path"),
+                self.aws_session.get_object_size(bucket_name, key),
+                entry.get("streaming", False),
+            )
+            if result["status"] == FAILED:
+                raise RuntimeError(result["error"])
+
+    def _run_entry(self, entry: dict) -> dict:
+        start_time: float = time.perf_counter()
+        try:
+            self.run_entry(entry)
+            status, error = OK, None
+        except Exception as e:
+            # the error is logged in the result of the line, the other operations continue
+            logger.error(f"Line {entry['line']} ({entry['op']} {entry['key']}): {e}")
+            status, error = FAILED, str(e)
+        return dict(
+            entry, status=status, error=error, seconds=time.perf_counter() - start_time
+        )
+
+    def run(self, entries: list) -> list:
+        """Run the entries, the ones with status ok (from a previous result log) are not run again.
+
+        Returns:
+            list: entries with their status (ok, failed or skipped), error and seconds
+        """
+        dependencies: dict = get_dependencies(entries)
+        results: dict = {
+            entry["id"]: dict(entry, status=OK)
+            for entry in entries
+            if entry.get("status") == OK
+        }
+        pending: list = [entry for entry in entries if entry["id"] not in results]
+        running: dict = {}
+        # boto3 sessions are not thread safe while they load the service models, the first client is made here
+        self.aws_session.session.client("s3")
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while pending or running:
+                changed: bool = True
+                # skipping an entry can make its dependents skipped too
+                while changed:
+                    changed = False
+                    waiting: list = []
+                    for entry in pending:
+                        entry_dependencies: set = dependencies[entry["id"]]
+                        failed: list = [
+                            dependency
+                            for dependency in entry_dependencies
+                            if dependency in results
+                            and results[dependency]["status"] != OK
+                        ]
+                        if failed:
+                            results[entry["id"]] = dict(
+                                entry,
+                                status=SKIPPED,
+                                error=f"dependencies failed: {', '.join(sorted(failed))}",
+                                seconds=0,
+                            )
+                            changed = True
+                        elif entry_dependencies.issubset(results):
+                            running[executor.submit(self._run_entry, entry)] = entry[
+                                "id"
+                            ]
+                        else:
+                            waiting.append(entry)
+                    pending = waiting
+                if not running:
+                    # only possible with a dependency cycle
+                    for entry in pending:
+                        results[entry["id"]] = dict(
+                            entry, status=SKIPPED, error="dependency cycle", seconds=0
+                        )
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future)] = future.result()
+        return [results[entry["id"]] for entry in entries]
@@ -0,0 +1,192 @@
+import json
+import threading
+import time
+
+# upper bounds in seconds of the latency histogram buckets, the last bucket counts the slower calls
+LATENCY_BUCKETS: tuple = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+)
+PROMETHEUS_PREFIX: str = "s3_requests"
+PROMETHEUS_EXTENSIONS: tuple = (".prom", ".txt")
+
+
+def get_latency_bucket(seconds: float) -> int:
+    """Index of the first histogram bucket whose upper bound is not lower than seconds"""
+    for index, upper_bound in enumerate(LATENCY_BUCKETS):
+        if seconds <= upper_bound:
+            return index
+    return len(LATENCY_BUCKETS)
+
+
+def get_empty_totals() -> dict:
+    return dict(
+        requests=0,
+        errors=0,
+        retries=0,
+        seconds=0.0,
+        histogram=[0] * (len(LATENCY_BUCKETS) + 1),
+    )
+
+
+class RequestMetrics:
+    """
+    Counters and latency histograms of the S3 calls of a session by operation (ListObjectsV2, HeadObject, GetObject,
+    PutObject, CopyObject, DeleteObject...) and bucket, collected with botocore event hooks. The latency of a call
+    includes its retries and ends when the response headers arrive, the body of a GetObject is read afterwards.
+    """
+
+    def __init__(self):
+        # (operation, bucket): totals
+        self.totals: dict = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def register(self, events) -> None:
+        """Register the handlers in the event system of a boto3 session, before the clients are created"""
+        events.register("before-parameter-build.s3", self.before_parameter_build)
+        events.register("after-call.s3", self.after_call)
+        events.register("after-call-error.s3", self.after_call_error)
+
+    def before_parameter_build(
+        self, params: dict, model, context: dict, **kwargs
+    ) -> None:
+        context["metrics_start_time"] = time.perf_counter()
+        context["metrics_key"] = (model.name, params.get("Bucket", ""))
+
+    def after_call(self, http_response, parsed: dict, context: dict, **kwargs):
+        retries: int = parsed.get("ResponseMetadata", {}).get("RetryAttempts", 0)
+        self._record(context, http_response.status_code >= 300, retries)
+
+    def after_call_error(self, context: dict, **kwargs) -> None:
+        self._record(context, True)
+
+    def _record(self, context: dict, error: bool, retries: int = 0) -> None:
+        start_time: float = context.get("metrics_start_time")
+        if start_time is None:
+            return
+        seconds: float = time.perf_counter() - start_time
+        with self._lock:
+            totals: dict = self.totals.setdefault(
+                context["metrics_key"], get_empty_totals()
+            )
+            totals["requests"] += 1
+            totals["errors"] += int(error)
+            totals["retries"] += retries
+            totals["seconds"] += seconds
+            totals["histogram"][get_latency_bucket(seconds)] += 1
+
+    def get_totals(self) -> list:
+        """
+        Returns:
+            list: dicts with operation, bucket, requests, errors, retries, seconds and histogram (calls in each
+            LATENCY_BUCKETS bucket), sorted by operation and bucket
+        """
+        with self._lock:
+            return [
+                dict(
+                    operation=operation,
+                    bucket=bucket,
+                    **{
+                        key: value
+                        for key, value in totals.items()
+                        if key != "histogram"
+                    },
+                    histogram=list(totals["histogram"]),
+                )
+                for (operation, bucket), totals in sorted(self.totals.items())
+            ]
+
+    def pop_totals(self) -> list:
+        """Get the totals and start counting again, workers send the totals of each job to the main process"""
+        totals: list = self.get_totals()
+        with self._lock:
+            self.totals = {}
+        return totals
+
+    def merge(self, totals: list) -> None:
+        """Add the totals of another session, e.g. an update worker"""
+        with self._lock:
+            for other in totals:
+                current: dict = self.totals.setdefault(
+                    (other["operation"], other["bucket"]), get_empty_totals()
+                )
+                for key in ["requests", "errors", "retries", "seconds"]:
+                    current[key] += other[key]
+                current["histogram"] = [
+                    number + other_number
+                    for number, other_number in zip(
+                        current["histogram"], other["histogram"]
+                    )
+                ]
+
+    def to_json(self, gauges: dict = None) -> str:
+        return json.dumps(
+            dict(
+                latency_buckets=list(LATENCY_BUCKETS),
+                operations=self.get_totals(),
+                gauges=gauges or {},
+            ),
+            indent=2,
+        )
+
+    def to_prometheus(self, gauges: dict = None) -> str:
+        """Totals in the Prometheus text exposition format, gauges are exported as s3_<name>"""
+        totals_list: list = self.get_totals()
+        labels: list = [
+            f'operation="{totals["operation"]}",bucket="{escape_label(totals["bucket"])}"'
+            for totals in totals_list
+        ]
+        lines: list = []
+        # the samples of each metric are written together after its type
+        for name, key in [
+            ("total", "requests"),
+            ("errors_total", "errors"),
+            ("retries_total", "retries"),
+        ]:
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{name} counter")
+            for totals, label in zip(totals_list, labels):
+                lines.append(f"{PROMETHEUS_PREFIX}_{name}{{{label}}} {totals[key]}")
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_seconds histogram")
+        for totals, label in zip(totals_list, labels):
+            cumulative: int = 0
+            for upper_bound, number in zip(
+                list(LATENCY_BUCKETS) + ["+Inf"], totals["histogram"]
+            ):
+                cumulative += number
+                lines.append(
+                    f'{PROMETHEUS_PREFIX}_seconds_bucket{{{label},le="{upper_bound}"}} {cumulative}'
+                )
+            lines.append(
+                f"{PROMETHEUS_PREFIX}_seconds_sum{{{label}}} {totals['seconds']:.6f}"
+            )
+            lines.append(
+                f"{PROMETHEUS_PREFIX}_seconds_count{{{label}}} {totals['requests']}"
+            )
+        for name, value in (gauges or {}).items():
+            lines.append(f"# TYPE s3_{name} gauge")
+            lines.append(f"s3_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str, gauges: dict = None) -> None:
+        """Write the totals to path, in the Prometheus text format if it ends with .prom or .txt, as JSON otherwise"""
+        if path.endswith(PROMETHEUS_EXTENSIONS):
+            content: str = self.to_prometheus(gauges)
+        else:
+            content = self.to_json(gauges)
+        with open(path, "w") as file_obj:
+            file_obj.write(content)
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -2,14 +2,15 @@ import argparse
 import logging
 import os
 import sys
-
-from botocore.exceptions import ClientError
+import time
 
 # add path so we can use function through command line
 new_path = os.path.join(os.path.dirname(__file__), '..', '..')
 sys.path.append(new_path)
 
-from aws import AWSSession
+from aws import AWSSession, botocore_exceptions
+from planner import ThroughputHistory, plan_move
+from profiling import profile_main
 
 
 def main(argv):
@@ -25,6 +26,10 @@ def main(argv):
     parser.add_argument('-f', '--filename', dest='filename', default=None, nargs='*', help='one or more filenames')
     parser.add_argument('-e', '--extension', dest='extension_filter', default=None, nargs='*',
                         help='only files with this extension will be moved')
+    parser.add_argument('--plan', action='store_true',
+                        help='show the objects, bytes, requests and estimated time of the move without moving anything')
+    parser.add_argument('--throughput-history', default=None,
+                        help='JSON file where the throughput of each run is saved to estimate the time of plans')
 
     args = parser.parse_args(argv[1:])
 
@@ -33,6 +38,8 @@ def main(argv):
     target_bucket_name = args.target_bucket
     datafiles = args.filename
     extension = args.extension_filter
+    plan = args.plan
+    throughput_history_path = args.throughput_history
 
     aws_session = AWSSession()
     logger = logging.getLogger(__name__)
@@ -45,11 +52,24 @@ def main(argv):
     if not aws_session.check_bucket_exists(target_bucket_name):
         logger.info(f"Bucket {target_bucket_name} does not exist")
         exit(1)
+
+    if plan:
+        history = ThroughputHistory(throughput_history_path) if throughput_history_path is not None else None
+        object_list = aws_session.retrieve_obj_list(source_bucket_name)
+        for line in plan_move(object_list, datafiles, extension).get_summary(history):
+            logger.info(line)
+        return
+
     try:
-        aws_session.move_files_from_bucket_to_bucket(source_bucket_name, target_bucket_name, datafiles, extension)
-    except ClientError as e:
+        start_time = time.perf_counter()
+        stats = aws_session.move_files_from_bucket_to_bucket(source_bucket_name, target_bucket_name, datafiles,
+                                                             extension)
+        if throughput_history_path is not None:
+            ThroughputHistory(throughput_history_path).record('move', stats['objects'], stats['bytes'],
+                                                              time.perf_counter() - start_time)
+    except botocore_exceptions.ClientError as e:
         logger.error(e)
 
 
 if __name__ == "__main__":
-    sys.exit(main(sys.argv))
+    sys.exit(profile_main(main, sys.argv))
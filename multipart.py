@@ -0,0 +1,361 @@
+import hashlib
+import io
+import logging
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+# S3 minimum part size is 5 MB (except for the last part)
+MIN_PART_SIZE: int = 5 * 1024**2
+DEFAULT_PART_SIZE: int = 8 * 1024**2
+DEFAULT_UPLOAD_WORKERS: int = 4
+# S3 maximum number of parts of a multipart upload
+MAX_PARTS: int = 10000
+
+
+def get_multipart_etag(part_etags: list) -> str:
+    """ETag of an object made by a multipart upload: MD5 of the binary MD5s of its parts and the number of parts.
+    Objects encrypted with SSE-KMS or SSE-C have other ETags."""
+    digests: bytes = b"".join(bytes.fromhex(etag.strip('"')) for etag in part_etags)
+    return f'"{hashlib.md5(digests).hexdigest()}-{len(part_etags)}"'
+
+
+class MultipartUploadWriter(io.RawIOBase):
+    """
+    Writable file object that uploads what is written to an S3 object in parts of part_size bytes, so the object
+    size does not need to be known in advance and memory is bounded by one part buffer, taken from buffer_pool if it
+    is given. Objects smaller than a part are sent with a single PutObject. The multipart upload is aborted if the
+    writer is closed by an exception. before_complete, if it is set, is called with the writer when every byte was
+    sent and just before the object is published, get_etag gives then the ETag the object will have.
+    """
+
+    def __init__(
+        self,
+        client,
+        bucket_name: str,
+        key: str,
+        part_size: int = DEFAULT_PART_SIZE,
+        extra_args: dict = None,
+        buffer_pool=None,
+    ):
+        self.client = client
+        self.bucket_name: str = bucket_name
+        self.key: str = key
+        self.part_size: int = part_size
+        self.extra_args: dict = extra_args or {}
+        self.logger = logging.getLogger(__name__)
+        self.upload_id: str = None
+        self.parts: list = []
+        self.bytes_written: int = 0
+        self.buffer_pool = buffer_pool
+        self.before_complete = None
+        self._buffer: bytearray = None
+        # bytes of the current part in _buffer
+        self._buffer_size: int = 0
+        self._aborted: bool = False
+        # checked once the attributes exist, __del__ runs even if __init__ raises
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(f"Part size must be at least {MIN_PART_SIZE} bytes")
+        self._buffer = (
+            buffer_pool.acquire(part_size)
+            if buffer_pool is not None
+            else bytearray(part_size)
+        )
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.bytes_written
+
+    def write(self, data) -> int:
+        if self.closed:
+            raise ValueError("write to closed file")
+        data = memoryview(data).cast("B")
+        position: int = 0
+        while position < len(data):
+            size: int = min(len(data) - position, self.part_size - self._buffer_size)
+            self._buffer[self._buffer_size : self._buffer_size + size] = data[
+                position : position + size
+            ]
+            self._buffer_size += size
+            position += size
+            if self._buffer_size == self.part_size:
+                self._upload_part()
+        self.bytes_written += len(data)
+        return len(data)
+
+    def _upload_part(self) -> None:
+        if self.upload_id is None:
+            response: dict = self.client.create_multipart_upload(
+                Bucket=self.bucket_name, Key=self.key, **self.extra_args
+            )
+            self.upload_id = response["UploadId"]
+        part_number: int = len(self.parts) + 1
+        response = self.client.upload_part(
+            Bucket=self.bucket_name,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=PartBuffer(self._buffer, self._buffer_size),
+        )
+        self.parts.append(dict(ETag=response["ETag"], PartNumber=part_number))
+        self._buffer_size = 0
+
+    def get_etag(self) -> str:
+        """ETag of the object once it is published, e.g. in before_complete, when every byte was sent"""
+        if self.upload_id is None:
+            data: memoryview = memoryview(self._buffer)[: self._buffer_size]
+            return f'"{hashlib.md5(data).hexdigest()}"'
+        return get_multipart_etag([part["ETag"] for part in self.parts])
+
+    def _release_buffer(self) -> None:
+        if self._buffer is not None and self.buffer_pool is not None:
+            self.buffer_pool.release(self._buffer)
+        self._buffer = None
+
+    def abort(self) -> None:
+        """Discard the parts uploaded so far, the object is not modified"""
+        self._aborted = True
+        if self.upload_id is not None:
+            self.logger.info(f"Aborting multipart upload of {self.key} ...")
+            self.client.abort_multipart_upload(
+                Bucket=self.bucket_name, Key=self.key, UploadId=self.upload_id
+            )
+        self._release_buffer()
+        super().close()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        try:
+            if self.upload_id is not None and self._buffer_size:
+                self._upload_part()
+            if self.before_complete is not None:
+                self.before_complete(self)
+            if self.upload_id is None:
+                self.client.put_object(
+                    Bucket=self.bucket_name,
+                    Key=self.key,
+                    Body=PartBuffer(self._buffer, self._buffer_size),
+                    **self.extra_args,
+                )
+            else:
+                self.client.complete_multipart_upload(
+                    Bucket=self.bucket_name,
+                    Key=self.key,
+                    UploadId=self.upload_id,
+                    MultipartUpload=dict(Parts=self.parts),
+                )
+        except Exception:
+            self.abort()
+            raise
+        self._release_buffer()
+        super().close()
+
+    def __del__(self) -> None:
+        # an unclosed writer means the data was not completely written, it must not be published
+        if not self.closed:
+            self.abort()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+
+class PartBuffer(io.RawIOBase):
+    """
+    Seekable readable view of the first size bytes of a part buffer. It is the Body of UploadPart, botocore can read
+    it again to compute checksums or retry without copying the part.
+    """
+
+    def __init__(self, buffer: bytearray, size: int):
+        self._view: memoryview = memoryview(buffer)[:size]
+        self._position: int = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base: int = [0, self._position, len(self._view)][whence]
+        self._position = max(0, base + offset)
+        return self._position
+
+    def readinto(self, data) -> int:
+        chunk = self._view[self._position : self._position + len(data)]
+        data[: len(chunk)] = chunk
+        self._position += len(chunk)
+        return len(chunk)
+
+    def __len__(self) -> int:
+        return len(self._view)
+
+
+def read_part(input_stream, buffer: bytearray) -> int:
+    """Fill buffer from input_stream, pipes may return less than asked before the end. Returns the bytes read."""
+    view: memoryview = memoryview(buffer)
+    size: int = 0
+    while size < len(buffer):
+        read: int = input_stream.readinto(view[size:])
+        if not read:
+            break
+        size += read
+    return size
+
+
+def upload_stream(
+    client,
+    input_stream,
+    bucket_name: str,
+    key: str,
+    part_size: int = DEFAULT_PART_SIZE,
+    workers: int = DEFAULT_UPLOAD_WORKERS,
+    extra_args: dict = None,
+    buffer_pool=None,
+) -> tuple:
+    """This function uploads a stream of unknown length (stdin, a pipe) to an S3 object, reading it in parts that are
+    uploaded by workers threads. Each part is read into one of workers buffers of part_size bytes that are reused, so
+    memory is bounded by part_size x workers; when every buffer is being uploaded reading waits. A stream smaller than
+    a part is sent with a single PutObject. The multipart upload is aborted if reading or any part fails.
+
+    With buffer_pool the buffers are taken from it: the first one waits for the memory budget and the next ones are
+    only added while the budget has room, so a busy pool leaves the upload with fewer parts in flight.
+
+    Args:
+        client: boto3 S3 client
+        input_stream: binary stream with readinto, e.g. sys.stdin.buffer
+        bucket_name (str): bucket name
+        key (str): object key
+        part_size (int, optional): bytes of each part. Defaults to DEFAULT_PART_SIZE.
+        workers (int, optional): parts uploaded at the same time. Defaults to DEFAULT_UPLOAD_WORKERS.
+        extra_args (dict, optional): arguments of CreateMultipartUpload or PutObject, e.g. ContentType
+        buffer_pool (BufferPool, optional): memory budget shared with other transfers
+
+    Returns:
+        tuple: bytes uploaded and ETag of the object
+    """
+    if part_size < MIN_PART_SIZE:
+        raise ValueError(f"Part size must be at least {MIN_PART_SIZE} bytes")
+    extra_args = extra_args or {}
+    buffer: bytearray = (
+        buffer_pool.acquire(part_size)
+        if buffer_pool is not None
+        else bytearray(part_size)
+    )
+    # buffers are created when the previous ones are all in use, up to workers
+    buffers: list = [buffer]
+    try:
+        return _upload_parts(
+            client,
+            input_stream,
+            bucket_name,
+            key,
+            buffers,
+            part_size,
+            workers,
+            extra_args,
+            buffer_pool,
+        )
+    finally:
+        if buffer_pool is not None:
+            for pool_buffer in buffers:
+                buffer_pool.release(pool_buffer)
+
+
+def _upload_parts(
+    client,
+    input_stream,
+    bucket_name: str,
+    key: str,
+    buffers: list,
+    part_size: int,
+    workers: int,
+    extra_args: dict,
+    buffer_pool,
+) -> tuple:
+    logger = logging.getLogger(__name__)
+    buffer: bytearray = buffers[0]
+    size: int = read_part(input_stream, buffer)
+    if size < part_size:
+        response: dict = client.put_object(
+            Bucket=bucket_name, Key=key, Body=PartBuffer(buffer, size), **extra_args
+        )
+        return size, response["ETag"]
+
+    upload_id: str = client.create_multipart_upload(
+        Bucket=bucket_name, Key=key, **extra_args
+    )["UploadId"]
+    free_buffers: queue.Queue = queue.Queue()
+    parts: list = []
+    futures: list = []
+
+    def upload_part(part_number: int, part_buffer: bytearray, length: int) -> None:
+        try:
+            response: dict = client.upload_part(
+                Bucket=bucket_name,
+                Key=key,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                Body=PartBuffer(part_buffer, length),
+            )
+            parts.append(dict(ETag=response["ETag"], PartNumber=part_number))
+        finally:
+            free_buffers.put(part_buffer)
+
+    bytes_read: int = 0
+    executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        while size:
+            bytes_read += size
+            futures.append(executor.submit(upload_part, len(futures) + 1, buffer, size))
+            if size < part_size:
+                break
+            buffer = None
+            if len(buffers) < workers:
+                buffer = (
+                    buffer_pool.acquire(part_size, blocking=False)
+                    if buffer_pool is not None
+                    else bytearray(part_size)
+                )
+            if buffer is not None:
+                buffers.append(buffer)
+            else:
+                buffer = free_buffers.get()
+            for future in futures:
+                # stop reading as soon as a part fails
+                if future.done() and future.exception() is not None:
+                    future.result()
+            size = read_part(input_stream, buffer)
+            if size and len(futures) == MAX_PARTS:
+                raise ValueError(
+                    f"The stream has more than {MAX_PARTS} parts, use a bigger part size"
+                )
+        for future in futures:
+            future.result()
+        response = client.complete_multipart_upload(
+            Bucket=bucket_name,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload=dict(
+                Parts=sorted(parts, key=lambda part: part["PartNumber"])
+            ),
+        )
+    except BaseException:
+        # parts being uploaded must end before the abort, or they would be kept by S3, the parts not started are
+        # cancelled here since Executor.shutdown only cancels them from Python 3.9
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=True)
+        logger.info(f"Aborting multipart upload of {key} ...")
+        client.abort_multipart_upload(Bucket=bucket_name, Key=key, UploadId=upload_id)
+        raise
+    finally:
+        executor.shutdown()
+    return bytes_read, response["ETag"]
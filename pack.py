@@ -0,0 +1,248 @@
+import io
+import json
+import os
+
+from lazy import lazy_import
+from multipart import DEFAULT_PART_SIZE, DEFAULT_UPLOAD_WORKERS, upload_stream
+
+botocore_exceptions = lazy_import("botocore.exceptions")
+
+# the index of pack.bin is the object pack.bin.index.json
+INDEX_SUFFIX: str = ".index.json"
+# upload arguments of the pack that also apply to its index, readers need both
+INDEX_EXTRA_ARGS: list = ["ACL", "CacheControl"]
+INDEX_VERSION: int = 1
+# members closer than this are read with one range GET, reading the gap costs less than another request
+MAX_RANGE_GAP: int = 64 * 1024
+# bytes of the members read with one range GET, unless a single member is bigger
+MAX_RANGE_SIZE: int = DEFAULT_PART_SIZE
+
+
+def get_index_key(pack_key: str) -> str:
+    return pack_key + INDEX_SUFFIX
+
+
+def get_index(file_paths: list, names: list = None) -> dict:
+    """This function makes the index of a pack of file_paths, members are stored one after the other in that order.
+
+    Args:
+        file_paths (list): files of the pack
+        names (list, optional): member name of each file. Defaults to the file names.
+
+    Raises:
+        ValueError: In case of repeated member names
+
+    Returns:
+        dict: version, size of the pack and members, a list of dict(name, offset, size)
+    """
+    if names is None:
+        names = [os.path.basename(file_path) for file_path in file_paths]
+    if len(set(names)) != len(names):
+        raise ValueError("Member names of a pack must be unique")
+    members: list = []
+    offset: int = 0
+    for name, file_path in zip(names, file_paths):
+        size: int = os.path.getsize(file_path)
+        members.append(dict(name=name, offset=offset, size=size))
+        offset += size
+    return dict(version=INDEX_VERSION, size=offset, members=members)
+
+
+class ConcatenatedFiles(io.RawIOBase):
+    """
+    Binary stream of the content of some files one after the other, each file is open while it is read. The size of
+    each file is checked against the index, so a file that changes while it is packed fails the upload.
+    """
+
+    def __init__(self, file_paths: list, sizes: list):
+        super().__init__()
+        self._pending: list = list(zip(file_paths, sizes))[::-1]
+        self._file = None
+        self._file_path: str = None
+        self._remaining: int = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, data) -> int:
+        while True:
+            if self._file is None:
+                if not self._pending:
+                    return 0
+                self._file_path, self._remaining = self._pending.pop()
+                self._file = open(self._file_path, "rb")
+            if self._remaining == 0:
+                if self._file.read(1):
+                    raise IOError(f"{self._file_path} grew while it was packed")
+                self._file.close()
+                self._file = None
+                continue
+            length: int = self._file.readinto(
+                memoryview(data)[: min(len(data), self._remaining)]
+            )
+            if not length:
+                raise IOError(f"{self._file_path} shrank while it was packed")
+            self._remaining -= length
+            return length
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        super().close()
+
+
+def write_pack(
+    client,
+    file_paths: list,
+    bucket_name: str,
+    key: str,
+    names: list = None,
+    part_size: int = DEFAULT_PART_SIZE,
+    workers: int = DEFAULT_UPLOAD_WORKERS,
+    extra_args: dict = None,
+    buffer_pool=None,
+) -> dict:
+    """This function uploads many small files as one object, key, and its index, get_index_key(key), so they take
+    two PUT requests (or one multipart upload and a PUT) instead of one per file. The files are streamed into the
+    upload with bounded memory (see multipart.upload_stream). The index of a previous pack with the same key is
+    deleted before the pack is overwritten and the new index is written after it with the ETag of the pack, so
+    readers that started before the overwrite fail instead of reading the new bytes with the old offsets (see
+    PackReader): a pack without index is an upload that did not finish. The ACL and Cache-Control of extra_args are
+    given to the index too.
+
+    Returns:
+        dict: index of the pack, with its ETag
+    """
+    index: dict = get_index(file_paths, names)
+    sizes: list = [member["size"] for member in index["members"]]
+    client.delete_object(Bucket=bucket_name, Key=get_index_key(key))
+    with ConcatenatedFiles(file_paths, sizes) as stream:
+        _, index["etag"] = upload_stream(
+            client,
+            stream,
+            bucket_name,
+            key,
+            part_size,
+            workers,
+            extra_args,
+            buffer_pool=buffer_pool,
+        )
+    client.put_object(
+        Bucket=bucket_name,
+        Key=get_index_key(key),
+        Body=json.dumps(index).encode("utf-8"),
+        ContentType="application/json",
+        **{
+            name: value
+            for name, value in (extra_args or {}).items()
+            if name in INDEX_EXTRA_ARGS
+        },
+    )
+    return index
+
+
+def get_ranges(members: list, max_gap: int = MAX_RANGE_GAP) -> list:
+    """This function groups members by the byte range of the pack that holds them, members separated by up to
+    max_gap bytes share a range as long as it stays under MAX_RANGE_SIZE.
+
+    Returns:
+        list: (start, end, members) of each range, end is exclusive
+    """
+    ranges: list = []
+    for member in sorted(members, key=lambda member: member["offset"]):
+        start: int = member["offset"]
+        end: int = start + member["size"]
+        if ranges:
+            last_start, last_end, last_members = ranges[-1]
+            if start - last_end <= max_gap and end - last_start <= MAX_RANGE_SIZE:
+                ranges[-1] = (last_start, max(last_end, end), last_members + [member])
+                continue
+        ranges.append((start, end, [member]))
+    return ranges
+
+
+class PackReader:
+    """
+    Reads members of a pack made by write_pack with HTTP range GETs, the pack is never downloaded as a whole. The
+    index is read with the first request that needs it and every range GET must match the ETag it records, so a pack
+    replaced after the index was read raises IOError instead of returning bytes of other members.
+    """
+
+    def __init__(self, client, bucket_name: str, key: str):
+        self.client = client
+        self.bucket_name: str = bucket_name
+        self.key: str = key
+        self._members: dict = None
+        self._etag: str = None
+
+    @property
+    def members(self) -> dict:
+        """name: dict(name, offset, size) in pack order"""
+        if self._members is None:
+            response: dict = self.client.get_object(
+                Bucket=self.bucket_name, Key=get_index_key(self.key)
+            )
+            index: dict = json.loads(response["Body"].read())
+            if index.get("version") != INDEX_VERSION:
+                raise ValueError(
+                    f"Unknown index version {index.get('version')} of {self.key}"
+                )
+            self._members = {member["name"]: member for member in index["members"]}
+            self._etag = index["etag"]
+        return self._members
+
+    def get_member(self, name: str) -> dict:
+        if name not in self.members:
+            raise KeyError(f"{name} is not in {self.key}")
+        return self.members[name]
+
+    def _read_range(self, start: int, end: int) -> bytes:
+        try:
+            response: dict = self.client.get_object(
+                Bucket=self.bucket_name,
+                Key=self.key,
+                Range=f"bytes={start}-{end - 1}",
+                IfMatch=self._etag,
+            )
+        except botocore_exceptions.ClientError as e:
+            if e.response["Error"]["Code"] in ["412", "PreconditionFailed"]:
+                raise IOError(
+                    f"{self.key} was replaced after its index was read"
+                ) from e
+            raise
+        data: bytes = response["Body"].read()
+        if len(data) != end - start:
+            raise IOError(
+                f"Range {start}-{end - 1} of {self.key} has {len(data)} bytes, the pack is shorter than its index"
+            )
+        return data
+
+    def read(self, name: str) -> bytes:
+        member: dict = self.get_member(name)
+        if member["size"] == 0:
+            return b""
+        return self._read_range(member["offset"], member["offset"] + member["size"])
+
+    def read_many(self, names: list = None, max_gap: int = MAX_RANGE_GAP):
+        """This function reads some members (all by default) with one range GET for each group of nearby members,
+        see get_ranges. Empty members take no request.
+
+        Yields:
+            (str, bytes): name and content of each member, empty members first and then in pack order
+        """
+        members: list = (
+            list(self.members.values())
+            if names is None
+            else [self.get_member(name) for name in names]
+        )
+        empty: list = [member for member in members if member["size"] == 0]
+        for member in empty:
+            yield member["name"], b""
+        for start, end, range_members in get_ranges(
+            [member for member in members if member["size"] > 0], max_gap
+        ):
+            data: memoryview = memoryview(self._read_range(start, end))
+            for member in range_members:
+                offset: int = member["offset"] - start
+                yield member["name"], bytes(data[offset : offset + member["size"]])
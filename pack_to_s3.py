@@ -0,0 +1,121 @@
+import argparse
+import glob
+import logging
+import os
+import sys
+
+new_path: str = os.path.join(os.path.dirname(__file__), "..", "..")
+sys.path.append(new_path)
+
+from aws import CANNED_ACLS, AWSSession, botocore_exceptions, get_upload_extra_args
+from multipart import DEFAULT_PART_SIZE, DEFAULT_UPLOAD_WORKERS, MIN_PART_SIZE
+from pack import get_index_key, write_pack
+from profiling import profile_main
+
+
+def main(argv):
+    """
+    This script will pack many small files into one object of a bucket, with a byte offset index of its members.
+    """
+
+    # Arguments and description
+    parser = argparse.ArgumentParser(
+        description="upload many small files as one pack object KEY and its index KEY.index.json, members are read "
+        "back with range requests by unpack"
+    )
+
+    parser.add_argument(
+        "file",
+        nargs="+",
+        help="data file path. It can be a pattern, e.g. /path/to/file*.csv",
+    )
+    parser.add_argument("bucket", help="bucket name")
+    parser.add_argument("--key", required=True, help="object key of the pack")
+    parser.add_argument(
+        "--replace", action="store_true", help="replace the pack if it exists"
+    )
+    parser.add_argument(
+        "--part-size",
+        default=DEFAULT_PART_SIZE // 1024**2,
+        type=int,
+        help=f"MB of each part of the pack upload. Defaults to {DEFAULT_PART_SIZE // 1024 ** 2}",
+    )
+    parser.add_argument(
+        "--workers",
+        default=DEFAULT_UPLOAD_WORKERS,
+        type=int,
+        help=f"parts uploaded at the same time. Defaults to {DEFAULT_UPLOAD_WORKERS}",
+    )
+    parser.add_argument(
+        "--acl",
+        default=None,
+        choices=CANNED_ACLS,
+        help="canned ACL of the pack and its index, e.g. public-read. Defaults to the bucket settings",
+    )
+    parser.add_argument(
+        "--cache-control",
+        default=None,
+        help="Cache-Control of the pack and its index, e.g. max-age=3600",
+    )
+
+    args = parser.parse_args(argv[1:])
+
+    # Give names to arguments
+    bucket_name: str = args.bucket
+    key: str = args.key
+    replace: bool = args.replace
+    part_size: int = args.part_size * 1024**2
+    workers: int = args.workers
+
+    logger = logging.getLogger(__name__)
+    logging.basicConfig(level=logging.INFO)
+
+    if part_size < MIN_PART_SIZE:
+        logger.info(f"part size must be at least {MIN_PART_SIZE // 1024 ** 2} MB")
+        exit(1)
+
+    file_paths: list = []
+    for pattern in args.file:
+        matched_files: list = sorted(
+            path for path in glob.glob(pattern) if os.path.isfile(path)
+        )
+        if not matched_files:
+            logger.info(f"file {pattern} does not exist")
+            exit(1)
+        file_paths.extend(matched_files)
+
+    aws_session = AWSSession()
+
+    if not aws_session.check_bucket_exists(bucket_name):
+        logger.info(f"Bucket '{bucket_name}' does not exist")
+        exit(1)
+
+    try:
+        if not replace and aws_session.check_file_exists(
+            bucket_name, get_index_key(key)
+        ):
+            logger.info(f"pack '{key}' exists in bucket, use --replace to replace it")
+            return 1
+        index: dict = write_pack(
+            aws_session.session.client("s3"),
+            file_paths,
+            bucket_name,
+            key,
+            part_size=part_size,
+            workers=workers,
+            extra_args=get_upload_extra_args(
+                args.acl, cache_control=args.cache_control
+            ),
+            buffer_pool=aws_session.buffer_pool,
+        )
+    except (ValueError, IOError, botocore_exceptions.ClientError) as e:
+        logger.error(e)
+        return 1
+    logger.info(
+        f"{len(index['members'])} files ({index['size'] / 1024 ** 2:.1f} MB) packed into {key}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(profile_main(main, sys.argv))
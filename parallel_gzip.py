@@ -0,0 +1,148 @@
+import collections
+import io
+import os
+import struct
+import time
+import zlib
+from concurrent.futures import Executor, ThreadPoolExecutor
+
+DEFAULT_BLOCK_SIZE: int = 1024**2
+DEFAULT_COMPRESS_LEVEL: int = 6
+GZIP_MAGIC_NUMBER: bytes = b"\x1f\x8b"
+GZIP_DEFLATE_METHOD: int = 8
+GZIP_FNAME_FLAG: int = 8
+GZIP_UNKNOWN_OS: int = 255
+
+
+def get_gzip_header(
+    member_name: str = "", compresslevel: int = DEFAULT_COMPRESS_LEVEL, mtime: int = 0
+) -> bytes:
+    """This function makes the header of a gzip member, like gzip.GzipFile does.
+
+    Args:
+        member_name (str, optional): original file name, saved in the header if it is given. Defaults to "".
+        compresslevel (int, optional): compression level, it is only informative. Defaults to DEFAULT_COMPRESS_LEVEL.
+        mtime (int, optional): modification time. Defaults to 0.
+
+    Returns:
+        bytes: gzip member header
+    """
+    flags: int = GZIP_FNAME_FLAG if member_name else 0
+    extra_flags: int = 2 if compresslevel == 9 else 4 if compresslevel == 1 else 0
+    header: bytes = (
+        GZIP_MAGIC_NUMBER
+        + bytes([GZIP_DEFLATE_METHOD, flags])
+        + struct.pack("<L", mtime)
+        + bytes([extra_flags, GZIP_UNKNOWN_OS])
+    )
+    if member_name:
+        header += member_name.encode("latin-1", errors="replace") + b"\x00"
+    return header
+
+
+def compress_block(data: bytes, compresslevel: int = DEFAULT_COMPRESS_LEVEL) -> bytes:
+    """This function compresses a block as the deflate data and trailer of an independent gzip member.
+
+    It is a module function so it can be sent to process pools, zlib releases the GIL so threads also run in
+    parallel.
+
+    Args:
+        data (bytes): block to compress
+        compresslevel (int, optional): compression level. Defaults to DEFAULT_COMPRESS_LEVEL.
+
+    Returns:
+        bytes: raw deflate data followed by the CRC32 and size of the block
+    """
+    compressor = zlib.compressobj(
+        compresslevel, zlib.DEFLATED, -zlib.MAX_WBITS, zlib.DEF_MEM_LEVEL, 0
+    )
+    return (
+        compressor.compress(data)
+        + compressor.flush()
+        + struct.pack("<LL", zlib.crc32(data), len(data) & 0xFFFFFFFF)
+    )
+
+
+class ParallelGzipWriter(io.RawIOBase):
+    """
+    Writable binary stream that compresses blocks in parallel (like pigz) and writes them in order to file_obj as a
+    multi-member gzip stream, which gzip and gunzip read as one file. file_obj only needs write, so it can be a
+    multipart upload. file_obj is not closed.
+    """
+
+    def __init__(
+        self,
+        file_obj,
+        member_name: str = "",
+        compresslevel: int = DEFAULT_COMPRESS_LEVEL,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+        workers: int = None,
+        executor: Executor = None,
+    ):
+        if block_size <= 0:
+            raise ValueError(f"Invalid block size ({block_size})")
+        self.file_obj = file_obj
+        self.member_name: str = member_name
+        self.compresslevel: int = compresslevel
+        self.block_size: int = block_size
+        self.workers: int = workers or os.cpu_count() or 1
+        self._own_executor: bool = executor is None
+        self.executor: Executor = executor or ThreadPoolExecutor(
+            max_workers=self.workers
+        )
+        # at most two blocks per worker are kept in memory waiting to be written
+        self._max_pending: int = 2 * self.workers
+        self._pending: collections.deque = collections.deque()
+        self._buffer: bytearray = bytearray()
+        self._members: int = 0
+        self.bytes_written: int = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        if self.closed:
+            raise ValueError("write to closed file")
+        self._buffer += data
+        while len(self._buffer) >= self.block_size:
+            self._submit(bytes(self._buffer[: self.block_size]))
+            del self._buffer[: self.block_size]
+        self.bytes_written += len(data)
+        return len(data)
+
+    def _submit(self, block: bytes) -> None:
+        self._pending.append(
+            self.executor.submit(compress_block, block, self.compresslevel)
+        )
+        while len(self._pending) > self._max_pending:
+            self._write_member(self._pending.popleft().result())
+
+    def _write_member(self, compressed_block: bytes) -> None:
+        if self._members == 0:
+            header: bytes = get_gzip_header(
+                self.member_name, self.compresslevel, int(time.time())
+            )
+        else:
+            header = get_gzip_header(compresslevel=self.compresslevel)
+        self.file_obj.write(header)
+        self.file_obj.write(compressed_block)
+        self._members += 1
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        try:
+            if self._buffer or (self._members == 0 and not self._pending):
+                # an empty input is still written as one empty member
+                self._submit(bytes(self._buffer))
+                self._buffer = bytearray()
+            while self._pending:
+                self._write_member(self._pending.popleft().result())
+        finally:
+            # blocks not written yet are left when writing failed, Executor.shutdown only cancels them since 3.9
+            for future in self._pending:
+                future.cancel()
+            self._pending.clear()
+            if self._own_executor:
+                self.executor.shutdown(wait=True)
+            super().close()
@@ -0,0 +1,257 @@
+import json
+import math
+import os
+from collections import Counter
+
+from aws import filter_by_extension
+from key_index import KeyIndex
+
+# boto3 managed transfer defaults (boto3.s3.transfer.TransferConfig)
+MULTIPART_THRESHOLD: int = 8 * 1024**2
+MULTIPART_CHUNKSIZE: int = 8 * 1024**2
+LIST_PAGE_SIZE: int = 1000
+
+# used to estimate wall time when there is no throughput history
+DEFAULT_REQUEST_SECONDS: float = 0.05
+DEFAULT_BYTES_PER_SECOND: float = 20 * 1024**2
+HISTORY_RUNS: int = 10
+
+
+def count_upload_requests(size: int) -> Counter:
+    """Requests made by a managed upload (upload_file/upload_fileobj) of an object of the given size"""
+    if size < MULTIPART_THRESHOLD:
+        return Counter(PutObject=1)
+    return Counter(
+        CreateMultipartUpload=1,
+        UploadPart=math.ceil(size / MULTIPART_CHUNKSIZE),
+        CompleteMultipartUpload=1,
+    )
+
+
+def count_download_requests(size: int) -> Counter:
+    """Requests made by a managed download (download_file) of an object of the given size"""
+    if size < MULTIPART_THRESHOLD:
+        return Counter(HeadObject=1, GetObject=1)
+    return Counter(HeadObject=1, GetObject=math.ceil(size / MULTIPART_CHUNKSIZE))
+
+
+def count_copy_requests(size: int) -> Counter:
+    """Requests made by a managed copy (Bucket.copy) of an object of the given size"""
+    if size < MULTIPART_THRESHOLD:
+        return Counter(HeadObject=1, CopyObject=1)
+    return Counter(
+        HeadObject=1,
+        CreateMultipartUpload=1,
+        UploadPartCopy=math.ceil(size / MULTIPART_CHUNKSIZE),
+        CompleteMultipartUpload=1,
+    )
+
+
+def count_list_requests(object_number: int) -> Counter:
+    return Counter(ListObjectsV2=max(1, math.ceil(object_number / LIST_PAGE_SIZE)))
+
+
+def get_size_in_bytes(obj: dict) -> int:
+    """Object size of retrieve_obj_list entries is in MB"""
+    return int(round(obj["size"] * 1024**2))
+
+
+def format_bytes(byte_number: float) -> str:
+    for unit in ["B", "KB", "MB", "GB"]:
+        if abs(byte_number) < 1024:
+            return f"{byte_number:.1f} {unit}"
+        byte_number /= 1024
+    return f"{byte_number:.1f} TB"
+
+
+class ThroughputHistory:
+    """
+    JSON file with the objects, bytes and time of the last runs of each operation, used to estimate the wall time
+    of a plan
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path: str = file_path
+        self.runs: dict = {}
+        if os.path.isfile(file_path):
+            with open(file_path, "r") as history_file:
+                self.runs = json.load(history_file)
+
+    def record(
+        self,
+        operation: str,
+        object_number: int,
+        byte_number: int,
+        seconds: float,
+        concurrency: int = 1,
+    ) -> None:
+        """Save a run of an operation, only the last HISTORY_RUNS runs are kept"""
+        if object_number == 0:
+            return
+        runs: list = self.runs.setdefault(operation, [])
+        runs.append(
+            dict(
+                objects=object_number,
+                bytes=byte_number,
+                seconds=seconds,
+                concurrency=concurrency,
+            )
+        )
+        del runs[:-HISTORY_RUNS]
+        with open(self.file_path, "w") as history_file:
+            json.dump(self.runs, history_file, indent=2)
+
+    def get_throughput(self, operation: str):
+        """Throughput of one worker measured on previous runs
+
+        Returns:
+            tuple: seconds per object and bytes per second, None if the operation has never been run
+        """
+        runs: list = self.runs.get(operation, [])
+        if not runs:
+            return None
+        worker_seconds: float = sum(run["seconds"] * run["concurrency"] for run in runs)
+        object_number: int = sum(run["objects"] for run in runs)
+        byte_number: int = sum(run["bytes"] for run in runs)
+        bytes_per_second: float = (
+            byte_number / worker_seconds if byte_number and worker_seconds else None
+        )
+        return worker_seconds / object_number, bytes_per_second
+
+
+class Plan:
+    """
+    Objects, bytes and S3 requests that a bulk operation will involve, built without mutating calls
+    """
+
+    def __init__(self, operation: str, concurrency: int = 1):
+        self.operation: str = operation
+        self.concurrency: int = max(1, concurrency)
+        self.keys: list = []
+        self.total_bytes: int = 0
+        self.transfer_bytes: int = 0
+        self.requests: Counter = Counter()
+
+    def add_requests(self, requests: Counter) -> None:
+        self.requests.update(requests)
+
+    def add_object(
+        self, key: str, size: int, requests: Counter, transfer_bytes: int = 0
+    ) -> None:
+        self.keys.append(key)
+        self.total_bytes += size
+        self.transfer_bytes += transfer_bytes
+        self.requests.update(requests)
+
+    @property
+    def request_number(self) -> int:
+        return sum(self.requests.values())
+
+    def estimate_seconds(self, history: ThroughputHistory = None) -> float:
+        """Estimated wall time with the plan concurrency, from measured throughput when it is available"""
+        throughput = history.get_throughput(self.operation) if history else None
+        if throughput is None:
+            worker_seconds: float = (
+                self.request_number * DEFAULT_REQUEST_SECONDS
+                + self.transfer_bytes / DEFAULT_BYTES_PER_SECOND
+            )
+        else:
+            seconds_per_object, bytes_per_second = throughput
+            worker_seconds = len(self.keys) * seconds_per_object
+            if bytes_per_second:
+                worker_seconds = max(
+                    worker_seconds, self.transfer_bytes / bytes_per_second
+                )
+        return worker_seconds / self.concurrency
+
+    def get_summary(self, history: ThroughputHistory = None) -> list:
+        """Lines that describe the plan"""
+        lines: list = [
+            f"Plan for {self.operation}: {len(self.keys)} objects, {format_bytes(self.total_bytes)}",
+        ]
+        if self.transfer_bytes:
+            lines.append(f"Bytes to transfer: {format_bytes(self.transfer_bytes)}")
+        lines.append(f"Expected requests: {self.request_number}")
+        for request_type, request_number in sorted(self.requests.items()):
+            lines.append(f"  {request_type}: {request_number}")
+        source: str = (
+            "measured throughput"
+            if history is not None and history.get_throughput(self.operation)
+            else "default throughput"
+        )
+        lines.append(
+            f"Estimated wall time: {self.estimate_seconds(history):.1f}s "
+            f"with concurrency {self.concurrency} ({source})"
+        )
+        return lines
+
+
+def plan_move(
+    object_list: list, datafiles: list, extension_list: list, concurrency: int = 1
+) -> Plan:
+    """Plan AWSSession.move_files_from_bucket_to_bucket
+
+    Args:
+        object_list (list): source bucket objects given by AWSSession.retrieve_obj_list
+        datafiles (list): list of files to move (optional)
+        extension_list (list): list of extension filter (optional)
+        concurrency (int, optional): concurrent operations. Defaults to 1.
+    """
+    plan: Plan = Plan("move", concurrency)
+    sizes: dict = {obj["name"]: get_size_in_bytes(obj) for obj in object_list}
+    keys: list = datafiles if datafiles else list(sizes)
+    if extension_list:
+        keys = filter_by_extension(keys, extension_list)
+    if datafiles:
+        # every file is checked before being moved
+        plan.add_requests(Counter(HeadObject=len(keys)))
+        keys = [key for key in keys if key in sizes]
+    else:
+        plan.add_requests(count_list_requests(len(object_list)))
+    for key in keys:
+        plan.add_object(
+            key, sizes[key], count_copy_requests(sizes[key]) + Counter(DeleteObject=1)
+        )
+    return plan
+
+
+def plan_delete_bucket(object_list: list, concurrency: int = 1) -> Plan:
+    """Plan AWSSession.delete_bucket
+
+    Args:
+        object_list (list): bucket objects given by AWSSession.retrieve_obj_list
+        concurrency (int, optional): concurrent operations. Defaults to 1.
+    """
+    plan: Plan = Plan("delete", concurrency)
+    plan.add_requests(count_list_requests(len(object_list)))
+    for obj in object_list:
+        plan.add_object(obj["name"], get_size_in_bytes(obj), Counter(DeleteObject=1))
+    plan.add_requests(Counter(DeleteBucket=1))
+    return plan
+
+
+def plan_update(
+    object_list: list, date_list: list, extension: str, concurrency: int = 1
+) -> Plan:
+    """Plan AWSSession.update_files_from_bucket, updated objects keep approximately their size
+
+    Args:
+        object_list (list): bucket objects given by AWSSession.retrieve_obj_list
+        date_list (list): dates to update
+        extension (str): extension pattern
+        concurrency (int, optional): concurrent operations. Defaults to 1.
+    """
+    plan: Plan = Plan("update", concurrency)
+    plan.add_requests(count_list_requests(len(object_list)))
+    sizes: dict = {obj["name"]: get_size_in_bytes(obj) for obj in object_list}
+    key_index: KeyIndex = KeyIndex(sizes)
+    for date in date_list:
+        for key in key_index.match_date(date, extension):
+            size: int = sizes[key]
+            plan.add_object(
+                key,
+                size,
+                count_download_requests(size) + count_upload_requests(size),
+                transfer_bytes=2 * size,
+            )
+    return plan
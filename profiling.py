@@ -0,0 +1,269 @@
+import argparse
+import cProfile
+import io
+import json
+import os
+import sys
+import threading
+import time
+
+DEFAULT_TOP: int = 20
+DEFAULT_SAMPLE_INTERVAL: float = 0.01
+# where the time goes, by the file (or C function) running it
+NETWORK: str = "network"
+CPU: str = "update and compression"
+WAIT: str = "waiting for threads"
+OTHER: str = "other"
+CATEGORIES: list = [NETWORK, CPU, WAIT, OTHER]
+NETWORK_PATTERNS: tuple = (
+    "socket",
+    "ssl",
+    "http/client",
+    "http.client",
+    "urllib3",
+    "select",
+    "getaddrinfo",
+)
+CPU_PATTERNS: tuple = (
+    "utils.py",
+    "columnar.py",
+    "parallel_gzip.py",
+    "streaming.py",
+    "zlib",
+    "zstd",
+    "gzip",
+    "zipfile",
+    "_csv",
+    "numpy",
+)
+WAIT_PATTERNS: tuple = (
+    "threading.py",
+    "concurrent/futures",
+    "queue.py",
+    "_thread.lock",
+    "multiprocessing",
+)
+
+
+def get_category(location: str) -> str:
+    """This function tells what kind of work runs at a location, network waits are checked first.
+
+    Args:
+        location (str): file name of a Python function or name of a C function, e.g. <method 'recv_into' of
+            '_socket.socket' objects>
+
+    Returns:
+        str: NETWORK, CPU, WAIT or OTHER
+    """
+    location = location.replace(os.sep, "/")
+    for category, patterns in [
+        (NETWORK, NETWORK_PATTERNS),
+        (CPU, CPU_PATTERNS),
+        (WAIT, WAIT_PATTERNS),
+    ]:
+        if any(pattern in location for pattern in patterns):
+            return category
+    return OTHER
+
+
+def parse_profile_args(argv: list) -> tuple:
+    """This function removes the profiling options from the arguments of a command, so they can be used with any
+    command and in any position.
+
+    Args:
+        argv (list): command arguments, argv[0] is the program name
+
+    Returns:
+        tuple: arguments without the profiling options, argparse.Namespace with profile, profile_top and
+        profile_timeline
+    """
+    parser = argparse.ArgumentParser(add_help=False, allow_abbrev=False)
+    parser.add_argument("--profile", default=None)
+    parser.add_argument("--profile-top", type=int, default=DEFAULT_TOP)
+    parser.add_argument("--profile-timeline", action="store_true")
+    options, remaining = parser.parse_known_args(argv[1:])
+    return argv[:1] + remaining, options
+
+
+class ThreadSampler:
+    """
+    Background thread that records what every other thread is running each interval seconds (wall clock), so time
+    blocked on the network or on locks is seen, unlike in cProfile, and threads of pools are included.
+    """
+
+    def __init__(self, interval: float = DEFAULT_SAMPLE_INTERVAL):
+        self.interval: float = interval
+        # (seconds since start, thread name, function, category)
+        self.samples: list = []
+        self._stop: threading.Event = threading.Event()
+        self._thread: threading.Thread = threading.Thread(
+            target=self._run, name="profile-sampler", daemon=True
+        )
+        self._start_time: float = 0
+
+    def start(self) -> None:
+        self._start_time = time.perf_counter()
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        sampler_id: int = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            now: float = time.perf_counter() - self._start_time
+            names: dict = {
+                thread.ident: thread.name for thread in threading.enumerate()
+            }
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == sampler_id:
+                    continue
+                code = frame.f_code
+                self.samples.append(
+                    (
+                        now,
+                        names.get(thread_id, str(thread_id)),
+                        f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})",
+                        get_category(code.co_filename),
+                    )
+                )
+
+    def get_category_seconds(self) -> dict:
+        seconds: dict = {category: 0.0 for category in CATEGORIES}
+        for _, _, _, category in self.samples:
+            seconds[category] += self.interval
+        return seconds
+
+    def to_trace(self) -> dict:
+        """Samples as Chrome trace events (chrome://tracing or ui.perfetto.dev), consecutive equal samples of a thread
+        are merged in one event"""
+        events: list = []
+        last_events: dict = {}
+        for seconds, thread_name, function, category in self.samples:
+            event: dict = last_events.get(thread_name)
+            if (
+                event is not None
+                and event["name"] == function
+                and event["ts"] + event["dur"] >= (seconds - 1.5 * self.interval) * 1e6
+            ):
+                event["dur"] = seconds * 1e6 - event["ts"]
+                continue
+            event = dict(
+                name=function,
+                cat=category,
+                ph="X",
+                ts=seconds * 1e6,
+                dur=self.interval * 1e6,
+                pid=os.getpid(),
+                tid=thread_name,
+            )
+            events.append(event)
+            last_events[thread_name] = event
+        return dict(traceEvents=events, displayTimeUnit="ms")
+
+
+class CommandProfiler:
+    """
+    cProfile of a command, including the threads it starts. Update workers run in other processes and are not
+    profiled.
+    """
+
+    def __init__(self):
+        self.profiles: list = []
+        self._lock: threading.Lock = threading.Lock()
+
+    def _profile_thread(self, *args) -> None:
+        # first call in a new thread: its own profiler replaces this hook
+        profile: cProfile.Profile = cProfile.Profile()
+        with self._lock:
+            self.profiles.append(profile)
+        profile.enable()
+
+    def __enter__(self):
+        threading.setprofile(self._profile_thread)
+        main_profile: cProfile.Profile = cProfile.Profile()
+        self.profiles.append(main_profile)
+        main_profile.enable()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.profiles[0].disable()
+        threading.setprofile(None)
+
+    def get_stats(self):
+        import pstats
+
+        with self._lock:
+            return pstats.Stats(*self.profiles)
+
+
+def get_category_seconds(stats) -> dict:
+    """Own time (tottime) of the profiled functions by category"""
+    seconds: dict = {category: 0.0 for category in CATEGORIES}
+    for (file_name, _, function_name), (_, _, own_time, _, _) in stats.stats.items():
+        location: str = function_name if file_name == "~" else file_name
+        seconds[get_category(location)] += own_time
+    return seconds
+
+
+def format_category_seconds(title: str, seconds: dict) -> str:
+    total: float = sum(seconds.values()) or 1
+    return f"{title}: " + ", ".join(
+        f"{category} {seconds[category]:.2f}s ({100 * seconds[category] / total:.0f}%)"
+        for category in CATEGORIES
+    )
+
+
+def profile_main(main, argv: list):
+    """This function runs the main(argv) function of a command, profiled when --profile PATH is given.
+
+    PATH gets the cProfile dump (python -m pstats PATH), PATH.txt the top --profile-top functions by cumulative time
+    and the time by category (network, update and compression, waiting for threads). With --profile-timeline the
+    threads are also sampled every 10 ms and PATH.trace.json gets the wall clock timeline of each one.
+
+    Args:
+        main (function): main function of the command
+        argv (list): command arguments
+
+    Returns:
+        any: value returned by main
+    """
+    argv, options = parse_profile_args(argv)
+    if options.profile is None:
+        return main(argv)
+
+    sampler: ThreadSampler = ThreadSampler() if options.profile_timeline else None
+    start_time: float = time.perf_counter()
+    if sampler is not None:
+        sampler.start()
+    try:
+        with CommandProfiler() as profiler:
+            return main(argv)
+    finally:
+        seconds: float = time.perf_counter() - start_time
+        if sampler is not None:
+            sampler.stop()
+        stats = profiler.get_stats()
+        stats.dump_stats(options.profile)
+        lines: list = [
+            f"Wall time: {seconds:.2f}s",
+            # cProfile measures wall clock time, network waits are the time spent in socket reads
+            format_category_seconds(
+                "Profiled time by category", get_category_seconds(stats)
+            ),
+        ]
+        if sampler is not None:
+            lines.append(
+                format_category_seconds(
+                    "Sampled thread time by category", sampler.get_category_seconds()
+                )
+            )
+            with open(f"{options.profile}.trace.json", "w") as file_obj:
+                json.dump(sampler.to_trace(), file_obj)
+        summary: io.StringIO = io.StringIO()
+        stats.stream = summary
+        stats.sort_stats("cumulative").print_stats(options.profile_top)
+        with open(f"{options.profile}.txt", "w") as file_obj:
+            file_obj.write("\n".join(lines) + "\n" + summary.getvalue())
+        sys.stderr.write("\n".join(lines) + f"\nProfile written to {options.profile}\n")
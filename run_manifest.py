@@ -0,0 +1,89 @@
+import argparse
+import logging
+import os
+import sys
+import time
+
+new_path: str = os.path.join(os.path.dirname(__file__), "..", "..")
+sys.path.append(new_path)
+
+from aws import AWSSession
+from manifest import (
+    DEFAULT_MANIFEST_WORKERS,
+    FAILED,
+    OK,
+    SKIPPED,
+    ManifestRunner,
+    read_manifest,
+    write_results,
+)
+from profiling import profile_main
+from throttling import DEFAULT_MAX_CONCURRENCY
+
+
+def main(argv):
+    """
+    This script will run the operations of a manifest in one session.
+    """
+
+    # Arguments and description
+    parser = argparse.ArgumentParser(
+        description="run the upload, download, copy, move, delete and update operations of a JSONL or CSV manifest",
+        epilog="the result log has a line for each operation with its status, it can be run again as a manifest to "
+        "retry only the operations that did not end ok",
+    )
+
+    parser.add_argument("manifest", help="JSONL or CSV (.csv) manifest")
+    parser.add_argument(
+        "--results",
+        default=None,
+        help="result log, CSV if it ends with .csv. Defaults to MANIFEST.results.jsonl",
+    )
+    parser.add_argument(
+        "--workers",
+        default=DEFAULT_MANIFEST_WORKERS,
+        type=int,
+        help=f"operations run at the same time. Defaults to {DEFAULT_MANIFEST_WORKERS}",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        default=DEFAULT_MAX_CONCURRENCY,
+        type=int,
+        help=f"S3 requests in flight shared by every operation. Defaults to {DEFAULT_MAX_CONCURRENCY}",
+    )
+
+    args = parser.parse_args(argv[1:])
+
+    # Give names to arguments
+    manifest_path: str = args.manifest
+    results_path: str = args.results or f"{manifest_path}.results.jsonl"
+    workers: int = args.workers
+    max_concurrency: int = args.max_concurrency
+
+    logger = logging.getLogger(__name__)
+    logging.basicConfig(level=logging.INFO)
+
+    try:
+        entries: list = read_manifest(manifest_path)
+    except (OSError, ValueError) as e:
+        logger.info(e)
+        exit(1)
+
+    aws_session = AWSSession(max_concurrency=max_concurrency)
+    start_time: float = time.perf_counter()
+    results: list = ManifestRunner(aws_session, workers).run(entries)
+    write_results(results_path, results)
+
+    counts: dict = {
+        status: sum(result["status"] == status for result in results)
+        for status in [OK, FAILED, SKIPPED]
+    }
+    logger.info(
+        f"{counts[OK]} operations ok, {counts[FAILED]} failed and {counts[SKIPPED]} skipped in "
+        f"{time.perf_counter() - start_time:.1f}s, results written to {results_path}"
+    )
+    return int(counts[FAILED] + counts[SKIPPED] > 0)
+
+
+if __name__ == "__main__":
+    sys.exit(profile_main(main, sys.argv))
@@ -0,0 +1,49 @@
+import argparse
+import importlib
+import os
+import sys
+
+# add path so we can use function through command line
+new_path = os.path.join(os.path.dirname(__file__), "..", "..")
+sys.path.append(new_path)
+
+from profiling import profile_main
+
+# subcommand: (module with a main(argv) function, description)
+SUBCOMMANDS: dict = {
+    "upload": ("upload_to_s3", "upload files to a S3 bucket"),
+    "download": ("download_from_s3", "download one or more objects from S3 bucket"),
+    "delete": ("delete_object_in_s3", "delete an object from S3 bucket"),
+    "delete-bucket": ("delete_bucket_from_s3", "delete a bucket with all its objects"),
+    "move-bucket": ("move_bucket_from_s3", "move objects from a bucket to another"),
+    "update": ("update_objects_from_s3", "update one or more objects from S3 bucket"),
+    "sync": ("sync_with_s3", "sync a local directory with a bucket prefix"),
+    "pack": ("pack_to_s3", "upload many small files as one indexed pack object"),
+    "unpack": ("unpack_from_s3", "extract members of a pack with range GETs"),
+    "run": ("run_manifest", "run the operations of a JSONL or CSV manifest"),
+}
+
+
+def main(argv):
+    """
+    Single entry point for every command: s3tool <subcommand> [arguments]. Only the module of the subcommand is
+    imported, and boto3 is imported after its arguments are parsed, so --help and argument errors return at once.
+    """
+    parser = argparse.ArgumentParser(
+        description="S3 file uploader commands",
+        epilog="use 's3tool <subcommand> -h' to show the arguments of a subcommand. Every subcommand also accepts "
+        "--profile PATH (cProfile dump and summary), --profile-top N and --profile-timeline (sampled threads)",
+    )
+    subparsers = parser.add_subparsers(dest="subcommand", metavar="subcommand")
+    subparsers.required = True
+    for name, (_, description) in SUBCOMMANDS.items():
+        # arguments are parsed by the subcommand module
+        subparsers.add_parser(name, help=description, add_help=False)
+
+    args: argparse.Namespace = parser.parse_args(argv[1:2])
+    module = importlib.import_module(SUBCOMMANDS[args.subcommand][0])
+    return module.main([f"{os.path.basename(argv[0])} {args.subcommand}"] + argv[2:])
+
+
+if __name__ == "__main__":
+    sys.exit(profile_main(main, sys.argv))
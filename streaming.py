@@ -0,0 +1,270 @@
+import io
+import logging
+import os
+from contextlib import nullcontext
+
+from buffer_pool import get_transfer_config
+from columnar import get_engine_kwargs
+from multipart import DEFAULT_PART_SIZE, MultipartUploadWriter
+from utils import (
+    change_compress_type,
+    get_compress_type,
+    get_uncompressed_name,
+    open_compressed_stream,
+    open_decompressed_stream,
+    update_bytes_stream_by_tuples,
+)
+
+READ_BUFFER_SIZE: int = 1024**2
+
+logger = logging.getLogger(__name__)
+
+
+class S3ObjectReader(io.RawIOBase):
+    """
+    Seekable readable file object over an S3 object. Sequential reads share one open-ended ranged GET and a seek
+    starts a new one, so zip files can be read without downloading them. size, e.g. from a listing, saves the HEAD
+    request but it is only a hint: reads go on until the object ends and the first response gives the real size and
+    the ETag, later GETs must match that ETag, so an object overwritten while it is read fails instead of mixing two
+    versions.
+    """
+
+    def __init__(self, client, bucket_name: str, key: str, size: int = None):
+        self.client = client
+        self.bucket_name: str = bucket_name
+        self.key: str = key
+        self.size: int = size
+        self.etag: str = None
+        self._position: int = 0
+        self._body = None
+        if size is None:
+            self._head()
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position: int = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            if self.etag is None:
+                # the size given may be stale, the end of the object is checked before it is used
+                self._head()
+            position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence ({whence})")
+        if position < 0:
+            raise ValueError(f"Negative seek position {position}")
+        if position != self._position:
+            self._close_body()
+            self._position = position
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        if self._body is None:
+            if self.etag is None and self._position >= self.size:
+                # the object may have grown since the size was given, a GET after its end would fail
+                self._head()
+            if self._position >= self.size:
+                return 0
+            self._open_body()
+        data: bytes = self._body.read(len(buffer))
+        if not data and self._position < self.size:
+            raise IOError(
+                f"Object {self.key} ended at byte {self._position} of {self.size}"
+            )
+        buffer[: len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def _head(self) -> None:
+        response: dict = self.client.head_object(Bucket=self.bucket_name, Key=self.key)
+        self.size, self.etag = response["ContentLength"], response["ETag"]
+
+    def _open_body(self) -> None:
+        kwargs: dict = {} if self.etag is None else dict(IfMatch=self.etag)
+        response: dict = self.client.get_object(
+            Bucket=self.bucket_name,
+            Key=self.key,
+            Range=f"bytes={self._position}-",
+            **kwargs,
+        )
+        if self.etag is None:
+            self.etag = response["ETag"]
+            # Content-Range is "bytes start-end/size"
+            content_range: str = response.get("ContentRange")
+            self.size = (
+                int(content_range.rsplit("/", 1)[1])
+                if content_range
+                else self._position + response["ContentLength"]
+            )
+        self._body = response["Body"]
+
+    def _close_body(self) -> None:
+        if self._body is not None:
+            self._body.close()
+            self._body = None
+
+    def close(self) -> None:
+        self._close_body()
+        super().close()
+
+
+def update_object_streaming(
+    client,
+    bucket_name: str,
+    key: str,
+    tuples_list: list,
+    backup_file_path: str = None,
+    size: int = None,
+    part_size: int = DEFAULT_PART_SIZE,
+    codec: str = None,
+    compresslevel: int = None,
+    buffer_pool=None,
+    before_publish=None,
+    compression_threads: int = None,
+) -> dict:
+    """This function updates an S3 object with tuples values without temporary files.
+
+    The object is read with GET requests, decompressed, updated row by row, compressed again with the same format
+    (or with codec) and written with a multipart upload, so memory is bounded by the read buffer and one part. If no
+    tuple matched any cell the upload is aborted, so the object is left as it was. If codec changes the format, the
+    object is uploaded with the new extension and the original object is deleted afterwards.
+
+    Args:
+        client: boto3 S3 client
+        bucket_name (str): bucket name
+        key (str): object key
+        tuples_list (list): The tuples list with tuples in format [(column_to_check, value_to_replace, new_value)...]
+        backup_file_path (str, optional): if it is given, the original object is downloaded there and read from it.
+        size (int, optional): object size from a listing, to avoid a HEAD request, see S3ObjectReader. Defaults to None.
+        part_size (int, optional): multipart upload part size. Defaults to DEFAULT_PART_SIZE.
+        codec (str, optional): "gz", "zip" or "zst" format of the updated object. Defaults to the current format.
+        compresslevel (int, optional): compression level. Defaults to the default level of the format.
+        buffer_pool (BufferPool, optional): memory budget of the backup download and the upload part.
+        before_publish (callable, optional): called with the updated key, its size, the cells replaced by each tuple
+            and its ETag just before the updated object is published, e.g. to record that its upload may have finished.
+        compression_threads (int, optional): compression threads, see open_compressed_stream. Defaults to one per CPU.
+
+    Returns:
+        dict: key and size of the updated object (None if it was not changed) and cells replaced by each tuple
+    """
+    if backup_file_path is not None:
+        logger.info(f"Saving object {key} to {backup_file_path} ...")
+        with (
+            buffer_pool.transfer()
+            if buffer_pool is not None
+            else nullcontext(get_transfer_config())
+        ) as config:
+            client.download_file(bucket_name, key, backup_file_path, Config=config)
+        source: io.BufferedIOBase = open(backup_file_path, "rb")
+        source_size: int = os.path.getsize(backup_file_path)
+    else:
+        reader: S3ObjectReader = S3ObjectReader(client, bucket_name, key, size)
+        source = io.BufferedReader(reader, buffer_size=READ_BUFFER_SIZE)
+        source_size = reader.size
+
+    with source:
+        compress_type: str = get_compress_type(source)
+        member_name: str = get_uncompressed_name(key, compress_type)
+        output_compress_type: str = codec or compress_type
+        updated_key: str = change_compress_type(
+            key, compress_type, output_compress_type
+        )
+        logger.info(f"Streaming update of object {key} ...")
+        with MultipartUploadWriter(
+            client, bucket_name, updated_key, part_size, buffer_pool=buffer_pool
+        ) as writer:
+            with open_decompressed_stream(
+                source, compress_type, member_name
+            ) as input_stream, open_compressed_stream(
+                writer,
+                output_compress_type,
+                member_name,
+                compresslevel,
+                compression_threads,
+            ) as output_stream:
+                replacements: list = update_bytes_stream_by_tuples(
+                    input_stream,
+                    output_stream,
+                    tuples_list,
+                    **get_engine_kwargs(source_size),
+                )
+            if not any(replacements):
+                logger.info(f"No cells replaced in object {key}, it is not uploaded")
+                writer.abort()
+                return dict(key=key, size=None, replacements=replacements)
+            if before_publish is not None:
+                writer.before_complete = lambda writer: before_publish(
+                    updated_key, writer.bytes_written, replacements, writer.get_etag()
+                )
+    if updated_key != key:
+        logger.info(f"Object {key} saved as {updated_key}, deleting {key} ...")
+        client.delete_object(Bucket=bucket_name, Key=key)
+    return dict(key=updated_key, size=writer.bytes_written, replacements=replacements)
+
+
+def read_object_sample(
+    client, bucket_name: str, key: str, sample_size: int, size: int = None
+) -> tuple:
+    """This function reads the first bytes of the decompressed content of an S3 object.
+
+    Args:
+        client: boto3 S3 client
+        bucket_name (str): bucket name
+        key (str): object key
+        sample_size (int): number of decompressed bytes to read
+        size (int, optional): object size from a listing, to avoid a HEAD request, see S3ObjectReader. Defaults to None.
+
+    Returns:
+        tuple: decompressed sample and compress type of the object ("zip", "gz", "zst" or "")
+    """
+    reader: S3ObjectReader = S3ObjectReader(client, bucket_name, key, size)
+    with io.BufferedReader(reader, buffer_size=READ_BUFFER_SIZE) as source:
+        compress_type: str = get_compress_type(source)
+        member_name: str = get_uncompressed_name(key, compress_type)
+        with open_decompressed_stream(
+            source, compress_type, member_name
+        ) as input_stream:
+            return input_stream.read(sample_size), compress_type
+
+
+def scan_object(
+    client, bucket_name: str, key: str, tuples_list: list, size: int = None
+) -> list:
+    """This function counts the cells each tuple would replace in an S3 object, without writing anything.
+
+    Args:
+        client: boto3 S3 client
+        bucket_name (str): bucket name
+        key (str): object key
+        tuples_list (list): The tuples list with tuples in format [(column_to_check, value_to_replace, new_value)...]
+        size (int, optional): object size from a listing, to avoid a HEAD request, see S3ObjectReader. Defaults to None.
+
+    Returns:
+        list: number of cells each tuple would replace
+    """
+    reader: S3ObjectReader = S3ObjectReader(client, bucket_name, key, size)
+    with io.BufferedReader(reader, buffer_size=READ_BUFFER_SIZE) as source, open(
+        os.devnull, "wb"
+    ) as output_stream:
+        compress_type: str = get_compress_type(source)
+        member_name: str = get_uncompressed_name(key, compress_type)
+        logger.info(f"Scanning object {key} ...")
+        with open_decompressed_stream(
+            source, compress_type, member_name
+        ) as input_stream:
+            return update_bytes_stream_by_tuples(
+                input_stream,
+                output_stream,
+                tuples_list,
+                **get_engine_kwargs(reader.size),
+            )
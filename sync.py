@@ -0,0 +1,269 @@
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from multipart import DEFAULT_PART_SIZE
+
+DEFAULT_SYNC_WORKERS: int = 8
+# S3 keeps LastModified with second precision
+MTIME_TOLERANCE: float = 1.0
+HASH_BUFFER_SIZE: int = 1024**2
+# transfer reasons
+NEW: str = "new"
+SIZE_CHANGED: str = "size changed"
+NEWER: str = "newer"
+
+logger = logging.getLogger(__name__)
+
+
+def parse_s3_url(url: str):
+    """s3://bucket/prefix/ gives (bucket, prefix/), other paths give None"""
+    if not url.startswith("s3://"):
+        return None
+    bucket_name, _, prefix = url[len("s3://") :].partition("/")
+    if prefix and not prefix.endswith("/"):
+        prefix += "/"
+    return bucket_name, prefix
+
+
+def scan_directory(directory: str) -> dict:
+    """This function walks a directory with os.scandir, the size and modification time of each file come from the
+    same directory read.
+
+    Returns:
+        dict: path relative to directory with / separators: dict(size, mtime)
+    """
+    files: dict = {}
+    pending: list = [""]
+    while pending:
+        relative_path: str = pending.pop()
+        with os.scandir(os.path.join(directory, relative_path)) as entries:
+            for entry in entries:
+                key: str = f"{relative_path}{entry.name}"
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(f"{key}/")
+                elif entry.is_file():
+                    stat: os.stat_result = entry.stat()
+                    files[key] = dict(size=stat.st_size, mtime=stat.st_mtime)
+    return files
+
+
+def list_prefix(client, bucket_name: str, prefix: str = "") -> dict:
+    """This function lists the objects of a bucket under a prefix with one paginated listing.
+
+    Returns:
+        dict: key relative to prefix: dict(size, mtime, etag), folder markers (keys ending with /) are left out
+    """
+    objects: dict = {}
+    paginator = client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            if obj["Key"].endswith("/"):
+                continue
+            objects[obj["Key"][len(prefix) :]] = dict(
+                size=obj["Size"],
+                mtime=obj["LastModified"].timestamp(),
+                etag=obj["ETag"].strip('"'),
+            )
+    return objects
+
+
+def get_local_etag(file_path: str, part_number: int = None) -> str:
+    """This function computes the ETag S3 gives to a file: the MD5 of its content, or for multipart uploads
+    (part_number given) the MD5 of the MD5 of each DEFAULT_PART_SIZE part followed by -part_number.
+    """
+    if part_number is None:
+        file_hash = hashlib.md5()
+        with open(file_path, "rb") as file_obj:
+            for chunk in iter(lambda: file_obj.read(HASH_BUFFER_SIZE), b""):
+                file_hash.update(chunk)
+        return file_hash.hexdigest()
+    part_hashes: list = []
+    with open(file_path, "rb") as file_obj:
+        for part in iter(lambda: file_obj.read(DEFAULT_PART_SIZE), b""):
+            part_hashes.append(hashlib.md5(part).digest())
+    return f"{hashlib.md5(b''.join(part_hashes)).hexdigest()}-{len(part_hashes)}"
+
+
+def has_same_etag(file_path: str, etag: str) -> bool:
+    """Objects uploaded in parts of other sizes than DEFAULT_PART_SIZE can not be checked, they are different"""
+    if "-" not in etag:
+        return get_local_etag(file_path) == etag
+    part_number: int = int(etag.split("-")[1])
+    size: int = os.path.getsize(file_path)
+    if part_number != max(1, -(-size // DEFAULT_PART_SIZE)):
+        return False
+    return get_local_etag(file_path, part_number) == etag
+
+
+def get_transfer_reason(source: dict, destination: dict):
+    """Why a file must be copied to its destination, None if it is already there: it is new, its size changed or
+    the source was modified after the destination (its content is then compared by ETag)
+    """
+    if destination is None:
+        return NEW
+    if source["size"] != destination["size"]:
+        return SIZE_CHANGED
+    if source["mtime"] > destination["mtime"] + MTIME_TOLERANCE:
+        return NEWER
+    return None
+
+
+class SyncPlan:
+    """
+    Differences between a local directory and a bucket prefix: files to copy from the source to the destination
+    (key: reason) and files of the destination that are not in the source, deleted only with delete. When
+    downloading, objects whose key would be a path outside the directory (with .. segments or through a symbolic
+    link) are left out of the plan and listed in unsafe_keys.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        bucket_name: str,
+        prefix: str,
+        upload: bool,
+        local_files: dict,
+        objects: dict,
+        delete: bool = False,
+    ):
+        self.directory: str = directory
+        self.bucket_name: str = bucket_name
+        self.prefix: str = prefix
+        # upload is directory -> bucket, otherwise bucket -> directory
+        self.upload: bool = upload
+        self.local_files: dict = local_files
+        self.unsafe_keys: list = (
+            []
+            if upload
+            else sorted(key for key in objects if not self.is_inside_directory(key))
+        )
+        for key in self.unsafe_keys:
+            logger.warning(f"{key} is outside {directory}, it is skipped")
+        objects = {
+            key: obj for key, obj in objects.items() if key not in self.unsafe_keys
+        }
+        self.objects: dict = objects
+        source, destination = (
+            (local_files, objects) if upload else (objects, local_files)
+        )
+        self.transfers: dict = {}
+        for key in sorted(source):
+            reason: str = get_transfer_reason(source[key], destination.get(key))
+            if reason is not None:
+                self.transfers[key] = reason
+        self.deletes: list = (
+            sorted(key for key in destination if key not in source) if delete else []
+        )
+        self.transfer_bytes: int = sum(source[key]["size"] for key in self.transfers)
+
+    def is_inside_directory(self, key: str) -> bool:
+        directory: str = os.path.realpath(self.directory)
+        path: str = os.path.realpath(os.path.join(directory, *key.split("/")))
+        return path != directory and os.path.commonpath([directory, path]) == directory
+
+    def get_local_path(self, key: str) -> str:
+        return os.path.join(self.directory, *key.split("/"))
+
+    def get_summary(self) -> list:
+        direction: str = (
+            f"{self.directory} -> s3://{self.bucket_name}/{self.prefix}"
+            if self.upload
+            else f"s3://{self.bucket_name}/{self.prefix} -> {self.directory}"
+        )
+        reasons: dict = {}
+        for reason in self.transfers.values():
+            reasons[reason] = reasons.get(reason, 0) + 1
+        lines: list = [
+            f"Sync {direction}: {len(self.local_files)} local files, {len(self.objects)} objects",
+            f"  to copy: {len(self.transfers)} ({self.transfer_bytes / 1024 ** 2:.1f} MB)"
+            + "".join(
+                f", {number} {reason}" for reason, number in sorted(reasons.items())
+            ),
+            f"  to delete: {len(self.deletes)}",
+        ]
+        if self.unsafe_keys:
+            lines.append(
+                f"  skipped: {len(self.unsafe_keys)} objects outside the directory"
+            )
+        lines.extend(
+            f"  copy {key} ({reason})" for key, reason in self.transfers.items()
+        )
+        lines.extend(f"  delete {key}" for key in self.deletes)
+        return lines
+
+
+def sync_file(aws_session, plan: SyncPlan, key: str) -> bool:
+    """Copy a file of the plan to its destination, newer files with the same ETag are not copied and take the date
+    of their object, so the next sync compares them by date without reading them again.
+
+    Returns:
+        bool: True if it was copied
+    """
+    local_path: str = plan.get_local_path(key)
+    obj: dict = plan.objects.get(key)
+    if plan.transfers[key] == NEWER and has_same_etag(local_path, obj["etag"]):
+        os.utime(local_path, (obj["mtime"], obj["mtime"]))
+        return False
+    if plan.upload:
+        aws_session.send_file_to_bucket(local_path, plan.prefix + key, plan.bucket_name)
+    else:
+        if not plan.is_inside_directory(key):
+            raise ValueError(f"{key} is outside {plan.directory}")
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        aws_session.download_object_from_bucket(
+            plan.prefix + key, plan.bucket_name, local_path
+        )
+        # local files take the date of their object, so they are not newer than it
+        os.utime(local_path, (obj["mtime"], obj["mtime"]))
+    logger.info(f"{key} copied ({plan.transfers[key]})")
+    return True
+
+
+def delete_file(aws_session, plan: SyncPlan, key: str) -> None:
+    if plan.upload:
+        aws_session.delete_object_in_bucket(plan.prefix + key, plan.bucket_name)
+    else:
+        if not plan.is_inside_directory(key):
+            raise ValueError(f"{key} is outside {plan.directory}")
+        os.remove(plan.get_local_path(key))
+    logger.info(f"{key} deleted")
+
+
+def run_sync(aws_session, plan: SyncPlan, workers: int = DEFAULT_SYNC_WORKERS) -> dict:
+    """This function copies and deletes the files of a plan with workers threads, a failed file is logged and the
+    others continue.
+
+    Returns:
+        dict: files copied, unchanged (same ETag), deleted and failed, and bytes copied
+    """
+    stats: dict = dict(copied=0, unchanged=0, deleted=0, failed=0, bytes=0)
+    source: dict = plan.local_files if plan.upload else plan.objects
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures: dict = {
+            executor.submit(sync_file, aws_session, plan, key): key
+            for key in plan.transfers
+        }
+        futures.update(
+            {
+                executor.submit(delete_file, aws_session, plan, key): key
+                for key in plan.deletes
+            }
+        )
+        for future in as_completed(futures):
+            key: str = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"{key}: {e}")
+                stats["failed"] += 1
+                continue
+            if key not in plan.transfers:
+                stats["deleted"] += 1
+            elif result:
+                stats["copied"] += 1
+                stats["bytes"] += source[key]["size"]
+            else:
+                stats["unchanged"] += 1
+    return stats
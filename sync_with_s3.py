@@ -0,0 +1,117 @@
+import argparse
+import logging
+import os
+import sys
+import time
+
+new_path: str = os.path.join(os.path.dirname(__file__), "..", "..")
+sys.path.append(new_path)
+
+from aws import AWSSession
+from planner import ThroughputHistory
+from profiling import profile_main
+from sync import (
+    DEFAULT_SYNC_WORKERS,
+    SyncPlan,
+    list_prefix,
+    parse_s3_url,
+    run_sync,
+    scan_directory,
+)
+
+
+def main(argv):
+    """
+    This script will sync a local directory with a bucket prefix, in either direction.
+    """
+
+    # Arguments and description
+    parser = argparse.ArgumentParser(
+        description="copy the files of SOURCE that are new, have another size or are newer to DESTINATION. One of "
+        "them is a local directory and the other a bucket prefix (s3://bucket/prefix)"
+    )
+
+    parser.add_argument("source", help="local directory or s3://bucket/prefix")
+    parser.add_argument("destination", help="local directory or s3://bucket/prefix")
+    parser.add_argument(
+        "--delete",
+        action="store_true",
+        help="delete the files of DESTINATION that are not in SOURCE",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="show the files that would be copied and deleted without changing anything",
+    )
+    parser.add_argument(
+        "--workers",
+        default=DEFAULT_SYNC_WORKERS,
+        type=int,
+        help=f"files copied at the same time. Defaults to {DEFAULT_SYNC_WORKERS}",
+    )
+    parser.add_argument(
+        "--throughput-history",
+        default=None,
+        help="JSON file where the throughput of each run is saved to estimate the time of plans",
+    )
+
+    args = parser.parse_args(argv[1:])
+
+    # Give names to arguments
+    source_url = parse_s3_url(args.source)
+    destination_url = parse_s3_url(args.destination)
+    delete: bool = args.delete
+    plan_only: bool = args.plan
+    workers: int = args.workers
+    throughput_history_path: str = args.throughput_history
+
+    logger = logging.getLogger(__name__)
+    logging.basicConfig(level=logging.INFO)
+
+    if (source_url is None) == (destination_url is None):
+        logger.info(
+            "One of source and destination must be s3://bucket/prefix and the other a local directory"
+        )
+        exit(1)
+    upload: bool = destination_url is not None
+    bucket_name, prefix = destination_url if upload else source_url
+    directory: str = args.source if upload else args.destination
+    if upload and not os.path.isdir(directory):
+        logger.info(f"Path '{directory}' is not valid")
+        exit(1)
+
+    aws_session = AWSSession()
+
+    if not aws_session.check_bucket_exists(bucket_name):
+        logger.info(f"Bucket '{bucket_name}' does not exist")
+        exit(1)
+
+    local_files: dict = {}
+    if os.path.isdir(directory):
+        local_files = scan_directory(directory)
+    objects: dict = list_prefix(aws_session.session.client("s3"), bucket_name, prefix)
+    plan: SyncPlan = SyncPlan(
+        directory, bucket_name, prefix, upload, local_files, objects, delete
+    )
+    if plan_only:
+        for line in plan.get_summary():
+            logger.info(line)
+        return
+
+    os.makedirs(directory, exist_ok=True)
+    start_time: float = time.perf_counter()
+    stats: dict = run_sync(aws_session, plan, workers)
+    seconds: float = time.perf_counter() - start_time
+    logger.info(
+        f"Sync summary: {stats['copied']} files copied ({stats['bytes'] / 1024 ** 2:.1f} MB), "
+        f"{stats['unchanged']} unchanged, {stats['deleted']} deleted and {stats['failed']} failed in {seconds:.1f}s"
+    )
+    if throughput_history_path is not None:
+        ThroughputHistory(throughput_history_path).record(
+            "upload" if upload else "download", stats["copied"], stats["bytes"], seconds
+        )
+    return int(stats["failed"] > 0)
+
+
+if __name__ == "__main__":
+    sys.exit(profile_main(main, sys.argv))
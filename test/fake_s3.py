@@ -0,0 +1,169 @@
+import datetime
+import hashlib
+import io
+
+from botocore.exceptions import ClientError
+
+
+class FakeBody(io.BytesIO):
+    """GetObject body, like botocore StreamingBody it is a readable stream"""
+
+
+class FakePaginator:
+    def __init__(self, client, page_size: int = 1000):
+        self.client = client
+        self.page_size: int = page_size
+
+    def paginate(self, Bucket, StartAfter=None, Prefix="", Delimiter=None):
+        keys = [
+            key
+            for key in sorted(self.client.get_bucket(Bucket))
+            if key.startswith(Prefix) and (StartAfter is None or key > StartAfter)
+        ]
+        if Delimiter is not None:
+            prefixes = sorted(
+                {Prefix + key[len(Prefix):].split(Delimiter)[0] + Delimiter
+                 for key in keys if Delimiter in key[len(Prefix):]}
+            )
+            keys = [key for key in keys if Delimiter not in key[len(Prefix):]]
+            yield dict(
+                Contents=[self.client.get_listing_entry(Bucket, key) for key in keys],
+                CommonPrefixes=[dict(Prefix=prefix) for prefix in prefixes],
+            )
+            return
+        for i in range(0, len(keys), self.page_size):
+            yield dict(
+                Contents=[self.client.get_listing_entry(Bucket, key) for key in keys[i:i + self.page_size]]
+            )
+
+
+class FakeS3Client:
+    """
+    In memory stand-in of the boto3 S3 client methods used by this project, it keeps the calls made to it
+    """
+
+    def __init__(self, buckets: dict = None):
+        self.buckets: dict = {name: dict(objects) for name, objects in (buckets or {}).items()}
+        self.multipart_uploads: dict = {}
+        self.calls: list = []
+        # (bucket, key): (data, ETag) of objects made by multipart uploads, valid while the object keeps that data
+        self.multipart_etags: dict = {}
+
+    def get_bucket(self, bucket_name: str) -> dict:
+        if bucket_name not in self.buckets:
+            raise ClientError(dict(Error=dict(Code="404", Message="Not Found")), "HeadBucket")
+        return self.buckets[bucket_name]
+
+    def get_data(self, bucket_name: str, key: str) -> bytes:
+        bucket = self.get_bucket(bucket_name)
+        if key not in bucket:
+            raise ClientError(dict(Error=dict(Code="404", Message="Not Found")), "HeadObject")
+        return bucket[key]
+
+    def get_listing_entry(self, bucket_name: str, key: str) -> dict:
+        data = self.buckets[bucket_name][key]
+        multipart_data, etag = self.multipart_etags.get((bucket_name, key), (None, None))
+        return dict(
+            Key=key,
+            Size=len(data),
+            ETag=etag if multipart_data is data else f'"{hashlib.md5(data).hexdigest()}"',
+            LastModified=datetime.datetime(2021, 6, 30, tzinfo=datetime.timezone.utc),
+        )
+
+    def count_calls(self, operation_name: str) -> int:
+        return sum(1 for name, _ in self.calls if name == operation_name)
+
+    def head_bucket(self, Bucket):
+        self.calls.append(("head_bucket", Bucket))
+        self.get_bucket(Bucket)
+        return {}
+
+    def head_object(self, Bucket, Key):
+        self.calls.append(("head_object", Key))
+        self.get_data(Bucket, Key)
+        entry = self.get_listing_entry(Bucket, Key)
+        return dict(ContentLength=entry["Size"], ETag=entry["ETag"], LastModified=entry["LastModified"])
+
+    def get_object(self, Bucket, Key, Range=None, IfMatch=None):
+        self.calls.append(("get_object", Key))
+        data = self.get_data(Bucket, Key)
+        etag = self.get_listing_entry(Bucket, Key)["ETag"]
+        if IfMatch is not None and IfMatch != etag:
+            raise ClientError(dict(Error=dict(Code="PreconditionFailed", Message="Precondition Failed")), "GetObject")
+        response = dict(ETag=etag)
+        if Range is not None:
+            start, end = Range.replace("bytes=", "").split("-")
+            end = min(int(end), len(data) - 1) if end else len(data) - 1
+            response["ContentRange"] = f"bytes {start}-{end}/{len(data)}"
+            data = data[int(start):end + 1]
+        return dict(response, Body=FakeBody(data), ContentLength=len(data))
+
+    def put_object(self, Bucket, Key, Body=b"", **kwargs):
+        self.calls.append(("put_object", Key))
+        data = Body if isinstance(Body, bytes) else Body.read()
+        self.get_bucket(Bucket)[Key] = data
+        return dict(ETag=f'"{hashlib.md5(data).hexdigest()}"')
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        self.calls.append(("create_multipart_upload", Key))
+        upload_id = f"upload-{len(self.multipart_uploads)}"
+        self.multipart_uploads[upload_id] = dict(bucket=Bucket, key=Key, parts={})
+        return dict(UploadId=upload_id)
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.calls.append(("upload_part", Key))
+        data = bytes(Body) if isinstance(Body, (bytes, bytearray, memoryview)) else Body.read()
+        self.multipart_uploads[UploadId]["parts"][PartNumber] = data
+        return dict(ETag=f'"{hashlib.md5(data).hexdigest()}"')
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self.calls.append(("complete_multipart_upload", Key))
+        upload = self.multipart_uploads.pop(UploadId)
+        parts = upload["parts"]
+        data = b"".join(parts[part["PartNumber"]] for part in MultipartUpload["Parts"])
+        digests = b"".join(hashlib.md5(parts[part["PartNumber"]]).digest() for part in MultipartUpload["Parts"])
+        etag = f'"{hashlib.md5(digests).hexdigest()}-{len(MultipartUpload["Parts"])}"'
+        self.get_bucket(Bucket)[Key] = data
+        self.multipart_etags[(Bucket, Key)] = (data, etag)
+        return dict(ETag=etag)
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.calls.append(("abort_multipart_upload", Key))
+        self.multipart_uploads.pop(UploadId, None)
+        return {}
+
+    def copy_object(self, Bucket, Key, CopySource, **kwargs):
+        self.calls.append(("copy_object", Key))
+        self.get_bucket(Bucket)[Key] = self.get_data(CopySource["Bucket"], CopySource["Key"])
+        return {}
+
+    def delete_object(self, Bucket, Key):
+        self.calls.append(("delete_object", Key))
+        self.get_bucket(Bucket).pop(Key, None)
+        return {}
+
+    def list_objects_v2(self, Bucket, MaxKeys=1000, StartAfter=None, Prefix=""):
+        self.calls.append(("list_objects_v2", Bucket))
+        page = next(iter(FakePaginator(self, MaxKeys).paginate(Bucket, StartAfter, Prefix)), {})
+        return dict(Contents=page.get("Contents", []))
+
+    def get_paginator(self, operation_name: str) -> FakePaginator:
+        return FakePaginator(self)
+
+    def download_file(self, Bucket, Key, Filename, **kwargs):
+        self.calls.append(("download_file", Key))
+        with open(Filename, "wb") as file_obj:
+            file_obj.write(self.get_data(Bucket, Key))
+
+    def download_fileobj(self, Bucket, Key, Fileobj, **kwargs):
+        self.calls.append(("download_fileobj", Key))
+        Fileobj.write(self.get_data(Bucket, Key))
+
+    def upload_file(self, Filename, Bucket, Key, **kwargs):
+        self.calls.append(("upload_file", Key))
+        with open(Filename, "rb") as file_obj:
+            self.get_bucket(Bucket)[Key] = file_obj.read()
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, **kwargs):
+        self.calls.append(("upload_fileobj", Key))
+        self.get_bucket(Bucket)[Key] = Fileobj.read()
@@ -1,10 +1,20 @@
 import datetime
+import gzip
+import io
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from unittest import TestCase
 from unittest import mock
 
 from botocore.exceptions import ClientError
 
 import aws
+from journal import CLEANED, UPLOADED, UPLOADING, UpdateJournal
+from utils import update_file_by_tuples
+
+FILES_PATH: str = os.path.join(os.path.dirname(__file__), "files")
 
 
 class AwsTest(TestCase):
@@ -14,6 +24,18 @@ class AwsTest(TestCase):
         boto3_session.return_value = mock.MagicMock(resource=mock.MagicMock())
         self.aws_session = aws.AWSSession()
 
+    @mock.patch('aws.atexit.register')
+    @mock.patch('aws.decouple.config',
+                side_effect=lambda name, default=None, cast=None: 'metrics.prom' if name == 'S3_METRICS_FILE' else default)
+    @mock.patch('aws.boto3.Session')
+    def test_metrics_file_is_written_at_exit(self, boto3_session, config, atexit_register):
+        aws_session = aws.AWSSession()
+        atexit_register.assert_called_once_with(aws_session.export_metrics, 'metrics.prom')
+        aws_session.request_metrics = mock.MagicMock()
+        aws_session.export_metrics('metrics.prom')
+        self.assertEqual('metrics.prom', aws_session.request_metrics.export.call_args.args[0])
+        self.assertIn('throttling_concurrency_limit', aws_session.request_metrics.export.call_args.args[1])
+
     def test_retrieve_obj_list(self):
         date = mock.MagicMock(size=1000, key='key', last_modified='today')
         dates = mock.Mock(return_value=[date])
@@ -27,6 +49,42 @@ class AwsTest(TestCase):
             'url': 'https://s3.amazonaws.com/bucket_name/key'
         }], self.aws_session.retrieve_obj_list('bucket_name'))
 
+    @mock.patch('aws.iter_objects_in_parallel')
+    def test_retrieve_obj_list_with_listing_workers(self, iter_objects_in_parallel):
+        iter_objects_in_parallel.return_value = iter([{'Key': 'key', 'Size': 1000, 'LastModified': 'today'}])
+        self.aws_session.listing_workers = 4
+        self.assertEqual([{
+            'name': 'key',
+            'size': 0.00095367431640625,
+            'last_modified': 'today',
+            'url': 'https://s3.amazonaws.com/bucket_name/key'
+        }], self.aws_session.retrieve_obj_list('bucket_name'))
+        self.assertEqual(4, iter_objects_in_parallel.call_args.kwargs['max_workers'])
+
+    def test_retrieve_obj_list_from_inventory(self):
+        inventory = mock.MagicMock()
+        inventory.list_objects.return_value = [
+            {'key': 'key', 'size': 1000, 'etag': '"etag"', 'last_modified': 'today'}]
+        self.aws_session.inventory = inventory
+        self.assertEqual([{
+            'name': 'key',
+            'size': 0.00095367431640625,
+            'last_modified': 'today',
+            'url': 'https://s3.amazonaws.com/bucket_name/key'
+        }], self.aws_session.retrieve_obj_list('bucket_name'))
+        self.aws_session.retrieve_obj_list('bucket_name')
+        # inventory is refreshed only once per session
+        inventory.refresh.assert_called_once()
+
+    def test_check_file_exists_with_inventory(self):
+        inventory = mock.MagicMock()
+        inventory.contains.return_value = False
+        self.aws_session.inventory = inventory
+        self.aws_session.session.resource = mock.MagicMock()
+        self.assertFalse(self.aws_session.check_file_exists('bucket_name', '2020-05-08.transaction.gz'))
+        inventory.contains.assert_called_with('bucket_name', '2020-05-08.transaction.gz')
+        self.aws_session.session.resource.assert_not_called()
+
     def test_check_bucket_exists_true(self):
         bucket = mock.MagicMock(
             meta=mock.MagicMock(client=mock.MagicMock(head_bucket=mock.MagicMock(return_value=True))))
@@ -96,6 +154,59 @@ class AwsTest(TestCase):
         self.aws_session.session.resource = mock.MagicMock()
         self.assertEqual('url', self.aws_session.send_object_to_bucket('obj', 'key', 'bucket_name'))
 
+    @mock.patch('aws.AWSSession._build_url')
+    def test_send_file_to_bucket_with_a_budget_smaller_than_a_transfer(self, build_url):
+        self.aws_session.buffer_pool = aws.BufferPool(1024 ** 2)
+        self.aws_session.session.resource = mock.MagicMock()
+        self.aws_session.send_file_to_bucket('path', 'key', 'bucket_name')
+        self.aws_session.download_object_from_bucket('key', 'bucket_name', 'path')
+        upload_file = self.aws_session.session.resource.return_value.Bucket.return_value.upload_file
+        self.assertEqual(1, upload_file.call_args.kwargs['Config'].max_concurrency)
+
+    @mock.patch('aws.AWSSession._build_url')
+    def test_send_file_to_bucket_with_extra_args(self, build_url):
+        self.aws_session.session.resource = mock.MagicMock()
+        self.aws_session.send_file_to_bucket('path', 'key', 'bucket_name', aws.get_upload_extra_args('private'))
+        upload_file = self.aws_session.session.resource.return_value.Bucket.return_value.upload_file
+        self.assertEqual(dict(ACL='private'), upload_file.call_args.kwargs['ExtraArgs'])
+        self.aws_session.send_file_to_bucket('path', 'key', 'bucket_name')
+        self.assertIsNone(upload_file.call_args.kwargs['ExtraArgs'])
+
+    @mock.patch('aws.AWSSession._build_url')
+    def test_send_object_to_bucket_sets_acl_in_the_upload(self, build_url):
+        self.aws_session.session.resource = mock.MagicMock()
+        s3 = self.aws_session.session.resource.return_value
+        self.aws_session.send_object_to_bucket('obj', 'key', 'bucket_name')
+        self.assertEqual(dict(ACL='public-read'), s3.Bucket.return_value.upload_fileobj.call_args.kwargs['ExtraArgs'])
+        s3.Object.return_value.Acl.assert_not_called()
+        self.aws_session.send_object_to_bucket('obj', 'key', 'bucket_name', dict(ACL='private', ContentType='text/csv'))
+        self.assertEqual(dict(ACL='private', ContentType='text/csv'),
+                         s3.Bucket.return_value.upload_fileobj.call_args.kwargs['ExtraArgs'])
+
+    @mock.patch('aws.AWSSession._build_url')
+    def test_send_object_to_bucket_takes_the_inventory_size_from_the_object(self, build_url):
+        self.aws_session.session.resource = mock.MagicMock()
+        self.aws_session.inventory = mock.MagicMock()
+        s3 = self.aws_session.session.resource.return_value
+        s3.Bucket.return_value.upload_fileobj.side_effect = lambda obj, *args, **kwargs: obj.read()
+        obj = io.BytesIO(b'header|1|2')
+        obj.seek(7)
+        self.aws_session.send_object_to_bucket(obj, 'key', 'bucket_name')
+        self.aws_session.inventory.put_object.assert_called_with('bucket_name', 'key', 3)
+        read, write = os.pipe()
+        os.write(write, b'1|2|3|4')
+        os.close(write)
+        with open(read, 'rb', buffering=0) as pipe:
+            self.aws_session.send_object_to_bucket(pipe, 'key', 'bucket_name')
+        self.aws_session.inventory.put_object.assert_called_with('bucket_name', 'key', 7)
+        # no HEAD request after the upload
+        s3.Object.assert_not_called()
+
+    def test_get_upload_extra_args(self):
+        self.assertEqual({}, aws.get_upload_extra_args())
+        self.assertEqual(dict(ContentType='text/csv', CacheControl='no-cache'),
+                         aws.get_upload_extra_args(content_type='text/csv', cache_control='no-cache'))
+
     def test_delete_object_in_bucket(self):
         bucket = mock.MagicMock()
         bucket.Object.return_value = bucket
@@ -173,8 +284,8 @@ class AwsTest(TestCase):
                                                           extension_list)
 
     @mock.patch('aws.get_file_object')
-    @mock.patch('aws.retrieve_objects_with_pattern')
-    def test_update_files_from_bucket(self, retrieve_objects_with_pattern, get_file_object):
+    @mock.patch('aws.KeyIndex')
+    def test_update_files_from_bucket(self, key_index, get_file_object):
         date_list: list = [datetime.datetime(2021,5,30), datetime.datetime(2021,6,29)]
         bucket_name: str = "adatrap-bip123"
         extension: str = '.bip*'
@@ -182,7 +293,267 @@ class AwsTest(TestCase):
         destination_path: str = ""
         obj_list = [{"name":"2021-05-30.bip"},{"name": "2021-06-29.bip.gz"}]
         get_file_object.return_value = mock.MagicMock()
-        retrieve_objects_with_pattern.return_value =mock.MagicMock()
+        key_index.from_object_list.return_value = mock.MagicMock()
         self.aws_session.retrieve_obj_list = mock.MagicMock(return_value=obj_list)
         self.aws_session.download_object_from_bucket = mock.MagicMock()
-        self.aws_session.update_files_from_bucket(date_list, bucket_name, extension, tuples_list, destination_path,)
\ No newline at end of file
+        self.aws_session.update_files_from_bucket(date_list, bucket_name, extension, tuples_list, destination_path,)
+
+    def test_update_files_from_bucket_streaming(self):
+        date_list: list = [datetime.datetime(2021, 5, 30), datetime.datetime(2021, 6, 29)]
+        obj_list = [{"name": "2021-05-30.bip", "size": 1.0}, {"name": "2021-06-30.bip.gz", "size": 1.0}]
+        self.aws_session.retrieve_obj_list = mock.MagicMock(return_value=obj_list)
+        self.aws_session.update_object = mock.MagicMock()
+        self.aws_session.update_object_streaming = mock.MagicMock(
+            return_value=dict(key="2021-05-30.bip", size=10, replacements=[4]))
+        stats = self.aws_session.update_files_from_bucket(date_list, "bucket", ".bip*", [["1", "2", "3"]], None,
+                                                          streaming=True)
+        self.aws_session.update_object_streaming.assert_called_once_with(
+            "2021-05-30.bip", "bucket", [["1", "2", "3"]], None, 1024 ** 2, None, None)
+        self.aws_session.update_object.assert_not_called()
+        self.assertEqual({"objects": 1, "unchanged": 0, "bytes": 1024 ** 2, "replacements": [4]}, stats)
+
+    def test_update_files_from_bucket_without_replacements(self):
+        date_list: list = [datetime.datetime(2021, 5, 30)]
+        self.aws_session.retrieve_obj_list = mock.MagicMock(return_value=[{"name": "2021-05-30.bip", "size": 1.0}])
+        self.aws_session.inventory = mock.MagicMock()
+        self.aws_session.update_object = mock.MagicMock(
+            return_value=dict(key="2021-05-30.bip", size=None, replacements=[0, 0]))
+        with self.assertLogs('aws', level='INFO') as f:
+            stats = self.aws_session.update_files_from_bucket(
+                date_list, "bucket", ".bip*", [["1", "2", "3"], ["7", "LABORAL", "FERIADO"]], None)
+        self.assertEqual({"objects": 0, "unchanged": 1, "bytes": 1024 ** 2, "replacements": [0, 0]}, stats)
+        self.assertIn('INFO:aws:Update summary: 0 objects updated (0.0 MB), 1 unchanged, 0 failed', f.output[-2])
+        self.assertEqual('INFO:aws:Cells replaced (Total): [1,2,3] 0, [7,LABORAL,FERIADO] 0', f.output[-1])
+        self.aws_session.inventory.put_object.assert_not_called()
+
+    def test_update_files_from_bucket_with_target_throughput(self):
+        date_list: list = [datetime.datetime(2021, 5, 30)]
+        self.aws_session.retrieve_obj_list = mock.MagicMock(return_value=[{"name": "2021-05-30.bip.gz", "size": 1.0}])
+        self.aws_session.choose_compresslevel = mock.MagicMock(return_value=3)
+        self.aws_session.update_object = mock.MagicMock(
+            return_value=dict(key="2021-05-30.bip.gz", size=10, replacements=[1]))
+        self.aws_session.update_files_from_bucket(date_list, "bucket", ".bip*", [["1", "2", "3"]], None,
+                                                  target_throughput=50)
+        self.aws_session.choose_compresslevel.assert_called_once_with("2021-05-30.bip.gz", "bucket", None, 50, 1024 ** 2)
+        self.aws_session.update_object.assert_called_once_with(
+            "2021-05-30.bip.gz", "bucket", [["1", "2", "3"]], None, None, 3)
+
+    def test_scan_files_from_bucket(self):
+        date_list: list = [datetime.datetime(2021, 5, 30)]
+        self.aws_session.retrieve_obj_list = mock.MagicMock(return_value=[{"name": "2021-05-30.bip", "size": 1.0}])
+        self.aws_session.update_object = mock.MagicMock()
+        self.aws_session.scan_object = mock.MagicMock(return_value=[5])
+        with self.assertLogs('aws', level='INFO') as f:
+            stats = self.aws_session.update_files_from_bucket(date_list, "bucket", ".bip*", [["1", "2", "3"]], None,
+                                                              scan=True)
+        self.aws_session.scan_object.assert_called_once_with("2021-05-30.bip", "bucket", [["1", "2", "3"]], 1024 ** 2)
+        self.aws_session.update_object.assert_not_called()
+        self.assertEqual(0, stats["objects"])
+        self.assertEqual([5], stats["replacements"])
+        self.assertIn('INFO:aws:Cells replaced (2021-05-30.bip): [1,2,3] 5', f.output)
+
+    @mock.patch('aws.update_object_streaming')
+    def test_update_object_streaming_keeps_backup_in_destination_path(self, update_object_streaming):
+        update_object_streaming.return_value = dict(key="2021-05-30.bip.gz", size=10, replacements=[1])
+        self.aws_session.update_object_streaming("2021-05-30.bip.gz", "bucket", [["1", "2", "3"]], "data", 20)
+        self.assertEqual(
+            "data/2021-05-30.bip.gz.old-version", update_object_streaming.call_args.kwargs["backup_file_path"])
+
+    @mock.patch('aws.AWSSession.update_object_streaming')
+    @mock.patch('aws.ProcessPoolExecutor', ThreadPoolExecutor)
+    def test_update_files_from_bucket_with_workers(self, update_object_streaming):
+        update_object_streaming.side_effect = [
+            dict(key="2021-05-30.bip", size=10, replacements=[2]), ClientError({'Error': {'Code': '500'}}, 'PutObject')]
+        date_list: list = [datetime.datetime(2021, 5, 30), datetime.datetime(2021, 6, 30)]
+        obj_list = [{"name": "2021-05-30.bip", "size": 1.0}, {"name": "2021-06-30.bip.gz", "size": 1.0}]
+        self.aws_session.retrieve_obj_list = mock.MagicMock(return_value=obj_list)
+        self.aws_session.inventory = mock.MagicMock()
+        with self.assertLogs('aws', level='INFO') as f:
+            stats = self.aws_session.update_files_from_bucket(date_list, "bucket", ".bip*", [["1", "2", "3"]], None,
+                                                              streaming=True, workers=2)
+        self.assertEqual(2, update_object_streaming.call_count)
+        self.assertEqual({"objects": 1, "unchanged": 0, "bytes": 1024 ** 2, "replacements": [2]}, stats)
+        self.assertIn('INFO:aws:Update summary: 1 objects updated (1.0 MB), 1 failed', f.output[-3])
+        self.assertTrue(any(line.startswith('ERROR:aws:[2021-0') for line in f.output))
+        self.aws_session.inventory.put_object.assert_called_once()
+
+    @mock.patch('aws.AWSSession.update_object_streaming')
+    def test_update_files_from_bucket_continues_after_a_corrupt_object(self, update_object_streaming):
+        update_object_streaming.side_effect = [
+            OSError("Not a gzipped file"), dict(key="2021-06-30.bip.gz", size=10, replacements=[2])]
+        date_list: list = [datetime.datetime(2021, 5, 30), datetime.datetime(2021, 6, 30)]
+        obj_list = [{"name": "2021-05-30.bip.gz", "size": 1.0}, {"name": "2021-06-30.bip.gz", "size": 1.0}]
+        self.aws_session.retrieve_obj_list = mock.MagicMock(return_value=obj_list)
+        with self.assertLogs('aws', level='INFO') as f:
+            stats = self.aws_session.update_files_from_bucket(date_list, "bucket", ".bip*", [["1", "2", "3"]], None,
+                                                              streaming=True)
+        self.assertEqual(1, stats["objects"])
+        self.assertIn('ERROR:aws:2021-05-30.bip.gz: Not a gzipped file', f.output)
+        self.assertTrue(any('1 objects updated (1.0 MB), 1 failed' in line for line in f.output))
+        self.assertIn('INFO:aws:Failed object 2021-05-30.bip.gz: Not a gzipped file', f.output)
+
+    @mock.patch('aws._run_update_job')
+    @mock.patch('aws._init_update_worker')
+    @mock.patch('aws.os.cpu_count', return_value=8)
+    @mock.patch('aws.ProcessPoolExecutor', ThreadPoolExecutor)
+    def test_update_workers_share_the_cpus(self, cpu_count, init_update_worker, run_update_job):
+        run_update_job.side_effect = lambda job: dict(
+            key=job["data_filename"], status="unchanged", bytes=10, updated_key=job["data_filename"], updated_size=0,
+            replacements=[0], error=None)
+        date_list: list = [datetime.datetime(2021, 5, 30), datetime.datetime(2021, 6, 30)]
+        obj_list = [{"name": "2021-05-30.bip", "size": 1.0}, {"name": "2021-06-30.bip.gz", "size": 1.0}]
+        self.aws_session.retrieve_obj_list = mock.MagicMock(return_value=obj_list)
+        with self.assertLogs('aws', level='INFO'):
+            self.aws_session.update_files_from_bucket(date_list, "bucket", ".bip*", [["1", "2", "3"]], None,
+                                                      streaming=True, workers=3)
+        # 3 workers compress with 2 threads each instead of 8
+        self.assertEqual(2, init_update_worker.call_args.args[-1])
+
+    @mock.patch('aws._run_update_job')
+    @mock.patch('aws.ProcessPoolExecutor', ThreadPoolExecutor)
+    def test_update_files_from_bucket_continues_after_a_worker_error(self, run_update_job):
+        def run_job(job):
+            if job["data_filename"] != "2021-05-30.bip":
+                raise MemoryError()
+            return dict(key=job["data_filename"], status="updated", bytes=10, updated_key=job["data_filename"],
+                        updated_size=10, replacements=[2], error=None)
+
+        run_update_job.side_effect = run_job
+        date_list: list = [datetime.datetime(2021, 5, 30), datetime.datetime(2021, 6, 30)]
+        obj_list = [{"name": "2021-05-30.bip", "size": 1.0}, {"name": "2021-06-30.bip.gz", "size": 1.0}]
+        self.aws_session.retrieve_obj_list = mock.MagicMock(return_value=obj_list)
+        with self.assertLogs('aws', level='INFO') as f:
+            stats = self.aws_session.update_files_from_bucket(date_list, "bucket", ".bip*", [["1", "2", "3"]], None,
+                                                              streaming=True, workers=2)
+        self.assertEqual(1, stats["objects"])
+        self.assertIn('ERROR:aws:2021-06-30.bip.gz: MemoryError', f.output)
+
+    def test_update_object_without_intermediate_files(self):
+        tuples_list: list = [["7", "LABORAL", "FERIADO"]]
+        with tempfile.TemporaryDirectory() as directory:
+            expected_file: str = os.path.join(directory, "expected")
+            update_file_by_tuples(os.path.join(FILES_PATH, "2021-06-30.bip"), expected_file, tuples_list)
+            with open(expected_file, "rb") as file_obj:
+                expected_data: bytes = file_obj.read()
+            os.remove(expected_file)
+            uploaded: dict = {}
+
+            def send_file_to_bucket(file_path, file_name, bucket_name):
+                with open(file_path, "rb") as file_obj:
+                    uploaded[file_name] = file_obj.read()
+
+            self.aws_session.download_object_from_bucket = mock.MagicMock(
+                side_effect=lambda key, bucket, path: shutil.copy(os.path.join(FILES_PATH, key), path))
+            self.aws_session.send_file_to_bucket = mock.MagicMock(side_effect=send_file_to_bucket)
+            update = self.aws_session.update_object("2021-06-30.bip.gz", "bucket", tuples_list, directory)
+
+            self.assertEqual(["2021-06-30.bip.gz.old-version"], os.listdir(directory))
+        self.assertEqual(expected_data, gzip.decompress(uploaded["2021-06-30.bip.gz"]))
+        self.assertEqual(
+            dict(key="2021-06-30.bip.gz", size=len(uploaded["2021-06-30.bip.gz"]), replacements=[10]), update)
+
+    def test_update_object_resumes_from_journal(self):
+        tuples_list: list = [["7", "LABORAL", "FERIADO"]]
+        self.aws_session.journal = UpdateJournal(":memory:", "job")
+        with tempfile.TemporaryDirectory() as directory:
+            self.aws_session.download_object_from_bucket = mock.MagicMock(
+                side_effect=lambda key, bucket, path: shutil.copy(os.path.join(FILES_PATH, key), path))
+            # the previous run stopped after the upload, before removing the local updated file
+            self.aws_session.send_file_to_bucket = mock.MagicMock(side_effect=ClientError({}, "PutObject"))
+            with self.assertRaises(ClientError):
+                self.aws_session.update_object("2021-06-30.bip.gz", "bucket", tuples_list, directory)
+            self.aws_session.journal.set_state("bucket", "2021-06-30.bip.gz", UPLOADED)
+            self.aws_session.download_object_from_bucket.reset_mock()
+            self.aws_session.send_file_to_bucket = mock.MagicMock()
+
+            update = self.aws_session.update_object("2021-06-30.bip.gz", "bucket", tuples_list, directory)
+
+            self.assertEqual(["2021-06-30.bip.gz.old-version"], os.listdir(directory))
+        self.aws_session.download_object_from_bucket.assert_not_called()
+        self.aws_session.send_file_to_bucket.assert_not_called()
+        self.assertEqual([10], update["replacements"])
+        self.assertTrue(self.aws_session.journal.is_cleaned("bucket", "2021-06-30.bip.gz"))
+
+    def test_interrupted_streaming_update_is_not_applied_twice(self):
+        self.aws_session.journal = UpdateJournal(":memory:", "job")
+        self.aws_session.journal.set_state("bucket", "2021-06-30.bip.gz", UPLOADING, updated_key="2021-06-30.bip.zst",
+                                           updated_size=10, replacements=[4], updated_etag='"abc-2"')
+        journal_object = self.aws_session.journal.get_object("bucket", "2021-06-30.bip.gz")
+        client = self.aws_session.session.client.return_value
+        self.aws_session.delete_object_in_bucket = mock.MagicMock()
+        self.aws_session.update_object_streaming = mock.MagicMock(
+            return_value=dict(key="2021-06-30.bip.zst", size=12, replacements=[4]))
+        # the upload was not published, the object is another one and it is updated again
+        client.head_object.return_value = dict(ETag='"def"', ContentLength=10,
+                                               LastModified=journal_object["updated_at"])
+        with self.assertLogs('aws', level='INFO'):
+            result = self.aws_session.update_object_job("2021-06-30.bip.gz", "bucket", [["1", "2", "3"]], None, 20,
+                                                        True)
+        self.assertEqual(12, result["updated_size"])
+        self.aws_session.update_object_streaming.assert_called_once()
+
+        self.aws_session.journal.set_state("bucket", "2021-06-30.bip.gz", UPLOADING, updated_key="2021-06-30.bip.zst",
+                                           updated_size=10, replacements=[4], updated_etag='"abc-2"')
+        self.aws_session.update_object_streaming.reset_mock()
+        # LastModified of a multipart object is the start of the upload, before the journal state
+        client.head_object.return_value = dict(ETag='"abc-2"', ContentLength=10,
+                                               LastModified=journal_object["updated_at"] - datetime.timedelta(hours=1))
+        with self.assertLogs('aws', level='INFO'):
+            result = self.aws_session.update_object_job("2021-06-30.bip.gz", "bucket", [["1", "2", "3"]], None, 20,
+                                                        True)
+        self.aws_session.update_object_streaming.assert_not_called()
+        self.aws_session.delete_object_in_bucket.assert_called_once_with("2021-06-30.bip.gz", "bucket")
+        self.assertEqual(("updated", "2021-06-30.bip.zst", 10, [4]),
+                         (result["status"], result["updated_key"], result["updated_size"], result["replacements"]))
+        self.assertTrue(self.aws_session.journal.is_cleaned("bucket", "2021-06-30.bip.gz"))
+
+    def test_update_object_reuses_downloaded_backup(self):
+        self.aws_session.journal = UpdateJournal(":memory:", "job")
+        with tempfile.TemporaryDirectory() as directory:
+            self.aws_session.download_object_from_bucket = mock.MagicMock(
+                side_effect=lambda key, bucket, path: shutil.copy(os.path.join(FILES_PATH, key), path))
+            self.aws_session.send_file_to_bucket = mock.MagicMock()
+            with mock.patch("aws.update_bytes_stream_by_tuples", side_effect=OSError("disk full")):
+                with self.assertRaises(OSError):
+                    self.aws_session.update_object("2021-06-30.bip.gz", "bucket", [["7", "LABORAL", "FERIADO"]],
+                                                   directory)
+            update = self.aws_session.update_object("2021-06-30.bip.gz", "bucket", [["7", "LABORAL", "FERIADO"]],
+                                                    directory)
+        self.aws_session.download_object_from_bucket.assert_called_once()
+        self.assertEqual([10], update["replacements"])
+
+    def test_throttles_are_counted_by_the_job_runner(self):
+        def update_object(key, *args):
+            self.aws_session.throttling.limiter.release(self.aws_session.throttling.limiter.acquire(), throttled=True)
+            return dict(key=key, size=10, replacements=[2])
+
+        self.aws_session.update_object_streaming = mock.MagicMock(side_effect=update_object)
+        job: dict = dict(data_filename="2021-06-30.bip", bucket_name="bucket", tuples_list=[["1", "2", "3"]],
+                         destination_path=None, size=20, streaming=True)
+        with self.assertLogs('aws', level='INFO'):
+            # jobs run at the same time (a manifest) share the session counter, they do not report throttles
+            self.assertNotIn("throttle_events", self.aws_session.update_object_job(**job))
+            self.assertEqual(1, self.aws_session.run_update_job(job)["throttle_events"])
+
+    def test_completed_job_is_not_repeated(self):
+        date_list: list = [datetime.datetime(2021, 5, 30), datetime.datetime(2021, 6, 30)]
+        obj_list = [{"name": "2021-05-30.bip", "size": 1.0}, {"name": "2021-06-30.bip.gz", "size": 1.0}]
+        self.aws_session.journal = UpdateJournal(":memory:", "job")
+        self.aws_session.journal.set_state("bucket", "2021-05-30.bip", CLEANED, replacements=[1])
+        self.aws_session.retrieve_obj_list = mock.MagicMock(return_value=obj_list)
+        self.aws_session.update_object_streaming = mock.MagicMock(
+            side_effect=lambda key, *args: self.aws_session.record_journal_state(
+                "bucket", key, CLEANED) or dict(key=key, size=10, replacements=[2]))
+        with self.assertLogs('aws', level='INFO') as f:
+            stats = self.aws_session.update_files_from_bucket(date_list, "bucket", ".bip*", [["1", "2", "3"]], None,
+                                                              streaming=True)
+        self.aws_session.update_object_streaming.assert_called_once()
+        self.assertEqual({"objects": 1, "unchanged": 0, "bytes": 1024 ** 2, "replacements": [2]}, stats)
+        self.assertIn('INFO:aws:Update summary: 1 objects updated (1.0 MB), 1 skipped, 0 failed', f.output[-2])
+        self.assertEqual({"2021-05-30", "2021-06-30"}, self.aws_session.journal.get_completed_dates("bucket"))
+
+        self.aws_session.retrieve_obj_list.reset_mock()
+        stats = self.aws_session.update_files_from_bucket(date_list, "bucket", ".bip*", [["1", "2", "3"]], None,
+                                                          streaming=True)
+        self.aws_session.retrieve_obj_list.assert_not_called()
+        self.assertEqual(0, stats["objects"])
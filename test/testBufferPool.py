@@ -0,0 +1,120 @@
+import threading
+import time
+from unittest import TestCase
+
+from buffer_pool import BufferPool, get_transfer_config, get_transfer_memory
+from multipart import MIN_PART_SIZE, MultipartUploadWriter, upload_stream
+from test.fake_s3 import FakeS3Client
+from test.testMultipart import PipeStream
+
+
+class TestBufferPool(TestCase):
+    def test_released_buffers_are_reused(self):
+        pool: BufferPool = BufferPool(100)
+        buffer: bytearray = pool.acquire(40)
+        self.assertEqual(40, len(buffer))
+        pool.release(buffer)
+        self.assertIs(buffer, pool.acquire(40))
+        self.assertEqual(40, pool.get_metrics()["memory_in_use_bytes"])
+
+    def test_kept_buffers_are_dropped_for_other_sizes(self):
+        pool: BufferPool = BufferPool(100)
+        for buffer in [pool.acquire(40), pool.acquire(40)]:
+            pool.release(buffer)
+        self.assertEqual(90, len(pool.acquire(90)))
+        self.assertIsNone(pool.acquire(20, blocking=False))
+
+    def test_acquire_waits_for_a_release(self):
+        pool: BufferPool = BufferPool(100)
+        buffer: bytearray = pool.acquire(60)
+        self.assertIsNone(pool.acquire(60, blocking=False))
+        acquired: list = []
+        thread = threading.Thread(target=lambda: acquired.append(pool.acquire(60)))
+        thread.start()
+        time.sleep(0.05)
+        self.assertEqual([], acquired)
+        pool.release(buffer)
+        thread.join(1)
+        self.assertEqual(1, len(acquired))
+        metrics: dict = pool.get_metrics()
+        self.assertEqual(1, metrics["memory_waits"])
+        self.assertEqual(60, metrics["memory_peak_bytes"])
+
+    def test_reserve_counts_while_the_block_runs(self):
+        pool: BufferPool = BufferPool(100)
+        with pool.reserve(70):
+            self.assertIsNone(pool.acquire(40, blocking=False))
+        self.assertEqual(0, pool.get_metrics()["memory_in_use_bytes"])
+        self.assertIsNotNone(pool.acquire(40, blocking=False))
+
+    def test_buffers_bigger_than_the_budget_run_alone(self):
+        pool: BufferPool = BufferPool(100)
+        buffer: bytearray = pool.acquire(10)
+        self.assertIsNone(pool.acquire(101, blocking=False))
+        pool.release(buffer)
+        # the kept buffer is dropped
+        self.assertEqual(101, len(pool.acquire(101, blocking=False)))
+        self.assertIsNone(pool.acquire(1, blocking=False))
+
+    def test_transfer_uses_the_parts_the_budget_allows(self):
+        pool: BufferPool = BufferPool(3 * MIN_PART_SIZE)
+        with pool.transfer(MIN_PART_SIZE) as config:
+            self.assertEqual(3, config.max_concurrency)
+            self.assertEqual(
+                3 * MIN_PART_SIZE, pool.get_metrics()["memory_in_use_bytes"]
+            )
+        pool = BufferPool(16 * 1024**2)
+        with pool.transfer() as config:
+            self.assertEqual(2, config.max_concurrency)
+        # a budget smaller than a part gives transfers of one part that run alone
+        pool = BufferPool(1024**2)
+        with pool.transfer() as config:
+            self.assertEqual(1, config.max_concurrency)
+        self.assertEqual(0, pool.get_metrics()["memory_in_use_bytes"])
+
+    def test_transfer_config_fits_the_transfer_memory(self):
+        config = get_transfer_config(MIN_PART_SIZE, 2)
+        self.assertEqual(2 * MIN_PART_SIZE, get_transfer_memory(MIN_PART_SIZE, 2))
+        self.assertEqual(2, config.max_concurrency)
+        self.assertEqual(2, config.max_in_memory_upload_chunks)
+        self.assertEqual(2 * MIN_PART_SIZE, config.max_io_queue * config.io_chunksize)
+
+
+class TestTransfersWithBufferPool(TestCase):
+    def setUp(self) -> None:
+        self.client = FakeS3Client(dict(bucket={}))
+
+    def test_stream_upload_uses_the_buffers_the_budget_allows(self):
+        pool: BufferPool = BufferPool(2 * MIN_PART_SIZE)
+        data: bytes = bytes(range(256)) * (MIN_PART_SIZE // 256) * 4
+        with pool.reserve(MIN_PART_SIZE):
+            upload_stream(
+                self.client,
+                PipeStream(data),
+                "bucket",
+                "key",
+                MIN_PART_SIZE,
+                4,
+                buffer_pool=pool,
+            )
+        self.assertEqual(data, self.client.buckets["bucket"]["key"])
+        metrics: dict = pool.get_metrics()
+        self.assertEqual(2 * MIN_PART_SIZE, metrics["memory_peak_bytes"])
+        self.assertEqual(0, metrics["memory_in_use_bytes"])
+
+    def test_writer_gives_its_buffer_back(self):
+        pool: BufferPool = BufferPool(MIN_PART_SIZE)
+        with MultipartUploadWriter(
+            self.client, "bucket", "a", MIN_PART_SIZE, buffer_pool=pool
+        ) as writer:
+            writer.write(b"1|2\n")
+            self.assertEqual(MIN_PART_SIZE, pool.get_metrics()["memory_in_use_bytes"])
+        writer = MultipartUploadWriter(
+            self.client, "bucket", "b", MIN_PART_SIZE, buffer_pool=pool
+        )
+        writer.write(b"0" * (MIN_PART_SIZE + 1))
+        with self.assertLogs("multipart", level="INFO"):
+            writer.abort()
+        self.assertEqual(0, pool.get_metrics()["memory_in_use_bytes"])
+        self.assertEqual(b"1|2\n", self.client.buckets["bucket"]["a"])
+        self.assertNotIn("b", self.client.buckets["bucket"])
@@ -0,0 +1,82 @@
+import io
+import os
+from unittest import TestCase, mock, skipIf
+
+import columnar
+from columnar import np, supports_tables, update_lines_vectorized, use_vectorized_engine
+from utils import compile_tuples, update_bytes_stream_by_tuples, update_file_by_tuples
+
+FILES_PATH: str = os.path.join(os.path.dirname(__file__), "files")
+
+
+def get_column_tables(tuple_list: list) -> list:
+    return [
+        (column_index, {key.encode(): value.encode() for key, value in table.items()})
+        for column_index, table in compile_tuples(tuple_list)
+    ]
+
+
+def update_with_row_engine(data: bytes, tuple_list: list) -> bytes:
+    output_stream: io.BytesIO = io.BytesIO()
+    update_bytes_stream_by_tuples(io.BytesIO(data), output_stream, tuple_list)
+    return output_stream.getvalue()
+
+
+@skipIf(np is None, "NumPy is not installed")
+class TestUpdateLinesVectorized(TestCase):
+    def assert_same_output(self, data: bytes, tuple_list: list):
+        self.assertEqual(
+            update_with_row_engine(data, tuple_list),
+            update_lines_vectorized(data, get_column_tables(tuple_list), b"|"),
+        )
+
+    def test_fixture(self):
+        with open(os.path.join(FILES_PATH, "2021-06-30.bip"), "rb") as file_obj:
+            data: bytes = file_obj.read()
+        self.assert_same_output(data, [["3", "2", "1"], ["7", "LABORAL", "FERIADO"], ["5", "201R", "202R"]])
+
+    def test_special_rows(self):
+        data: bytes = b"x\n\na|b|c|2\nx|\n|\xc3\xb1|2|3|2|5|6|LABORAL\nlast|1|2|2"
+        tuple_list: list = [["3", "2", "1"], ["0", "x", ""], ["1", "", "y"], ["1", "\xf1", "n"], ["3", "1", "2"]]
+        self.assert_same_output(data, tuple_list)
+
+    def test_values_longer_than_packed_width(self):
+        data: bytes = b"1|T201 00R|a\n2|T201 00RX|b\n3|T201|c\n"
+        self.assert_same_output(data, [["1", "T201 00RX", "T202"], ["1", "T201", "T201 00R LONG"]])
+
+    def test_matches_are_counted(self):
+        matches: dict = {}
+        update_lines_vectorized(b"a|2\nb|2\nc|3\n", get_column_tables([["1", "2", "3"], ["1", "3", "4"]]), b"|", matches)
+        self.assertEqual({(1, b"2"): 2, (1, b"3"): 1}, matches)
+
+    def test_no_tables(self):
+        self.assertEqual(b"a|b\r\nc\r\n", update_lines_vectorized(b"a|b\nc", [], b"|"))
+
+
+class TestVectorizedEngineSelection(TestCase):
+    def test_supports_tables(self):
+        self.assertTrue(supports_tables(get_column_tables([["3", "2", "1"]])))
+        self.assertFalse(supports_tables(get_column_tables([["-1", "2", "1"]])))
+        self.assertFalse(supports_tables(get_column_tables([["3", "2\x00", "1"]])))
+
+    @mock.patch("columnar.VECTORIZED_SIZE_THRESHOLD", 1)
+    def test_engine_is_chosen_by_size(self):
+        self.assertEqual(np is not None, use_vectorized_engine(1))
+        self.assertFalse(use_vectorized_engine(0))
+
+    @mock.patch("columnar.np", None)
+    def test_numpy_is_optional(self):
+        self.assertFalse(use_vectorized_engine(columnar.VECTORIZED_SIZE_THRESHOLD))
+
+    @skipIf(np is None, "NumPy is not installed")
+    @mock.patch("utils.update_lines_vectorized", wraps=update_lines_vectorized)
+    @mock.patch("columnar.VECTORIZED_SIZE_THRESHOLD", 1)
+    def test_update_file_by_tuples_uses_vectorized_engine(self, update_lines_vectorized_mock):
+        input_file: str = os.path.join(FILES_PATH, "2021-06-30.bip")
+        output_file: str = input_file + "-updated"
+        tuple_list: list = [["7", "LABORAL", "FERIADO"]]
+        update_file_by_tuples(input_file, output_file, tuple_list)
+        with open(input_file, "rb") as input_obj, open(output_file, "rb") as output_obj:
+            self.assertEqual(update_with_row_engine(input_obj.read(), tuple_list), output_obj.read())
+        os.remove(output_file)
+        update_lines_vectorized_mock.assert_called()
@@ -0,0 +1,101 @@
+import datetime
+from unittest import TestCase, mock
+
+from inventory import BucketInventory
+
+
+def build_page(keys: list) -> dict:
+    last_modified = datetime.datetime(2021, 6, 30, tzinfo=datetime.timezone.utc)
+    return dict(
+        Contents=[
+            dict(Key=key, Size=1000, ETag=f'"{key}"', LastModified=last_modified)
+            for key in keys
+        ]
+    )
+
+
+class TestBucketInventory(TestCase):
+    def setUp(self) -> None:
+        self.inventory = BucketInventory(":memory:")
+        self.paginator = mock.MagicMock()
+        self.client = mock.MagicMock()
+        self.client.get_paginator.return_value = self.paginator
+
+    def tearDown(self) -> None:
+        self.inventory.close()
+
+    def test_first_refresh_is_full(self):
+        self.paginator.paginate.return_value = [
+            build_page(["2021-05-30.bip", "2021-06-29.bip.gz"]),
+            build_page(["2021-06-30.bip.zip"]),
+        ]
+        self.assertEqual(3, self.inventory.refresh(self.client, "bucket"))
+        self.paginator.paginate.assert_called_with(Bucket="bucket")
+        self.assertEqual(
+            ["2021-05-30.bip", "2021-06-29.bip.gz", "2021-06-30.bip.zip"],
+            [obj["key"] for obj in self.inventory.list_objects("bucket")],
+        )
+        self.assertIsNotNone(self.inventory.get_last_full_refresh("bucket"))
+
+    def test_incremental_refresh_starts_after_last_key(self):
+        self.paginator.paginate.return_value = [build_page(["2021-05-30.bip"])]
+        self.inventory.refresh(self.client, "bucket")
+        self.paginator.paginate.return_value = [build_page(["2021-06-30.bip"])]
+        self.assertEqual(1, self.inventory.refresh(self.client, "bucket"))
+        self.paginator.paginate.assert_called_with(
+            Bucket="bucket", StartAfter="2021-05-30.bip"
+        )
+        self.assertTrue(self.inventory.contains("bucket", "2021-05-30.bip"))
+        self.assertTrue(self.inventory.contains("bucket", "2021-06-30.bip"))
+
+    def test_local_objects_do_not_move_the_listing_cursor(self):
+        self.paginator.paginate.return_value = [build_page(["2021-05-30.bip"])]
+        self.inventory.refresh(self.client, "bucket")
+        self.inventory.put_object("bucket", "2021-07-31.bip", 1)
+        # another writer adds an object between the listed key and the local one
+        self.paginator.paginate.return_value = [build_page(["2021-06-30.bip"])]
+        self.inventory.refresh(self.client, "bucket")
+        self.paginator.paginate.assert_called_with(
+            Bucket="bucket", StartAfter="2021-05-30.bip"
+        )
+        self.assertTrue(self.inventory.contains("bucket", "2021-06-30.bip"))
+        self.assertEqual("2021-06-30.bip", self.inventory.get_last_key("bucket"))
+        # an empty listing keeps the cursor
+        self.paginator.paginate.return_value = [dict()]
+        self.inventory.refresh(self.client, "bucket")
+        self.assertEqual("2021-06-30.bip", self.inventory.get_last_key("bucket"))
+
+    def test_full_refresh_removes_deleted_objects(self):
+        self.paginator.paginate.return_value = [build_page(["2021-05-30.bip"])]
+        self.inventory.refresh(self.client, "bucket")
+        self.paginator.paginate.return_value = [build_page(["2021-06-30.bip"])]
+        self.inventory.refresh(self.client, "bucket", full=True)
+        self.assertFalse(self.inventory.contains("bucket", "2021-05-30.bip"))
+        self.assertTrue(self.inventory.contains("bucket", "2021-06-30.bip"))
+
+    def test_expired_reconcile_interval_triggers_full_refresh(self):
+        self.inventory.reconcile_interval = datetime.timedelta(seconds=-1)
+        self.paginator.paginate.return_value = [build_page(["2021-05-30.bip"])]
+        self.inventory.refresh(self.client, "bucket")
+        self.inventory.refresh(self.client, "bucket")
+        self.paginator.paginate.assert_called_with(Bucket="bucket")
+
+    def test_put_get_and_delete_object(self):
+        self.inventory.put_object("bucket", "2021-06-30.bip", 743, '"etag"')
+        obj = self.inventory.get_object("bucket", "2021-06-30.bip")
+        self.assertEqual(743, obj["size"])
+        self.assertEqual('"etag"', obj["etag"])
+        self.assertFalse(self.inventory.contains("other-bucket", "2021-06-30.bip"))
+        self.inventory.delete_object("bucket", "2021-06-30.bip")
+        self.assertIsNone(self.inventory.get_object("bucket", "2021-06-30.bip"))
+
+    def test_match(self):
+        for key in ["2021-06-29.bip", "2021-06-30.bip", "2021-06-30.bip.gz", "2021-06-30.trip"]:
+            self.inventory.put_object("bucket", key, 1)
+        self.assertEqual(
+            ["2021-06-30.bip", "2021-06-30.bip.gz"],
+            self.inventory.match("bucket", "2021-06-30.bip*"),
+        )
+        self.assertEqual(
+            ["2021-06-29.bip", "2021-06-30.bip"], self.inventory.match("bucket", "*.bip")
+        )
@@ -0,0 +1,53 @@
+from unittest import TestCase
+
+from journal import CLEANED, DOWNLOADED, REWRITTEN, UpdateJournal, get_job_id
+
+
+class TestUpdateJournal(TestCase):
+    def setUp(self) -> None:
+        self.journal = UpdateJournal(":memory:", "job")
+
+    def tearDown(self) -> None:
+        self.journal.close()
+
+    def test_object_states(self):
+        self.assertIsNone(self.journal.get_object("bucket", "2021-06-30.bip.gz"))
+        self.journal.set_state("bucket", "2021-06-30.bip.gz", DOWNLOADED)
+        self.journal.set_state(
+            "bucket", "2021-06-30.bip.gz", REWRITTEN, updated_key="2021-06-30.bip.zst", updated_size=10,
+            replacements=[3, 0]
+        )
+        self.assertFalse(self.journal.is_cleaned("bucket", "2021-06-30.bip.gz"))
+        self.journal.set_state("bucket", "2021-06-30.bip.gz", CLEANED)
+        journal_object: dict = self.journal.get_object("bucket", "2021-06-30.bip.gz")
+        self.assertIsNotNone(journal_object.pop("updated_at").tzinfo)
+        self.assertEqual(
+            dict(state=CLEANED, updated_key="2021-06-30.bip.zst", updated_size=10, updated_etag=None,
+                 replacements=[3, 0]),
+            journal_object,
+        )
+        self.assertTrue(self.journal.is_cleaned("bucket", "2021-06-30.bip.gz"))
+        with self.assertRaises(ValueError):
+            self.journal.set_state("bucket", "2021-06-30.bip.gz", "deleted")
+
+    def test_completed_dates_are_per_job(self):
+        self.journal.complete_date("bucket", "2021-06-30")
+        self.assertEqual({"2021-06-30"}, self.journal.get_completed_dates("bucket"))
+        self.assertEqual(set(), self.journal.get_completed_dates("other_bucket"))
+        other_journal = UpdateJournal(":memory:", "other_job")
+        self.assertEqual(set(), other_journal.get_completed_dates("bucket"))
+        other_journal.close()
+
+    def test_job_id(self):
+        self.assertEqual(get_job_id("bucket", [("1", "2", "3")]), get_job_id("bucket", [["1", "2", "3"]]))
+        self.assertNotEqual(get_job_id("bucket", [["1", "2", "3"]]), get_job_id("bucket", [["1", "2", "4"]]))
+        self.assertNotEqual(get_job_id("bucket", [["1", "2", "3"]]), get_job_id("bucket", [["1", "2", "3"]], "zst"))
+        # objects of another extension are another job
+        self.assertNotEqual(
+            get_job_id("bucket", [["1", "2", "3"]], None, ".bip.gz"),
+            get_job_id("bucket", [["1", "2", "3"]], None, ".bip.zip"),
+        )
+        self.assertNotEqual(
+            get_job_id("bucket", [["1", "2", "3"]], "gz", ".bip*", 1),
+            get_job_id("bucket", [["1", "2", "3"]], "gz", ".bip*", 9),
+        )
@@ -0,0 +1,84 @@
+import datetime
+from unittest import TestCase
+
+from key_index import KeyIndex, get_literal_prefix, get_prefix_upper_bound
+from utils import retrieve_objects_with_pattern
+
+
+class TestGetLiteralPrefix(TestCase):
+    def test_pattern_with_wildcards(self):
+        self.assertEqual("2021-06-30.bip", get_literal_prefix("2021-06-30.bip*"))
+        self.assertEqual("2021-06-", get_literal_prefix("2021-06-?0.bip"))
+        self.assertEqual("", get_literal_prefix("[0-9]*.bip"))
+
+    def test_pattern_without_wildcards(self):
+        self.assertEqual("2021-06-30.bip", get_literal_prefix("2021-06-30.bip"))
+
+    def test_prefix_upper_bound(self):
+        self.assertEqual("2021-06-31", get_prefix_upper_bound("2021-06-30"))
+        self.assertTrue("2021-06-30.bip.zip" < get_prefix_upper_bound("2021-06-30"))
+
+
+class TestKeyIndex(TestCase):
+    def setUp(self) -> None:
+        self.keys: list = [
+            "2021-06-30.bip.zip",
+            "2021-05-30.bip",
+            "2021-06-29.bip.gz",
+            "2021-06-30.bip",
+            "2021-06-30.trip.gz",
+            "2021-07-01.bip",
+            "readme.txt",
+        ]
+        self.key_index: KeyIndex = KeyIndex(self.keys)
+
+    def test_from_object_list(self):
+        key_index: KeyIndex = KeyIndex.from_object_list(
+            [{"name": "2021-06-30.bip"}, {"name": "2021-05-30.bip"}, {"size": 1}]
+        )
+        self.assertEqual(["2021-05-30.bip", "2021-06-30.bip"], key_index.keys)
+        self.assertIn("2021-06-30.bip", key_index)
+        self.assertNotIn("2021-06-30.bip.gz", key_index)
+
+    def test_match_is_equivalent_to_retrieve_objects_with_pattern(self):
+        aws_object_list: list = [{"name": key} for key in sorted(self.keys)]
+        for pattern in [
+            "2021-06-30.bip*",
+            "2021-06-30.bip",
+            "2021-06-*.bip*",
+            "*.bip",
+            "*.trip*",
+            "2021-0[56]-30*",
+            "2022-*",
+        ]:
+            self.assertEqual(
+                retrieve_objects_with_pattern(pattern, aws_object_list),
+                self.key_index.match(pattern),
+                pattern,
+            )
+
+    def test_match_date(self):
+        self.assertEqual(
+            ["2021-06-30.bip", "2021-06-30.bip.zip"],
+            self.key_index.match_date(datetime.datetime(2021, 6, 30), ".bip*"),
+        )
+
+    def test_match_date_range(self):
+        self.assertEqual(
+            ["2021-06-29.bip.gz", "2021-06-30.bip", "2021-06-30.bip.zip", "2021-07-01.bip"],
+            self.key_index.match_date_range(
+                datetime.datetime(2021, 6, 1), datetime.datetime(2021, 7, 1), ".bip*"
+            ),
+        )
+        self.assertEqual(
+            ["2021-06-30.trip.gz"],
+            self.key_index.match_date_range(
+                datetime.datetime(2021, 6, 30), datetime.datetime(2021, 6, 30), ".trip*"
+            ),
+        )
+
+    def test_match_date_range_with_wrong_dates(self):
+        with self.assertRaises(ValueError):
+            self.key_index.match_date_range(
+                datetime.datetime(2021, 7, 1), datetime.datetime(2021, 6, 1)
+            )
@@ -0,0 +1,88 @@
+import datetime
+from unittest import TestCase, mock
+
+from listing import (
+    discover_delimiter_boundaries,
+    discover_month_boundaries,
+    get_key_ranges,
+    get_month_boundaries,
+    iter_objects_in_parallel,
+    list_key_range,
+)
+
+
+def build_client(keys: list, page_size: int = 2) -> mock.MagicMock:
+    """Fake S3 client whose paginated listing honours StartAfter like list_objects_v2"""
+    keys = sorted(keys)
+
+    def paginate(Bucket, StartAfter=None, Delimiter=None):
+        if Delimiter is not None:
+            prefixes = sorted({key.split(Delimiter)[0] + Delimiter for key in keys if Delimiter in key})
+            return [dict(CommonPrefixes=[dict(Prefix=prefix) for prefix in prefixes])]
+        listed = [key for key in keys if StartAfter is None or key > StartAfter]
+        return [
+            dict(Contents=[dict(Key=key, Size=1) for key in listed[i:i + page_size]])
+            for i in range(0, len(listed), page_size)
+        ]
+
+    client = mock.MagicMock()
+    client.get_paginator.return_value.paginate.side_effect = paginate
+    client.list_objects_v2.side_effect = lambda Bucket, MaxKeys: dict(
+        Contents=[dict(Key=key, Size=1) for key in keys[:MaxKeys]]
+    )
+    return client
+
+
+class TestListing(TestCase):
+    def setUp(self) -> None:
+        self.keys: list = [
+            "2021-05-30.bip",
+            "2021-06-29.bip.gz",
+            "2021-06-30.bip",
+            "2021-06-30.bip.zip",
+            "2021-07",
+            "2021-07-01.bip",
+            "2021-09-01.bip",
+            "readme.txt",
+        ]
+
+    def test_get_month_boundaries(self):
+        self.assertEqual(
+            ["2021-11", "2021-12", "2022-01"],
+            get_month_boundaries(datetime.datetime(2021, 11, 15), datetime.datetime(2022, 1, 1)),
+        )
+
+    def test_get_key_ranges(self):
+        self.assertEqual(
+            [(None, "a"), ("a", "b"), ("b", None)], get_key_ranges(["b", "a", "b"])
+        )
+        self.assertEqual([(None, None)], get_key_ranges([]))
+
+    def test_discover_month_boundaries(self):
+        client = build_client(self.keys)
+        self.assertEqual(
+            ["2021-05", "2021-06", "2021-07"],
+            discover_month_boundaries(client, "bucket", datetime.datetime(2021, 7, 2)),
+        )
+        self.assertEqual([], discover_month_boundaries(build_client(["readme.txt"]), "bucket"))
+        self.assertEqual([], discover_month_boundaries(build_client([]), "bucket"))
+
+    def test_discover_delimiter_boundaries(self):
+        client = build_client(["a/1", "a/2", "b/1", "c"])
+        self.assertEqual(["a/", "b/"], discover_delimiter_boundaries(client, "bucket"))
+
+    def test_list_key_range(self):
+        client = build_client(self.keys)
+        self.assertEqual(
+            ["2021-06-29.bip.gz", "2021-06-30.bip", "2021-06-30.bip.zip", "2021-07"],
+            [obj["Key"] for obj in list_key_range(client, "bucket", "2021-06", "2021-07")],
+        )
+
+    def test_iter_objects_in_parallel_is_sorted_and_complete(self):
+        client = build_client(self.keys)
+        for boundaries in [None, [], ["2021-06", "2021-07", "2021-08"], ["2021-06-30.bip"]]:
+            self.assertEqual(
+                self.keys,
+                [obj["Key"] for obj in iter_objects_in_parallel(client, "bucket", boundaries, max_workers=3)],
+                boundaries,
+            )
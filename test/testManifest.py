@@ -0,0 +1,200 @@
+import json
+import os
+import tempfile
+import threading
+from unittest import TestCase, mock
+
+from manifest import (
+    FAILED,
+    OK,
+    SKIPPED,
+    ManifestRunner,
+    get_dependencies,
+    parse_entry,
+    read_manifest,
+    write_results,
+)
+
+
+def write_manifest(directory: str, name: str, text: str) -> str:
+    path: str = os.path.join(directory, name)
+    with open(path, "w") as file_obj:
+        file_obj.write(text)
+    return path
+
+
+class TestReadManifest(TestCase):
+    def test_jsonl_manifest(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path: str = write_manifest(
+                directory,
+                "manifest.jsonl",
+                '{"op": "upload", "file": "data/2021-06-30.bip", "bucket": "b"}\n'
+                "\n"
+                '{"id": "fix", "op": "update", "bucket": "b", "key": "2021-06-30.bip", '
+                '"tuples": "[7,LABORAL,FERIADO]", "depends_on": [1]}\n',
+            )
+            entries: list = read_manifest(path)
+        self.assertEqual(["1", "fix"], [entry["id"] for entry in entries])
+        self.assertEqual("2021-06-30.bip", entries[0]["key"])
+        self.assertEqual([["7", "LABORAL", "FERIADO"]], entries[1]["tuples"])
+        self.assertEqual(["1"], entries[1]["depends_on"])
+
+    def test_csv_manifest(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path: str = write_manifest(
+                directory,
+                "manifest.csv",
+                "id,op,bucket,key,target_bucket,tuples,streaming,depends_on\n"
+                "a,copy,b,x.bip,c,,,\n"
+                'b,update,c,x.bip,,"[7,LABORAL,FERIADO]",true,a\n',
+            )
+            entries: list = read_manifest(path)
+        self.assertNotIn("tuples", entries[0])
+        self.assertEqual("c", entries[0]["target_bucket"])
+        self.assertTrue(entries[1]["streaming"])
+        self.assertEqual(["a"], entries[1]["depends_on"])
+
+    def test_invalid_entries(self):
+        with self.assertRaisesRegex(ValueError, "unknown operation 'rename'"):
+            parse_entry(dict(op="rename", bucket="b", key="k"), 3)
+        with self.assertRaisesRegex(ValueError, "Line 2: copy needs target_bucket"):
+            parse_entry(dict(op="copy", bucket="b", key="k"), 2)
+        with tempfile.TemporaryDirectory() as directory:
+            path: str = write_manifest(
+                directory,
+                "manifest.jsonl",
+                '{"op": "delete", "bucket": "b", "key": "k", "depends_on": ["9"]}\n',
+            )
+            with self.assertRaisesRegex(ValueError, "unknown dependencies 9"):
+                read_manifest(path)
+
+    def test_operations_over_the_same_object_keep_their_order(self):
+        entries: list = [
+            parse_entry(entry, line)
+            for line, entry in enumerate(
+                [
+                    dict(op="copy", bucket="a", key="x", target_bucket="b"),
+                    dict(op="delete", bucket="a", key="y"),
+                    dict(op="delete", bucket="b", key="x"),
+                    dict(op="download", bucket="a", key="z", depends_on="2"),
+                ],
+                start=1,
+            )
+        ]
+        self.assertEqual(
+            {"1": set(), "2": set(), "3": {"1"}, "4": {"2"}},
+            get_dependencies(entries),
+        )
+
+
+class TestManifestRunner(TestCase):
+    def setUp(self):
+        self.aws_session = mock.MagicMock()
+        self.entries: list = [
+            parse_entry(entry, line)
+            for line, entry in enumerate(
+                [
+                    dict(op="upload", file="x.bip", bucket="a"),
+                    dict(op="move", bucket="a", key="x.bip", target_bucket="b"),
+                    dict(op="delete", bucket="b", key="x.bip"),
+                    dict(op="delete", bucket="a", key="y.bip"),
+                ],
+                start=1,
+            )
+        ]
+
+    def test_operations_run_after_their_dependencies(self):
+        calls: list = []
+        lock: threading.Lock = threading.Lock()
+
+        def record(name):
+            def call(*args):
+                with lock:
+                    calls.append((name, args))
+
+            return call
+
+        self.aws_session.send_file_to_bucket.side_effect = record("upload")
+        self.aws_session.copy_file_from_bucket_to_bucket.side_effect = record("copy")
+        self.aws_session.delete_object_in_bucket.side_effect = record("delete")
+        results: list = ManifestRunner(self.aws_session, workers=4).run(self.entries)
+
+        self.assertEqual([OK] * 4, [result["status"] for result in results])
+        object_calls: list = [
+            call for call in calls if call != ("delete", ("y.bip", "a"))
+        ]
+        self.assertEqual(
+            [
+                ("upload", ("x.bip", "x.bip", "a")),
+                ("copy", ("a", "b", "x.bip")),
+                ("delete", ("x.bip", "a")),
+                ("delete", ("x.bip", "b")),
+            ],
+            object_calls,
+        )
+
+    def test_dependents_of_a_failure_are_skipped(self):
+        self.aws_session.copy_file_from_bucket_to_bucket.side_effect = RuntimeError(
+            "Access Denied"
+        )
+        with self.assertLogs("manifest", level="ERROR"):
+            results: list = ManifestRunner(self.aws_session).run(self.entries)
+
+        self.assertEqual(
+            [OK, FAILED, SKIPPED, OK], [result["status"] for result in results]
+        )
+        self.assertEqual("Access Denied", results[1]["error"])
+        self.assertEqual("dependencies failed: 2", results[2]["error"])
+
+    def test_failed_update(self):
+        entry: dict = parse_entry(
+            dict(op="update", bucket="a", key="x.bip", tuples="[7,LABORAL,FERIADO]"), 1
+        )
+        self.aws_session.get_object_size.return_value = 10
+        self.aws_session.update_object_job.return_value = dict(
+            status=FAILED, error="bad header"
+        )
+        with self.assertLogs("manifest", level="ERROR"):
+            (result,) = ManifestRunner(self.aws_session).run([entry])
+        self.assertEqual((FAILED, "bad header"), (result["status"], result["error"]))
+        self.aws_session.update_object_job.assert_called_once_with(
+            "x.bip", "a", [["7", "LABORAL", "FERIADO"]], None, 10, False
+        )
+
+    def test_result_log_retries_what_did_not_end_ok(self):
+        for extension in ["jsonl", "csv"]:
+            with self.subTest(
+                extension=extension
+            ), tempfile.TemporaryDirectory() as directory:
+                self.aws_session.reset_mock()
+                self.aws_session.copy_file_from_bucket_to_bucket.side_effect = [
+                    RuntimeError("Slow Down"),
+                    None,
+                ]
+                path: str = os.path.join(directory, f"results.{extension}")
+                with self.assertLogs("manifest", level="ERROR"):
+                    write_results(
+                        path, ManifestRunner(self.aws_session).run(self.entries)
+                    )
+                self.aws_session.reset_mock()
+
+                results: list = ManifestRunner(self.aws_session).run(
+                    read_manifest(path)
+                )
+
+                self.assertEqual([OK] * 4, [result["status"] for result in results])
+                self.aws_session.send_file_to_bucket.assert_not_called()
+                self.aws_session.copy_file_from_bucket_to_bucket.assert_called_once()
+                self.assertEqual(2, self.aws_session.delete_object_in_bucket.call_count)
+
+    def test_results_are_written_in_manifest_order(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path: str = os.path.join(directory, "results.jsonl")
+            results: list = ManifestRunner(self.aws_session).run(self.entries)
+            write_results(path, list(reversed(results)))
+            with open(path) as file_obj:
+                lines: list = [json.loads(text) for text in file_obj]
+        self.assertEqual([1, 2, 3, 4], [line["line"] for line in lines])
+        self.assertEqual(OK, lines[0]["status"])
+        self.assertIsNone(lines[0]["error"])
@@ -0,0 +1,99 @@
+import json
+import os
+import tempfile
+from unittest import TestCase, mock
+
+import boto3
+from botocore.awsrequest import AWSResponse
+from botocore.exceptions import ClientError, EndpointConnectionError
+
+from metrics import LATENCY_BUCKETS, RequestMetrics, get_latency_bucket
+
+
+class TestRequestMetrics(TestCase):
+    def setUp(self):
+        self.metrics = RequestMetrics()
+        session = boto3.Session(aws_access_key_id="x", aws_secret_access_key="x")
+        self.metrics.register(session.events)
+        self.status_codes: list = []
+        session.events.register("before-send.s3", self.send)
+        self.client = session.client(
+            "s3",
+            region_name="us-east-1",
+            config=boto3.session.Config(retries=dict(total_max_attempts=1)),
+        )
+
+    def send(self, request, **kwargs):
+        status_code = self.status_codes.pop(0)
+        if isinstance(status_code, Exception):
+            raise status_code
+        raw = mock.Mock(stream=mock.Mock(return_value=iter([b""])))
+        raw.read.return_value = b""
+        return AWSResponse(request.url, status_code, {}, raw)
+
+    def test_calls_are_counted_by_operation_and_bucket(self):
+        self.status_codes = [200, 200, 404, 200]
+        self.client.head_object(Bucket="bucket", Key="a")
+        self.client.head_object(Bucket="bucket", Key="b")
+        self.assertRaises(
+            ClientError, self.client.head_object, Bucket="bucket", Key="c"
+        )
+        self.client.delete_object(Bucket="other", Key="a")
+        totals: list = self.metrics.get_totals()
+        self.assertEqual(
+            [("DeleteObject", "other", 1, 0), ("HeadObject", "bucket", 3, 1)],
+            [
+                (total["operation"], total["bucket"], total["requests"], total["errors"])
+                for total in totals
+            ],
+        )
+        self.assertEqual(3, sum(totals[1]["histogram"]))
+        self.assertEqual(len(LATENCY_BUCKETS) + 1, len(totals[1]["histogram"]))
+
+    def test_connection_errors_are_counted(self):
+        self.status_codes = [EndpointConnectionError(endpoint_url="u")]
+        self.assertRaises(
+            EndpointConnectionError,
+            self.client.get_object,
+            Bucket="bucket",
+            Key="a",
+        )
+        self.assertEqual(1, self.metrics.get_totals()[0]["errors"])
+
+    def test_latency_bucket(self):
+        self.assertEqual(0, get_latency_bucket(0.001))
+        self.assertEqual(LATENCY_BUCKETS.index(1), get_latency_bucket(0.7))
+        self.assertEqual(len(LATENCY_BUCKETS), get_latency_bucket(3600))
+
+    def test_merge_and_pop_totals(self):
+        self.status_codes = [200, 200]
+        self.client.head_object(Bucket="bucket", Key="a")
+        worker_totals: list = self.metrics.pop_totals()
+        self.assertEqual([], self.metrics.get_totals())
+        self.client.head_object(Bucket="bucket", Key="b")
+        self.metrics.merge(worker_totals)
+        totals: dict = self.metrics.get_totals()[0]
+        self.assertEqual(2, totals["requests"])
+        self.assertEqual(2, sum(totals["histogram"]))
+
+    def test_export(self):
+        self.status_codes = [200]
+        self.client.put_object(Bucket="bucket", Key="a", Body=b"data")
+        with tempfile.TemporaryDirectory() as directory:
+            json_path: str = os.path.join(directory, "metrics.json")
+            prometheus_path: str = os.path.join(directory, "metrics.prom")
+            self.metrics.export(json_path, dict(throttling_throttle_events=2))
+            self.metrics.export(prometheus_path, dict(throttling_throttle_events=2))
+            with open(json_path) as file_obj:
+                content: dict = json.load(file_obj)
+            with open(prometheus_path) as file_obj:
+                lines: list = file_obj.read().splitlines()
+        self.assertEqual("PutObject", content["operations"][0]["operation"])
+        self.assertEqual(dict(throttling_throttle_events=2), content["gauges"])
+        self.assertIn('s3_requests_total{operation="PutObject",bucket="bucket"} 1', lines)
+        self.assertIn(
+            's3_requests_seconds_bucket{operation="PutObject",bucket="bucket",le="+Inf"} 1',
+            lines,
+        )
+        self.assertIn('s3_requests_seconds_count{operation="PutObject",bucket="bucket"} 1', lines)
+        self.assertEqual("s3_throttling_throttle_events 2", lines[-1])
@@ -0,0 +1,153 @@
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase, mock
+
+from multipart import MIN_PART_SIZE, MultipartUploadWriter, upload_stream
+from test.fake_s3 import FakeS3Client
+
+
+class TestMultipartUploadWriter(TestCase):
+    def setUp(self) -> None:
+        self.client = FakeS3Client(dict(bucket={}))
+
+    def test_small_object_is_sent_with_one_request(self):
+        with MultipartUploadWriter(self.client, "bucket", "key") as writer:
+            writer.write(b"id|tiempo\n")
+            writer.write(b"1|2\n")
+        self.assertEqual(b"id|tiempo\n1|2\n", self.client.buckets["bucket"]["key"])
+        self.assertEqual(["put_object"], [name for name, _ in self.client.calls])
+
+    def test_big_object_is_sent_in_parts(self):
+        data: bytes = bytes(range(256)) * (MIN_PART_SIZE // 256) * 2 + b"end"
+        with MultipartUploadWriter(self.client, "bucket", "key", MIN_PART_SIZE) as writer:
+            for i in range(0, len(data), 1000000):
+                writer.write(data[i:i + 1000000])
+        self.assertEqual(data, self.client.buckets["bucket"]["key"])
+        self.assertEqual(3, self.client.count_calls("upload_part"))
+        self.assertEqual(1, self.client.count_calls("complete_multipart_upload"))
+        self.assertEqual(len(data), writer.bytes_written)
+
+    def test_etag_of_the_object_is_known_before_it_is_published(self):
+        etags: list = []
+        for data in [b"id|tiempo\n1|2\n", bytes(range(256)) * (MIN_PART_SIZE // 256) * 2 + b"end"]:
+            with MultipartUploadWriter(self.client, "bucket", "key", MIN_PART_SIZE) as writer:
+                writer.before_complete = lambda writer: etags.append(writer.get_etag())
+                writer.write(data)
+            self.assertEqual(etags[-1], self.client.head_object(Bucket="bucket", Key="key")["ETag"])
+        self.assertTrue(etags[-1].endswith('-3"'))
+
+    def test_upload_is_aborted_on_error(self):
+        with self.assertRaises(RuntimeError):
+            with MultipartUploadWriter(self.client, "bucket", "key", MIN_PART_SIZE) as writer:
+                writer.write(b"0" * (MIN_PART_SIZE + 1))
+                raise RuntimeError("producer failed")
+        self.assertNotIn("key", self.client.buckets["bucket"])
+        self.assertEqual(1, self.client.count_calls("abort_multipart_upload"))
+        self.assertEqual({}, self.client.multipart_uploads)
+
+    def test_part_size_must_be_valid_for_s3(self):
+        with self.assertRaises(ValueError):
+            MultipartUploadWriter(self.client, "bucket", "key", 1024)
+
+
+class PipeStream(io.RawIOBase):
+    """Like a pipe, each read returns at most chunk_size bytes, and it fails after fail_after bytes"""
+
+    def __init__(self, data: bytes, chunk_size: int = 65536, fail_after: int = None):
+        self.data: memoryview = memoryview(data)
+        self.chunk_size: int = chunk_size
+        self.fail_after: int = fail_after
+        self.position: int = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self.fail_after is not None and self.position >= self.fail_after:
+            raise OSError("broken pipe")
+        chunk = self.data[self.position : self.position + min(len(buffer), self.chunk_size)]
+        buffer[: len(chunk)] = chunk
+        self.position += len(chunk)
+        return len(chunk)
+
+
+class TestUploadStream(TestCase):
+    def setUp(self) -> None:
+        self.client = FakeS3Client(dict(bucket={}))
+        self.data: bytes = bytes(range(256)) * (MIN_PART_SIZE // 256) * 5 + b"end"
+
+    def test_small_stream_is_sent_with_one_request(self):
+        size, etag = upload_stream(self.client, PipeStream(b"1|2"), "bucket", "key")
+        self.assertEqual((3, self.client.get_listing_entry("bucket", "key")["ETag"]), (size, etag))
+        self.assertEqual(b"1|2", self.client.buckets["bucket"]["key"])
+        self.assertEqual(["put_object"], [name for name, _ in self.client.calls])
+
+    def test_parts_reuse_a_fixed_number_of_buffers(self):
+        upload_part = self.client.upload_part
+        lock: threading.Lock = threading.Lock()
+        buffers: set = set()
+        in_flight: list = [0, 0]
+
+        def slow_upload_part(**kwargs):
+            with lock:
+                buffers.add(id(kwargs["Body"]._view.obj))
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight)
+            time.sleep(0.01)
+            with lock:
+                in_flight[0] -= 1
+            return upload_part(**kwargs)
+
+        self.client.upload_part = slow_upload_part
+        size, etag = upload_stream(
+            self.client, PipeStream(self.data), "bucket", "key", MIN_PART_SIZE, workers=2
+        )
+        self.assertEqual(len(self.data), size)
+        self.assertEqual(self.client.head_object(Bucket="bucket", Key="key")["ETag"], etag)
+        self.assertEqual(self.data, self.client.buckets["bucket"]["key"])
+        self.assertEqual(6, self.client.count_calls("upload_part"))
+        self.assertEqual(2, len(buffers))
+        self.assertLessEqual(in_flight[1], 2)
+
+    def test_upload_is_aborted_when_a_part_fails(self):
+        upload_part = self.client.upload_part
+
+        def failing_upload_part(**kwargs):
+            if kwargs["PartNumber"] == 2:
+                raise RuntimeError("Slow Down")
+            return upload_part(**kwargs)
+
+        self.client.upload_part = failing_upload_part
+        with self.assertRaises(RuntimeError), self.assertLogs("multipart", level="INFO"):
+            upload_stream(self.client, PipeStream(self.data), "bucket", "key", MIN_PART_SIZE, workers=2)
+        self.assertNotIn("key", self.client.buckets["bucket"])
+        self.assertEqual(1, self.client.count_calls("abort_multipart_upload"))
+        self.assertEqual(0, self.client.count_calls("complete_multipart_upload"))
+        self.assertEqual({}, self.client.multipart_uploads)
+
+    def test_upload_is_aborted_when_the_stream_fails(self):
+        with self.assertRaises(OSError), self.assertLogs("multipart", level="INFO"):
+            upload_stream(
+                self.client,
+                PipeStream(self.data, fail_after=2 * MIN_PART_SIZE),
+                "bucket",
+                "key",
+                MIN_PART_SIZE,
+            )
+        self.assertNotIn("key", self.client.buckets["bucket"])
+        self.assertEqual(1, self.client.count_calls("abort_multipart_upload"))
+
+    def test_upload_is_aborted_without_cancel_futures(self):
+        class Python38ThreadPoolExecutor(ThreadPoolExecutor):
+            # Executor.shutdown has no cancel_futures argument before Python 3.9
+            def shutdown(self, wait=True):
+                super().shutdown(wait)
+
+        with mock.patch("multipart.ThreadPoolExecutor", Python38ThreadPoolExecutor):
+            with self.assertRaises(OSError), self.assertLogs("multipart", level="INFO"):
+                upload_stream(self.client, PipeStream(self.data, fail_after=2 * MIN_PART_SIZE), "bucket", "key",
+                              MIN_PART_SIZE)
+        self.assertEqual(1, self.client.count_calls("abort_multipart_upload"))
+        self.assertEqual({}, self.client.multipart_uploads)
@@ -0,0 +1,154 @@
+import json
+import os
+import tempfile
+from unittest import TestCase, mock
+
+import pack
+from pack import ConcatenatedFiles, PackReader, get_index, get_ranges, write_pack
+from test.fake_s3 import FakeS3Client
+
+FILES: dict = {
+    "2021-06-30.a.csv": b"1|2\n",
+    "2021-06-30.empty.csv": b"",
+    "2021-06-30.b.csv": b"3|4|5\n",
+    "2021-06-30.c.csv": b"6\n",
+}
+
+
+class TestPack(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.file_paths: list = []
+        for name, data in FILES.items():
+            file_path: str = os.path.join(self.directory.name, name)
+            with open(file_path, "wb") as file_obj:
+                file_obj.write(data)
+            self.file_paths.append(file_path)
+        self.client = FakeS3Client({"bucket": {}})
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_index_has_the_offset_of_each_member(self):
+        index: dict = get_index(self.file_paths)
+        self.assertEqual(12, index["size"])
+        self.assertEqual(
+            [
+                dict(name="2021-06-30.a.csv", offset=0, size=4),
+                dict(name="2021-06-30.empty.csv", offset=4, size=0),
+                dict(name="2021-06-30.b.csv", offset=4, size=6),
+                dict(name="2021-06-30.c.csv", offset=10, size=2),
+            ],
+            index["members"],
+        )
+        with self.assertRaises(ValueError):
+            get_index(self.file_paths, ["a", "a", "b", "c"])
+
+    def test_concatenated_files_check_sizes(self):
+        with ConcatenatedFiles(self.file_paths, [4, 0, 6, 2]) as stream:
+            self.assertEqual(b"".join(FILES.values()), stream.read())
+        with ConcatenatedFiles(self.file_paths, [4, 0, 7, 2]) as stream:
+            with self.assertRaises(IOError):
+                stream.read()
+        with ConcatenatedFiles(self.file_paths, [3, 0, 6, 2]) as stream:
+            with self.assertRaises(IOError):
+                stream.read()
+
+    def test_write_pack_makes_two_objects(self):
+        write_pack(self.client, self.file_paths, "bucket", "2021-06-30.pack")
+        self.assertEqual(
+            b"".join(FILES.values()), self.client.get_data("bucket", "2021-06-30.pack")
+        )
+        index: dict = json.loads(
+            self.client.get_data("bucket", "2021-06-30.pack.index.json")
+        )
+        self.assertEqual(4, len(index["members"]))
+        self.assertEqual(2, self.client.count_calls("put_object"))
+
+    def test_write_pack_gives_acl_to_the_index(self):
+        self.client.put_object = mock.MagicMock(return_value=dict(ETag='"etag"'))
+        write_pack(
+            self.client,
+            self.file_paths,
+            "bucket",
+            "2021-06-30.pack",
+            extra_args=dict(
+                ACL="public-read", CacheControl="max-age=60", ContentType="text/csv"
+            ),
+        )
+        pack_call, index_call = self.client.put_object.call_args_list
+        self.assertEqual("text/csv", pack_call.kwargs["ContentType"])
+        self.assertEqual("application/json", index_call.kwargs["ContentType"])
+        self.assertEqual("public-read", index_call.kwargs["ACL"])
+        self.assertEqual("max-age=60", index_call.kwargs["CacheControl"])
+
+    def test_replaced_pack_has_no_index_while_it_is_uploaded(self):
+        write_pack(self.client, self.file_paths[:1], "bucket", "2021-06-30.pack")
+        bucket: dict = self.client.get_bucket("bucket")
+        indexes: list = []
+        upload_stream = pack.upload_stream
+
+        def check_index(*args, **kwargs):
+            indexes.append("2021-06-30.pack.index.json" in bucket)
+            return upload_stream(*args, **kwargs)
+
+        with mock.patch("pack.upload_stream", side_effect=check_index):
+            write_pack(self.client, self.file_paths, "bucket", "2021-06-30.pack")
+        self.assertEqual([False], indexes)
+        reader: PackReader = PackReader(self.client, "bucket", "2021-06-30.pack")
+        self.assertEqual(FILES, dict(reader.read_many()))
+
+    def test_reader_detects_replaced_pack(self):
+        write_pack(self.client, self.file_paths, "bucket", "2021-06-30.pack")
+        reader: PackReader = PackReader(self.client, "bucket", "2021-06-30.pack")
+        self.assertEqual(b"1|2\n", reader.read("2021-06-30.a.csv"))
+        # same size, other members
+        write_pack(
+            self.client,
+            self.file_paths[::-1],
+            "bucket",
+            "2021-06-30.pack",
+        )
+        with self.assertRaises(IOError):
+            reader.read("2021-06-30.b.csv")
+        with self.assertRaises(IOError):
+            dict(reader.read_many())
+
+    def test_ranges_group_nearby_members(self):
+        members: list = [
+            dict(name="c", offset=100, size=10),
+            dict(name="a", offset=0, size=10),
+            dict(name="b", offset=10, size=20),
+        ]
+        self.assertEqual(
+            [(0, 30, [members[1], members[2]]), (100, 110, [members[0]])],
+            get_ranges(members, max_gap=50),
+        )
+        self.assertEqual(
+            [(0, 110, [members[1], members[2], members[0]])],
+            get_ranges(members, max_gap=70),
+        )
+
+    def test_reader_uses_range_requests(self):
+        write_pack(self.client, self.file_paths, "bucket", "2021-06-30.pack")
+        reader: PackReader = PackReader(self.client, "bucket", "2021-06-30.pack")
+        self.assertEqual(b"3|4|5\n", reader.read("2021-06-30.b.csv"))
+        self.assertEqual(b"", reader.read("2021-06-30.empty.csv"))
+        with self.assertRaises(KeyError):
+            reader.read("2021-07-01.csv")
+        # the index and one range
+        self.assertEqual(2, self.client.count_calls("get_object"))
+        self.assertEqual(FILES, dict(reader.read_many()))
+        self.assertEqual(3, self.client.count_calls("get_object"))
+        self.assertEqual(
+            {"2021-06-30.a.csv": b"1|2\n", "2021-06-30.c.csv": b"6\n"},
+            dict(reader.read_many(["2021-06-30.c.csv", "2021-06-30.a.csv"], 0)),
+        )
+        self.assertEqual(5, self.client.count_calls("get_object"))
+
+    def test_reader_detects_short_pack(self):
+        write_pack(self.client, self.file_paths, "bucket", "2021-06-30.pack")
+        self.client.get_bucket("bucket")["2021-06-30.pack"] = b"1|2\n"
+        reader: PackReader = PackReader(self.client, "bucket", "2021-06-30.pack")
+        with self.assertRaises(IOError):
+            reader.read("2021-06-30.c.csv")
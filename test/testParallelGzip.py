@@ -0,0 +1,88 @@
+import gzip
+import io
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from unittest import TestCase
+
+from multipart import MultipartUploadWriter
+from parallel_gzip import ParallelGzipWriter
+from test.fake_s3 import FakeS3Client
+
+FILES_PATH: str = os.path.join(os.path.dirname(__file__), "files")
+
+
+def read_file(file_name: str) -> bytes:
+    with open(os.path.join(FILES_PATH, file_name), "rb") as file_obj:
+        return file_obj.read()
+
+
+def compress(data: bytes, **kwargs) -> bytes:
+    output_stream: io.BytesIO = io.BytesIO()
+    with ParallelGzipWriter(output_stream, **kwargs) as gzip_file:
+        for start in range(0, len(data), 1000):
+            gzip_file.write(data[start : start + 1000])
+    return output_stream.getvalue()
+
+
+def count_members(data: bytes) -> int:
+    members: int = 0
+    while data:
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        decompressor.decompress(data)
+        data = decompressor.unused_data
+        members += 1
+    return members
+
+
+class TestParallelGzipWriter(TestCase):
+    def setUp(self) -> None:
+        self.data: bytes = read_file("2021-06-30.bip") * 20
+
+    def test_one_member(self):
+        compressed: bytes = compress(self.data, member_name="2021-06-30.bip")
+        self.assertEqual(self.data, gzip.decompress(compressed))
+        self.assertEqual(1, count_members(compressed))
+        # the original name is saved like gzip.GzipFile does
+        self.assertEqual(b"2021-06-30.bip\x00", compressed[10:25])
+
+    def test_blocks_are_independent_members(self):
+        compressed: bytes = compress(self.data, block_size=4096, workers=3)
+        self.assertEqual(self.data, gzip.decompress(compressed))
+        self.assertEqual(-(-len(self.data) // 4096), count_members(compressed))
+
+    def test_empty_input(self):
+        compressed: bytes = compress(b"")
+        self.assertEqual(b"", gzip.decompress(compressed))
+        self.assertEqual(1, count_members(compressed))
+
+    def test_process_pool(self):
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            compressed: bytes = compress(self.data, block_size=4096, executor=executor)
+        self.assertEqual(self.data, gzip.decompress(compressed))
+
+    def test_multipart_upload(self):
+        client = FakeS3Client(dict(bucket={}))
+        with MultipartUploadWriter(client, "bucket", "key.gz") as writer:
+            with ParallelGzipWriter(writer, block_size=4096) as gzip_file:
+                gzip_file.write(self.data)
+        self.assertEqual(self.data, gzip.decompress(client.buckets["bucket"]["key.gz"]))
+
+    def test_write_after_close(self):
+        gzip_file = ParallelGzipWriter(io.BytesIO())
+        gzip_file.close()
+        with self.assertRaises(ValueError):
+            gzip_file.write(b"data")
+
+    def test_failed_write_cancels_pending_blocks(self):
+        class FailingStream(io.BytesIO):
+            def write(self, data):
+                raise OSError("disk full")
+
+        gzip_file = ParallelGzipWriter(FailingStream(), block_size=1024, workers=1)
+        # two blocks wait to be written, the first one fails
+        gzip_file.write(self.data[:2048])
+        with self.assertRaises(OSError):
+            gzip_file.close()
+        self.assertEqual(0, len(gzip_file._pending))
+        self.assertTrue(gzip_file.closed)
@@ -0,0 +1,118 @@
+import datetime
+import os
+import tempfile
+from collections import Counter
+from unittest import TestCase
+
+from planner import (
+    MULTIPART_CHUNKSIZE,
+    Plan,
+    ThroughputHistory,
+    count_copy_requests,
+    count_download_requests,
+    count_upload_requests,
+    plan_delete_bucket,
+    plan_move,
+    plan_update,
+)
+
+MB: int = 1024**2
+
+
+def build_object_list(sizes: dict) -> list:
+    return [dict(name=name, size=size / MB) for name, size in sizes.items()]
+
+
+class TestRequestCounts(TestCase):
+    def test_small_objects(self):
+        self.assertEqual(Counter(PutObject=1), count_upload_requests(MB))
+        self.assertEqual(Counter(HeadObject=1, GetObject=1), count_download_requests(MB))
+        self.assertEqual(Counter(HeadObject=1, CopyObject=1), count_copy_requests(MB))
+
+    def test_multipart_objects(self):
+        size: int = 3 * MULTIPART_CHUNKSIZE + 1
+        self.assertEqual(
+            Counter(CreateMultipartUpload=1, UploadPart=4, CompleteMultipartUpload=1),
+            count_upload_requests(size),
+        )
+        self.assertEqual(Counter(HeadObject=1, GetObject=4), count_download_requests(size))
+        self.assertEqual(4, count_copy_requests(size)["UploadPartCopy"])
+
+
+class TestPlans(TestCase):
+    def setUp(self) -> None:
+        self.object_list: list = build_object_list(
+            {
+                "2021-05-30.bip": 743,
+                "2021-06-29.bip.gz": 2 * MB,
+                "2021-06-30.bip.zip": 100 * MB,
+                "2021-06-30.trip.gz": 10,
+            }
+        )
+
+    def test_plan_move_all_objects(self):
+        plan: Plan = plan_move(self.object_list, None, [".bip"])
+        self.assertEqual(
+            ["2021-05-30.bip", "2021-06-29.bip.gz", "2021-06-30.bip.zip"], plan.keys
+        )
+        self.assertEqual(743 + 102 * MB, plan.total_bytes)
+        self.assertEqual(1, plan.requests["ListObjectsV2"])
+        self.assertEqual(3, plan.requests["DeleteObject"])
+        self.assertEqual(2, plan.requests["CopyObject"])
+        self.assertEqual(13, plan.requests["UploadPartCopy"])
+
+    def test_plan_move_some_objects(self):
+        plan: Plan = plan_move(self.object_list, ["2021-05-30.bip", "2021-07-01.bip"], None)
+        self.assertEqual(["2021-05-30.bip"], plan.keys)
+        self.assertEqual(2, plan.requests["HeadObject"] - plan.requests["CopyObject"])
+        self.assertNotIn("ListObjectsV2", plan.requests)
+
+    def test_plan_delete_bucket(self):
+        plan: Plan = plan_delete_bucket(self.object_list)
+        self.assertEqual(4, len(plan.keys))
+        self.assertEqual(Counter(ListObjectsV2=1, DeleteObject=4, DeleteBucket=1), plan.requests)
+
+    def test_plan_update(self):
+        plan: Plan = plan_update(
+            self.object_list,
+            [datetime.datetime(2021, 6, 29), datetime.datetime(2021, 6, 30)],
+            ".bip*",
+        )
+        self.assertEqual(["2021-06-29.bip.gz", "2021-06-30.bip.zip"], plan.keys)
+        self.assertEqual(2 * plan.total_bytes, plan.transfer_bytes)
+        self.assertEqual(1, plan.requests["PutObject"])
+        self.assertEqual(1, plan.requests["CreateMultipartUpload"])
+
+    def test_estimate_seconds_scales_with_concurrency(self):
+        sequential_plan: Plan = plan_delete_bucket(self.object_list)
+        concurrent_plan: Plan = plan_delete_bucket(self.object_list, concurrency=4)
+        self.assertAlmostEqual(
+            sequential_plan.estimate_seconds(), 4 * concurrent_plan.estimate_seconds()
+        )
+        self.assertIn("with concurrency 4 (default throughput)", concurrent_plan.get_summary()[-1])
+
+
+class TestThroughputHistory(TestCase):
+    def test_record_and_estimate(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_path: str = os.path.join(directory, "throughput.json")
+            history: ThroughputHistory = ThroughputHistory(file_path)
+            self.assertIsNone(history.get_throughput("delete"))
+            history.record("delete", 100, 0, 10.0)
+            history.record("delete", 0, 0, 1.0)
+
+            history = ThroughputHistory(file_path)
+            self.assertEqual((0.1, None), history.get_throughput("delete"))
+            plan: Plan = Plan("delete", concurrency=2)
+            for i in range(10):
+                plan.add_object(str(i), 1, Counter(DeleteObject=1))
+            self.assertAlmostEqual(0.5, plan.estimate_seconds(history))
+            self.assertIn("(measured throughput)", plan.get_summary(history)[-1])
+
+    def test_keeps_last_runs(self):
+        with tempfile.TemporaryDirectory() as directory:
+            history: ThroughputHistory = ThroughputHistory(os.path.join(directory, "throughput.json"))
+            for _ in range(20):
+                history.record("update", 1, MB, 1.0)
+            self.assertEqual(10, len(history.runs["update"]))
+            self.assertEqual((1.0, MB), history.get_throughput("update"))
@@ -0,0 +1,77 @@
+import io
+import json
+import os
+import pstats
+import tempfile
+import time
+from unittest import TestCase, mock
+
+from parallel_gzip import ParallelGzipWriter
+from profiling import (
+    CPU,
+    NETWORK,
+    OTHER,
+    WAIT,
+    get_category,
+    parse_profile_args,
+    profile_main,
+)
+
+
+def compress_in_threads(argv: list) -> int:
+    with ParallelGzipWriter(io.BytesIO(), workers=2, block_size=1024) as gzip_file:
+        for _ in range(64):
+            gzip_file.write(os.urandom(1024))
+    time.sleep(0.05)
+    return len(argv)
+
+
+class TestProfiling(TestCase):
+    def test_profile_options_are_removed_in_any_position(self):
+        argv, options = parse_profile_args(
+            ["update", "bucket", "--profile", "out.prof", "--workers", "2", "--profile-timeline"]
+        )
+        self.assertEqual(["update", "bucket", "--workers", "2"], argv)
+        self.assertEqual("out.prof", options.profile)
+        self.assertTrue(options.profile_timeline)
+        self.assertEqual(20, options.profile_top)
+
+    def test_get_category(self):
+        self.assertEqual(NETWORK, get_category("/usr/lib/python3.11/ssl.py"))
+        self.assertEqual(NETWORK, get_category("<method 'recv_into' of '_socket.socket' objects>"))
+        self.assertEqual(CPU, get_category("/root/package/utils.py"))
+        self.assertEqual(CPU, get_category("<method 'compress' of 'zlib.Compress' objects>"))
+        self.assertEqual(WAIT, get_category("<method 'acquire' of '_thread.lock' objects>"))
+        self.assertEqual(OTHER, get_category("/root/package/aws.py"))
+
+    def test_main_is_not_profiled_without_option(self):
+        main = mock.Mock(return_value=0)
+        with mock.patch("profiling.CommandProfiler") as command_profiler:
+            self.assertEqual(0, profile_main(main, ["update", "-h"]))
+        main.assert_called_once_with(["update", "-h"])
+        command_profiler.assert_not_called()
+
+    def test_profile_with_timeline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path: str = os.path.join(directory, "update.prof")
+            with mock.patch("sys.stderr", new_callable=io.StringIO) as stderr:
+                result = profile_main(
+                    compress_in_threads,
+                    ["update", "--profile", path, "--profile-top", "5", "--profile-timeline"],
+                )
+            self.assertEqual(1, result)
+            self.assertIn(f"Profile written to {path}", stderr.getvalue())
+            functions: set = {
+                function_name for _, _, function_name in pstats.Stats(path).stats
+            }
+            with open(f"{path}.txt") as file_obj:
+                summary: str = file_obj.read()
+            with open(f"{path}.trace.json") as file_obj:
+                trace: dict = json.load(file_obj)
+        # compress_block runs in the threads of the pool
+        self.assertIn("compress_block", functions)
+        self.assertIn("Profiled time by category: network", summary)
+        self.assertIn("Sampled thread time by category", summary)
+        self.assertIn("List reduced from", summary)
+        self.assertTrue(trace["traceEvents"])
+        self.assertTrue(all(event["ph"] == "X" for event in trace["traceEvents"]))
@@ -0,0 +1,45 @@
+import os
+import sys
+from datetime import datetime
+from unittest import TestCase, skipIf
+
+# the generator and the harness are benchmark scripts
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+
+from bench_scale import moto, read_rows, run_harness
+from synthetic_bip import HEADER, get_synthetic_bip
+
+
+class TestSyntheticBip(TestCase):
+    def test_rows_follow_the_schema(self):
+        rows: list = read_rows(get_synthetic_bip(100, seed=1, date=datetime(2021, 7, 3)))
+        self.assertEqual(HEADER, rows[0])
+        self.assertEqual(101, len(rows))
+        for row in rows[1:]:
+            self.assertEqual(len(HEADER), len(row))
+            self.assertTrue(row[1].startswith("2021-07-03 "))
+            self.assertEqual("SABADO", row[7])
+            # T211 C0 00R is 211cR
+            self.assertTrue(row[5].startswith(row[4].split(" ")[0][1:]))
+
+    def test_same_seed_gives_same_content(self):
+        self.assertEqual(get_synthetic_bip(50, seed=3), get_synthetic_bip(50, seed=3))
+        self.assertNotEqual(get_synthetic_bip(50, seed=3), get_synthetic_bip(50, seed=4))
+
+    def test_compression(self):
+        data: bytes = get_synthetic_bip(50)
+        for compress_type in ["gz", "zip"]:
+            compressed: bytes = get_synthetic_bip(50, compress_type=compress_type)
+            self.assertNotEqual(data, compressed)
+            self.assertEqual(read_rows(data), read_rows(compressed))
+
+
+@skipIf(moto is None, "moto is not installed")
+class TestScaleHarness(TestCase):
+    def test_every_command_end_to_end(self):
+        results: list = run_harness(days=2, objects=2, rows=50, compression="gz")
+        self.assertIn("update --streaming", [result["scenario"] for result in results])
+        for result in results:
+            self.assertIsNone(result["error"], result["scenario"])
+            self.assertEqual(4, result["objects"])
+            self.assertGreater(result["peak_rss_mb"], 0)
@@ -0,0 +1,149 @@
+import gzip
+import io
+import os
+import tempfile
+import zipfile
+from unittest import TestCase, skipIf
+
+from botocore.exceptions import ClientError
+
+from streaming import S3ObjectReader, scan_object, update_object_streaming
+from test.fake_s3 import FakeS3Client
+from utils import update_file_by_tuples, zstandard
+
+FILES_PATH: str = os.path.join(os.path.dirname(__file__), "files")
+TUPLES_LIST: list = [["3", "2", "1"], ["7", "LABORAL", "FERIADO"]]
+
+
+def read_file(file_name: str) -> bytes:
+    with open(os.path.join(FILES_PATH, file_name), "rb") as file_obj:
+        return file_obj.read()
+
+
+class TestS3ObjectReader(TestCase):
+    def setUp(self) -> None:
+        self.data: bytes = read_file("2021-06-30.bip")
+        self.client = FakeS3Client(dict(bucket={"key": self.data}))
+
+    def test_sequential_reads_use_one_request(self):
+        reader = S3ObjectReader(self.client, "bucket", "key")
+        self.assertEqual(self.data[:10], reader.read(10))
+        self.assertEqual(self.data[10:], reader.read())
+        self.assertEqual(b"", reader.read(10))
+        self.assertEqual(1, self.client.count_calls("get_object"))
+
+    def test_seek(self):
+        reader = S3ObjectReader(self.client, "bucket", "key", size=len(self.data))
+        reader.seek(3)
+        self.assertEqual(self.data[3:6], reader.read(3))
+        # the size of the first response is used
+        reader.seek(-5, io.SEEK_END)
+        self.assertEqual(self.data[-5:], reader.read())
+        self.assertEqual(0, self.client.count_calls("head_object"))
+
+    def test_given_size_is_only_a_hint(self):
+        reader = S3ObjectReader(self.client, "bucket", "key", size=10)
+        self.assertEqual(self.data, reader.read())
+        self.assertEqual(len(self.data), reader.size)
+        reader = S3ObjectReader(self.client, "bucket", "key", size=10)
+        reader.seek(-5, io.SEEK_END)
+        self.assertEqual(self.data[-5:], reader.read())
+
+    def test_overwritten_object_is_not_mixed(self):
+        reader = S3ObjectReader(self.client, "bucket", "key", size=len(self.data))
+        self.assertEqual(self.data[:10], reader.read(10))
+        self.client.buckets["bucket"]["key"] = self.data.upper()
+        reader.seek(20)
+        with self.assertRaises(ClientError):
+            reader.read(10)
+
+
+class TestUpdateObjectStreaming(TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        expected_file: str = os.path.join(self.directory.name, "expected.bip")
+        update_file_by_tuples(os.path.join(FILES_PATH, "2021-06-30.bip"), expected_file, TUPLES_LIST)
+        with open(expected_file, "rb") as file_obj:
+            self.expected_data: bytes = file_obj.read()
+        self.client = FakeS3Client(
+            dict(
+                bucket={
+                    "2021-06-30.bip": read_file("2021-06-30.bip"),
+                    "2021-06-30.bip.gz": read_file("2021-06-30.bip.gz"),
+                    "2021-06-30.bip.zip": read_file("2021-06-30.bip.zip"),
+                }
+            )
+        )
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_not_compressed_object(self):
+        update_object_streaming(self.client, "bucket", "2021-06-30.bip", TUPLES_LIST)
+        self.assertEqual(self.expected_data, self.client.buckets["bucket"]["2021-06-30.bip"])
+        self.assertEqual(0, self.client.count_calls("download_file"))
+
+    def test_object_bigger_than_the_given_size_is_not_truncated(self):
+        update_object_streaming(self.client, "bucket", "2021-06-30.bip", TUPLES_LIST, size=100)
+        self.assertEqual(self.expected_data, self.client.buckets["bucket"]["2021-06-30.bip"])
+        update_object_streaming(self.client, "bucket", "2021-06-30.bip.zip", TUPLES_LIST, size=100)
+        with zipfile.ZipFile(io.BytesIO(self.client.buckets["bucket"]["2021-06-30.bip.zip"])) as zip_file:
+            self.assertEqual(self.expected_data, zip_file.read("2021-06-30.bip"))
+
+    def test_gzip_object(self):
+        update: dict = update_object_streaming(self.client, "bucket", "2021-06-30.bip.gz", TUPLES_LIST)
+        data: bytes = self.client.buckets["bucket"]["2021-06-30.bip.gz"]
+        self.assertEqual(len(data), update["size"])
+        self.assertEqual(self.expected_data, gzip.decompress(data))
+
+    def test_zip_object(self):
+        update_object_streaming(self.client, "bucket", "2021-06-30.bip.zip", TUPLES_LIST)
+        data: bytes = self.client.buckets["bucket"]["2021-06-30.bip.zip"]
+        with zipfile.ZipFile(io.BytesIO(data)) as zip_file:
+            self.assertEqual(["2021-06-30.bip"], zip_file.namelist())
+            self.assertEqual(self.expected_data, zip_file.read("2021-06-30.bip"))
+
+    @skipIf(zstandard is None, "zstandard is not installed")
+    def test_codec_change(self):
+        update: dict = update_object_streaming(
+            self.client, "bucket", "2021-06-30.bip.gz", TUPLES_LIST, codec="zst", compresslevel=10
+        )
+        self.assertEqual("2021-06-30.bip.zst", update["key"])
+        self.assertNotIn("2021-06-30.bip.gz", self.client.buckets["bucket"])
+        data: bytes = self.client.buckets["bucket"]["2021-06-30.bip.zst"]
+        self.assertEqual(self.expected_data, zstandard.ZstdDecompressor().decompressobj().decompress(data))
+
+    def test_before_publish_runs_before_the_object_is_published(self):
+        calls: list = []
+
+        def before_publish(updated_key, updated_size, replacements, updated_etag):
+            calls.append((updated_key, updated_size, replacements, updated_etag))
+            self.assertEqual(read_file("2021-06-30.bip.gz"), self.client.buckets["bucket"]["2021-06-30.bip.gz"])
+
+        update: dict = update_object_streaming(
+            self.client, "bucket", "2021-06-30.bip.gz", TUPLES_LIST, before_publish=before_publish
+        )
+        etag: str = self.client.head_object(Bucket="bucket", Key=update["key"])["ETag"]
+        self.assertEqual([(update["key"], update["size"], update["replacements"], etag)], calls)
+
+    def test_object_without_replacements_is_not_uploaded(self):
+        update: dict = update_object_streaming(self.client, "bucket", "2021-06-30.bip.gz", [["7", "FERIADO", "1"]])
+        self.assertEqual(dict(key="2021-06-30.bip.gz", size=None, replacements=[0]), update)
+        self.assertEqual(read_file("2021-06-30.bip.gz"), self.client.buckets["bucket"]["2021-06-30.bip.gz"])
+        self.assertEqual(0, self.client.count_calls("put_object") + self.client.count_calls("upload_part"))
+
+    def test_scan_object(self):
+        self.assertEqual(
+            update_object_streaming(self.client, "bucket", "2021-06-30.bip", TUPLES_LIST)["replacements"],
+            scan_object(self.client, "bucket", "2021-06-30.bip.zip", TUPLES_LIST),
+        )
+        self.assertEqual(read_file("2021-06-30.bip.zip"), self.client.buckets["bucket"]["2021-06-30.bip.zip"])
+
+    def test_backup_copy(self):
+        backup_file_path: str = os.path.join(self.directory.name, "2021-06-30.bip.gz.old-version")
+        update_object_streaming(
+            self.client, "bucket", "2021-06-30.bip.gz", TUPLES_LIST, backup_file_path=backup_file_path
+        )
+        with open(backup_file_path, "rb") as file_obj:
+            self.assertEqual(read_file("2021-06-30.bip.gz"), file_obj.read())
+        self.assertEqual(0, self.client.count_calls("get_object"))
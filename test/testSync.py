@@ -0,0 +1,246 @@
+import datetime
+import hashlib
+import os
+import tempfile
+from unittest import TestCase, mock
+
+from multipart import DEFAULT_PART_SIZE
+from sync import (
+    NEW,
+    NEWER,
+    SIZE_CHANGED,
+    SyncPlan,
+    get_local_etag,
+    has_same_etag,
+    list_prefix,
+    parse_s3_url,
+    run_sync,
+    scan_directory,
+)
+from test.fake_s3 import FakeS3Client
+
+# LastModified of the objects of FakeS3Client
+OBJECT_MTIME: float = datetime.datetime(
+    2021, 6, 30, tzinfo=datetime.timezone.utc
+).timestamp()
+
+
+def write_file(directory: str, key: str, data: bytes, mtime: float) -> str:
+    path: str = os.path.join(directory, *key.split("/"))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as file_obj:
+        file_obj.write(data)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+class TestSyncListings(TestCase):
+    def test_parse_s3_url(self):
+        self.assertEqual(("bucket", ""), parse_s3_url("s3://bucket"))
+        self.assertEqual(
+            ("bucket", "data/2021/"), parse_s3_url("s3://bucket/data/2021")
+        )
+        self.assertIsNone(parse_s3_url("data/2021"))
+
+    def test_scan_directory(self):
+        with tempfile.TemporaryDirectory() as directory:
+            write_file(directory, "2021-06-30.bip", b"1|2\n", 1000)
+            write_file(directory, "metro/2021/2021-06-30.bip", b"1\n", 2000)
+            os.makedirs(os.path.join(directory, "empty"))
+            files: dict = scan_directory(directory)
+        self.assertEqual(
+            {
+                "2021-06-30.bip": dict(size=4, mtime=1000),
+                "metro/2021/2021-06-30.bip": dict(size=2, mtime=2000),
+            },
+            files,
+        )
+
+    def test_list_prefix(self):
+        client = FakeS3Client(
+            dict(bucket={"data/": b"", "data/a.bip": b"1|2\n", "other.bip": b"1"})
+        )
+        self.assertEqual(
+            {
+                "a.bip": dict(
+                    size=4,
+                    mtime=OBJECT_MTIME,
+                    etag=hashlib.md5(b"1|2\n").hexdigest(),
+                )
+            },
+            list_prefix(client, "bucket", "data/"),
+        )
+        self.assertEqual(1, client.count_calls("list_objects_v2") + 1)
+
+    def test_local_etag(self):
+        data: bytes = b"0" * (DEFAULT_PART_SIZE + 10)
+        parts_hash: bytes = (
+            hashlib.md5(data[:DEFAULT_PART_SIZE]).digest()
+            + hashlib.md5(data[DEFAULT_PART_SIZE:]).digest()
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            path: str = write_file(directory, "a.bin", data, 1000)
+            self.assertEqual(hashlib.md5(data).hexdigest(), get_local_etag(path))
+            etag: str = f"{hashlib.md5(parts_hash).hexdigest()}-2"
+            self.assertEqual(etag, get_local_etag(path, 2))
+            self.assertTrue(has_same_etag(path, etag))
+            # uploaded with other part size
+            self.assertFalse(
+                has_same_etag(path, f"{hashlib.md5(parts_hash).hexdigest()}-3")
+            )
+
+
+class TestSync(TestCase):
+    def setUp(self):
+        temporary_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(temporary_directory.cleanup)
+        self.directory: str = temporary_directory.name
+        self.aws_session = mock.MagicMock()
+        self.objects: dict = {
+            "same.bip": dict(
+                size=4, mtime=OBJECT_MTIME, etag=hashlib.md5(b"1|2\n").hexdigest()
+            ),
+            "touched.bip": dict(
+                size=4, mtime=OBJECT_MTIME, etag=hashlib.md5(b"1|2\n").hexdigest()
+            ),
+            "edited.bip": dict(
+                size=4, mtime=OBJECT_MTIME, etag=hashlib.md5(b"1|2\n").hexdigest()
+            ),
+            "resized.bip": dict(
+                size=4, mtime=OBJECT_MTIME, etag=hashlib.md5(b"1|2\n").hexdigest()
+            ),
+            "remote.bip": dict(
+                size=1, mtime=OBJECT_MTIME, etag=hashlib.md5(b"1").hexdigest()
+            ),
+        }
+        write_file(self.directory, "same.bip", b"1|2\n", OBJECT_MTIME)
+        write_file(self.directory, "touched.bip", b"1|2\n", OBJECT_MTIME + 60)
+        write_file(self.directory, "edited.bip", b"1|3\n", OBJECT_MTIME + 60)
+        write_file(self.directory, "resized.bip", b"1|2|3\n", OBJECT_MTIME - 60)
+        write_file(self.directory, "sub/local.bip", b"1", OBJECT_MTIME)
+
+    def get_plan(self, upload: bool, delete: bool) -> SyncPlan:
+        return SyncPlan(
+            self.directory,
+            "bucket",
+            "data/",
+            upload,
+            scan_directory(self.directory),
+            self.objects,
+            delete,
+        )
+
+    def test_upload_plan(self):
+        plan: SyncPlan = self.get_plan(upload=True, delete=False)
+        self.assertEqual(
+            {
+                "edited.bip": NEWER,
+                "resized.bip": SIZE_CHANGED,
+                "sub/local.bip": NEW,
+                "touched.bip": NEWER,
+            },
+            plan.transfers,
+        )
+        self.assertEqual([], plan.deletes)
+        self.assertEqual(
+            ["remote.bip"], self.get_plan(upload=True, delete=True).deletes
+        )
+
+    def test_upload_sends_only_changed_content(self):
+        stats: dict = run_sync(
+            self.aws_session, self.get_plan(upload=True, delete=True), workers=2
+        )
+        self.assertEqual(
+            dict(copied=3, unchanged=1, deleted=1, failed=0, bytes=11), stats
+        )
+        self.assertEqual(
+            sorted(
+                [
+                    mock.call(
+                        os.path.join(self.directory, "edited.bip"),
+                        "data/edited.bip",
+                        "bucket",
+                    ),
+                    mock.call(
+                        os.path.join(self.directory, "resized.bip"),
+                        "data/resized.bip",
+                        "bucket",
+                    ),
+                    mock.call(
+                        os.path.join(self.directory, "sub", "local.bip"),
+                        "data/sub/local.bip",
+                        "bucket",
+                    ),
+                ],
+                key=str,
+            ),
+            sorted(self.aws_session.send_file_to_bucket.call_args_list, key=str),
+        )
+        self.aws_session.delete_object_in_bucket.assert_called_once_with(
+            "data/remote.bip", "bucket"
+        )
+        # the file with the same content takes the date of its object
+        self.assertEqual(
+            OBJECT_MTIME, os.path.getmtime(os.path.join(self.directory, "touched.bip"))
+        )
+        self.assertNotIn(
+            "touched.bip", self.get_plan(upload=True, delete=True).transfers
+        )
+
+    def test_download_skips_keys_outside_the_directory(self):
+        self.objects["../outside.bip"] = dict(size=1, mtime=OBJECT_MTIME, etag="etag")
+        self.objects["sub/../../outside.bip"] = dict(
+            size=1, mtime=OBJECT_MTIME, etag="etag"
+        )
+        os.symlink(tempfile.gettempdir(), os.path.join(self.directory, "link"))
+        self.objects["link/outside.bip"] = dict(size=1, mtime=OBJECT_MTIME, etag="etag")
+        with self.assertLogs("sync", level="WARNING"):
+            plan: SyncPlan = self.get_plan(upload=False, delete=True)
+        self.assertEqual(
+            ["../outside.bip", "link/outside.bip", "sub/../../outside.bip"],
+            plan.unsafe_keys,
+        )
+        self.assertFalse(set(plan.unsafe_keys) & set(plan.transfers))
+        self.assertIn("  skipped: 3 objects outside the directory", plan.get_summary())
+        # uploads do not write local files, those objects are only bucket keys
+        self.assertEqual([], self.get_plan(upload=True, delete=True).unsafe_keys)
+
+    def test_download_takes_the_date_of_the_objects(self):
+        def download(key, bucket_name, file_path):
+            with open(file_path, "wb") as file_obj:
+                file_obj.write(b"0" * self.objects[key[len("data/") :]]["size"])
+
+        self.aws_session.download_object_from_bucket.side_effect = download
+        self.objects["same.bip"]["mtime"] += 60
+        plan: SyncPlan = self.get_plan(upload=False, delete=True)
+        self.assertEqual(
+            {"remote.bip": NEW, "resized.bip": SIZE_CHANGED, "same.bip": NEWER},
+            plan.transfers,
+        )
+        self.assertEqual(["sub/local.bip"], plan.deletes)
+
+        stats: dict = run_sync(self.aws_session, plan)
+
+        self.assertEqual(
+            dict(copied=2, unchanged=1, deleted=1, failed=0, bytes=5), stats
+        )
+        self.assertEqual(sorted(self.objects), sorted(scan_directory(self.directory)))
+        for key in ["remote.bip", "same.bip"]:
+            self.assertEqual(
+                self.objects[key]["mtime"],
+                os.path.getmtime(os.path.join(self.directory, key)),
+            )
+        self.assertEqual({}, self.get_plan(upload=False, delete=True).transfers)
+
+    def test_failed_files_do_not_stop_the_sync(self):
+        self.aws_session.send_file_to_bucket.side_effect = [
+            RuntimeError("Access Denied"),
+            None,
+            None,
+        ]
+        with self.assertLogs("sync", level="ERROR"):
+            stats: dict = run_sync(
+                self.aws_session, self.get_plan(upload=True, delete=False)
+            )
+        self.assertEqual(1, stats["failed"])
+        self.assertEqual(2, stats["copied"])
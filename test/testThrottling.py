@@ -0,0 +1,155 @@
+import threading
+import time
+from unittest import TestCase, mock
+
+import boto3
+from botocore.awsrequest import AWSResponse
+from botocore.exceptions import EndpointConnectionError, ReadTimeoutError
+
+from throttling import (
+    AdaptiveConcurrencyLimiter,
+    ThrottlingHandler,
+    get_backoff_delay,
+    is_throttling_response,
+)
+
+
+def get_response(status_code: int, error_code: str = None) -> tuple:
+    parsed_response: dict = dict(ResponseMetadata=dict(HTTPStatusCode=status_code))
+    if error_code is not None:
+        parsed_response["Error"] = dict(Code=error_code)
+    return mock.Mock(status_code=status_code), parsed_response
+
+
+class TestAdaptiveConcurrencyLimiter(TestCase):
+    def test_limit_grows_with_successes(self):
+        limiter = AdaptiveConcurrencyLimiter(max_limit=10, initial_limit=2)
+        for _ in range(3):
+            limiter.release(limiter.acquire())
+        self.assertEqual(3, limiter.get_metrics()["concurrency_limit"])
+
+    def test_limit_does_not_grow_over_max_limit(self):
+        limiter = AdaptiveConcurrencyLimiter(max_limit=3)
+        for _ in range(10):
+            limiter.release(limiter.acquire())
+        self.assertEqual(3, limiter.limit)
+
+    def test_burst_of_throttled_requests_decreases_once(self):
+        limiter = AdaptiveConcurrencyLimiter(max_limit=8)
+        tokens: list = [limiter.acquire() for _ in range(4)]
+        for token in tokens:
+            limiter.release(token, throttled=True)
+        metrics: dict = limiter.get_metrics()
+        self.assertEqual(4, metrics["concurrency_limit"])
+        self.assertEqual(4, metrics["throttle_events"])
+        limiter.release(limiter.acquire(), throttled=True)
+        self.assertEqual(2, limiter.get_metrics()["concurrency_limit"])
+
+    def test_limit_does_not_decrease_under_min_limit(self):
+        limiter = AdaptiveConcurrencyLimiter(max_limit=4, min_limit=2)
+        for _ in range(5):
+            limiter.release(limiter.acquire(), throttled=True)
+        self.assertEqual(2, limiter.limit)
+
+    def test_acquire_waits_for_a_free_slot(self):
+        limiter = AdaptiveConcurrencyLimiter(max_limit=1)
+        token: float = limiter.acquire()
+        acquired: threading.Event = threading.Event()
+        thread: threading.Thread = threading.Thread(
+            target=lambda: (limiter.acquire(), acquired.set())
+        )
+        thread.start()
+        self.assertFalse(acquired.wait(0.1))
+        limiter.release(token)
+        self.assertTrue(acquired.wait(5))
+        thread.join()
+
+    def test_invalid_limits(self):
+        self.assertRaises(ValueError, AdaptiveConcurrencyLimiter, max_limit=0)
+        self.assertRaises(ValueError, AdaptiveConcurrencyLimiter, decrease_factor=1)
+
+
+class TestThrottlingHandler(TestCase):
+    def setUp(self):
+        self.limiter = AdaptiveConcurrencyLimiter(max_limit=4)
+        self.handler = ThrottlingHandler(self.limiter, max_attempts=3)
+
+    def test_backoff_delay_is_jittered_and_capped(self):
+        delays: list = [get_backoff_delay(4, base=0.1, cap=10) for _ in range(100)]
+        self.assertTrue(all(0 <= delay <= 0.8 for delay in delays))
+        self.assertGreater(len(set(delays)), 1)
+        self.assertLessEqual(get_backoff_delay(30, base=0.1, cap=2), 2)
+
+    def test_is_throttling_response(self):
+        self.assertTrue(is_throttling_response(get_response(503, "SlowDown")))
+        self.assertTrue(is_throttling_response(get_response(400, "RequestTimeout")))
+        self.assertFalse(is_throttling_response(get_response(200)))
+        self.assertFalse(is_throttling_response(get_response(404, "NoSuchKey")))
+        self.assertTrue(
+            is_throttling_response(caught_exception=ReadTimeoutError(endpoint_url="u"))
+        )
+        self.assertFalse(
+            is_throttling_response(
+                caught_exception=EndpointConnectionError(endpoint_url="u")
+            )
+        )
+
+    @mock.patch("throttling.get_backoff_delay", return_value=0.5)
+    def test_throttled_request_is_retried_with_lower_concurrency(self, _):
+        self.handler.before_send()
+        self.assertEqual(1, self.limiter.in_flight)
+        delay = self.handler.needs_retry(
+            response=get_response(503, "SlowDown"), attempts=1
+        )
+        self.assertEqual(0.5, delay)
+        self.assertEqual(
+            dict(
+                concurrency_limit=2,
+                in_flight=0,
+                throttle_events=1,
+                successes=0,
+                retries=1,
+            ),
+            self.handler.get_metrics(),
+        )
+
+    def test_other_responses_are_left_to_botocore(self):
+        self.handler.before_send()
+        self.assertIsNone(
+            self.handler.needs_retry(response=get_response(200), attempts=1)
+        )
+        self.handler.before_send()
+        self.assertIsNone(
+            self.handler.needs_retry(
+                response=get_response(503, "SlowDown"), attempts=3
+            )
+        )
+        self.assertEqual(0, self.limiter.in_flight)
+        self.assertEqual(0, self.handler.retries)
+
+    def test_slot_of_request_without_needs_retry_is_freed(self):
+        self.handler.before_send()
+        self.handler.before_send()
+        self.assertEqual(1, self.limiter.in_flight)
+
+    def test_handlers_are_called_by_boto3(self):
+        session = boto3.Session(aws_access_key_id="x", aws_secret_access_key="x")
+        self.handler.register(session.events)
+        status_codes: list = [503, 200]
+
+        def send(request, **kwargs):
+            status_code: int = status_codes.pop(0)
+            raw = mock.Mock(stream=mock.Mock(return_value=iter([b""])))
+            raw.read.return_value = b""
+            return AWSResponse(request.url, status_code, {}, raw)
+
+        session.events.register("before-send.s3", send)
+        client = session.client("s3", region_name="us-east-1")
+        with mock.patch("throttling.get_backoff_delay", return_value=0):
+            start_time: float = time.perf_counter()
+            client.head_bucket(Bucket="bucket")
+        self.assertLess(time.perf_counter() - start_time, 5)
+        metrics: dict = self.handler.get_metrics()
+        self.assertEqual(1, metrics["throttle_events"])
+        self.assertEqual(1, metrics["successes"])
+        self.assertEqual(0, metrics["in_flight"])
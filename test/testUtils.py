@@ -1,14 +1,25 @@
 import csv
+import io
 import os
-from unittest import TestCase
+import tempfile
+import zipfile
+from unittest import TestCase, mock, skipIf
 from utils import (
     valid_date,
     get_date_list_between_two_given_dates,
     update_file_by_tuples,
+    update_stream_by_tuples,
+    update_bytes_stream_by_tuples,
+    compile_tuples,
     retrieve_objects_with_pattern,
     valid_three_tuple_list,
     is_gzipfile,
     get_file_object,
+    change_compress_type,
+    choose_compresslevel,
+    measure_compression,
+    open_compressed_stream,
+    zstandard,
 )
 import datetime
 import argparse
@@ -113,6 +124,68 @@ class TestUpdateFileByTuples(TestCase):
         os.remove(output_file)
 
 
+class TestCompileTuples(TestCase):
+    def test_only_touched_columns_are_compiled(self):
+        tuple_list: list = [["3", "2", "1"], ["7", "LABORAL", "FERIADO"], [3, 5, "1"]]
+        self.assertEqual(
+            [(3, {"2": "1", "5": "1"}), (7, {"LABORAL": "FERIADO"})],
+            compile_tuples(tuple_list),
+        )
+
+    def test_tuples_are_chained_in_order(self):
+        tuple_list: list = [["0", "a", "b"], ["0", "b", "c"], ["0", "c", "a"], ["0", "a", "d"]]
+        self.assertEqual([(0, {"a": "d", "b": "d", "c": "d"})], compile_tuples(tuple_list))
+
+
+class TestUpdateStreamByTuples(TestCase):
+    def test_same_result_as_applying_each_tuple(self):
+        input_text: str = "a|x\nb|y\nc\nd|x\n"
+        tuple_list: list = [["0", "a", "b"], ["1", "x", "z"], ["0", "b", "c"], ["1", "9", "0"]]
+        output_stream: io.StringIO = io.StringIO()
+        replacements: list = update_stream_by_tuples(io.StringIO(input_text), output_stream, tuple_list)
+        self.assertEqual("c|z\r\nc|y\r\nc\r\nd|z\r\n", output_stream.getvalue())
+        self.assertEqual([1, 2, 2, 0], replacements)
+
+
+class TestUpdateBytesStreamByTuples(TestCase):
+    tuple_list: list = [["3", "2", "1"], ["7", "LABORAL", "FERIADO"], ["0", "x", ""], ["1", "", "y"]]
+
+    def update_with_csv(self, data: bytes) -> tuple:
+        output_stream: io.StringIO = io.StringIO()
+        input_stream = io.TextIOWrapper(io.BytesIO(data), encoding="utf-8")
+        replacements: list = update_stream_by_tuples(input_stream, output_stream, self.tuple_list)
+        return output_stream.getvalue().encode("utf-8"), replacements
+
+    def update_with_bytes(self, data: bytes, chunk_size: int) -> tuple:
+        output_stream: io.BytesIO = io.BytesIO()
+        replacements: list = update_bytes_stream_by_tuples(
+            io.BytesIO(data), output_stream, self.tuple_list, chunk_size=chunk_size
+        )
+        return output_stream.getvalue(), replacements
+
+    def assert_same_output(self, data: bytes):
+        for chunk_size in [1, 7, 1024**2]:
+            self.assertEqual(self.update_with_csv(data), self.update_with_bytes(data, chunk_size))
+
+    def test_fixtures(self):
+        for file_name in ["2021-06-29.bip", "2021-06-30.bip"]:
+            with open(os.path.join(os.path.dirname(__file__), "files", file_name), "rb") as file_obj:
+                self.assert_same_output(file_obj.read())
+
+    def test_special_rows(self):
+        self.assert_same_output(b"x\n\na|b|c|2\r\nx|\n|\xc3\xb1|2|3|2|5|6|LABORAL\nlast|1|2|2")
+
+    def test_quoted_fields_use_csv_module(self):
+        self.assert_same_output(b"a|b|c|2\n\"x|y\"|b|c|2\n\"multi\nline\"|\n1|2|3|2\n")
+
+    def test_lone_carriage_return(self):
+        self.assert_same_output(b"a|b|c|2\r\nx|b|c|2\r\r\nx|b|c|2\rx|b|c|2\n")
+
+    def test_new_value_needs_quotes(self):
+        self.tuple_list = [["3", "2", "1|2"]]
+        self.assert_same_output(b"a|b|c|2\n")
+
+
 class TestRetrieveObjectsWithPattern(TestCase):
     def test_not_matched_case(self):
         pattern = "*.trip*"
@@ -164,32 +237,93 @@ class TestIsGzipFile(TestCase):
 
 
 class TestGetFileObject(TestCase):
+    def setUp(self) -> None:
+        with open(os.path.join(os.path.dirname(__file__), "files", "2021-06-30.bip"), "rb") as file_obj:
+            self.expected_data: bytes = file_obj.read()
+
     def test_zip_file_case(self):
         file: str = os.path.join(
-            os.path.dirname(__file__), "files", "2021-05-30.bip.zip"
+            os.path.dirname(__file__), "files", "2021-06-30.bip.zip"
         )
-        expected_file: str =  os.path.join(os.path.dirname(__file__), "files", "2021-05-30.bip")
-        expected_compress_mode: str = "zip"
-        opened_file, compress_mode = get_file_object(file)
-        self.assertEqual(expected_file, opened_file)
-        self.assertEqual(expected_compress_mode, compress_mode)
-        os.remove(expected_file)
+        with get_file_object(file) as (opened_file, compress_mode):
+            self.assertEqual(self.expected_data, opened_file.read())
+        self.assertEqual("zip", compress_mode)
 
     def test_gz_file_case(self):
         file: str = os.path.join(
-            os.path.dirname(__file__), "files", "2021-05-30.bip.gz"
+            os.path.dirname(__file__), "files", "2021-06-30.bip.gz"
         )
-        expected_compress_mode: str = "gz"
-        expected_file: str =  os.path.join(os.path.dirname(__file__), "files", "2021-05-30.bip")
-        opened_file, compress_mode = get_file_object(file)
-        self.assertEqual(expected_file, opened_file)
-        self.assertEqual(expected_compress_mode, compress_mode)
-        os.remove(expected_file)
+        with get_file_object(file) as (opened_file, compress_mode):
+            self.assertEqual(self.expected_data, opened_file.read())
+        self.assertEqual("gz", compress_mode)
 
     def test_file_case(self):
-        file: str = os.path.join(os.path.dirname(__file__), "files", "2021-06-29.bip")
-        expected_file: str =  os.path.join(os.path.dirname(__file__), "files", "2021-06-29.bip")
-        expected_compress_mode: str = ""
-        opened_file, compress_mode = get_file_object(file)
-        self.assertEqual(expected_file, opened_file)
-        self.assertEqual(expected_compress_mode, compress_mode)
\ No newline at end of file
+        file: str = os.path.join(os.path.dirname(__file__), "files", "2021-06-30.bip")
+        with get_file_object(file) as (opened_file, compress_mode):
+            self.assertEqual(self.expected_data, opened_file.read())
+        self.assertEqual("", compress_mode)
+        self.assertTrue(opened_file.closed)
+
+    def test_multi_member_zip_file_case(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file: str = os.path.join(directory, "2021-06-30.bip.zip")
+            with zipfile.ZipFile(file, "w") as zip_file:
+                zip_file.writestr("readme.txt", b"other member")
+                zip_file.writestr("2021-06-30.bip", self.expected_data)
+            with get_file_object(file) as (opened_file, compress_mode):
+                self.assertEqual(self.expected_data, opened_file.read())
+            with self.assertRaises(ValueError):
+                with get_file_object(file, member_name="2021-06-29.bip"):
+                    pass
+
+
+class TestCompression(TestCase):
+    def setUp(self) -> None:
+        with open(os.path.join(os.path.dirname(__file__), "files", "2021-06-30.bip"), "rb") as file_obj:
+            self.data: bytes = file_obj.read()
+
+    def compress(self, compress_type: str, compresslevel: int = None) -> bytes:
+        output_stream: io.BytesIO = io.BytesIO()
+        with open_compressed_stream(output_stream, compress_type, "2021-06-30.bip", compresslevel) as stream:
+            stream.write(self.data)
+        return output_stream.getvalue()
+
+    def test_compress_level(self):
+        for compress_type in ["gz", "zip"]:
+            self.assertLess(len(self.compress(compress_type, 9)), len(self.compress(compress_type, 1)))
+
+    @skipIf(zstandard is None, "zstandard is not installed")
+    def test_zst_file_case(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file: str = os.path.join(directory, "2021-06-30.bip.zst")
+            with open(file, "wb") as file_obj:
+                file_obj.write(self.compress("zst"))
+            with get_file_object(file) as (opened_file, compress_mode):
+                self.assertEqual(self.data, opened_file.read())
+            self.assertEqual("zst", compress_mode)
+
+    @skipIf(zstandard is None, "zstandard is not installed")
+    def test_compression_threads(self):
+        with mock.patch("utils.zstandard.ZstdCompressor", wraps=zstandard.ZstdCompressor) as compressor:
+            with open_compressed_stream(io.BytesIO(), "zst", "2021-06-30.bip", threads=2) as stream:
+                stream.write(self.data)
+        self.assertEqual(2, compressor.call_args.kwargs["threads"])
+        with open_compressed_stream(io.BytesIO(), "gz", "2021-06-30.bip", threads=2) as stream:
+            self.assertEqual(2, stream.workers)
+
+    @mock.patch("utils.zstandard", None)
+    def test_zstandard_is_optional(self):
+        with self.assertRaises(ImportError):
+            self.compress("zst")
+
+    def test_change_compress_type(self):
+        self.assertEqual("2021/2021-06-30.bip.zst", change_compress_type("2021/2021-06-30.bip.gz", "gz", "zst"))
+        self.assertEqual("2021-06-30.bip.gz", change_compress_type("2021-06-30.bip", "", "gz"))
+        self.assertEqual("2021-06-30.bip.zip", change_compress_type("2021-06-30.bip.zip", "zip", "zip"))
+
+    def test_choose_compresslevel(self):
+        self.assertEqual(1, choose_compresslevel(self.data, "gz", float("inf"))["compresslevel"])
+        self.assertEqual(9, choose_compresslevel(self.data, "gz", 0)["compresslevel"])
+        measure: dict = measure_compression(self.data, "gz", 6)
+        self.assertLess(measure["ratio"], 1)
+        self.assertGreater(measure["throughput"], 0)
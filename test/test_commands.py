@@ -1,5 +1,9 @@
 import io
+import json
 import os
+import subprocess
+import sys
+import tempfile
 from contextlib import redirect_stdout
 from unittest import TestCase, mock
 
@@ -11,6 +15,13 @@ from download_from_s3 import main as download_main
 from move_bucket_from_s3 import main as move_bucket_main
 from upload_to_s3 import main as upload_main
 from update_objects_from_s3 import main as update_objects_main
+from run_manifest import main as run_manifest_main
+from sync_with_s3 import main as sync_main
+from pack_to_s3 import main as pack_main
+from unpack_from_s3 import main as unpack_main
+from s3tool import main as s3tool_main
+from inventory import BucketInventory
+from test.fake_s3 import FakeS3Client
 
 class DeleteObjectTest(TestCase):
 
@@ -130,7 +141,7 @@ class UploadObjectTest(TestCase):
         self.assertIn('finished load of file', f.output[1])
 
         mock_call.assert_called_once()
-        mock_call.assert_called_with(filepath, filename, bucket_name)
+        mock_call.assert_called_with(filepath, filename, bucket_name, extra_args={})
 
     @mock.patch('upload_to_s3.AWSSession')
     @mock.patch('upload_to_s3.glob')
@@ -167,7 +178,7 @@ class UploadObjectTest(TestCase):
         self.assertIn('finished load of file', f.output[1])
 
         mock_call.assert_called_once()
-        mock_call.assert_called_with(filepath, filename, bucket_name)
+        mock_call.assert_called_with(filepath, filename, bucket_name, extra_args={})
 
     @mock.patch('builtins.input')
     @mock.patch('upload_to_s3.AWSSession')
@@ -191,7 +202,7 @@ class UploadObjectTest(TestCase):
         self.assertIn('finished load of file', f.output[1])
 
         mock_call.assert_called_once()
-        mock_call.assert_called_with(filepath, filename, bucket_name)
+        mock_call.assert_called_with(filepath, filename, bucket_name, extra_args={})
 
     @mock.patch('builtins.input')
     @mock.patch('upload_to_s3.AWSSession')
@@ -215,7 +226,7 @@ class UploadObjectTest(TestCase):
 
         input_mock.assert_not_called()
         mock_call.assert_called_once()
-        mock_call.assert_called_with(filepath, filename, bucket_name)
+        mock_call.assert_called_with(filepath, filename, bucket_name, extra_args={})
 
     @mock.patch('builtins.input')
     @mock.patch('upload_to_s3.AWSSession')
@@ -263,6 +274,77 @@ class UploadObjectTest(TestCase):
             self.assertIn(expected_answer, f.output[0])
 
 
+    @mock.patch('upload_to_s3.AWSSession')
+    @mock.patch('upload_to_s3.glob')
+    def test_move_file_to_bucket_with_inventory(self, glob_mock, aws_session_mock):
+        """  the session is built with the local inventory """
+        filename = '2018-01-01.txt'
+        filepath = os.path.join(__file__, filename)
+        bucket_name = 'aarrrp'
+
+        aws_session_mock.return_value.check_bucket_exists.return_value = True
+        aws_session_mock.return_value.check_file_exists.return_value = False
+        glob_mock.glob.return_value = [filepath]
+
+        with self.assertLogs('upload_to_s3', level='INFO'):
+            upload_main([self.command_name, filepath, bucket_name, '--inventory', ':memory:'])
+
+        self.assertIsInstance(aws_session_mock.call_args.kwargs['inventory'], BucketInventory)
+        aws_session_mock.return_value.send_file_to_bucket.assert_called_with(filepath, filename, bucket_name,
+                                                                         extra_args={})
+
+    @mock.patch('upload_to_s3.AWSSession')
+    @mock.patch('upload_to_s3.glob')
+    def test_move_file_to_bucket_with_acl_and_headers(self, glob_mock, aws_session_mock):
+        """  ACL and headers are sent with the upload """
+        filename = '2018-01-01.bip.gz'
+        filepath = os.path.join(__file__, filename)
+        bucket_name = 'aarrrp'
+
+        aws_session_mock.return_value.check_bucket_exists.return_value = True
+        aws_session_mock.return_value.check_file_exists.return_value = False
+        glob_mock.glob.return_value = [filepath]
+
+        with self.assertLogs('upload_to_s3', level='INFO'):
+            upload_main([self.command_name, filepath, bucket_name, '--acl', 'public-read', '--content-type',
+                         'text/csv', '--content-encoding', 'gzip', '--cache-control', 'max-age=3600'])
+
+        extra_args = dict(ACL='public-read', ContentType='text/csv', ContentEncoding='gzip',
+                          CacheControl='max-age=3600')
+        aws_session_mock.return_value.send_file_to_bucket.assert_called_with(filepath, filename, bucket_name,
+                                                                         extra_args=extra_args)
+        with self.assertRaises(SystemExit):
+            upload_main([self.command_name, filepath, bucket_name, '--acl', 'everyone'])
+
+    @mock.patch('upload_to_s3.AWSSession')
+    def test_upload_from_stdin(self, aws_session_mock):
+        """  data read from stdin is uploaded with the key given by --key """
+        aws_session_mock.return_value.check_bucket_exists.return_value = True
+        aws_session_mock.return_value.check_file_exists.return_value = False
+        mock_call = aws_session_mock.return_value.send_stream_to_bucket
+        stdin = io.TextIOWrapper(io.BytesIO(b'1|2\n'))
+
+        with mock.patch('sys.stdin', stdin), self.assertLogs('upload_to_s3', level='INFO') as f:
+            self.assertEqual(0, upload_main([self.command_name, '-', 'aarrrp', '--key', '2018-01-01.bip',
+                                             '--part-size', '16', '--workers', '2']))
+        self.assertIn('uploading stdin to 2018-01-01.bip', f.output[0])
+        mock_call.assert_called_once_with(stdin.buffer, '2018-01-01.bip', 'aarrrp', 16 * 1024 ** 2, 2, {})
+
+    @mock.patch('upload_to_s3.AWSSession')
+    def test_upload_from_stdin_does_not_replace_without_option(self, aws_session_mock):
+        """  stdin is the data, the user can not be asked to replace the object """
+        aws_session_mock.return_value.check_bucket_exists.return_value = True
+        aws_session_mock.return_value.check_file_exists.return_value = True
+
+        with self.assertLogs('upload_to_s3', level='INFO') as f:
+            self.assertEqual(1, upload_main([self.command_name, '-', 'aarrrp', '--key', '2018-01-01.bip']))
+            with self.assertRaises(SystemExit):
+                upload_main([self.command_name, '-', 'aarrrp'])
+        self.assertIn('use --replace to replace it', f.output[0])
+        self.assertIn('--key is needed', f.output[1])
+        aws_session_mock.return_value.send_stream_to_bucket.assert_not_called()
+
+
 class DownloadObjectTest(TestCase):
 
     def setUp(self):
@@ -385,6 +467,20 @@ class DeleteBucketTest(TestCase):
         delete_bucket.assert_called_with(bucket_name)
 
 
+    @mock.patch('delete_bucket_from_s3.AWSSession.retrieve_obj_list')
+    @mock.patch('delete_bucket_from_s3.AWSSession.delete_bucket')
+    @mock.patch('delete_bucket_from_s3.AWSSession.check_bucket_exists')
+    def test_plan_does_not_delete(self, check_bucket_exists, delete_bucket, retrieve_obj_list):
+        check_bucket_exists.return_value = True
+        retrieve_obj_list.return_value = [{'name': '2020-01-01.trip.gz', 'size': 1.0}]
+
+        with self.assertLogs('delete_bucket_from_s3', level='INFO') as f:
+            delete_bucket_main([self.command_name, 'bucket_name', '--plan'])
+
+        self.assertIn('INFO:delete_bucket_from_s3:  DeleteBucket: 1', f.output)
+        delete_bucket.assert_not_called()
+
+
 class MoveBucketTest(TestCase):
     def setUp(self):
         self.command_name = 'move_bucket_from_s3'
@@ -435,6 +531,20 @@ class MoveBucketTest(TestCase):
         move_files_from_bucket_to_bucket.assert_called_with(source, target, None, None)
 
 
+    @mock.patch('move_bucket_from_s3.AWSSession.retrieve_obj_list')
+    @mock.patch('move_bucket_from_s3.AWSSession.move_files_from_bucket_to_bucket')
+    @mock.patch('move_bucket_from_s3.AWSSession.check_bucket_exists')
+    def test_plan_does_not_move(self, check_bucket_exists, move_files_from_bucket_to_bucket, retrieve_obj_list):
+        check_bucket_exists.return_value = True
+        retrieve_obj_list.return_value = [{'name': '2020-01-01.trip.gz', 'size': 1.0}]
+
+        with self.assertLogs('move_bucket_from_s3', level='INFO') as f:
+            move_bucket_main([self.command_name, 'source', 'target', '--plan'])
+
+        self.assertIn('INFO:move_bucket_from_s3:Plan for move: 1 objects, 1.0 MB', f.output)
+        move_files_from_bucket_to_bucket.assert_not_called()
+
+
 class UpdateObjectsFromS3Test(TestCase):
     def setUp(self):
         self.command_name = 'update_objects_from_s3'
@@ -513,4 +623,206 @@ class UpdateObjectsFromS3Test(TestCase):
         extension = 'bip'
         start_date = '2022-10-01'
         end_date = '2022-10-01'
-        self.assertIsNone(update_objects_main([self.command_name, source_bucket, extension, start_date, end_date, tuples]))
\ No newline at end of file
+        self.assertIsNone(update_objects_main([self.command_name, source_bucket, extension, start_date, end_date, tuples]))
+
+    @mock.patch('update_objects_from_s3.AWSSession.retrieve_obj_list')
+    @mock.patch('update_objects_from_s3.AWSSession.update_files_from_bucket')
+    @mock.patch('update_objects_from_s3.AWSSession.check_bucket_exists')
+    def test_plan_does_not_update(self, check_bucket_exist, update_files_from_bucket, retrieve_obj_list):
+        check_bucket_exist.return_value = True
+        retrieve_obj_list.return_value = [{'name': '2022-10-01.bip.gz', 'size': 1.0}]
+
+        with self.assertLogs('update_objects_from_s3', level='INFO') as f:
+            update_objects_main([self.command_name, 'source', '.bip*', '2022-10-01', '2022-10-02', '[1,2,3]',
+                                 '--plan'])
+
+        self.assertIn('INFO:update_objects_from_s3:Plan for update: 1 objects, 1.0 MB', f.output)
+        update_files_from_bucket.assert_not_called()
+
+    @mock.patch('update_objects_from_s3.ThroughputHistory')
+    @mock.patch('update_objects_from_s3.AWSSession.update_files_from_bucket')
+    @mock.patch('update_objects_from_s3.AWSSession.check_bucket_exists')
+    def test_scan(self, check_bucket_exist, update_files_from_bucket, throughput_history):
+        check_bucket_exist.return_value = True
+        update_objects_main([self.command_name, 'source', '.bip*', '2022-10-01', '2022-10-01', '[1,2,3]', '--scan',
+                             '--throughput-history', 'history.json'])
+        self.assertTrue(update_files_from_bucket.call_args.args[7])
+        throughput_history.assert_not_called()
+
+    @mock.patch('update_objects_from_s3.ThroughputHistory')
+    @mock.patch('update_objects_from_s3.AWSSession.update_files_from_bucket')
+    @mock.patch('update_objects_from_s3.AWSSession.check_bucket_exists')
+    def test_throughput_history_counts_unchanged_objects(self, check_bucket_exist, update_files_from_bucket,
+                                                         throughput_history):
+        check_bucket_exist.return_value = True
+        update_files_from_bucket.return_value = dict(objects=1, unchanged=2, bytes=30, replacements=[4])
+        update_objects_main([self.command_name, 'source', '.bip*', '2022-10-01', '2022-10-01', '[1,2,3]',
+                             '--throughput-history', 'history.json'])
+        # the bytes of the 3 objects read go with the 3 objects
+        self.assertEqual(('update', 3, 30), throughput_history.return_value.record.call_args.args[:3])
+
+    @mock.patch('update_objects_from_s3.AWSSession.update_files_from_bucket')
+    @mock.patch('update_objects_from_s3.AWSSession.check_bucket_exists')
+    def test_codec_and_compress_level(self, check_bucket_exist, update_files_from_bucket):
+        check_bucket_exist.return_value = True
+        update_objects_main([self.command_name, 'source', '.bip*', '2022-10-01', '2022-10-01', '[1,2,3]',
+                             '--codec', 'zst', '--compress-level', '12'])
+        self.assertEqual(('zst', 12, None), update_files_from_bucket.call_args.args[-3:])
+
+    @mock.patch('update_objects_from_s3.AWSSession.update_files_from_bucket')
+    @mock.patch('update_objects_from_s3.AWSSession.check_bucket_exists')
+    def test_invalid_compress_level(self, check_bucket_exist, update_files_from_bucket):
+        check_bucket_exist.return_value = True
+        with self.assertRaises(SystemExit):
+            update_objects_main([self.command_name, 'source', '.bip*', '2022-10-01', '2022-10-01', '[1,2,3]',
+                                 '--compress-level', '12'])
+        with self.assertRaises(SystemExit):
+            update_objects_main([self.command_name, 'source', '.bip*', '2022-10-01', '2022-10-01', '[1,2,3]',
+                                 '--compress-level', '6', '--target-throughput', '50'])
+        update_files_from_bucket.assert_not_called()
+
+
+class RunManifestTest(TestCase):
+
+    def setUp(self):
+        self.command_name = 'run_manifest'
+
+    @mock.patch('run_manifest.AWSSession')
+    def test_invalid_manifest(self, aws_session_mock):
+        with tempfile.TemporaryDirectory() as directory:
+            manifest_path = os.path.join(directory, 'manifest.jsonl')
+            with open(manifest_path, 'w') as manifest_file:
+                manifest_file.write('{"op": "rename", "bucket": "b", "key": "k"}\n')
+            with self.assertLogs('run_manifest', level='INFO') as f:
+                with self.assertRaises(SystemExit):
+                    run_manifest_main([self.command_name, manifest_path])
+        self.assertIn("INFO:run_manifest:Line 1: unknown operation 'rename'", f.output)
+        aws_session_mock.assert_not_called()
+
+    @mock.patch('run_manifest.AWSSession')
+    def test_results_are_written(self, aws_session_mock):
+        aws_session_mock.return_value.delete_object_in_bucket.side_effect = [None, RuntimeError('Access Denied')]
+        with tempfile.TemporaryDirectory() as directory:
+            manifest_path = os.path.join(directory, 'manifest.jsonl')
+            with open(manifest_path, 'w') as manifest_file:
+                manifest_file.write('{"op": "delete", "bucket": "b", "key": "k1"}\n'
+                                    '{"op": "delete", "bucket": "b", "key": "k2", "depends_on": [1]}\n')
+            with self.assertLogs('run_manifest', level='INFO') as f:
+                self.assertEqual(1, run_manifest_main([self.command_name, manifest_path, '--max-concurrency', '4']))
+            with open(f'{manifest_path}.results.jsonl') as results_file:
+                statuses = [json.loads(line)['status'] for line in results_file]
+        self.assertEqual(['ok', 'failed'], statuses)
+        self.assertIn('1 operations ok, 1 failed and 0 skipped', f.output[-1])
+        aws_session_mock.assert_called_once_with(max_concurrency=4)
+
+
+class SyncTest(TestCase):
+
+    def setUp(self):
+        self.command_name = 'sync_with_s3'
+
+    @mock.patch('sync_with_s3.AWSSession')
+    def test_one_side_must_be_a_bucket(self, aws_session_mock):
+        with self.assertLogs('sync_with_s3', level='INFO') as f:
+            with self.assertRaises(SystemExit):
+                sync_main([self.command_name, 'data', 'backup'])
+            with self.assertRaises(SystemExit):
+                sync_main([self.command_name, 's3://a', 's3://b'])
+        self.assertIn('One of source and destination must be s3://bucket/prefix', f.output[0])
+        aws_session_mock.assert_not_called()
+
+    @mock.patch('sync_with_s3.list_prefix')
+    @mock.patch('sync_with_s3.AWSSession')
+    def test_plan_does_not_copy(self, aws_session_mock, list_prefix_mock):
+        aws_session_mock.return_value.check_bucket_exists.return_value = True
+        list_prefix_mock.return_value = {'2021-06-30.bip': dict(size=4, mtime=0, etag='etag')}
+        with tempfile.TemporaryDirectory() as directory:
+            with self.assertLogs('sync_with_s3', level='INFO') as f:
+                sync_main([self.command_name, 's3://bucket/data', directory, '--plan'])
+        self.assertIn('to copy: 1 (0.0 MB), 1 new', f.output[1])
+        self.assertEqual('bucket', list_prefix_mock.call_args.args[1])
+        self.assertEqual('data/', list_prefix_mock.call_args.args[2])
+        aws_session_mock.return_value.download_object_from_bucket.assert_not_called()
+
+
+class PackTest(TestCase):
+
+    @mock.patch('unpack_from_s3.AWSSession')
+    @mock.patch('pack_to_s3.AWSSession')
+    def test_pack_and_unpack(self, pack_session_mock, unpack_session_mock):
+        """  files packed into one object are extracted with range requests """
+        client = FakeS3Client({'bucket': {}})
+        for session_mock in [pack_session_mock, unpack_session_mock]:
+            session_mock.return_value.session.client.return_value = client
+            session_mock.return_value.buffer_pool = None
+        pack_session_mock.return_value.check_bucket_exists.return_value = True
+        pack_session_mock.return_value.check_file_exists.return_value = False
+        with tempfile.TemporaryDirectory() as directory:
+            for name in ['2021-06-30.a.csv', '2021-06-30.b.csv']:
+                with open(os.path.join(directory, name), 'w') as file_obj:
+                    file_obj.write(name)
+            with self.assertLogs('pack_to_s3', level='INFO') as f:
+                self.assertEqual(0, pack_main(['pack_to_s3', os.path.join(directory, '*.csv'), 'bucket', '--key',
+                                               '2021-06-30.pack']))
+            self.assertIn('2 files (0.0 MB) packed into 2021-06-30.pack', f.output[0])
+            self.assertEqual(['2021-06-30.pack', '2021-06-30.pack.index.json'], sorted(client.buckets['bucket']))
+
+            destination_path = os.path.join(directory, 'unpacked')
+            os.makedirs(destination_path)
+            with self.assertLogs('unpack_from_s3', level='INFO'):
+                self.assertEqual(0, unpack_main(['unpack_from_s3', 'bucket', '2021-06-30.pack', '2021-06-30.b.csv',
+                                                 '--destination-path', destination_path]))
+                self.assertEqual(1, unpack_main(['unpack_from_s3', 'bucket', '2021-06-30.pack', '2021-07-01.csv',
+                                                 '--destination-path', destination_path]))
+            self.assertEqual(['2021-06-30.b.csv'], os.listdir(destination_path))
+            with open(os.path.join(destination_path, '2021-06-30.b.csv')) as file_obj:
+                self.assertEqual('2021-06-30.b.csv', file_obj.read())
+
+    @mock.patch('pack_to_s3.write_pack')
+    @mock.patch('pack_to_s3.AWSSession')
+    def test_pack_does_not_replace_without_option(self, aws_session_mock, write_pack_mock):
+        aws_session_mock.return_value.check_bucket_exists.return_value = True
+        aws_session_mock.return_value.check_file_exists.return_value = True
+        with self.assertLogs('pack_to_s3', level='INFO') as f:
+            self.assertEqual(1, pack_main(['pack_to_s3', __file__, 'bucket', '--key', 'test.pack']))
+        self.assertIn('use --replace to replace it', f.output[0])
+        aws_session_mock.return_value.check_file_exists.assert_called_once_with('bucket', 'test.pack.index.json')
+        write_pack_mock.assert_not_called()
+
+
+class S3ToolTest(TestCase):
+
+    def setUp(self):
+        self.command_name = 's3tool'
+
+    def test_without_subcommand(self):
+        with self.assertRaises(SystemExit):
+            s3tool_main([self.command_name])
+        with self.assertRaises(SystemExit):
+            s3tool_main([self.command_name, 'copy', 'source'])
+
+    @mock.patch('download_from_s3.main')
+    def test_subcommand_receives_its_arguments(self, download_main_mock):
+        download_main_mock.return_value = 0
+        self.assertEqual(0, s3tool_main([self.command_name, 'download', 'file.txt', 'bucket', '--destination-path', 'data']))
+        download_main_mock.assert_called_once_with(
+            ['s3tool download', 'file.txt', 'bucket', '--destination-path', 'data'])
+
+    @mock.patch('update_objects_from_s3.AWSSession')
+    def test_subcommand_help(self, aws_session_mock):
+        with redirect_stdout(io.StringIO()) as output:
+            with self.assertRaises(SystemExit):
+                s3tool_main([self.command_name, 'update', '-h'])
+        self.assertIn('--journal', output.getvalue())
+        aws_session_mock.assert_not_called()
+
+    def test_help_does_not_load_boto3(self):
+        script = ("import sys, s3tool\n"
+                  "try:\n"
+                  "    s3tool.main(['s3tool', 'update', '-h'])\n"
+                  "except SystemExit:\n"
+                  "    pass\n"
+                  "print('botocore.client' in sys.modules, 'numpy.linalg' in sys.modules)")
+        output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True,
+                                cwd=os.path.join(os.path.dirname(__file__), '..'), check=True).stdout
+        self.assertEqual('False False', output.splitlines()[-1])
@@ -0,0 +1,174 @@
+import random
+import threading
+import time
+
+DEFAULT_MAX_CONCURRENCY: int = 10
+DEFAULT_MAX_ATTEMPTS: int = 8
+DEFAULT_BACKOFF_BASE: float = 0.1
+DEFAULT_BACKOFF_CAP: float = 20.0
+# error codes S3 answers when it is asked to slow down
+THROTTLING_ERROR_CODES: set = {
+    "SlowDown",
+    "Throttling",
+    "ThrottlingException",
+    "RequestTimeout",
+    "RequestLimitExceeded",
+    "ServiceUnavailable",
+}
+THROTTLING_STATUS_CODES: set = {429, 503}
+TIMEOUT_EXCEPTION_NAMES: set = {"ReadTimeoutError", "ConnectTimeoutError"}
+
+
+def get_backoff_delay(
+    attempt: int,
+    base: float = DEFAULT_BACKOFF_BASE,
+    cap: float = DEFAULT_BACKOFF_CAP,
+) -> float:
+    """This function makes the delay before retrying a throttled request, exponential with full jitter.
+
+    Random delays keep the workers throttled at the same time from retrying together.
+
+    Args:
+        attempt (int): number of the failed attempt, starting at 1
+        base (float, optional): delay of the first retry in seconds. Defaults to DEFAULT_BACKOFF_BASE.
+        cap (float, optional): maximum delay in seconds. Defaults to DEFAULT_BACKOFF_CAP.
+
+    Returns:
+        float: seconds to wait, between 0 and min(cap, base * 2 ** (attempt - 1))
+    """
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+def is_throttling_response(response=None, caught_exception=None) -> bool:
+    """This function tells if a request failed because S3 is throttling it or it timed out.
+
+    Args:
+        response (tuple, optional): (http_response, parsed_response) pair given by botocore. Defaults to None.
+        caught_exception (Exception, optional): exception raised sending the request. Defaults to None.
+
+    Returns:
+        bool: True if the request was throttled or timed out
+    """
+    if caught_exception is not None:
+        return type(caught_exception).__name__ in TIMEOUT_EXCEPTION_NAMES
+    if response is None:
+        return False
+    http_response, parsed_response = response
+    error_code: str = (parsed_response or {}).get("Error", {}).get("Code")
+    return (
+        error_code in THROTTLING_ERROR_CODES
+        or getattr(http_response, "status_code", None) in THROTTLING_STATUS_CODES
+    )
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD (additive increase, multiplicative decrease) limit of the requests in flight. Each successful request raises
+    the limit by 1/limit, so it grows by one per round of requests, and a throttled request divides it by
+    decrease_factor. Requests sent before the last decrease do not decrease it again, so a burst of throttled answers
+    halves the limit once.
+    """
+
+    def __init__(
+        self,
+        max_limit: int = DEFAULT_MAX_CONCURRENCY,
+        min_limit: int = 1,
+        initial_limit: int = None,
+        decrease_factor: float = 0.5,
+    ):
+        if not 1 <= min_limit <= max_limit:
+            raise ValueError(f"Invalid concurrency limits ({min_limit}, {max_limit})")
+        if not 0 < decrease_factor < 1:
+            raise ValueError(f"Invalid decrease factor ({decrease_factor})")
+        self.max_limit: int = max_limit
+        self.min_limit: int = min_limit
+        self.decrease_factor: float = decrease_factor
+        self.limit: float = float(initial_limit or max_limit)
+        self.in_flight: int = 0
+        self.throttle_events: int = 0
+        self.successes: int = 0
+        self._last_decrease: float = float("-inf")
+        self._condition: threading.Condition = threading.Condition()
+
+    def acquire(self) -> float:
+        """Wait until a request can be sent.
+
+        Returns:
+            float: token to give to release, the time the request was allowed
+        """
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+            return time.monotonic()
+
+    def release(self, token: float, throttled: bool = False) -> None:
+        """Free the slot of a finished request and adapt the limit to its result."""
+        with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                self.throttle_events += 1
+                if token > self._last_decrease:
+                    self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                    self._last_decrease = time.monotonic()
+            else:
+                self.successes += 1
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+    def get_metrics(self) -> dict:
+        with self._condition:
+            return dict(
+                concurrency_limit=int(self.limit),
+                in_flight=self.in_flight,
+                throttle_events=self.throttle_events,
+                successes=self.successes,
+            )
+
+
+class ThrottlingHandler:
+    """
+    botocore event handlers that send the requests of a session through an AdaptiveConcurrencyLimiter and retry the
+    throttled ones with jittered exponential backoff. Other errors are left to the botocore retry handler.
+    """
+
+    def __init__(
+        self,
+        limiter: AdaptiveConcurrencyLimiter,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    ):
+        self.limiter: AdaptiveConcurrencyLimiter = limiter
+        self.max_attempts: int = max_attempts
+        self.retries: int = 0
+        # a thread sends one request at a time, its slot is kept from before-send to needs-retry
+        self._local: threading.local = threading.local()
+
+    def register(self, events) -> None:
+        """Register the handlers in the event system of a boto3 session, before the clients are created"""
+        events.register("before-send.s3", self.before_send)
+        events.register("needs-retry.s3", self.needs_retry)
+
+    def before_send(self, **kwargs) -> None:
+        token: float = getattr(self._local, "token", None)
+        if token is not None:
+            # the previous request of this thread ended without needs-retry
+            self.limiter.release(token)
+        self._local.token = self.limiter.acquire()
+
+    def needs_retry(
+        self, response=None, attempts: int = 1, caught_exception=None, **kwargs
+    ):
+        throttled: bool = is_throttling_response(response, caught_exception)
+        token: float = getattr(self._local, "token", None)
+        if token is not None:
+            self._local.token = None
+            self.limiter.release(token, throttled)
+        if not throttled or attempts >= self.max_attempts:
+            return None
+        self.retries += 1
+        return get_backoff_delay(attempts)
+
+    def get_metrics(self) -> dict:
+        metrics: dict = self.limiter.get_metrics()
+        metrics["retries"] = self.retries
+        return metrics
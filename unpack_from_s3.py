@@ -0,0 +1,80 @@
+import argparse
+import logging
+import os
+import sys
+
+new_path: str = os.path.join(os.path.dirname(__file__), "..", "..")
+sys.path.append(new_path)
+
+from aws import AWSSession, botocore_exceptions
+from pack import PackReader
+from profiling import profile_main
+
+
+def main(argv):
+    """
+    This script will extract members of a pack object with range requests, without downloading the whole pack.
+    """
+
+    # Arguments and description
+    parser = argparse.ArgumentParser(
+        description="extract members of a pack made by pack, each group of nearby members is read with one range "
+        "request"
+    )
+
+    parser.add_argument("bucket", help="bucket name")
+    parser.add_argument("key", help="object key of the pack")
+    parser.add_argument(
+        "member", nargs="*", help="members to extract. Defaults to every member"
+    )
+    parser.add_argument(
+        "--destination-path",
+        default=None,
+        help="path where members will be saved, if it is not provided we will use current path",
+    )
+    parser.add_argument(
+        "--list",
+        action="store_true",
+        help="show the members of the pack without extracting them",
+    )
+
+    args = parser.parse_args(argv[1:])
+
+    # Give names to arguments
+    bucket_name: str = args.bucket
+    key: str = args.key
+    names: list = args.member or None
+    destination_path: str = args.destination_path or os.getcwd()
+
+    logger = logging.getLogger(__name__)
+    logging.basicConfig(level=logging.INFO)
+
+    if not os.path.isdir(destination_path):
+        logger.info(f"Path '{destination_path}' is not valid")
+        exit(1)
+
+    aws_session = AWSSession()
+    reader: PackReader = PackReader(aws_session.session.client("s3"), bucket_name, key)
+
+    try:
+        if args.list:
+            for member in reader.members.values():
+                logger.info(f"{member['name']} ({member['size']} bytes)")
+            return 0
+        extracted: int = 0
+        for name, data in reader.read_many(names):
+            # members are written by name, without leaving the destination path
+            with open(
+                os.path.join(destination_path, os.path.basename(name)), "wb"
+            ) as file_obj:
+                file_obj.write(data)
+            extracted += 1
+    except (KeyError, ValueError, IOError, botocore_exceptions.ClientError) as e:
+        logger.error(e)
+        return 1
+    logger.info(f"{extracted} members of {key} extracted to {destination_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(profile_main(main, sys.argv))
@@ -3,17 +3,25 @@ import gzip
 import logging
 import os
 import sys
+import time
 
 from utils import (
+    COMPRESS_LEVELS,
+    COMPRESS_TYPES,
     get_date_list_between_two_given_dates,
     valid_date,
     valid_three_tuple_list,
+    zstandard,
 )
 
 new_path: str = os.path.join(os.path.dirname(__file__), "..", "..")
 sys.path.append(new_path)
 
 from aws import AWSSession
+from inventory import BucketInventory
+from journal import UpdateJournal, get_job_id
+from planner import ThroughputHistory, plan_update
+from profiling import profile_main
 
 
 def main(argv):
@@ -53,6 +61,69 @@ def main(argv):
         default=None,
         help="path where files will be saved, if it is not provided we will use current path",
     )
+    parser.add_argument(
+        "--inventory",
+        default=None,
+        help="path to a local SQLite inventory of the bucket, it is refreshed incrementally instead of listing the whole "
+        "bucket. Objects other writers add with lower keys than the last listed one, overwrite or delete are seen by "
+        "the full listing made every 24 hours",
+    )
+    parser.add_argument(
+        "--listing-workers",
+        default=None,
+        type=int,
+        help="list the bucket with this number of concurrent requests over year-month key ranges",
+    )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="update objects streaming them from and to the bucket without temporary files, the original version is only saved if --destination-path is given",
+    )
+    parser.add_argument(
+        "--workers",
+        default=1,
+        type=int,
+        help="number of processes updating objects at the same time, each one downloads, updates and uploads one object",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="show the objects, bytes, requests and estimated time of the update without updating anything",
+    )
+    parser.add_argument(
+        "--scan",
+        action="store_true",
+        help="only count the cells each tuple would replace in each object, nothing is written",
+    )
+    parser.add_argument(
+        "--throughput-history",
+        default=None,
+        help="JSON file where the throughput of each run is saved to estimate the time of plans",
+    )
+    parser.add_argument(
+        "--codec",
+        default=None,
+        choices=COMPRESS_TYPES,
+        help="compress updated objects with this format and change their extension, the original objects are deleted (zst needs the zstandard package). By default objects keep their format",
+    )
+    parser.add_argument(
+        "--journal",
+        default=None,
+        help="path to a local SQLite journal where the steps of each object are recorded, rerunning the command with the same bucket, extension, tuples, codec and compression level continues where it stopped and skips the dates already updated",
+    )
+    compression_group = parser.add_mutually_exclusive_group()
+    compression_group.add_argument(
+        "--compress-level",
+        default=None,
+        type=int,
+        help="compression level of updated objects, 1-9 for gz and zip and 1-19 for zst. Defaults to 6 for gz and zip and 3 for zst",
+    )
+    compression_group.add_argument(
+        "--target-throughput",
+        default=None,
+        type=float,
+        help="choose the highest compression level that compresses at least this MB/s, measured on a sample of the first object",
+    )
 
     args: argparse.Namespace = parser.parse_args(argv[1:])
 
@@ -66,14 +137,50 @@ def main(argv):
     extension: str = args.extension
     tuples_list: list = args.tuples
     destination_path: str = args.destination_path
+    inventory_path: str = args.inventory
+    listing_workers: int = args.listing_workers
+    streaming: bool = args.streaming
+    workers: int = args.workers
+    plan: bool = args.plan
+    scan: bool = args.scan
+    throughput_history_path: str = args.throughput_history
+    codec: str = args.codec
+    compresslevel: int = args.compress_level
+    target_throughput: float = args.target_throughput
+    journal_path: str = args.journal
 
     if destination_path is not None and not os.path.isdir(destination_path):
         logger.info(f"Path '{destination_path}' is not valid")
         exit(1)
 
+    if codec == "zst" and zstandard is None:
+        logger.info("zst codec needs the zstandard package (pip install zstandard)")
+        exit(1)
+
+    # without codec, the level must be valid for every format
+    if compresslevel is not None and not all(
+        compresslevel in COMPRESS_LEVELS[compress_type]
+        for compress_type in ([codec] if codec else COMPRESS_TYPES)
+    ):
+        logger.info(f"Compression level {compresslevel} is not valid")
+        exit(1)
+
     # Check start_date and end_date
     date_list: list = get_date_list_between_two_given_dates(start_date, end_date)
-    aws_session = AWSSession()
+    inventory: BucketInventory = (
+        BucketInventory(inventory_path) if inventory_path is not None else None
+    )
+    journal: UpdateJournal = (
+        UpdateJournal(
+            journal_path,
+            get_job_id(bucket_name, tuples_list, codec, extension, compresslevel),
+        )
+        if journal_path is not None
+        else None
+    )
+    aws_session = AWSSession(
+        inventory=inventory, listing_workers=listing_workers, journal=journal
+    )
 
     if not aws_session.check_bucket_exists(bucket_name):
         logger.info(f"Bucket '{bucket_name}' does not exist")
@@ -81,10 +188,44 @@ def main(argv):
 
     logger.info(f"Bucket name: {bucket_name} ...")
 
-    aws_session.update_files_from_bucket(
-        date_list, bucket_name, extension, tuples_list, destination_path
+    if plan:
+        history: ThroughputHistory = (
+            ThroughputHistory(throughput_history_path)
+            if throughput_history_path is not None
+            else None
+        )
+        object_list: list = aws_session.retrieve_obj_list(bucket_name)
+        for line in plan_update(object_list, date_list, extension, workers).get_summary(
+            history
+        ):
+            logger.info(line)
+        return
+
+    start_time: float = time.perf_counter()
+    stats: dict = aws_session.update_files_from_bucket(
+        date_list,
+        bucket_name,
+        extension,
+        tuples_list,
+        destination_path,
+        streaming,
+        workers,
+        scan,
+        codec,
+        compresslevel,
+        target_throughput,
     )
+    if throughput_history_path is not None and not scan:
+        # plans count every object of the dates, so runs count every object read (updated or unchanged), the ones
+        # whose bytes are in stats["bytes"]
+        ThroughputHistory(throughput_history_path).record(
+            "update",
+            stats["objects"] + stats["unchanged"],
+            stats["bytes"],
+            time.perf_counter() - start_time,
+            workers,
+        )
 
 
 if __name__ == "__main__":
-    sys.exit(main(sys.argv))
+    sys.exit(profile_main(main, sys.argv))
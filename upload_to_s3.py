@@ -5,13 +5,55 @@ import os
 import sys
 from datetime import datetime
 
-from botocore.exceptions import ClientError
-
 # add path so we can use function through command line
 new_path = os.path.join(os.path.dirname(__file__), '..', '..')
 sys.path.append(new_path)
 
-from aws import AWSSession
+from aws import CANNED_ACLS, AWSSession, botocore_exceptions, get_upload_extra_args
+from inventory import BucketInventory
+from multipart import DEFAULT_PART_SIZE, DEFAULT_UPLOAD_WORKERS, MIN_PART_SIZE
+from profiling import profile_main
+
+
+def has_valid_format_name(filename):
+    """ file names start with a YYYY-mm-dd date """
+    try:
+        datetime.strptime(filename.split('.')[0], "%Y-%m-%d")
+    except ValueError:
+        return False
+    return True
+
+
+def send_stdin_to_s3(aws_session, key, bucket_name, omit_filename_check, replace, ignore_if_exists, part_size,
+                     workers, extra_args):
+    """
+    Upload the data read from stdin while it is produced. The user can not be asked to replace an existing object
+    because stdin is the data, so it is only replaced with --replace.
+    """
+    logger = logging.getLogger(__name__)
+    if key is None:
+        logger.info('--key is needed to upload the data read from stdin')
+        exit(1)
+    if not omit_filename_check and not has_valid_format_name(key):
+        logger.error(f'\'{key}\' does not have a valid format name')
+        exit(1)
+    if part_size < MIN_PART_SIZE:
+        logger.info(f'part size must be at least {MIN_PART_SIZE // 1024 ** 2} MB')
+        exit(1)
+
+    try:
+        if not replace and aws_session.check_file_exists(bucket_name, key):
+            if ignore_if_exists:
+                return 0
+            logger.info(f'file \'{key}\' exists in bucket, use --replace to replace it')
+            return 1
+        logger.info(f"{datetime.now().replace(microsecond=0)}: uploading stdin to {key}")
+        aws_session.send_stream_to_bucket(sys.stdin.buffer, key, bucket_name, part_size, workers, extra_args)
+        logger.info(f"{datetime.now().replace(microsecond=0)}: finished load of {key}")
+    except botocore_exceptions.ClientError as e:
+        logger.error(e)
+        return 1
+    return 0
 
 
 def main(argv):
@@ -24,7 +66,8 @@ def main(argv):
     parser = argparse.ArgumentParser(description='move document to S3 bucket')
 
     parser.add_argument('file', nargs='+',
-                        help='data file path. It can be a pattern, e.g. /path/to/file or /path/to/file*.zip')
+                        help='data file path. It can be a pattern, e.g. /path/to/file or /path/to/file*.zip. Use - to '
+                             'read the data from stdin, its object key is given by --key')
     parser.add_argument('bucket', default=None, help='bucket name. Valid options are: ')
     parser.add_argument('--omit-filename-check', action='store_true',
                         help='It Accepts filenames with distinct format to YYYY-mm-dd.*')
@@ -32,6 +75,21 @@ def main(argv):
                         help='It replaces file if exists in bucket, default behavior ask to user a confirmation')
     parser.add_argument('--ignore-if-exists', action='store_true',
                         help='It does not upload file if already exist in the bucket')
+    parser.add_argument('--inventory', default=None,
+                        help='path to a local SQLite inventory of the bucket, existence checks are answered by it '
+                             'instead of one request per file. Objects other writers add with lower keys than the '
+                             'last listed one, overwrite or delete are seen by the full listing made every 24 hours')
+    parser.add_argument('--key', default=None, help='object key of the data read from stdin')
+    parser.add_argument('--part-size', default=DEFAULT_PART_SIZE // 1024 ** 2, type=int,
+                        help=f'MB of each part of stdin uploads. Defaults to {DEFAULT_PART_SIZE // 1024 ** 2}')
+    parser.add_argument('--workers', default=DEFAULT_UPLOAD_WORKERS, type=int,
+                        help=f'parts of stdin uploaded at the same time, memory used is part size x workers. '
+                             f'Defaults to {DEFAULT_UPLOAD_WORKERS}')
+    parser.add_argument('--acl', default=None, choices=CANNED_ACLS,
+                        help='canned ACL of the objects, e.g. public-read. Defaults to the bucket settings')
+    parser.add_argument('--content-type', default=None, help='Content-Type of the objects, e.g. text/csv')
+    parser.add_argument('--content-encoding', default=None, help='Content-Encoding of the objects, e.g. gzip')
+    parser.add_argument('--cache-control', default=None, help='Cache-Control of the objects, e.g. max-age=3600')
 
     args = parser.parse_args(argv[1:])
 
@@ -41,8 +99,15 @@ def main(argv):
     omit_filename_check = args.omit_filename_check
     replace = args.replace
     ignore_if_exists = args.ignore_if_exists
-
-    aws_session = AWSSession()
+    inventory_path = args.inventory
+    stdin_key = args.key
+    part_size = args.part_size * 1024 ** 2
+    workers = args.workers
+    # sent with the upload request of each object
+    extra_args = get_upload_extra_args(args.acl, args.content_type, args.content_encoding, args.cache_control)
+
+    inventory = BucketInventory(inventory_path) if inventory_path is not None else None
+    aws_session = AWSSession(inventory=inventory)
     logger = logging.getLogger(__name__)
     logging.basicConfig(level=logging.INFO)
 
@@ -53,10 +118,14 @@ def main(argv):
     if not aws_session.check_bucket_exists(bucket_name):
         logger.info(f"Bucket {bucket_name} does not exist")
         exit(1)
+
+    if datafiles == ['-']:
+        return send_stdin_to_s3(aws_session, stdin_key, bucket_name, omit_filename_check, replace, ignore_if_exists,
+                                part_size, workers, extra_args)
     
     def send_file_to_s3(matched_file, filename):
         logger.info(f"{datetime.now().replace(microsecond=0)}: uploading file {matched_file}")
-        aws_session.send_file_to_bucket(matched_file, filename, bucket_name)
+        aws_session.send_file_to_bucket(matched_file, filename, bucket_name, extra_args=extra_args)
         logger.info(f"{datetime.now().replace(microsecond=0)}: finished load of file {matched_file}")
         
     for datafile in datafiles:
@@ -67,13 +136,9 @@ def main(argv):
 
         for matched_file in matched_files:
             filename = matched_file.split(os.sep)[-1]
-            if not omit_filename_check:
-                filename_date_part = filename.split('.')[0]
-                try:
-                    datetime.strptime(filename_date_part, "%Y-%m-%d")
-                except ValueError:
-                    logger.error(f'\'{filename}\' does not have a valid format name')
-                    continue
+            if not omit_filename_check and not has_valid_format_name(filename):
+                logger.error(f'\'{filename}\' does not have a valid format name')
+                continue
 
             try:
                 file_exists = aws_session.check_file_exists(bucket_name, filename)
@@ -91,10 +156,10 @@ def main(argv):
                         logger.info(f"file {filename} was not replaced")
                         continue
                     send_file_to_s3(matched_file, filename)
-            except ClientError as e:
+            except botocore_exceptions.ClientError as e:
                 # ignore it and continue uploading files
                 logger.error(e)
 
 
 if __name__ == "__main__":
-    sys.exit(main(sys.argv))
+    sys.exit(profile_main(main, sys.argv))
@@ -1,13 +1,21 @@
 from datetime import datetime, timedelta
 import argparse
+import contextlib
 import csv
-import fnmatch
 import io
 import os
-import shutil
+import time
 import zipfile
 import gzip
 
+from columnar import get_engine_kwargs, supports_tables, update_lines_vectorized
+from key_index import compile_pattern
+from lazy import lazy_import
+from parallel_gzip import DEFAULT_COMPRESS_LEVEL, ParallelGzipWriter
+
+# optional dependency, only needed for zstd objects
+zstandard = lazy_import("zstandard")
+
 
 def valid_date(s: str) -> datetime.date:
     """This is a function that validate a date with the format YYYY-mm-dd.
@@ -70,9 +78,10 @@ def retrieve_objects_with_pattern(pattern: str, aws_object_list: list) -> list:
     Returns:
         list: object matched list
     """
+    regex = compile_pattern(pattern)
     object_matched_list: list = []
     for object in aws_object_list:
-        if object.get("name") and fnmatch.fnmatch(object.get("name"), pattern):
+        if object.get("name") and regex.match(object["name"]):
             object_matched_list.append(object["name"])
     return object_matched_list
 
@@ -113,24 +122,290 @@ def update_file_by_tuples(
         output_file_name (str): The output file name
         tuples (list): The tuples list with tuples in format [(column_to_check, value_to_replace, new_value)...]
         delimiter (str, optional): File's delimiter. Defaults to "|".
+
+    Returns:
+        list: number of cells replaced by each tuple
     """
-    with open(input_file_name, "r") as input_file, open(
-        output_file_name, "w"
+    with open(input_file_name, "rb") as input_file, open(
+        output_file_name, "wb"
     ) as output_file:
-        reader: csv.reader = csv.reader(input_file, delimiter=delimiter)
-        writer: csv.writer = csv.writer(output_file, delimiter=delimiter)
-        for row in reader:
-            for column_index, previous_value, new_value in tuples:
-                if int(column_index) < len(row) and row[int(column_index)] == str(
-                    previous_value
-                ):
-                    row[int(column_index)] = new_value
+        return update_bytes_stream_by_tuples(
+            input_file,
+            output_file,
+            tuples,
+            delimiter,
+            **get_engine_kwargs(os.path.getsize(input_file_name)),
+        )
+
+
+def compile_tuples(tuples: list) -> list:
+    """This function compiles the tuples list into one replacement table per touched column.
+
+    Tuples are applied in order, so a value replaced by a tuple can be replaced again by a later tuple of the same
+    column. Each table maps the original value to its final value after every tuple of its column.
+
+    Args:
+        tuples (list): The tuples list with tuples in format [(column_to_check, value_to_replace, new_value)...]
+
+    Returns:
+        list: (column_index, {value_to_replace: new_value}) pairs, in order of first appearance of the column
+    """
+    tables: dict = {}
+    for column_index, previous_value, new_value in tuples:
+        table: dict = tables.setdefault(int(column_index), {})
+        previous_value = str(previous_value)
+        for value, replaced_value in table.items():
+            if replaced_value == previous_value:
+                table[value] = new_value
+        if previous_value not in table:
+            table[previous_value] = new_value
+    return list(tables.items())
 
-            writer.writerow(row)
+
+def count_replacements(tuples: list, matches: dict) -> list:
+    """This function counts the cells replaced by each tuple from the cells found in the compiled tables.
+
+    Args:
+        tuples (list): The tuples list with tuples in format [(column_to_check, value_to_replace, new_value)...]
+        matches (dict): number of cells found for each (column_index, original value)
+
+    Returns:
+        list: number of cells replaced by each tuple, in the same order as tuples
+    """
+    counts: list = [0] * len(tuples)
+    for (column_index, value), cell_number in matches.items():
+        for tuple_index, (tuple_column, previous_value, new_value) in enumerate(tuples):
+            if int(tuple_column) == column_index and value == str(previous_value):
+                counts[tuple_index] += cell_number
+                value = new_value
+    return counts
+
+
+def update_stream_by_tuples(
+    input_stream: io.TextIOBase,
+    output_stream: io.TextIOBase,
+    tuples: list,
+    delimiter="|",
+):
+    """This function update a csv-like text stream with tuples values using the delimiter.
+
+    Args:
+        input_stream (io.TextIOBase): The text stream to update
+        output_stream (io.TextIOBase): The text stream where updated rows are written
+        tuples (list): The tuples list with tuples in format [(column_to_check, value_to_replace, new_value)...]
+        delimiter (str, optional): File's delimiter. Defaults to "|".
+
+    Returns:
+        list: number of cells replaced by each tuple
+    """
+    reader: csv.reader = csv.reader(input_stream, delimiter=delimiter)
+    writer: csv.writer = csv.writer(output_stream, delimiter=delimiter)
+    column_tables: list = compile_tuples(tuples)
+    matches: dict = {}
+    for row in reader:
+        row_length: int = len(row)
+        for column_index, table in column_tables:
+            if column_index < row_length:
+                value = row[column_index]
+                if value in table:
+                    row[column_index] = table[value]
+                    match: tuple = (column_index, value)
+                    matches[match] = matches.get(match, 0) + 1
+
+        writer.writerow(row)
+    return count_replacements(tuples, matches)
+
+
+BYTES_CHUNK_SIZE: int = 1024**2
+CSV_LINE_TERMINATOR: bytes = b"\r\n"
+
+
+class _PrefixedReader(io.RawIOBase):
+    """Readable stream that returns already read bytes before the rest of another stream"""
+
+    def __init__(self, prefix: bytes, stream: io.BufferedIOBase):
+        self.prefix: bytes = prefix
+        self.stream: io.BufferedIOBase = stream
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self.prefix:
+            data: bytes = self.prefix[: len(buffer)]
+            self.prefix = self.prefix[len(data) :]
+        else:
+            data = self.stream.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+class CountingReader(io.RawIOBase):
+    """Readable stream that counts the bytes read from another stream, for streams without a known length"""
+
+    def __init__(self, stream: io.BufferedIOBase):
+        self.stream: io.BufferedIOBase = stream
+        self.bytes_read: int = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data: bytes = self.stream.read(len(buffer))
+        buffer[: len(data)] = data
+        self.bytes_read += len(data)
+        return len(data)
+
+
+def _needs_csv_module(values: list, delimiter: bytes) -> bool:
+    """Values with quotes, delimiters or line breaks are quoted by csv.writer"""
+    return any(
+        special in value
+        for value in values
+        for special in (delimiter, b'"', b"\r", b"\n")
+    )
+
+
+def _decode_matches(matches: dict, encoding: str) -> dict:
+    """Matches of the binary engines with text values, as count_replacements expects"""
+    return {
+        (column_index, value.decode(encoding)): cell_number
+        for (column_index, value), cell_number in matches.items()
+    }
+
+
+def _update_lines(
+    data: bytes, column_tables: list, delimiter: bytes, max_split: int, matches: dict
+) -> bytes:
+    """Row by row engine of update_bytes_stream_by_tuples, rows end with CRLF like csv.writer output"""
+    if not data:
+        return data
+    lines: list = data.split(b"\n")
+    if data.endswith(b"\n"):
+        lines.pop()
+    for line_index, line in enumerate(lines):
+        if not line:
+            continue
+        fields: list = line.split(delimiter, max_split)
+        field_number: int = len(fields)
+        updated: bool = False
+        for column_index, table in column_tables:
+            if column_index < field_number and fields[column_index] in table:
+                match: tuple = (column_index, fields[column_index])
+                matches[match] = matches.get(match, 0) + 1
+                fields[column_index] = table[fields[column_index]]
+                updated = True
+        if updated:
+            line = delimiter.join(fields)
+            # csv.writer quotes a row with only one empty field
+            lines[line_index] = line if line or field_number > 1 else b'""'
+    lines.append(b"")
+    return CSV_LINE_TERMINATOR.join(lines)
+
+
+def update_bytes_stream_by_tuples(
+    input_stream: io.BufferedIOBase,
+    output_stream: io.BufferedIOBase,
+    tuples: list,
+    delimiter="|",
+    encoding="utf-8",
+    chunk_size: int = BYTES_CHUNK_SIZE,
+    vectorized: bool = False,
+):
+    """This function update a csv-like binary stream with tuples values using the delimiter.
+
+    Files without quotes are rewritten in big binary chunks: rows are split only up to the last column with tuples
+    and rows without changes are written back as they are. As soon as a quote (or a lone carriage return) is found,
+    the rest of the stream goes through update_stream_by_tuples, the output is the same as with the csv module.
+
+    Args:
+        input_stream (io.BufferedIOBase): The binary stream to update
+        output_stream (io.BufferedIOBase): The binary stream where updated rows are written
+        tuples (list): The tuples list with tuples in format [(column_to_check, value_to_replace, new_value)...]
+        delimiter (str, optional): File's delimiter. Defaults to "|".
+        encoding (str, optional): stream encoding. Defaults to "utf-8".
+        chunk_size (int, optional): bytes read at once. Defaults to BYTES_CHUNK_SIZE.
+        vectorized (bool, optional): apply the tuples to each chunk with NumPy (see columnar module).
+            Defaults to False.
+
+    Returns:
+        list: number of cells replaced by each tuple
+    """
+    byte_delimiter: bytes = delimiter.encode(encoding)
+    column_tables: list = [
+        (
+            column_index,
+            {
+                str(value).encode(encoding): str(new_value).encode(encoding)
+                for value, new_value in table.items()
+            },
+        )
+        for column_index, table in compile_tuples(tuples)
+    ]
+    new_values: list = [
+        new_value for _, table in column_tables for new_value in table.values()
+    ]
+    vectorized = vectorized and supports_tables(column_tables)
+    matches: dict = {}
+    pending: bytes = b""
+    if not _needs_csv_module(new_values, byte_delimiter):
+        columns: list = [column_index for column_index, _ in column_tables]
+        # negative columns count from the end, so the whole row must be split
+        max_split: int = max(columns) + 1 if columns and min(columns) >= 0 else -1
+        while True:
+            chunk: bytes = input_stream.read(chunk_size)
+            data: bytes = pending + chunk
+            if chunk:
+                # the last line may be incomplete, it is completed with the next chunk
+                end: int = data.rfind(b"\n") + 1
+                data, pending = data[:end], data[end:]
+            else:
+                pending = b""
+            if b'"' in data:
+                pending = data + pending
+                break
+            if b"\r" in data:
+                unix_data: bytes = data.replace(b"\r\n", b"\n")
+                if b"\r" in unix_data:
+                    # a lone carriage return is a line break for text streams
+                    pending = data + pending
+                    break
+                data = unix_data
+            if vectorized and b"\x00" not in data:
+                output_stream.write(
+                    update_lines_vectorized(
+                        data, column_tables, byte_delimiter, matches
+                    )
+                )
+            else:
+                output_stream.write(
+                    _update_lines(
+                        data, column_tables, byte_delimiter, max_split, matches
+                    )
+                )
+            if not chunk:
+                return count_replacements(tuples, _decode_matches(matches, encoding))
+
+    input_text = io.TextIOWrapper(
+        io.BufferedReader(_PrefixedReader(pending, input_stream)), encoding=encoding
+    )
+    output_text = io.TextIOWrapper(output_stream, encoding=encoding)
+    csv_counts: list = update_stream_by_tuples(
+        input_text, output_text, tuples, delimiter
+    )
+    output_text.flush()
+    # the streams belong to the caller, the text wrappers must not close them
+    input_text.detach()
+    output_text.detach()
+    bytes_counts: list = count_replacements(tuples, _decode_matches(matches, encoding))
+    return [
+        bytes_count + csv_count
+        for bytes_count, csv_count in zip(bytes_counts, csv_counts)
+    ]
 
 
 def is_gzipfile(file_path: str) -> bool:
-    """This function validate if a file_path is a gzip file.
+    """This function validate if a file_path is a gzip file by its magic number.
 
     Args:
         file_path (str): The file path
@@ -138,40 +413,243 @@ def is_gzipfile(file_path: str) -> bool:
     Returns:
         bool: True if is a gzip file
     """
-    with gzip.open(file_path) as file_obj:
-        try:
-            file_obj.read(1)
-            return True
-        except IOError:
-            return False
-
-
-def get_file_object(file_path: str):
-    """This function is designed to open a file in one of three possible formats: gzip, zip, or no compressed.
-      Then, extract the file if it is compressed and make a copy.
-    Args:
-        file_path (_type_): File path to the object to copy
-
-    Returns:
-        str: Return the filepath of the copy and the compress type
-    """
-    compress_mode: str = ""
-    file_name: str = os.path.basename(file_path)
-    path: str = os.path.dirname(file_path)
-    if zipfile.is_zipfile(file_path):
-        with zipfile.ZipFile(file_path, "r") as zip_file:
-            zip_file.extractall(path=path)
-            inside_file: str = file_name.split(".zip")[0]
-            compress_mode = "zip"
-            file_name = os.path.join(path, inside_file)
-    elif is_gzipfile(file_path):
-        with gzip.open(file_path, str("rt"), encoding="utf-8") as f_in:
-            inside_file: str = file_name.split(".gz")[0]
-            with open(os.path.join(path, inside_file), "wt") as f_out:
-                shutil.copyfileobj(f_in, f_out)
-                file_name = os.path.join(path, inside_file)
-                compress_mode = "gz"
+    with open(file_path, "rb") as file_obj:
+        return get_compress_type(file_obj) == "gz"
+
+
+@contextlib.contextmanager
+def get_file_object(file_path: str, member_name: str = None):
+    """This function is designed to open a file in one of four possible formats: gzip, zip, zstd or no compressed.
+      The format is detected by its magic number and the content is decompressed while it is read, without
+      intermediate files.
+    Args:
+        file_path (str): File path to the object to read
+        member_name (str, optional): zip member to read. Defaults to the file name without the compression
+            extension, or to the only member of the zip file.
+
+    Raises:
+        ValueError: In case of a zip file with more than one member and none of them is member_name
+
+    Yields:
+        tuple: readable binary stream with the content of the file and the compress type ("zip", "gz", "zst" or "")
+    """
+    with open(file_path, "rb") as file_obj:
+        compress_type: str = get_compress_type(file_obj)
+        if member_name is None:
+            member_name = get_uncompressed_name(file_path, compress_type)
+        with open_decompressed_stream(file_obj, compress_type, member_name) as stream:
+            yield stream, compress_type
+
+
+GZIP_MAGIC_NUMBER: bytes = b"\x1f\x8b"
+ZIP_MAGIC_NUMBERS: tuple = (b"PK\x03\x04", b"PK\x05\x06")
+ZSTD_MAGIC_NUMBER: bytes = b"\x28\xb5\x2f\xfd"
+COMPRESS_TYPES: list = ["gz", "zip", "zst"]
+COMPRESS_LEVELS: dict = dict(gz=range(1, 10), zip=range(1, 10), zst=range(1, 20))
+# level 9 is much slower than 6 and the files are barely smaller
+DEFAULT_COMPRESS_LEVELS: dict = dict(gz=DEFAULT_COMPRESS_LEVEL, zip=6, zst=3)
+
+
+def get_compress_type(file_obj: io.BufferedIOBase) -> str:
+    """This function detects the compression of a seekable binary file object by its magic number.
+
+    Args:
+        file_obj (io.BufferedIOBase): seekable binary file object, its position is restored
+
+    Returns:
+        str: "zip", "gz", "zst" or "" if it is not compressed
+    """
+    position: int = file_obj.tell()
+    header: bytes = file_obj.read(4)
+    file_obj.seek(position)
+    if header.startswith(ZIP_MAGIC_NUMBERS):
+        return "zip"
+    if header.startswith(GZIP_MAGIC_NUMBER):
+        return "gz"
+    if header.startswith(ZSTD_MAGIC_NUMBER):
+        return "zst"
+    return ""
+
+
+def get_uncompressed_name(file_name: str, compress_type: str) -> str:
+    """This function removes the compression extension of a file name.
+
+    Args:
+        file_name (str): file name, e.g. 2021-06-30.bip.gz
+        compress_type (str): "zip", "gz", "zst" or ""
+
+    Returns:
+        str: file name without compression extension, e.g. 2021-06-30.bip
+    """
+    if compress_type:
+        return os.path.basename(file_name).split(f".{compress_type}")[0]
+    return os.path.basename(file_name)
+
+
+def change_compress_type(
+    file_name: str, compress_type: str, new_compress_type: str
+) -> str:
+    """This function replaces the compression extension of a file name or object key.
+
+    Args:
+        file_name (str): file name or key, e.g. 2021/2021-06-30.bip.gz
+        compress_type (str): current compression, "zip", "gz", "zst" or ""
+        new_compress_type (str): new compression, "zip", "gz", "zst" or ""
+
+    Returns:
+        str: file name with the extension of the new compression, e.g. 2021/2021-06-30.bip.zst
+    """
+    if compress_type and file_name.endswith(f".{compress_type}"):
+        file_name = file_name[: -len(compress_type) - 1]
+    if new_compress_type:
+        return f"{file_name}.{new_compress_type}"
+    return file_name
+
+
+def check_zstandard() -> None:
+    """This function checks that the optional zstandard package is installed.
+
+    Raises:
+        ImportError: if zstandard is not installed
+    """
+    if zstandard is None:
+        raise ImportError(
+            "zstd compression needs the zstandard package (pip install zstandard)"
+        )
+
+
+def open_decompressed_stream(
+    file_obj: io.BufferedIOBase, compress_type: str, member_name: str = None
+) -> io.BufferedIOBase:
+    """This function returns a binary stream with the decompressed content of a file object.
+
+    Args:
+        file_obj (io.BufferedIOBase): binary file object, it must be seekable for zip files
+        compress_type (str): "zip", "gz", "zst" or ""
+        member_name (str, optional): zip member to read. Defaults to the only member of the zip file.
+
+    Raises:
+        ValueError: In case of a zip file without member_name and more than one member
+
+    Returns:
+        io.BufferedIOBase: readable binary stream
+    """
+    if compress_type == "zip":
+        zip_file: zipfile.ZipFile = zipfile.ZipFile(file_obj, "r")
+        names: list = zip_file.namelist()
+        if member_name not in names:
+            if len(names) != 1:
+                raise ValueError(
+                    f"Zip file has {len(names)} members and none is '{member_name}': {names}"
+                )
+            member_name = names[0]
+        return zip_file.open(member_name, "r")
+    if compress_type == "gz":
+        return gzip.GzipFile(fileobj=file_obj, mode="rb")
+    if compress_type == "zst":
+        check_zstandard()
+        return zstandard.ZstdDecompressor().stream_reader(
+            file_obj, read_across_frames=True, closefd=False
+        )
+    return file_obj
+
+
+@contextlib.contextmanager
+def open_compressed_stream(
+    file_obj: io.RawIOBase,
+    compress_type: str,
+    member_name: str,
+    compresslevel: int = None,
+    threads: int = None,
+):
+    """This function yields a binary stream that compresses what is written to file_obj.
+
+    The file object does not need to be seekable, so it can be a multipart upload.
+
+    Args:
+        file_obj (io.RawIOBase): writable binary file object
+        compress_type (str): "zip", "gz", "zst" or ""
+        member_name (str): name of the compressed file inside the zip or gzip header
+        compresslevel (int, optional): compression level. Defaults to DEFAULT_COMPRESS_LEVELS of compress_type.
+        threads (int, optional): compression threads of gz and zst, e.g. the share of the CPUs of a worker process.
+            Defaults to one per CPU.
+
+    Yields:
+        io.BufferedIOBase: writable binary stream
+    """
+    if compresslevel is None:
+        compresslevel = DEFAULT_COMPRESS_LEVELS.get(compress_type)
+    if compress_type == "zip":
+        with zipfile.ZipFile(
+            file_obj, "w", zipfile.ZIP_DEFLATED, compresslevel=compresslevel
+        ) as zip_file:
+            # the size is unknown in advance, so zip64 is needed for members bigger than 2 GB
+            with zip_file.open(member_name, "w", force_zip64=True) as member:
+                yield member
+    elif compress_type == "gz":
+        # independent blocks are compressed in parallel, the result is a multi-member gzip stream
+        with ParallelGzipWriter(
+            file_obj, member_name, compresslevel, workers=threads
+        ) as gzip_file:
+            yield gzip_file
+    elif compress_type == "zst":
+        check_zstandard()
+        # zstd compresses in parallel by itself, threads=-1 uses every CPU
+        compressor = zstandard.ZstdCompressor(
+            level=compresslevel, threads=threads or -1
+        )
+        with compressor.stream_writer(file_obj, closefd=False) as zstd_file:
+            yield zstd_file
     else:
-        file_name = file_path
+        yield file_obj
+
+
+def measure_compression(data: bytes, compress_type: str, compresslevel: int) -> dict:
+    """This function compresses data in memory and measures the ratio and speed of the compression.
+
+    Args:
+        data (bytes): uncompressed sample
+        compress_type (str): "zip", "gz" or "zst"
+        compresslevel (int): compression level
+
+    Returns:
+        dict: compress_type, compresslevel, ratio (compressed size / size) and throughput in MB/s of input
+    """
+    output_stream: io.BytesIO = io.BytesIO()
+    start_time: float = time.perf_counter()
+    with open_compressed_stream(
+        output_stream, compress_type, "sample", compresslevel
+    ) as compressed_stream:
+        compressed_stream.write(data)
+    seconds: float = max(time.perf_counter() - start_time, 1e-9)
+    return dict(
+        compress_type=compress_type,
+        compresslevel=compresslevel,
+        ratio=len(output_stream.getvalue()) / max(len(data), 1),
+        throughput=len(data) / 1024**2 / seconds,
+    )
+
+
+def choose_compresslevel(
+    data: bytes, compress_type: str, target_throughput: float
+) -> dict:
+    """This function chooses the highest compression level that still compresses data at target_throughput.
+
+    Levels are measured from the fastest one and the search stops at the first level slower than the target, so
+    the fastest level is chosen when none reaches it.
+
+    Args:
+        data (bytes): uncompressed sample, a few MB of the data to compress
+        compress_type (str): "zip", "gz" or "zst"
+        target_throughput (float): minimum throughput in MB/s
 
-    return file_name, compress_mode
+    Returns:
+        dict: measure_compression result of the chosen level
+    """
+    chosen: dict = None
+    for compresslevel in COMPRESS_LEVELS[compress_type]:
+        measure: dict = measure_compression(data, compress_type, compresslevel)
+        if chosen is not None and measure["throughput"] < target_throughput:
+            break
+        chosen = measure
+    return chosen